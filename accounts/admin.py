@@ -1,6 +1,12 @@
+from datetime import timedelta
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, AuditLog
+from django.db.models import Avg, Count, Max, Sum
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .models import User, AuditLog, BackgroundJob, RequestProfile
 
 
 @admin.register(User)
@@ -26,3 +32,59 @@ class AuditLogAdmin(admin.ModelAdmin):
     list_filter = ['action', 'model_name', 'created_at']
     search_fields = ['user__username', 'action', 'model_name']
     readonly_fields = ['user', 'action', 'model_name', 'object_id', 'changes', 'ip_address', 'user_agent', 'created_at']
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ['job_type', 'description', 'status', 'processed', 'total', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['job_type', 'status', 'created_at']
+    search_fields = ['description', 'created_by__username']
+    readonly_fields = ['job_type', 'description', 'status', 'total', 'processed', 'result', 'error',
+                       'created_by', 'created_at', 'started_at', 'finished_at']
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['view_name', 'method', 'status_code', 'total_ms', 'sql_ms', 'sql_count', 'template_ms', 'user', 'created_at']
+    list_filter = ['view_name', 'method', 'status_code', 'created_at']
+    search_fields = ['view_name', 'path']
+    readonly_fields = ['method', 'path', 'view_name', 'status_code', 'user', 'total_ms', 'sql_ms', 'sql_count',
+                       'template_ms', 'slowest_queries', 'created_at']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_urls(self):
+        return [
+            path('endpoints/', self.admin_site.admin_view(self.endpoints_view), name='accounts_requestprofile_endpoints'),
+        ] + super().get_urls()
+    
+    def endpoints_view(self, request):
+        """Sampled endpoints ranked by total DB time over the last ?days= (default 7)"""
+        try:
+            days = max(1, int(request.GET.get('days', 7)))
+        except ValueError:
+            days = 7
+        endpoints = (
+            RequestProfile.objects.filter(created_at__gte=timezone.now() - timedelta(days=days))
+            .values('view_name')
+            .annotate(
+                requests=Count('id'),
+                total_sql_ms=Sum('sql_ms'),
+                avg_sql_ms=Avg('sql_ms'),
+                avg_sql_count=Avg('sql_count'),
+                max_sql_count=Max('sql_count'),
+                avg_total_ms=Avg('total_ms'),
+                max_total_ms=Max('total_ms'),
+                avg_template_ms=Avg('template_ms'),
+            )
+            .order_by('-total_sql_ms')
+        )
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Endpoints by DB time',
+            'opts': self.model._meta,
+            'endpoints': endpoints,
+            'days': days,
+        }
+        return TemplateResponse(request, 'admin/accounts/requestprofile/endpoints.html', context)
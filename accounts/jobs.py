@@ -0,0 +1,72 @@
+"""
+In-process background job runner.
+
+Heavy operations (bulk lead duplication etc.) are recorded as a BackgroundJob
+row and executed on a small thread pool so the request can return straight
+away. The UI polls accounts:job_status for progress. Jobs run inside the web
+process - if the process restarts mid-job the row stays 'running', so job
+functions must be safe to re-run (use ignore_conflicts / conditional updates).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKGROUND_JOB_WORKERS', 2),
+            thread_name_prefix='bridgio-job',
+        )
+    return _executor
+
+
+def _run(job_id, func, args, kwargs):
+    close_old_connections()
+    job = BackgroundJob.objects.get(pk=job_id)
+    BackgroundJob.objects.filter(pk=job_id).update(status='running', started_at=timezone.now())
+    try:
+        result = func(job, *args, **kwargs)
+    except Exception as exc:
+        logger.exception(f"Background job {job_id} ({job.job_type}) failed")
+        BackgroundJob.objects.filter(pk=job_id).update(
+            status='failed', error=str(exc), finished_at=timezone.now()
+        )
+    else:
+        BackgroundJob.objects.filter(pk=job_id).update(
+            status='completed', result=result or {}, finished_at=timezone.now()
+        )
+    finally:
+        connection.close()
+
+
+def start_job(job_type, func, *args, user=None, description='', total=0, **kwargs):
+    """Create a BackgroundJob and run func(job, *args, **kwargs) on the worker pool
+
+    The job is only submitted once the surrounding transaction commits, so the
+    worker always sees the rows the request wrote. func's return value (a
+    JSON-serialisable dict) is stored as the job result.
+    """
+    from django.db import transaction
+
+    job = BackgroundJob.objects.create(
+        job_type=job_type,
+        description=description[:255],
+        total=total,
+        created_by=user,
+    )
+    if getattr(settings, 'BACKGROUND_JOBS_SYNC', False):
+        transaction.on_commit(lambda: _run(job.pk, func, args, kwargs))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run, job.pk, func, args, kwargs))
+    return job
@@ -0,0 +1,94 @@
+"""
+Benchmark the hot views against the bench dataset (seed_benchmark first).
+
+Requests every view in bridgio.benchmark.HOT_VIEWS through the test client,
+logged in as a bench user of each role, and prints JSON with p50 / p95 / max
+latency and the query count per endpoint and role. Save a run with --output
+and pass it to a later run with --compare to see the change per endpoint.
+
+By default the cache stays warm between iterations (the steady state);
+--cold clears it before every request.
+
+With --url the same views are requested over HTTP from a running server
+(start it with gunicorn.conf.py and the worker settings to compare),
+--concurrency clients at a time, optionally while --slow-clients threads keep
+a slow view busy (--slow-view) - how long fast pages wait behind long ones.
+Query counts then come from the Server-Timing header (staff users only).
+
+Usage:
+    python manage.py bench --output before.json
+    python manage.py bench --compare before.json --output after.json
+    python manage.py bench --views leads:list,dashboard --roles super_admin --iterations 20
+    python manage.py bench --url http://localhost:8000 --concurrency 8 --slow-view reports:employee_performance
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bridgio.benchmark import compare, run_bench, run_http_bench
+
+
+def _split(value):
+    return value.split(',') if value else None
+
+
+class Command(BaseCommand):
+    help = 'Latency and query counts of the hot views per role, as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=10, help='Measured requests per endpoint and role')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests first')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--views', help='Comma-separated URL names (default: all hot views)')
+        parser.add_argument('--roles', help='Comma-separated roles (default: every role per view)')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+        parser.add_argument('--compare', help='Baseline report (an earlier --output) to diff against')
+        parser.add_argument('--url', help='Benchmark this running server over HTTP instead of the test client')
+        parser.add_argument('--concurrency', type=int, default=1, help='Concurrent clients per view (--url)')
+        parser.add_argument('--slow-view', help='URL name kept busy by --slow-clients during the run (--url)')
+        parser.add_argument('--slow-clients', type=int, default=2, help='Threads requesting --slow-view (--url)')
+
+    def handle(self, *args, **options):
+        try:
+            if options['url']:
+                if options['cold']:
+                    raise CommandError('--cold only works in-process, not with --url')
+                results = run_http_bench(
+                    options['url'], views=_split(options['views']), roles=_split(options['roles']),
+                    iterations=options['iterations'], warmup=options['warmup'],
+                    concurrency=options['concurrency'], slow_view=options['slow_view'],
+                    slow_clients=options['slow_clients'] if options['slow_view'] else 0,
+                    log=self.stderr.write,
+                )
+            else:
+                results = run_bench(
+                    views=_split(options['views']), roles=_split(options['roles']),
+                    iterations=options['iterations'], warmup=options['warmup'], cold=options['cold'],
+                    log=self.stderr.write,
+                )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        if options['compare']:
+            with open(options['compare']) as f:
+                compare(results, json.load(f)['results'])
+
+        report = {
+            'meta': {
+                'vendor': connection.vendor,
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'cache': 'cold' if options['cold'] else 'warm',
+                'cache_backend': settings.CACHES['default']['BACKEND'],
+                'url': options['url'],
+                'concurrency': options['concurrency'] if options['url'] else 1,
+                'slow_view': options['slow_view'] if options['url'] else None,
+            },
+            'results': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,56 @@
+"""
+Run the photo pipeline (bridgio.images) over uploads that have no thumbnail yet.
+
+New uploads are processed in the background right after they are saved;
+this backfills project images and attendance selfies uploaded before that
+(or whose background job was lost in a restart). Runs in this process.
+
+Usage:
+    python manage.py process_images --dry-run
+    python manage.py process_images --only projects.Project.image --limit 500
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from bridgio.images import IMAGE_SPECS, process_image
+
+
+class Command(BaseCommand):
+    help = 'Downsize, strip EXIF and thumbnail existing project images and attendance selfies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=list(IMAGE_SPECS), help='Process just this field')
+        parser.add_argument('--limit', type=int, help='Stop after this many rows per field')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows to process')
+
+    def handle(self, *args, **options):
+        specs = {options['only']: IMAGE_SPECS[options['only']]} if options['only'] else IMAGE_SPECS
+        for key, spec in specs.items():
+            model_label, field_name = key.rsplit('.', 1)
+            model = apps.get_model(model_label)
+            if model is None:
+                raise CommandError(f'Unknown model {model_label}')
+            thumbnail_field = spec['thumbnail_field']
+            rows = model.objects.exclude(
+                Q(**{f'{field_name}__isnull': True}) | Q(**{field_name: ''})
+            ).filter(
+                Q(**{f'{thumbnail_field}__isnull': True}) | Q(**{thumbnail_field: ''})
+            ).order_by('pk')
+            if options['limit']:
+                rows = rows[:options['limit']]
+
+            if options['dry_run']:
+                self.stdout.write(f'{key}: {rows.count()} to process')
+                continue
+            processed = skipped = 0
+            for instance in rows.iterator(chunk_size=100):
+                if process_image(instance, field_name):
+                    processed += 1
+                else:
+                    skipped += 1
+            self.stdout.write(f'{key}: {processed} processed, {skipped} skipped (missing or unreadable)')
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run - no files changed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Images processed.'))
@@ -0,0 +1,29 @@
+"""
+Delete stored request profiles older than the retention window.
+
+The profiling middleware already prunes hourly while it stores new
+profiles; run this from cron (or after switching REQUEST_PROFILING off) to
+clean up regardless.
+
+Usage:
+    python manage.py prune_request_profiles
+    python manage.py prune_request_profiles --days 3
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import RequestProfile
+
+
+class Command(BaseCommand):
+    help = 'Delete request profiles older than REQUEST_PROFILE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep this many days instead of REQUEST_PROFILE_RETENTION_DAYS')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.REQUEST_PROFILE_RETENTION_DAYS
+        if days < 0:
+            raise CommandError('--days must be 0 or more')
+        deleted = RequestProfile.prune(days)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} request profile(s) older than {days} day(s).'))
@@ -0,0 +1,73 @@
+"""
+Release phase - everything that has to happen once per deploy, before the
+new web processes take traffic.
+
+Runs in one process instead of a `manage.py` per step: applies pending
+migrations (skipped, with the system checks, when there are none), creates
+the cache table for CACHE_BACKEND=db and loads the initial fixtures into an
+empty database. --catch-up also runs the idempotent backfills and rollups
+that build.sh used to run on every build; a failure there is reported but
+doesn't fail the release.
+
+The web process (Dockerfile CMD, Procfile `web`) only starts gunicorn. Run
+this from the platform's release step (Procfile `release`, Fly
+`release_command`, Render pre-deploy), or set RELEASE_ON_START=1 when the
+database lives on a volume only the web machine mounts (SQLite on Fly / Render).
+
+Usage:
+    python manage.py release
+    python manage.py release --catch-up
+"""
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# Idempotent maintenance commands run with --catch-up, in this order
+CATCH_UP_COMMANDS = [
+    'backfill_unit_bookings',
+    'rollup_daily_metrics',
+    'rebuild_cp_stats',
+    'prune_request_profiles',
+]
+
+
+class Command(BaseCommand):
+    help = 'Migrate, create the cache table and load initial data (deploy release phase)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--catch-up', action='store_true',
+                            help='Also run the backfill / rollup commands (' + ', '.join(CATCH_UP_COMMANDS) + ')')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+        self.step('migrate', self.migrate)
+        if settings.CACHE_BACKEND == 'db':
+            self.step('createcachetable', call_command, 'createcachetable')
+        self.step('load_initial_data', call_command, 'load_initial_data', skip_if_exists=True)
+        if options['catch_up']:
+            for name in CATCH_UP_COMMANDS:
+                try:
+                    self.step(name, call_command, name)
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f'{name} failed: {e}'))
+        self.stdout.write(self.style.SUCCESS(f'Release done in {time.perf_counter() - started:.1f}s'))
+
+    def step(self, name, func, *args, **kwargs):
+        self.stdout.write(f'-> {name}')
+        step_started = time.perf_counter()
+        func(*args, **kwargs)
+        self.stdout.write(f'   {name}: {(time.perf_counter() - step_started) * 1000:.0f} ms')
+
+    def migrate(self):
+        executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.stdout.write('   No migrations to apply')
+            return
+        self.stdout.write(f'   Applying {len(plan)} migration(s)')
+        call_command('migrate', interactive=False, verbosity=max(self.verbosity - 1, 0))
@@ -0,0 +1,67 @@
+"""
+Seed a synthetic production-scale dataset for benchmarking (bridgio.benchmark).
+
+Creates bench users of every role, projects with full tower grids, channel
+partners, leads with associations, call logs, reminders, bookings, payments
+and commissions with bulk inserts. Everything it creates is tagged (bench_*
+usernames, 'Bench ...' projects, +910000 / +910001 phones that no real
+number canonicalizes to) so --clear removes it again without touching real
+data (slowly - deletes run the model signals, so for the larger sizes a fresh
+database is quicker). Every bench user's password is 'bench', including a
+super_admin, so the command refuses to run unless DEBUG is on or --force is
+passed.
+
+Sizes (--size): tiny, small, medium, production (1M leads). Any volume can be
+overridden, e.g. --leads 250000 --bookings 5000.
+
+Usage:
+    python manage.py seed_benchmark --size small
+    python manage.py seed_benchmark --size production --batch-size 5000
+    python manage.py seed_benchmark --clear
+    python manage.py seed_benchmark --size small --force   # with DEBUG off
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bridgio.benchmark import SIZES, clear_dataset, has_dataset, seed_dataset, volumes_for
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create a tagged synthetic dataset for `manage.py bench`'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=list(SIZES), default='small', help='Named dataset size')
+        for volume in SIZES['small']:
+            parser.add_argument(f"--{volume.replace('_', '-')}", type=int, dest=volume, help=f'Override {volume}')
+        parser.add_argument('--call-logs-per-lead', type=float, help='Mean call logs per lead')
+        parser.add_argument('--reminders-per-lead', type=float, help='Mean reminders per lead')
+        parser.add_argument('--days', type=int, help='Spread created_at over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT / lead chunk')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (same seed, same data)')
+        parser.add_argument('--clear', action='store_true', help='Delete the bench dataset (and reseed unless --clear-only)')
+        parser.add_argument('--clear-only', action='store_true', help='Only delete the bench dataset')
+        parser.add_argument('--force', action='store_true', help='Run even though DEBUG is off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                "DEBUG is off - this looks like a real database. seed_benchmark creates users with the "
+                "password 'bench' (including a super_admin); pass --force to run it anyway."
+            )
+        if options['clear'] or options['clear_only']:
+            self.stdout.write('Removing bench dataset...')
+            clear_dataset(options['batch_size'], log=self.stdout.write)
+            if options['clear_only']:
+                return
+        elif has_dataset():
+            raise CommandError('A bench dataset already exists - pass --clear to replace it.')
+
+        overrides = {key: options.get(key) for key in list(SIZES['small']) + ['call_logs_per_lead', 'reminders_per_lead', 'days']}
+        volumes = volumes_for(options['size'], **overrides)
+        self.stdout.write(f"Seeding '{options['size']}' dataset: {json.dumps(volumes)}")
+        counts = seed_dataset(volumes, options['batch_size'], options['seed'], log=self.stdout.write)
+        for label, count in counts.items():
+            self.stdout.write(f'  {label}: {count}')
+        self.stdout.write(self.style.SUCCESS('Bench dataset ready - run `python manage.py bench`.'))
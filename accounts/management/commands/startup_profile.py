@@ -0,0 +1,143 @@
+"""
+Measure how long a web process takes to boot, and where the time goes.
+
+Starts a fresh interpreter with `python -X importtime` that does what a
+gunicorn worker does before its first request - load settings,
+django.setup(), build the WSGI handler (middleware) and import the URLconf
+(every app's urls and views) - and reports:
+
+- the wall time of each of those phases,
+- import time per app (INSTALLED_APPS, by module prefix) and per other
+  top-level package (django, PIL, ...), self time summed over its modules,
+- the slowest individual modules.
+
+Imports are cached by the OS after the first run, so each of --runs is timed
+and the fastest one is reported (use --runs 1 right after a deploy to see a
+cold start).
+
+Usage:
+    python manage.py startup_profile
+    python manage.py startup_profile --top 30 --runs 5
+    python manage.py startup_profile --json > startup.json
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in the child interpreter; prints the phase timings as the last stdout line
+BOOT_SCRIPT = """
+import json, time
+started = time.perf_counter()
+phases = {}
+def mark(name):
+    global started
+    now = time.perf_counter()
+    phases[name] = round((now - started) * 1000, 1)
+    started = now
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('settings')
+django.setup()
+mark('django.setup')
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+mark('wsgi handler')
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('urlconf')
+print(json.dumps(phases))
+"""
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """[(module, self us, cumulative us)] from `-X importtime` output"""
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return modules
+
+
+def owner(module, app_names):
+    """INSTALLED_APPS name the module belongs to, else its top-level package"""
+    for name in app_names:
+        if module == name or module.startswith(name + '.'):
+            return name
+    return module.split('.', 1)[0]
+
+
+class Command(BaseCommand):
+    help = 'Boot phase timings and import time per app (python -X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Boot this many times and report the fastest')
+        parser.add_argument('--top', type=int, default=15, help='Rows in the per-package and slowest-module tables')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+        best = None
+        for _ in range(options['runs']):
+            phases, modules = self.boot()
+            if best is None or sum(phases.values()) < sum(best[0].values()):
+                best = phases, modules
+        phases, modules = best
+
+        # Longest names first, so django.contrib.admin wins over django
+        app_names = sorted((config.name for config in apps.get_app_configs()), key=len, reverse=True)
+        packages = {}
+        for module, self_us, _ in modules:
+            entry = packages.setdefault(owner(module, app_names), {'ms': 0.0, 'modules': 0})
+            entry['ms'] += self_us / 1000
+            entry['modules'] += 1
+        report = {
+            'phases_ms': phases,
+            'total_ms': round(sum(phases.values()), 1),
+            'imports_ms': round(sum(self_us for _, self_us, _ in modules) / 1000, 1),
+            'packages': [
+                {'package': name, 'ms': round(entry['ms'], 1), 'modules': entry['modules'],
+                 'app': name in settings.INSTALLED_APPS or name in app_names}
+                for name, entry in sorted(packages.items(), key=lambda item: -item[1]['ms'])
+            ],
+            'slowest_modules': [
+                {'module': module, 'self_ms': round(self_us / 1000, 1), 'cumulative_ms': round(cumulative_us / 1000, 1)}
+                for module, self_us, cumulative_us in sorted(modules, key=lambda row: -row[1])[:options['top']]
+            ],
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.print_report(report, options['top'])
+
+    def boot(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'bridgio.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f'Boot failed:\n{result.stderr[-2000:]}')
+        return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+    def print_report(self, report, top):
+        self.stdout.write(f"Boot: {report['total_ms']:.0f} ms (imports {report['imports_ms']:.0f} ms)")
+        for phase, ms in report['phases_ms'].items():
+            self.stdout.write(f'  {phase:<16} {ms:>8.1f} ms')
+        self.stdout.write('\nImport time by package (self time, * = INSTALLED_APPS):')
+        for row in report['packages'][:top]:
+            marker = '*' if row['app'] else ' '
+            self.stdout.write(f"  {marker} {row['package']:<32} {row['ms']:>8.1f} ms  {row['modules']:>4} modules")
+        self.stdout.write('\nSlowest modules:')
+        for row in report['slowest_modules']:
+            self.stdout.write(f"  {row['module']:<48} {row['self_ms']:>8.1f} ms  (cumulative {row['cumulative_ms']:.1f})")
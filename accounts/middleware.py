@@ -0,0 +1,107 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .profiling import RequestMetrics, instrument_templates
+from .scope import UserScope
+
+request_logger = logging.getLogger('bridgio.requests')
+
+
+class RequestScopeMiddleware:
+    """Attach request.scope (accounts.scope.UserScope) - must come after AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.scope = UserScope(request)
+        return self.get_response(request)
+
+
+class RequestProfilingMiddleware:
+    """SQL count / time, template time and total time per request (accounts.profiling)
+
+    Logs one JSON line per request to 'bridgio.requests', adds a
+    Server-Timing header for staff (all users when DEBUG) and stores a
+    RequestProfile row for a sample of the requests slower than
+    REQUEST_PROFILE_SLOW_MS or running more than REQUEST_PROFILE_MAX_QUERIES
+    queries. Place it near the top (after WhiteNoise) so session, auth and
+    every other middleware's queries are counted too. Profiles older than
+    REQUEST_PROFILE_RETENTION_DAYS are pruned at most once an hour per
+    process, right after a new one is stored.
+    """
+
+    prune_interval = 3600
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'REQUEST_PROFILING', True)
+        self.slow_ms = getattr(settings, 'REQUEST_PROFILE_SLOW_MS', 1000)
+        self.max_queries = getattr(settings, 'REQUEST_PROFILE_MAX_QUERIES', 100)
+        self.sample_rate = getattr(settings, 'REQUEST_PROFILE_SAMPLE_RATE', 1.0)
+        self.next_prune = 0
+        if self.enabled:
+            instrument_templates()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            metrics.total_seconds = time.perf_counter() - started
+            RequestMetrics.deactivate(token)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match.view_name if match else None) or request.path
+        user = getattr(request, 'user', None)
+        user_id = user.pk if user is not None and user.is_authenticated else None
+        numbers = metrics.as_dict()
+
+        request_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'user': user_id,
+            **numbers,
+        }))
+        if settings.DEBUG or (user_id is not None and (user.is_staff or user.is_superuser or user.role == 'super_admin')):
+            response['Server-Timing'] = metrics.server_timing()
+        if (numbers['total_ms'] >= self.slow_ms or numbers['sql_count'] > self.max_queries) and (
+            random.random() < self.sample_rate
+        ):
+            self.save_profile(request, response, view_name, user_id, metrics)
+        return response
+
+    def save_profile(self, request, response, view_name, user_id, metrics):
+        from .models import RequestProfile
+        try:
+            RequestProfile.objects.create(
+                method=request.method,
+                path=request.path[:500],
+                view_name=view_name[:200],
+                status_code=response.status_code,
+                user_id=user_id,
+                slowest_queries=metrics.slowest_queries,
+                **metrics.as_dict(),
+            )
+            if time.monotonic() >= self.next_prune:
+                self.next_prune = time.monotonic() + self.prune_interval
+                RequestProfile.prune()
+        except Exception:
+            # Profiling must never break the request
+            request_logger.exception('Could not store request profile for %s', request.path)
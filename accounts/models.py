@@ -86,3 +86,86 @@ class AuditLog(models.Model):
     
     def __str__(self):
         return f"{self.user} - {self.action} - {self.model_name}"
+
+
+class BackgroundJob(models.Model):
+    """Long-running work executed off the request path, with progress for the UI"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    job_type = models.CharField(max_length=50, db_index=True)
+    description = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='background_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'background_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.job_type} #{self.pk} ({self.status})"
+    
+    @property
+    def progress_percent(self):
+        if not self.total:
+            return 100 if self.status == 'completed' else 0
+        return min(100, int(self.processed * 100 / self.total))
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+    
+    def set_progress(self, processed, total=None):
+        """Persist progress with a single UPDATE (safe to call from the worker thread)"""
+        self.processed = processed
+        fields = {'processed': processed}
+        if total is not None:
+            self.total = total
+            fields['total'] = total
+        BackgroundJob.objects.filter(pk=self.pk).update(**fields)
+
+
+class RequestProfile(models.Model):
+    """Timings of a sampled heavy request (see accounts.middleware.RequestProfilingMiddleware)"""
+    
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, db_index=True, help_text='URL name, or the path if it has none')
+    status_code = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    total_ms = models.FloatField()
+    sql_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField()
+    template_ms = models.FloatField()
+    slowest_queries = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        db_table = 'request_profiles'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.method} {self.view_name} - {self.total_ms:.0f} ms, {self.sql_count} queries"
+    
+    @classmethod
+    def prune(cls, days=None):
+        """Delete profiles older than `days` (default REQUEST_PROFILE_RETENTION_DAYS); returns the number deleted"""
+        from datetime import timedelta
+        from django.conf import settings
+        from django.utils import timezone
+        
+        days = getattr(settings, 'REQUEST_PROFILE_RETENTION_DAYS', 14) if days is None else days
+        deleted, _ = cls.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+        return deleted
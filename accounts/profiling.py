@@ -0,0 +1,110 @@
+"""
+Per-request SQL / template timing (see RequestProfilingMiddleware).
+
+RequestMetrics measures one request:
+
+- every SQL query through connection.execute_wrapper (count, total time and
+  the slowest few statements),
+- template rendering, by timing the outermost django.template.base.Template
+  render() of the request (includes and extends run inside it),
+- the total time spent in the rest of the middleware chain and the view.
+
+Queries run while a template renders (lazy querysets) count towards both the
+SQL and the template time.
+
+The middleware turns that into a structured log line (logger
+'bridgio.requests', one JSON object per request), a Server-Timing header and,
+for heavy requests, a RequestProfile row (accounts.models) that the admin
+ranks by endpoint.
+"""
+import contextvars
+import heapq
+import itertools
+import time
+
+from django.template import base as template_base
+
+SQL_PREVIEW_CHARS = 500
+
+_active = contextvars.ContextVar('request_metrics', default=None)
+_sequence = itertools.count()
+
+
+class RequestMetrics:
+    """Counters for one request - also the execute_wrapper callable"""
+
+    def __init__(self, keep_slowest=5):
+        self.keep_slowest = keep_slowest
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.total_seconds = 0.0
+        self._slowest = []  # min-heap of (duration, sequence, sql)
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.sql_count += 1
+            self.sql_seconds += duration
+            entry = (duration, next(_sequence), sql)
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, entry)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def activate(self):
+        return _active.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _active.reset(token)
+
+    @property
+    def slowest_queries(self):
+        """[{'ms': 12.3, 'sql': '...'}, ...] - slowest first"""
+        return [
+            {'ms': round(duration * 1000, 2), 'sql': sql[:SQL_PREVIEW_CHARS]}
+            for duration, _, sql in sorted(self._slowest, reverse=True)
+        ]
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total_seconds * 1000, 2),
+            'sql_ms': round(self.sql_seconds * 1000, 2),
+            'sql_count': self.sql_count,
+            'template_ms': round(self.template_seconds * 1000, 2),
+        }
+
+    def server_timing(self):
+        """Server-Timing header value"""
+        return ', '.join([
+            f'db;dur={self.sql_seconds * 1000:.1f};desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+            f'total;dur={self.total_seconds * 1000:.1f}',
+        ])
+
+
+_original_render = template_base.Template.render
+
+
+def _timed_render(self, context):
+    metrics = _active.get()
+    if metrics is None:
+        return _original_render(self, context)
+    metrics._template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_render(self, context)
+    finally:
+        metrics._template_depth -= 1
+        if not metrics._template_depth:
+            metrics.template_seconds += time.perf_counter() - started
+
+
+def instrument_templates():
+    """Time Template.render for the active RequestMetrics (idempotent, called by the middleware)"""
+    template_base.Template.render = _timed_render
@@ -0,0 +1,194 @@
+"""
+Per-request access scope - role flags and visible projects, computed once.
+
+Views used to chain request.user.is_*() calls and re-query
+request.user.assigned_projects.all() / Project.objects.filter(site_head=...)
+for every permission check (`project not in request.user.assigned_projects.all()`
+loads the whole M2M each time). RequestScopeMiddleware attaches a UserScope to
+every request as `request.scope`; everything on it is computed lazily on first
+use and then memoized for the rest of the request:
+
+    if not request.scope.can_view_project(project): ...
+    associations.filter(request.scope.project_q())
+
+The project ids can also be cached across requests (USER_SCOPE_CACHE_TIMEOUT
+seconds, 0 = off). Any change to project assignments, project site head /
+mandate owner or a user's role bumps a version number that invalidates every
+cached scope (see invalidate_user_scopes and the signals in accounts.apps).
+With a per-process cache backend (locmem) other workers only see the change
+once their entry expires, so keep the timeout short there.
+"""
+from functools import cached_property
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+
+VERSION_KEY = 'user_scope:version'
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_user_scopes():
+    """Drop all cached user scopes (call after assignment / role changes)"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def load_project_ids(user_id):
+    """Project ids the user is assigned to / heads / owns - one query
+
+    Returns a dict of lists: assigned, active_assigned, site_head,
+    active_site_head, mandate.
+    """
+    from projects.models import Project
+    from .models import User
+
+    ids = {'assigned': [], 'active_assigned': [], 'site_head': [], 'active_site_head': [], 'mandate': []}
+    if user_id is None:
+        return ids
+    assignments = User.assigned_projects.through.objects.filter(user_id=user_id, project_id=OuterRef('pk'))
+    rows = (
+        Project.objects.filter(
+            Q(site_head_id=user_id) | Q(mandate_owner_id=user_id) | Q(Exists(assignments))
+        )
+        .annotate(is_assigned=Exists(assignments))
+        .values_list('id', 'is_active', 'site_head_id', 'mandate_owner_id', 'is_assigned')
+    )
+    for project_id, is_active, site_head_id, mandate_owner_id, is_assigned in rows:
+        if is_assigned:
+            ids['assigned'].append(project_id)
+            if is_active:
+                ids['active_assigned'].append(project_id)
+        if site_head_id == user_id:
+            ids['site_head'].append(project_id)
+            if is_active:
+                ids['active_site_head'].append(project_id)
+        if mandate_owner_id == user_id:
+            ids['mandate'].append(project_id)
+    return ids
+
+
+class UserScope:
+    """Lazily computed role flags and project ids for request.user"""
+
+    def __init__(self, request):
+        self._request = request
+
+    @cached_property
+    def user(self):
+        return self._request.user
+
+    @cached_property
+    def role(self):
+        return getattr(self.user, 'role', None) if self.user.is_authenticated else None
+
+    # Role flags (same meaning as the User.is_*() methods)
+    @cached_property
+    def is_super_admin(self):
+        return self.role == 'super_admin'
+
+    @cached_property
+    def is_mandate_owner(self):
+        return self.role == 'mandate_owner'
+
+    @cached_property
+    def is_site_head(self):
+        return self.role == 'site_head'
+
+    @cached_property
+    def is_closing_manager(self):
+        return self.role == 'closing_manager'
+
+    @cached_property
+    def is_sourcing_manager(self):
+        return self.role == 'sourcing_manager'
+
+    @cached_property
+    def is_telecaller(self):
+        return self.role == 'telecaller'
+
+    @cached_property
+    def sees_all_projects(self):
+        """Super admins and mandate owners are not limited to a project list"""
+        return self.is_super_admin or self.is_mandate_owner
+
+    @cached_property
+    def _project_ids(self):
+        if not self.user.is_authenticated:
+            return load_project_ids(None)
+        timeout = getattr(settings, 'USER_SCOPE_CACHE_TIMEOUT', 0)
+        if not timeout:
+            return load_project_ids(self.user.pk)
+        cache_key = f'user_scope:{_version()}:{self.user.pk}'
+        ids = cache.get(cache_key)
+        if ids is None:
+            ids = load_project_ids(self.user.pk)
+            cache.set(cache_key, ids, timeout)
+        return ids
+
+    @cached_property
+    def assigned_project_ids(self):
+        """Projects in user.assigned_projects (active or not)"""
+        return frozenset(self._project_ids['assigned'])
+
+    @cached_property
+    def active_assigned_project_ids(self):
+        return frozenset(self._project_ids['active_assigned'])
+
+    @cached_property
+    def site_head_project_ids(self):
+        """Projects the user is site head of (active or not)"""
+        return frozenset(self._project_ids['site_head'])
+
+    @cached_property
+    def active_site_head_project_ids(self):
+        return frozenset(self._project_ids['active_site_head'])
+
+    @cached_property
+    def mandate_project_ids(self):
+        """Projects whose mandate owner is the user"""
+        return frozenset(self._project_ids['mandate'])
+
+    @cached_property
+    def visible_project_ids(self):
+        """Projects the user may view - None means all projects
+
+        Super admin / mandate owner: all; site head: projects they head;
+        everyone else: their assigned projects.
+        """
+        if self.sees_all_projects:
+            return None
+        if self.is_site_head:
+            return self.site_head_project_ids
+        return self.assigned_project_ids
+
+    def is_assigned_to(self, project):
+        """Same as `project in user.assigned_projects.all()` without the query per call"""
+        return _pk(project) in self.assigned_project_ids
+
+    def heads_project(self, project):
+        return _pk(project) in self.site_head_project_ids
+
+    def can_view_project(self, project):
+        visible = self.visible_project_ids
+        return visible is None or _pk(project) in visible
+
+    def project_q(self, field='project'):
+        """Q limiting `field` (a Project FK) to the visible projects - Q() when unrestricted"""
+        visible = self.visible_project_ids
+        if visible is None:
+            return Q()
+        return Q(**{f'{field}__in': visible})
+
+
+def _pk(project):
+    return getattr(project, 'pk', project)
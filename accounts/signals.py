@@ -0,0 +1,34 @@
+"""Drop cached request scopes (accounts.scope) when who-sees-which-project changes,
+and the 'users' cache domain (bridgio.cache) when a user changes"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from bridgio.cache import invalidate_on_commit
+from projects.models import Project
+
+from .models import User
+from .scope import invalidate_user_scopes
+
+
+@receiver(m2m_changed, sender=User.assigned_projects.through)
+def assignments_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_user_scopes()
+        invalidate_on_commit('users')
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, **kwargs):
+    # Site head / mandate owner / is_active may have changed
+    invalidate_user_scopes()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, update_fields=None, **kwargs):
+    # Role may have changed (logins only touch last_login)
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_user_scopes()
+    invalidate_on_commit('users')
@@ -1,3 +1,42 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import RequestProfile, User
+from bridgio.testing import QueryBudgetTestCase
+
+
+class DashboardQueryBudgetTests(QueryBudgetTestCase):
+    url_names = ['dashboard']
+
+
+class RequestProfileRetentionTests(TestCase):
+    """Stored request profiles don't pile up forever"""
+
+    def old_profile(self, days):
+        profile = RequestProfile.objects.create(
+            method='GET', path='/', view_name='dashboard', status_code=200,
+            total_ms=1500, sql_ms=10, sql_count=5, template_ms=1,
+        )
+        RequestProfile.objects.filter(pk=profile.pk).update(created_at=timezone.now() - timedelta(days=days))
+        return profile
+
+    @override_settings(REQUEST_PROFILE_RETENTION_DAYS=14)
+    def test_prune_keeps_recent_profiles(self):
+        old, recent = self.old_profile(20), self.old_profile(2)
+        call_command('prune_request_profiles', stdout=StringIO())
+        self.assertFalse(RequestProfile.objects.filter(pk=old.pk).exists())
+        self.assertTrue(RequestProfile.objects.filter(pk=recent.pk).exists())
+
+    @override_settings(REQUEST_PROFILING=True, REQUEST_PROFILE_SLOW_MS=0, REQUEST_PROFILE_RETENTION_DAYS=14)
+    def test_middleware_prunes_when_storing(self):
+        old = self.old_profile(20)
+        client = Client()
+        client.force_login(User.objects.create_user(username='profiled', role='super_admin'))
+        client.get(reverse('dashboard'))
+        self.assertFalse(RequestProfile.objects.filter(pk=old.pk).exists())
+        self.assertTrue(RequestProfile.objects.filter(view_name='dashboard').exists())
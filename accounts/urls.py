@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import CustomLoginView, logout_view, user_list, user_create, user_edit, user_toggle_active
+from .views import CustomLoginView, logout_view, user_list, user_create, user_edit, user_toggle_active, job_status
 
 app_name = 'accounts'
 
@@ -10,4 +10,5 @@ urlpatterns = [
     path('users/create/', user_create, name='user_create'),
     path('users/<int:pk>/edit/', user_edit, name='user_edit'),
     path('users/<int:pk>/toggle-active/', user_toggle_active, name='user_toggle_active'),
+    path('jobs/<int:pk>/', job_status, name='job_status'),
 ]
@@ -305,3 +305,39 @@ def user_toggle_active(request, pk):
     status = 'activated' if user.is_active else 'deactivated'
     messages.success(request, f'User {user.username} {status} successfully!')
     return redirect('accounts:user_list')
+
+
+@login_required
+def job_status(request, pk):
+    """Progress of a background job - JSON for polling, HTML page otherwise"""
+    from django.http import JsonResponse
+    from .models import BackgroundJob
+    
+    job = get_object_or_404(BackgroundJob, pk=pk)
+    if job.created_by_id != request.user.pk and not request.user.is_super_admin():
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+        messages.error(request, 'You do not have permission to view this job.')
+        return redirect('dashboard')
+    
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.GET.get('format') == 'json':
+        return JsonResponse({
+            'id': job.pk,
+            'status': job.status,
+            'processed': job.processed,
+            'total': job.total,
+            'percent': job.progress_percent,
+            'result': job.result,
+            'error': job.error,
+            'finished': job.is_finished,
+        })
+    
+    from django.utils.http import url_has_allowed_host_and_scheme
+    next_url = request.GET.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = ''
+    
+    return render(request, 'accounts/job_status.html', {
+        'job': job,
+        'next_url': next_url,
+    })
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='selfie_thumbnail',
+            field=models.ImageField(blank=True, editable=False, help_text='Small copy of selfie_photo for lists (bridgio.images)', upload_to='attendance/selfies/thumbs/'),
+        ),
+    ]
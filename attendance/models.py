@@ -22,6 +22,10 @@ class Attendance(models.Model):
     
     # Selfie
     selfie_photo = models.ImageField(upload_to='attendance/selfies/')
+    selfie_thumbnail = models.ImageField(
+        upload_to='attendance/selfies/thumbs/', blank=True, editable=False,
+        help_text="Small copy of selfie_photo for lists (bridgio.images)"
+    )
     
     # Metadata
     check_in_time = models.DateTimeField(auto_now_add=True)
@@ -8,6 +8,7 @@ from django.http import JsonResponse
 from django.conf import settings
 from .models import Attendance
 from projects.models import Project
+from bridgio.images import schedule_processing
 
 
 @login_required
@@ -176,6 +177,8 @@ def attendance_checkin(request):
                 user_agent=user_agent,
                 ip_address=ip_address,
             )
+            # Downsize / strip EXIF / thumbnail off the request path
+            schedule_processing(attendance, 'selfie_photo', user=request.user)
             
             if is_within_radius:
                 messages.success(request, 'Check-in successful!')
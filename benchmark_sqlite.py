@@ -0,0 +1,153 @@
+"""
+Concurrent read/write throughput of SQLite - Django defaults vs the tuned profile
+
+Runs reader and writer processes against a scratch database for a few
+seconds per profile and reports operations per second and lock errors:
+
+- default: what django.db.backends.sqlite3 does out of the box (rollback
+  journal, synchronous=FULL, Python's 5 s connect timeout, deferred BEGIN)
+- tuned: the PRAGMAs from bridgio.settings.sqlite_database() and
+  BEGIN IMMEDIATE for writes (bridgio.db.write_atomic)
+
+Writers mimic the hot write paths (look up a lead by phone, then insert it
+and a call log in one transaction - like get_or_create during uploads or an
+OTP burst); readers run the list-page style queries.
+
+Run: python benchmark_sqlite.py [--writers 4] [--readers 8] [--seconds 10]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+SCHEMA = """
+CREATE TABLE leads (id INTEGER PRIMARY KEY, phone TEXT UNIQUE, name TEXT, project_id INTEGER, created_at REAL);
+CREATE TABLE call_logs (id INTEGER PRIMARY KEY, lead_id INTEGER, outcome TEXT, created_at REAL);
+CREATE INDEX leads_project ON leads (project_id, created_at);
+CREATE INDEX call_logs_lead ON call_logs (lead_id);
+"""
+
+
+def tuned_pragmas():
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    from bridgio.settings import sqlite_database
+    return sqlite_database(':memory:')['OPTIONS']['pragmas']
+
+
+def connect(path, profile):
+    if profile['name'] == 'default':
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    else:
+        conn = sqlite3.connect(path, isolation_level=None)
+        for name, value in profile['pragmas'].items():
+            conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+def writer(path, profile, seconds, worker, results):
+    conn = connect(path, profile)
+    begin = 'BEGIN IMMEDIATE' if profile['name'] == 'tuned' else 'BEGIN'
+    done = errors = 0
+    sequence = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        sequence += 1
+        phone = f'+91{worker:02d}{sequence:08d}'
+        try:
+            conn.execute(begin)
+            row = conn.execute('SELECT id FROM leads WHERE phone = ?', (phone,)).fetchone()
+            if row is None:
+                lead_id = conn.execute(
+                    'INSERT INTO leads (phone, name, project_id, created_at) VALUES (?, ?, ?, ?)',
+                    (phone, f'Lead {sequence}', random.randint(1, 20), time.time()),
+                ).lastrowid
+                conn.execute(
+                    'INSERT INTO call_logs (lead_id, outcome, created_at) VALUES (?, ?, ?)',
+                    (lead_id, 'connected', time.time()),
+                )
+            conn.execute('COMMIT')
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    results.put(('write', done, errors))
+
+
+def reader(path, profile, seconds, results):
+    conn = connect(path, profile)
+    done = errors = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        try:
+            project_id = random.randint(1, 20)
+            conn.execute(
+                'SELECT id, phone, name FROM leads WHERE project_id = ? ORDER BY created_at DESC LIMIT 25',
+                (project_id,),
+            ).fetchall()
+            conn.execute('SELECT COUNT(*) FROM leads WHERE project_id = ?', (project_id,)).fetchone()
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('read', done, errors))
+
+
+def run(profile, writers, readers, seconds):
+    directory = tempfile.mkdtemp(prefix='bridgio-sqlite-bench-')
+    path = os.path.join(directory, 'bench.sqlite3')
+    setup = connect(path, profile)
+    setup.executescript(SCHEMA)
+    setup.executemany(
+        'INSERT INTO leads (phone, name, project_id, created_at) VALUES (?, ?, ?, ?)',
+        [(f'+9199{i:08d}', f'Seed {i}', i % 20 + 1, time.time()) for i in range(50000)],
+    )
+    setup.close()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=writer, args=(path, profile, seconds, worker, results))
+        for worker in range(writers)
+    ] + [
+        multiprocessing.Process(target=reader, args=(path, profile, seconds, results))
+        for _ in range(readers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for _ in processes:
+        kind, done, errors = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += errors
+    for process in processes:
+        process.join()
+
+    return {
+        'profile': profile['name'],
+        'writes_per_sec': round(totals['write'][0] / seconds, 1),
+        'write_lock_errors': totals['write'][1],
+        'reads_per_sec': round(totals['read'][0] / seconds, 1),
+        'read_lock_errors': totals['read'][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    profiles = [
+        {'name': 'default', 'pragmas': {}},
+        {'name': 'tuned', 'pragmas': tuned_pragmas()},
+    ]
+    report = [run(profile, args.writers, args.readers, args.seconds) for profile in profiles]
+    print(json.dumps({'writers': args.writers, 'readers': args.readers, 'seconds': args.seconds, 'results': report}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,7 @@ class BookingAdmin(admin.ModelAdmin):
     list_display = ['lead', 'project', 'unit_number', 'final_negotiated_price', 'token_amount', 'created_at']
     list_filter = ['project', 'created_at']
     search_fields = ['lead__name', 'lead__phone', 'unit_number', 'project__name']
-    readonly_fields = ['created_at', 'updated_at', 'total_paid', 'remaining_balance']
+    readonly_fields = ['created_at', 'updated_at', 'amount_paid', 'payments_count', 'remaining_balance']
     fieldsets = (
         ('Lead & Project', {
             'fields': ('lead', 'project')
@@ -22,7 +22,7 @@ class BookingAdmin(admin.ModelAdmin):
             'fields': ('channel_partner', 'cp_commission_percent')
         }),
         ('System', {
-            'fields': ('created_by', 'created_at', 'updated_at', 'is_archived', 'total_paid', 'remaining_balance')
+            'fields': ('created_by', 'created_at', 'updated_at', 'is_archived', 'amount_paid', 'payments_count', 'remaining_balance')
         }),
     )
 
@@ -33,3 +33,8 @@ class PaymentAdmin(admin.ModelAdmin):
     list_filter = ['payment_mode', 'payment_date', 'created_at']
     search_fields = ['booking__lead__name', 'booking__lead__phone', 'reference_number']
     readonly_fields = ['created_at', 'updated_at']
+    
+    def delete_queryset(self, request, queryset):
+        # Delete one by one so Payment.delete() keeps the booking totals in step
+        for payment in queryset:
+            payment.delete()
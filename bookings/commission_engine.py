@@ -0,0 +1,135 @@
+"""
+Batch commission engine.
+
+Computes CP, closing, sourcing and telecaller commissions for any set of
+bookings in memory and writes them with one bulk upsert keyed on
+(booking, commission_type, recipient_key). Commissions that were already
+approved, paid or cancelled are never recalculated; pending ones of
+recipients a booking no longer credits are removed.
+
+Used by Booking.calculate_and_create_commissions() for single bookings and
+by `python manage.py recalculate_commissions` for project-wide runs after a
+project's default_commission_percent changes.
+"""
+from decimal import Decimal
+
+from .models import Commission
+
+# (booking field, percent) - None means the project's default_commission_percent
+EMPLOYEE_COMMISSION_RULES = [
+    ('credited_to_closing_manager', None),
+    ('credited_to_sourcing_manager', Decimal('1.0')),  # Default 1% for sourcing
+    ('credited_to_telecaller', Decimal('0.5')),  # Default 0.5% for telecaller
+]
+
+LOCKED_STATUSES = ('approved', 'paid', 'cancelled')
+
+UPSERT_FIELDS = ['commission_percent', 'base_amount', 'commission_amount', 'calculation_basis', 'updated_at']
+
+
+def build_commissions(bookings, existing=None):
+    """Commission objects (unsaved) for the given bookings, computed in memory
+
+    `existing` maps (booking_id, commission_type, recipient_key) to
+    (status, calculation_basis) of commissions already in the database;
+    locked ones are skipped and the calculation basis of the rest is kept.
+    Bookings need their project loaded (select_related('project')).
+    """
+    existing = existing or {}
+    commissions = {}
+
+    def add(booking, commission_type, percent, channel_partner_id=None, employee_id=None):
+        key = Commission.build_recipient_key(channel_partner_id, employee_id)
+        lookup = (booking.pk, commission_type, key)
+        if lookup in commissions:
+            return
+        status, basis = existing.get(lookup, ('pending', 'booking_amount'))
+        if status in LOCKED_STATUSES:
+            return
+        commission = Commission(
+            booking=booking,
+            commission_type=commission_type,
+            channel_partner_id=channel_partner_id,
+            employee_id=employee_id,
+            commission_percent=Decimal(str(percent)),
+            calculation_basis=basis,
+            recipient_key=key,
+        )
+        commission.calculate_commission()
+        commissions[lookup] = commission
+
+    for booking in bookings:
+        if booking.channel_partner_id and booking.cp_commission_percent > 0:
+            add(booking, 'cp', booking.cp_commission_percent, channel_partner_id=booking.channel_partner_id)
+
+        for field, percent in EMPLOYEE_COMMISSION_RULES:
+            employee_id = getattr(booking, f'{field}_id')
+            if employee_id:
+                if percent is None:
+                    percent = booking.project.default_commission_percent
+                add(booking, 'employee', percent, employee_id=employee_id)
+
+    return list(commissions.values())
+
+
+def sync_commissions(bookings, batch_size=500, dry_run=False):
+    """Recalculate and upsert commissions for bookings (queryset or list)
+
+    The existing commissions are read with select_for_update() in the
+    transaction that writes, so a commission approved or paid meanwhile is
+    never rewritten. Pending commissions of recipients the bookings no longer
+    credit (e.g. after a credit reassignment) are deleted.
+
+    Returns a dict with the number of bookings, commissions written, pending
+    commissions removed and locked commissions left untouched.
+    """
+    from contextlib import nullcontext
+    from bridgio.db import write_atomic
+    from .commission_stats import invalidate_commission_stats
+
+    if hasattr(bookings, 'select_related'):
+        bookings = bookings.select_related('project')
+    bookings = list(bookings)
+    if not bookings:
+        return {'bookings': 0, 'written': 0, 'removed': 0, 'locked': 0}
+
+    with nullcontext() if dry_run else write_atomic():
+        existing = {}
+        pending_ids = {}
+        locked = 0
+        for booking_chunk in _chunks([b.pk for b in bookings], batch_size):
+            rows = Commission.objects.filter(booking_id__in=booking_chunk, recipient_key__isnull=False)
+            if not dry_run:
+                rows = rows.select_for_update()
+            for pk, booking_id, commission_type, key, status, basis in rows.values_list(
+                'pk', 'booking_id', 'commission_type', 'recipient_key', 'status', 'calculation_basis'
+            ):
+                existing[(booking_id, commission_type, key)] = (status, basis)
+                if status in LOCKED_STATUSES:
+                    locked += 1
+                elif status == 'pending':
+                    pending_ids[(booking_id, commission_type, key)] = pk
+
+        commissions = build_commissions(bookings, existing)
+        produced = {(c.booking_id, c.commission_type, c.recipient_key) for c in commissions}
+        removed = [pk for lookup, pk in pending_ids.items() if lookup not in produced]
+        if not dry_run:
+            for chunk in _chunks(removed, batch_size):
+                Commission.objects.filter(pk__in=chunk, status='pending').delete()
+            if commissions:
+                Commission.objects.bulk_create(
+                    commissions,
+                    batch_size=batch_size,
+                    update_conflicts=True,
+                    unique_fields=['booking', 'commission_type', 'recipient_key'],
+                    update_fields=UPSERT_FIELDS,
+                )
+    if not dry_run and (commissions or removed):
+        invalidate_commission_stats()
+
+    return {'bookings': len(bookings), 'written': len(commissions), 'removed': len(removed), 'locked': locked}
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
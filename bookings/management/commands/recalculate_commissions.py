@@ -0,0 +1,55 @@
+"""
+Recalculate commissions for every booking of a project.
+
+Run after changing a project's default_commission_percent (or credit
+assignments) so pending commissions follow the new rates and credits -
+pending commissions of recipients a booking no longer credits are deleted.
+Commissions that are already approved, paid or cancelled are left as they are.
+
+Usage:
+    python manage.py recalculate_commissions --project 3 --dry-run
+    python manage.py recalculate_commissions --all
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.commission_engine import sync_commissions
+from bookings.models import Booking
+
+
+class Command(BaseCommand):
+    help = 'Recalculate and upsert pending commissions for all bookings of a project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Project id to recalculate')
+        parser.add_argument('--all', action='store_true', help='Recalculate every project')
+        parser.add_argument('--dry-run', action='store_true', help='Compute without saving')
+        parser.add_argument('--batch-size', type=int, default=500, help='Bookings per chunk')
+
+    def handle(self, *args, **options):
+        if not options['project'] and not options['all']:
+            raise CommandError('Pass --project <id> or --all.')
+
+        bookings = Booking.objects.filter(is_archived=False).order_by('id')
+        if options['project']:
+            bookings = bookings.filter(project_id=options['project'])
+
+        batch_size = options['batch_size']
+        totals = {'bookings': 0, 'written': 0, 'removed': 0, 'locked': 0}
+        last_id = 0
+        while True:
+            chunk = list(bookings.filter(id__gt=last_id).select_related('project')[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].pk
+            result = sync_commissions(chunk, batch_size=batch_size, dry_run=options['dry_run'])
+            for key in totals:
+                totals[key] += result[key]
+
+        self.stdout.write(f"Bookings processed: {totals['bookings']}")
+        self.stdout.write(f"  Commissions {'calculated' if options['dry_run'] else 'written'}: {totals['written']}")
+        self.stdout.write(f"  Pending commissions of uncredited recipients {'to remove' if options['dry_run'] else 'removed'}: {totals['removed']}")
+        self.stdout.write(f"  Approved/paid/cancelled left untouched: {totals['locked']}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run - no changes saved.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Commissions recalculated.'))
@@ -0,0 +1,98 @@
+"""
+Verify (and optionally repair) the denormalized payment totals on bookings.
+
+Booking.amount_paid / payments_count are kept up to date by Payment.save()
+and Payment.delete(). Anything that bypasses those (raw SQL, queryset
+.update()/.delete() on payments, restores from backup) can leave them out of
+step. This command compares the stored totals with one GROUP BY per chunk of
+bookings and repairs the drifted rows of each chunk right away, with one
+UPDATE that recomputes the totals from the payments table itself - so a
+payment recorded while the command runs is never overwritten by a total
+read before it.
+
+Usage:
+    python manage.py reconcile_booking_totals --dry-run
+    python manage.py reconcile_booking_totals --project 3
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from bookings.models import Booking, Payment
+
+
+class Command(BaseCommand):
+    help = 'Check Booking.amount_paid / payments_count against the payments table and fix drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only reconcile bookings of this project id')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without saving')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Bookings per chunk')
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.order_by('id')
+        if options['project']:
+            bookings = bookings.filter(project_id=options['project'])
+
+        batch_size = options['batch_size']
+        checked = 0
+        drifted = 0
+        last_id = 0
+
+        while True:
+            chunk = list(
+                bookings.filter(id__gt=last_id).only('id', 'amount_paid', 'payments_count')[:batch_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].pk
+            checked += len(chunk)
+
+            actual = {
+                row['booking_id']: (row['total'] or Decimal('0'), row['count'])
+                for row in Payment.objects.filter(booking_id__in=[b.pk for b in chunk])
+                .order_by()
+                .values('booking_id')
+                .annotate(total=Sum('amount'), count=Count('id'))
+            }
+            drifted_ids = []
+            for booking in chunk:
+                amount, count = actual.get(booking.pk, (Decimal('0'), 0))
+                if booking.amount_paid != amount or booking.payments_count != count:
+                    self.stdout.write(
+                        f'  Booking #{booking.pk}: stored ₹{booking.amount_paid} / {booking.payments_count} payment(s), '
+                        f'actual ₹{amount} / {count}'
+                    )
+                    drifted_ids.append(booking.pk)
+            drifted += len(drifted_ids)
+            if drifted_ids and not options['dry_run']:
+                repair_totals(drifted_ids)
+
+        self.stdout.write(f'Bookings checked: {checked}')
+        self.stdout.write(f'  Out of step: {drifted}')
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All booking payment totals are correct.'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run - no changes saved.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Repaired payment totals on {drifted} booking(s).'))
+
+
+def repair_totals(booking_ids):
+    """Recompute and write the totals of these bookings in a single UPDATE"""
+    payments = Payment.objects.filter(booking_id=OuterRef('pk')).order_by().values('booking_id')
+    Booking.objects.filter(pk__in=booking_ids).update(
+        amount_paid=Coalesce(
+            Subquery(payments.annotate(total=Sum('amount')).values('total')),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=15, decimal_places=2),
+        ),
+        payments_count=Coalesce(
+            Subquery(payments.annotate(count=Count('id')).values('count')),
+            Value(0),
+            output_field=IntegerField(),
+        ),
+    )
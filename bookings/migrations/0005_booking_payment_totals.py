@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:51
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_payment_totals(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    Payment = apps.get_model('bookings', 'Payment')
+    totals = Payment.objects.filter(booking=OuterRef('pk')).order_by().values('booking')
+    Booking.objects.update(
+        amount_paid=Coalesce(
+            Subquery(totals.annotate(total=Sum('amount')).values('total')),
+            Value(0), output_field=DecimalField(max_digits=15, decimal_places=2),
+        ),
+        payments_count=Coalesce(
+            Subquery(totals.annotate(count=Count('id')).values('count')),
+            Value(0), output_field=IntegerField(),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_commission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='payments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_payment_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:53
+
+from django.db import migrations, models
+
+
+STATUS_PRIORITY = {'paid': 0, 'approved': 1, 'pending': 2, 'cancelled': 3}
+
+
+def populate_recipient_keys(apps, schema_editor):
+    """Key existing commissions by recipient; older duplicates keep a unique suffixed key"""
+    Commission = apps.get_model('bookings', 'Commission')
+    rows = Commission.objects.order_by('id').values_list('id', 'booking_id', 'commission_type', 'channel_partner_id', 'employee_id', 'status')
+    
+    groups = {}
+    for pk, booking_id, commission_type, cp_id, employee_id, status in rows.iterator():
+        if cp_id:
+            key = f"cp:{cp_id}"
+        elif employee_id:
+            key = f"employee:{employee_id}"
+        else:
+            continue
+        groups.setdefault((booking_id, commission_type, key), []).append((STATUS_PRIORITY.get(status, 9), pk))
+    
+    to_update = []
+    for (_, _, key), members in groups.items():
+        # The most advanced (paid > approved > pending) row becomes the canonical one
+        members.sort()
+        to_update.append(Commission(pk=members[0][1], recipient_key=key))
+        for _, pk in members[1:]:
+            to_update.append(Commission(pk=pk, recipient_key=f"{key}:duplicate:{pk}"))
+    Commission.objects.bulk_update(to_update, ['recipient_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_payment_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commission',
+            name='recipient_key',
+            field=models.CharField(blank=True, editable=False, max_length=50, null=True),
+        ),
+        migrations.RunPython(populate_recipient_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='commission',
+            constraint=models.UniqueConstraint(fields=('booking', 'commission_type', 'recipient_key'), name='unique_commission_per_recipient'),
+        ),
+    ]
@@ -73,6 +73,11 @@ class Booking(models.Model):
         help_text="Telecaller who gets credit for this booking (if telecaller-generated lead)"
     )
     
+    # Payment totals - denormalized, maintained by Payment.save()/delete()
+    # (`python manage.py reconcile_booking_totals` verifies and repairs drift)
+    amount_paid = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, editable=False)
+    payments_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # System
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -86,13 +91,32 @@ class Booking(models.Model):
     def __str__(self):
         return f"Booking - {self.lead.name} - {self.unit_number}"
     
+    def save(self, *args, **kwargs):
+        # The payment totals only move through adjust_payment_totals - a full save of an
+        # instance loaded before a payment must not write the old totals back
+        from bridgio.db import fields_without_counters
+        kwargs['update_fields'] = fields_without_counters(
+            self, ['amount_paid', 'payments_count'], kwargs.get('update_fields')
+        )
+        super().save(*args, **kwargs)
+    
     @property
     def total_paid(self):
-        return self.payments.aggregate(total=Sum('amount'))['total'] or 0
+        return self.amount_paid
     
     @property
     def remaining_balance(self):
-        return self.final_negotiated_price - self.total_paid
+        return self.final_negotiated_price - self.amount_paid
+    
+    @classmethod
+    def adjust_payment_totals(cls, booking_id, amount, count):
+        """Apply a payment delta to the denormalized totals with one atomic UPDATE"""
+        from decimal import Decimal
+        from django.db.models import F
+        cls.objects.filter(pk=booking_id).update(
+            amount_paid=F('amount_paid') + Decimal(str(amount)),
+            payments_count=F('payments_count') + count,
+        )
     
     @property
     def agreement_value(self):
@@ -111,61 +135,28 @@ class Booking(models.Model):
         """Alias for agreement value for consistency in reporting"""
         return self.agreement_value
     
-    def calculate_and_create_commissions(self):
-        """Automatically calculate and create commissions for CP and employees"""
-        from django.utils import timezone
+    def parse_unit_location(self):
+        """Parse the free-text unit fields into (tower_number, floor, unit_number)
         
-        # CP Commission
-        if self.channel_partner and self.cp_commission_percent > 0:
-            cp_commission = Commission.objects.filter(
-                booking=self,
-                commission_type='cp',
-                channel_partner=self.channel_partner
-            ).first()
-            
-            if not cp_commission:
-                cp_commission = Commission(
-                    booking=self,
-                    commission_type='cp',
-                    channel_partner=self.channel_partner,
-                    commission_percent=self.cp_commission_percent,
-                    calculation_basis='booking_amount'
-                )
-            
-            cp_commission.calculate_commission()
-            cp_commission.save()
+        Legacy bookings only carry tower_wing ("Tower 1", "1", "Tower1"...), floor and
+        unit_number strings. Any part that cannot be parsed is returned as None.
+        """
+        import re
         
-        # Employee Commissions
-        employee_commissions = [
-            ('closing_manager', self.credited_to_closing_manager, self.project.default_commission_percent),
-            ('sourcing_manager', self.credited_to_sourcing_manager, 1.0),  # Default 1% for sourcing
-            ('telecaller', self.credited_to_telecaller, 0.5),  # Default 0.5% for telecaller
-        ]
+        unit_number = int(self.unit_number) if self.unit_number and self.unit_number.isdigit() else None
+        
+        tower_number = None
+        if self.tower_wing:
+            tower_match = re.search(r'\d+', str(self.tower_wing))
+            if tower_match:
+                tower_number = int(tower_match.group())
         
-        for role, employee, default_percent in employee_commissions:
-            if employee:
-                # Get commission percent from project or use default
-                commission_percent = default_percent
-                if role == 'closing_manager':
-                    commission_percent = self.project.default_commission_percent
-                
-                emp_commission = Commission.objects.filter(
-                    booking=self,
-                    commission_type='employee',
-                    employee=employee
-                ).first()
-                
-                if not emp_commission:
-                    emp_commission = Commission(
-                        booking=self,
-                        commission_type='employee',
-                        employee=employee,
-                        commission_percent=commission_percent,
-                        calculation_basis='booking_amount'
-                    )
-                
-                emp_commission.calculate_commission()
-                emp_commission.save()
+        return tower_number, self.floor, unit_number
+    
+    def calculate_and_create_commissions(self):
+        """Automatically calculate and create commissions for CP and employees"""
+        from .commission_engine import sync_commissions
+        return sync_commissions([self])
     
     @property
     def total_commission_amount(self):
@@ -262,6 +253,9 @@ class Commission(models.Model):
     # Notes
     notes = models.TextField(blank=True, help_text="Commission calculation notes or payment details")
     
+    # Upsert key - "cp:<id>" or "employee:<id>", one commission per recipient per booking
+    recipient_key = models.CharField(max_length=50, null=True, blank=True, editable=False)
+    
     # System
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -275,6 +269,12 @@ class Commission(models.Model):
             models.Index(fields=['channel_partner', 'status']),
             models.Index(fields=['employee', 'status']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['booking', 'commission_type', 'recipient_key'],
+                name='unique_commission_per_recipient',
+            ),
+        ]
     
     def __str__(self):
         if self.channel_partner:
@@ -283,6 +283,20 @@ class Commission(models.Model):
             return f"Employee Commission - {self.employee.username} - ₹{self.commission_amount}"
         return f"Commission - ₹{self.commission_amount}"
     
+    @staticmethod
+    def build_recipient_key(channel_partner_id=None, employee_id=None):
+        if channel_partner_id:
+            return f"cp:{channel_partner_id}"
+        if employee_id:
+            return f"employee:{employee_id}"
+        return None
+    
+    def save(self, *args, **kwargs):
+        # Cached commission summaries are invalidated by bookings.signals
+        if not self.recipient_key:
+            self.recipient_key = self.build_recipient_key(self.channel_partner_id, self.employee_id)
+        super().save(*args, **kwargs)
+    
     def calculate_commission(self):
         """Calculate commission amount based on basis and percentage"""
         if self.calculation_basis == 'booking_amount':
@@ -310,6 +324,64 @@ class Commission(models.Model):
         self.paid_at = timezone.now()
         self.paid_by = paid_by
         self.save()
+    
+    @classmethod
+    def _bulk_transition(cls, commission_ids, from_status, to_status, user, action):
+        """Move many commissions from one status to the next with one conditional UPDATE
+        
+        Only rows still in from_status are touched, so a commission approved or paid
+        by someone else in the meantime is skipped rather than overwritten. One
+        AuditLog entry records the whole batch. Returns (updated_ids, skipped_count).
+        """
+        from django.db import transaction
+        from django.utils import timezone
+        from accounts.models import AuditLog
+        
+        commission_ids = {int(pk) for pk in commission_ids if str(pk).isdigit()}
+        if not commission_ids:
+            return [], 0
+        
+        now = timezone.now()
+        stamp_fields = {
+            'approved': {'approved_at': now, 'approved_by': user},
+            'paid': {'paid_at': now, 'paid_by': user},
+        }[to_status]
+        with transaction.atomic():
+            updated = cls.objects.filter(pk__in=commission_ids, status=from_status).update(
+                status=to_status, updated_at=now, **stamp_fields
+            )
+            # The stamp identifies exactly the rows this UPDATE changed
+            updated_rows = list(
+                cls.objects.filter(pk__in=commission_ids, status=to_status, updated_at=now, **stamp_fields)
+                .values_list('id', 'commission_amount')
+            ) if updated else []
+            if updated_rows:
+                AuditLog.objects.create(
+                    user=user,
+                    action=action,
+                    model_name='Commission',
+                    object_id='bulk',
+                    changes={
+                        'commission_ids': [pk for pk, _ in updated_rows],
+                        'count': len(updated_rows),
+                        'total_amount': str(sum(amount for _, amount in updated_rows)),
+                        'skipped': len(commission_ids) - len(updated_rows),
+                    },
+                )
+        if updated_rows:
+            from .commission_stats import invalidate_commission_stats
+            invalidate_commission_stats()
+        return [pk for pk, _ in updated_rows], len(commission_ids) - len(updated_rows)
+    
+    @classmethod
+    def bulk_approve(cls, commission_ids, approved_by):
+        """Approve all pending commissions among commission_ids"""
+        return cls._bulk_transition(commission_ids, 'pending', 'approved', approved_by, 'commission_bulk_approved')
+    
+    @classmethod
+    def bulk_mark_paid(cls, commission_ids, paid_by):
+        """Mark all approved commissions among commission_ids as paid"""
+        return cls._bulk_transition(commission_ids, 'approved', 'paid', paid_by, 'commission_bulk_paid')
 
 
 class Payment(models.Model):
@@ -354,3 +426,28 @@ class Payment(models.Model):
     
     def __str__(self):
         return f"Payment - {self.booking.lead.name} - ₹{self.amount}"
+    
+    def save(self, *args, **kwargs):
+        """Save and keep the booking's amount_paid / payments_count in step (same transaction)"""
+        from decimal import Decimal
+        from bridgio.db import write_atomic
+        with write_atomic():
+            previous = None
+            if self.pk:
+                previous = Payment.objects.filter(pk=self.pk).values('booking_id', 'amount').first()
+            super().save(*args, **kwargs)
+            if previous is None:
+                Booking.adjust_payment_totals(self.booking_id, self.amount, 1)
+            elif previous['booking_id'] != self.booking_id:
+                Booking.adjust_payment_totals(previous['booking_id'], -previous['amount'], -1)
+                Booking.adjust_payment_totals(self.booking_id, self.amount, 1)
+            elif previous['amount'] != Decimal(str(self.amount)):
+                Booking.adjust_payment_totals(self.booking_id, Decimal(str(self.amount)) - previous['amount'], 0)
+    
+    def delete(self, *args, **kwargs):
+        from bridgio.db import write_atomic
+        with write_atomic():
+            booking_id, amount = self.booking_id, self.amount
+            result = super().delete(*args, **kwargs)
+            Booking.adjust_payment_totals(booking_id, -amount, -1)
+        return result
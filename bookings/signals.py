@@ -0,0 +1,22 @@
+"""Invalidate the cache domains (bridgio.cache) that bookings, commissions and payments feed"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bridgio.cache import invalidate_on_commit
+
+from .models import Booking, Commission, Payment
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, **kwargs):
+    # Bookings count towards lead stats and the CP leaderboard
+    invalidate_on_commit('leads', 'cps')
+
+
+@receiver(post_save, sender=Commission)
+@receiver(post_delete, sender=Commission)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def commission_changed(sender, **kwargs):
+    invalidate_on_commit('commissions')
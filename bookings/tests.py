@@ -1,3 +1,182 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import AuditLog, User
+from bookings.commission_engine import sync_commissions
+from bookings.models import Booking, Commission, Payment
+from bridgio.testing import QueryBudgetTestCase
+from channel_partners.models import ChannelPartner
+from leads.models import Lead
+from projects.models import Project
+
+
+class BookingQueryBudgetTests(QueryBudgetTestCase):
+    url_names = ['bookings:list', 'bookings:commission_list', 'bookings:commission_dashboard']
+
+
+class BookingPaymentTotalsTests(TestCase):
+    """amount_paid / payments_count only move with payments"""
+
+    def setUp(self):
+        owner = User.objects.create_user(username='totals_owner', role='mandate_owner')
+        project = Project.objects.create(name='Totals', builder_name='Totals', location='-', mandate_owner=owner)
+        lead = Lead.objects.create(name='Buyer', phone='9876500001')
+        self.booking = Booking.objects.create(
+            lead=lead, project=project, unit_number='101', final_negotiated_price=Decimal('5000000'),
+        )
+
+    def pay(self, amount):
+        Payment.objects.create(
+            booking_id=self.booking.pk, amount=Decimal(amount), payment_mode='cash', payment_date=date.today(),
+        )
+
+    def test_stale_instance_does_not_overwrite_totals(self):
+        stale = Booking.objects.get(pk=self.booking.pk)
+        self.pay('100000')
+        self.pay('50000')
+        stale.unit_number = '102'
+        stale.save()
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.unit_number, '102')
+        self.assertEqual(self.booking.amount_paid, Decimal('150000'))
+        self.assertEqual(self.booking.payments_count, 2)
+
+    def test_explicit_update_fields_skip_totals(self):
+        self.pay('100000')
+        self.booking.amount_paid = Decimal('0')
+        self.booking.save(update_fields=['amount_paid', 'unit_number'])
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.amount_paid, Decimal('100000'))
+
+    def test_reconcile_repairs_drift_from_the_payments_table(self):
+        self.pay('100000')
+        self.pay('25000')
+        Booking.objects.filter(pk=self.booking.pk).update(amount_paid=Decimal('1'), payments_count=7)
+        call_command('reconcile_booking_totals', '--dry-run', stdout=StringIO())
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.payments_count, 7)
+
+        call_command('reconcile_booking_totals', stdout=StringIO())
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.amount_paid, Decimal('125000'))
+        self.assertEqual(self.booking.payments_count, 2)
+
+        Payment.objects.filter(booking_id=self.booking.pk).delete()
+        call_command('reconcile_booking_totals', stdout=StringIO())
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.amount_paid, self.booking.payments_count), (Decimal('0'), 0))
+
+
+class CommissionEngineTests(TestCase):
+    """sync_commissions computes every recipient's share and never touches locked rows"""
+
+    def setUp(self):
+        owner = User.objects.create_user(username='engine_owner', role='mandate_owner')
+        self.closer = User.objects.create_user(username='engine_closer', role='closing_manager')
+        self.telecaller = User.objects.create_user(username='engine_telecaller', role='telecaller')
+        project = Project.objects.create(
+            name='Engine', builder_name='Engine', location='-', mandate_owner=owner,
+            default_commission_percent=Decimal('2.00'),
+        )
+        self.cp = ChannelPartner.objects.create(firm_name='Firm', cp_name='Engine CP', phone='9876512399')
+        lead = Lead.objects.create(name='Buyer', phone='9876500002')
+        self.booking = Booking.objects.create(
+            lead=lead, project=project, unit_number='201', final_negotiated_price=Decimal('1000000'),
+            channel_partner=self.cp, cp_commission_percent=Decimal('3.00'),
+            credited_to_closing_manager=self.closer, credited_to_telecaller=self.telecaller,
+        )
+
+    def amounts(self):
+        return {
+            commission.recipient_key: commission.commission_amount
+            for commission in Commission.objects.filter(booking=self.booking)
+        }
+
+    def test_one_commission_per_recipient(self):
+        result = sync_commissions(Booking.objects.filter(pk=self.booking.pk))
+        self.assertEqual(result, {'bookings': 1, 'written': 3, 'removed': 0, 'locked': 0})
+        self.assertEqual(self.amounts(), {
+            f'cp:{self.cp.pk}': Decimal('30000'),
+            f'employee:{self.closer.pk}': Decimal('20000'),  # project default 2%
+            f'employee:{self.telecaller.pk}': Decimal('5000'),  # 0.5%
+        })
+
+    def test_rerun_updates_pending_and_skips_locked(self):
+        sync_commissions([self.booking])
+        Commission.objects.get(recipient_key=f'cp:{self.cp.pk}').approve(self.closer)
+        Booking.objects.filter(pk=self.booking.pk).update(final_negotiated_price=Decimal('2000000'))
+
+        result = sync_commissions(Booking.objects.filter(pk=self.booking.pk))
+        self.assertEqual(result, {'bookings': 1, 'written': 2, 'removed': 0, 'locked': 1})
+        self.assertEqual(Commission.objects.filter(booking=self.booking).count(), 3)
+        amounts = self.amounts()
+        self.assertEqual(amounts[f'cp:{self.cp.pk}'], Decimal('30000'))
+        self.assertEqual(amounts[f'employee:{self.closer.pk}'], Decimal('40000'))
+
+    def test_reassigned_credit_removes_pending_commission(self):
+        sync_commissions([self.booking])
+        Commission.objects.get(recipient_key=f'cp:{self.cp.pk}').approve(self.closer)
+        Booking.objects.filter(pk=self.booking.pk).update(
+            credited_to_telecaller=None, channel_partner=None, credited_to_closing_manager=self.telecaller,
+        )
+
+        result = sync_commissions(Booking.objects.filter(pk=self.booking.pk))
+        self.assertEqual(result, {'bookings': 1, 'written': 1, 'removed': 1, 'locked': 1})
+        self.assertEqual(self.amounts(), {
+            f'cp:{self.cp.pk}': Decimal('30000'),  # approved - kept
+            f'employee:{self.telecaller.pk}': Decimal('20000'),  # now the closing manager
+        })
+
+    def test_dry_run_writes_nothing(self):
+        result = sync_commissions([self.booking], dry_run=True)
+        self.assertEqual(result['written'], 3)
+        self.assertFalse(Commission.objects.exists())
+
+
+class CommissionBulkTransitionTests(TestCase):
+    """Bulk approve / mark paid only move rows still in the expected status"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='bulk_admin', role='super_admin')
+        project = Project.objects.create(name='Bulk', builder_name='Bulk', location='-', mandate_owner=self.admin)
+        lead = Lead.objects.create(name='Buyer', phone='9876500003')
+        booking = Booking.objects.create(
+            lead=lead, project=project, unit_number='301', final_negotiated_price=Decimal('1000000'),
+        )
+        self.commissions = [
+            Commission.objects.create(
+                booking=booking, commission_type='employee', employee=User.objects.create_user(username=f'bulk_{i}'),
+                commission_percent=Decimal('1.00'), base_amount=Decimal('1000000'), commission_amount=Decimal('10000'),
+            )
+            for i in range(3)
+        ]
+
+    def ids(self):
+        return [str(commission.pk) for commission in self.commissions]
+
+    def test_approve_skips_rows_no_longer_pending(self):
+        self.commissions[0].approve(self.admin)
+        updated, skipped = Commission.bulk_approve(self.ids() + ['junk'], self.admin)
+        self.assertEqual(sorted(updated), sorted(c.pk for c in self.commissions[1:]))
+        self.assertEqual(skipped, 1)
+        self.assertEqual(Commission.objects.filter(status='approved', approved_by=self.admin).count(), 3)
+        log = AuditLog.objects.get(action='commission_bulk_approved')
+        self.assertEqual(log.changes['count'], 2)
+        self.assertEqual(log.changes['total_amount'], '20000.00')
+
+    def test_mark_paid_requires_approval(self):
+        Commission.bulk_approve(self.ids()[:2], self.admin)
+        updated, skipped = Commission.bulk_mark_paid(self.ids(), self.admin)
+        self.assertEqual(len(updated), 2)
+        self.assertEqual(skipped, 1)
+        self.assertEqual(Commission.objects.get(pk=self.commissions[2].pk).status, 'pending')
+        self.assertEqual(Commission.objects.filter(status='paid', paid_at__isnull=False).count(), 2)
+
+    def test_nothing_to_do_writes_no_audit_log(self):
+        self.assertEqual(Commission.bulk_mark_paid(self.ids(), self.admin), ([], 3))
+        self.assertEqual(Commission.bulk_approve([], self.admin), ([], 0))
+        self.assertFalse(AuditLog.objects.filter(model_name='Commission').exists())
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import booking_list, booking_create, booking_detail, payment_create, clear_confetti
-from .views_commissions import commission_list, commission_approve, commission_mark_paid, commission_bulk_approve, commission_dashboard, booking_commissions
+from .views_commissions import commission_list, commission_approve, commission_mark_paid, commission_bulk_approve, commission_bulk_mark_paid, commission_dashboard, booking_commissions
 
 app_name = 'bookings'
 
@@ -16,6 +16,7 @@ urlpatterns = [
     path('commissions/<int:pk>/approve/', commission_approve, name='commission_approve'),
     path('commissions/<int:pk>/mark-paid/', commission_mark_paid, name='commission_mark_paid'),
     path('commissions/bulk-approve/', commission_bulk_approve, name='commission_bulk_approve'),
+    path('commissions/bulk-mark-paid/', commission_bulk_mark_paid, name='commission_bulk_mark_paid'),
     path('<int:pk>/commissions/', booking_commissions, name='booking_commissions'),
 ]
 
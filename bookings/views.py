@@ -2,7 +2,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Sum, Count
+from django.db.models import Q, Count
 from django.core.paginator import Paginator
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
@@ -11,6 +11,7 @@ from leads.models import Lead
 from projects.models import Project
 from channel_partners.models import ChannelPartner
 from accounts.models import User
+from bridgio.cache import active_projects
 
 
 @login_required
@@ -44,10 +45,8 @@ def booking_list(request):
     if project_id:
         bookings = bookings.filter(project_id=project_id)
     
-    # Annotate with payment totals (use different name to avoid conflict with property)
-    bookings = bookings.annotate(
-        total_paid_amount=Sum('payments__amount')
-    ).order_by('-created_at')
+    # Payment totals come from the denormalized Booking.amount_paid column
+    bookings = bookings.select_related('lead', 'project').order_by('-created_at')
     
     # Pagination
     paginator = Paginator(bookings, 25)
@@ -56,7 +55,7 @@ def booking_list(request):
     
     context = {
         'bookings': bookings_page,
-        'projects': Project.objects.filter(is_active=True),
+        'projects': active_projects(),
         'search': search,
         'selected_project': project_id,
     }
@@ -174,10 +173,10 @@ def booking_create(request, lead_id):
         return redirect(f"{reverse('projects:unit_selection', args=[project.id])}?lead_id={lead_id}")
     
     if request.method == 'POST':
-        from django.db import transaction
+        from bridgio.db import write_atomic
         try:
             # Use atomic transaction to ensure booking, payment, and status update are all-or-nothing
-            with transaction.atomic():
+            with write_atomic():
                 # Get channel partner if CP details exist
                 channel_partner = None
                 if lead.cp_name and lead.cp_phone:
@@ -314,7 +313,7 @@ def booking_create(request, lead_id):
                                 continue
                             
                             # Book the unit
-                            success, message = unit_config.book_unit(None)  # We'll set the booking after creation
+                            success, message = unit_config.book_unit(None, request.user)  # We'll set the booking after creation
                             if not success:
                                 messages.error(request, f'Cannot book unit {unit_config.full_unit_number}: {message}')
                                 continue
@@ -368,6 +367,10 @@ def booking_create(request, lead_id):
                                     created_by=request.user,
                                 )
                             
+                            # Payment.save() moved the totals in the database - load them before
+                            # commissions based on the amount paid are calculated
+                            booking.refresh_from_db(fields=['amount_paid', 'payments_count'])
+                            
                             # Calculate and create commissions automatically
                             booking.calculate_and_create_commissions()
                             
@@ -418,7 +421,7 @@ def booking_create(request, lead_id):
                             return redirect('leads:detail', pk=lead_id)
                         
                         # Book the unit
-                        success, message = unit_config.book_unit(None)  # We'll set the booking after creation
+                        success, message = unit_config.book_unit(None, request.user)  # We'll set the booking after creation
                         if not success:
                             messages.error(request, f'Cannot book unit {unit_config.full_unit_number}: {message}')
                             return redirect('leads:detail', pk=lead_id)
@@ -477,6 +480,10 @@ def booking_create(request, lead_id):
                             created_by=request.user,
                         )
                     
+                    # Payment.save() moved the totals in the database - load them before
+                    # commissions based on the amount paid are calculated
+                    booking.refresh_from_db(fields=['amount_paid', 'payments_count'])
+                    
                     # Calculate and create commissions automatically
                     booking.calculate_and_create_commissions()
                     
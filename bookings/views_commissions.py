@@ -2,13 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Sum, Count
-from django.utils import timezone
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from .models import Booking, Commission
-from projects.models import Project
+from .commission_stats import commission_summary
 from accounts.models import User
 from channel_partners.models import ChannelPartner
+from bridgio.cache import active_channel_partners, active_projects
 
 
 @login_required
@@ -32,6 +32,15 @@ def commission_list(request):
     employee_filter = request.GET.get('employee', '')
     date_from = request.GET.get('date_from', '')
     date_to = request.GET.get('date_to', '')
+    filters = {
+        'status': status_filter,
+        'commission_type': commission_type,
+        'project': project_filter,
+        'channel_partner': cp_filter,
+        'employee': employee_filter,
+        'date_from': date_from,
+        'date_to': date_to,
+    }
     
     # Apply filters
     if status_filter:
@@ -58,51 +67,30 @@ def commission_list(request):
     commissions_page = paginator.get_page(page)
     
     # Get filter options
-    projects = Project.objects.filter(is_active=True).order_by('name')
-    channel_partners = ChannelPartner.objects.filter(status='active').order_by('cp_name')
+    projects = active_projects('name')
+    channel_partners = active_channel_partners()
     employees = User.objects.filter(
         role__in=['closing_manager', 'sourcing_manager', 'telecaller'],
         is_active=True
     ).order_by('username')
     
-    # Calculate totals
-    total_pending = commissions.filter(status='pending').aggregate(
-        total=Sum('commission_amount')
-    )['total'] or 0
-    total_approved = commissions.filter(status='approved').aggregate(
-        total=Sum('commission_amount')
-    )['total'] or 0
-    total_paid = commissions.filter(status='paid').aggregate(
-        total=Sum('commission_amount')
-    )['total'] or 0
-    
-    # Calculate counts
-    pending_count = commissions.filter(status='pending').count()
-    approved_count = commissions.filter(status='approved').count()
-    paid_count = commissions.filter(status='paid').count()
+    # Totals and counts per status - one conditional-aggregation query, cached per filter set
+    summary = commission_summary(commissions, filters)
     
     context = {
         'commissions': commissions_page,
         'projects': projects,
         'channel_partners': channel_partners,
         'employees': employees,
-        'total_pending': total_pending,
-        'total_approved': total_approved,
-        'total_paid': total_paid,
-        'pending_count': pending_count,
-        'approved_count': approved_count,
-        'paid_count': paid_count,
+        'total_pending': summary['pending_total'],
+        'total_approved': summary['approved_total'],
+        'total_paid': summary['paid_total'],
+        'pending_count': summary['pending_count'],
+        'approved_count': summary['approved_count'],
+        'paid_count': summary['paid_count'],
         'status_choices': Commission.STATUS_CHOICES,
         'commission_type_choices': Commission.COMMISSION_TYPE_CHOICES,
-        'filters': {
-            'status': status_filter,
-            'commission_type': commission_type,
-            'project': project_filter,
-            'channel_partner': cp_filter,
-            'employee': employee_filter,
-            'date_from': date_from,
-            'date_to': date_to,
-        }
+        'filters': filters,
     }
     return render(request, 'bookings/commissions/list.html', context)
 
@@ -145,9 +133,8 @@ def commission_mark_paid(request, pk):
     return redirect('bookings:commission_list')
 
 
-@login_required
-def commission_bulk_approve(request):
-    """Bulk approve commissions - Super Admin and Mandate Owners only"""
+def _commission_bulk_action(request, transition, verb):
+    """Shared body of the bulk approve / mark paid endpoints"""
     if not (request.user.is_super_admin() or request.user.is_mandate_owner()):
         return JsonResponse({'success': False, 'error': 'Permission denied'})
     
@@ -158,21 +145,31 @@ def commission_bulk_approve(request):
     if not commission_ids:
         return JsonResponse({'success': False, 'error': 'No commissions selected'})
     
-    approved_count = 0
-    for commission_id in commission_ids:
-        try:
-            commission = Commission.objects.get(pk=commission_id, status='pending')
-            commission.approve(request.user)
-            approved_count += 1
-        except Commission.DoesNotExist:
-            continue
+    updated_ids, skipped = transition(commission_ids, request.user)
     
+    message = f'Successfully {verb} {len(updated_ids)} commissions.'
+    if skipped:
+        message += f' {skipped} skipped (already processed or not eligible).'
     return JsonResponse({
         'success': True,
-        'message': f'Successfully approved {approved_count} commissions.'
+        'message': message,
+        'updated': len(updated_ids),
+        'skipped': skipped,
     })
 
 
+@login_required
+def commission_bulk_approve(request):
+    """Bulk approve commissions - Super Admin and Mandate Owners only"""
+    return _commission_bulk_action(request, Commission.bulk_approve, 'approved')
+
+
+@login_required
+def commission_bulk_mark_paid(request):
+    """Bulk mark approved commissions as paid - Super Admin and Mandate Owners only"""
+    return _commission_bulk_action(request, Commission.bulk_mark_paid, 'marked as paid')
+
+
 @login_required
 def commission_dashboard(request):
     """Commission dashboard with analytics - Super Admin and Mandate Owners only"""
@@ -180,31 +177,9 @@ def commission_dashboard(request):
         messages.error(request, 'You do not have permission to view commission dashboard.')
         return redirect('dashboard')
     
-    today = timezone.now().date()
-    this_month_start = today.replace(day=1)
-    last_month_start = (this_month_start - timezone.timedelta(days=1)).replace(day=1)
-    
-    # Commission statistics
+    # Commission statistics - all buckets in one cached query
     all_commissions = Commission.objects.all()
-    
-    # Monthly stats
-    this_month_commissions = all_commissions.filter(created_at__date__gte=this_month_start)
-    last_month_commissions = all_commissions.filter(
-        created_at__date__gte=last_month_start,
-        created_at__date__lt=this_month_start
-    )
-    
-    # Status breakdown
-    status_breakdown = all_commissions.values('status').annotate(
-        count=Count('id'),
-        total_amount=Sum('commission_amount')
-    ).order_by('status')
-    
-    # Type breakdown
-    type_breakdown = all_commissions.values('commission_type').annotate(
-        count=Count('id'),
-        total_amount=Sum('commission_amount')
-    ).order_by('commission_type')
+    summary = commission_summary(all_commissions)
     
     # Top performers
     top_cps = ChannelPartner.objects.filter(
@@ -227,28 +202,18 @@ def commission_dashboard(request):
     ).order_by('-created_at')[:10]
     
     context = {
-        'this_month_total': this_month_commissions.aggregate(
-            total=Sum('commission_amount')
-        )['total'] or 0,
-        'this_month_count': this_month_commissions.count(),
-        'last_month_total': last_month_commissions.aggregate(
-            total=Sum('commission_amount')
-        )['total'] or 0,
-        'last_month_count': last_month_commissions.count(),
-        'pending_total': all_commissions.filter(status='pending').aggregate(
-            total=Sum('commission_amount')
-        )['total'] or 0,
-        'pending_count': all_commissions.filter(status='pending').count(),
-        'approved_total': all_commissions.filter(status='approved').aggregate(
-            total=Sum('commission_amount')
-        )['total'] or 0,
-        'approved_count': all_commissions.filter(status='approved').count(),
-        'paid_total': all_commissions.filter(status='paid').aggregate(
-            total=Sum('commission_amount')
-        )['total'] or 0,
-        'paid_count': all_commissions.filter(status='paid').count(),
-        'status_breakdown': status_breakdown,
-        'type_breakdown': type_breakdown,
+        'this_month_total': summary['this_month_total'],
+        'this_month_count': summary['this_month_count'],
+        'last_month_total': summary['last_month_total'],
+        'last_month_count': summary['last_month_count'],
+        'pending_total': summary['pending_total'],
+        'pending_count': summary['pending_count'],
+        'approved_total': summary['approved_total'],
+        'approved_count': summary['approved_count'],
+        'paid_total': summary['paid_total'],
+        'paid_count': summary['paid_count'],
+        'status_breakdown': summary['status_breakdown'],
+        'type_breakdown': summary['type_breakdown'],
         'top_cps': top_cps,
         'top_employees': top_employees,
         'recent_commissions': recent_commissions,
@@ -270,7 +235,7 @@ def booking_commissions(request, pk):
             messages.error(request, 'You do not have permission to view this booking.')
             return redirect('bookings:list')
     elif request.user.is_closing_manager():
-        if booking.project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(booking.project_id):
             messages.error(request, 'You do not have permission to view this booking.')
             return redirect('bookings:list')
     else:
@@ -0,0 +1,726 @@
+"""
+Synthetic production-scale dataset and a view benchmark on top of it.
+
+seed_dataset() fills the configured database with bench users, projects with
+full tower grids, channel partners, leads with their project associations,
+configurations, call logs and reminders, and bookings with payments and
+commissions - everything with bulk_create in chunks, so a million leads take
+minutes rather than hours. Rows are spread over the last `days` days and made
+recognisable so clear_dataset() can remove them again:
+
+    users      username 'bench_...', email '...@bench.invalid'
+    projects   name 'Bench ...' (cascades to units, associations, bookings ...)
+    leads      phone '+910000........'
+    CPs        phone '+910001........'
+
+Indian mobile numbers start with 6-9, so no canonical number a real lead or
+CP can be stored with (leads.utils.canonical_phone) starts with +910.
+
+run_bench() requests the hot views through the Django test client, logged in
+as a bench user of each role, and reports latency percentiles and query
+counts per endpoint and role. run_http_bench() does the same over HTTP
+against a running server with concurrent clients, to compare gunicorn worker
+settings (gunicorn.conf.py).
+
+Used by `manage.py seed_benchmark`, `manage.py bench` and the query budget
+tests (bridgio.testing).
+"""
+import http.cookiejar
+import random
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+BENCH_USER_PREFIX = 'bench_'
+BENCH_PROJECT_PREFIX = 'Bench '
+BENCH_USER_EMAIL_DOMAIN = '@bench.invalid'
+BENCH_LEAD_PHONE_PREFIX = '+910000'
+BENCH_CP_PHONE_PREFIX = '+910001'
+BENCH_PASSWORD = 'bench'
+
+# Named dataset sizes; any value can be overridden per run
+SIZES = {
+    'tiny': {
+        'projects': 2, 'towers': 2, 'floors': 4, 'units_per_floor': 4,
+        'employees_per_project': 2, 'cps': 20, 'leads': 200, 'bookings': 10,
+    },
+    'small': {
+        'projects': 5, 'towers': 3, 'floors': 10, 'units_per_floor': 4,
+        'employees_per_project': 3, 'cps': 200, 'leads': 10_000, 'bookings': 200,
+    },
+    'medium': {
+        'projects': 10, 'towers': 4, 'floors': 20, 'units_per_floor': 6,
+        'employees_per_project': 4, 'cps': 1_000, 'leads': 100_000, 'bookings': 2_000,
+    },
+    'production': {
+        'projects': 25, 'towers': 6, 'floors': 30, 'units_per_floor': 8,
+        'employees_per_project': 6, 'cps': 5_000, 'leads': 1_000_000, 'bookings': 20_000,
+    },
+}
+
+# Per-row ratios shared by every size
+RATES = {
+    'extra_association_rate': 0.2,  # leads that are also in a second project
+    'call_logs_per_lead': 2.0,
+    'reminders_per_lead': 0.5,
+    'payments_per_booking': 3,
+    'days': 365,  # created_at spread
+}
+
+# Association status mix (bookings are added on top from the booked candidates)
+STATUS_WEIGHTS = {
+    'new': 30, 'contacted': 20, 'visit_scheduled': 8, 'queued_visit': 2, 'visit_completed': 10,
+    'discussion': 8, 'hot': 5, 'ready_to_book': 3, 'lost': 8, 'not_interested': 6,
+}
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Rohan', 'Saanvi',
+               'Arjun', 'Neha', 'Pooja', 'Rahul', 'Sneha', 'Vikram', 'Priya', 'Karan', 'Riya', 'Nikhil']
+LAST_NAMES = ['Sharma', 'Patel', 'Shah', 'Mehta', 'Iyer', 'Nair', 'Desai', 'Joshi', 'Kulkarni', 'Reddy',
+              'Gupta', 'Verma', 'Khan', 'Singh', 'Chopra', 'Bhat', 'Rao', 'Pillai', 'Jain', 'Malhotra']
+LOCALITIES = ['Andheri', 'Powai', 'Thane', 'Borivali', 'Malad', 'Goregaon', 'Vashi', 'Kharghar', 'Chembur', 'Bandra']
+
+
+def volumes_for(size='small', **overrides):
+    """Volume dict for a named size, with overrides (None values are ignored)"""
+    if size not in SIZES:
+        raise ValueError(f"Unknown size {size!r} (expected one of {', '.join(SIZES)})")
+    volumes = {**SIZES[size], **RATES}
+    volumes.update({key: value for key, value in overrides.items() if value is not None})
+    return volumes
+
+
+def has_dataset():
+    from projects.models import Project
+    return Project.objects.filter(name__startswith=BENCH_PROJECT_PREFIX).exists()
+
+
+def clear_dataset(batch_size=5000, log=print):
+    """Delete every bench row (projects cascade to their units, associations and bookings)"""
+    from accounts.models import User
+    from channel_partners.models import ChannelPartner
+    from leads.models import Lead
+    from projects.models import Project
+
+    for label, queryset in [
+        ('projects', Project.objects.filter(name__startswith=BENCH_PROJECT_PREFIX)),
+        ('leads', Lead.objects.filter(phone__startswith=BENCH_LEAD_PHONE_PREFIX)),
+        ('channel partners', ChannelPartner.objects.filter(phone__startswith=BENCH_CP_PHONE_PREFIX)),
+        ('users', User.objects.filter(username__startswith=BENCH_USER_PREFIX,
+                                      email__endswith=BENCH_USER_EMAIL_DOMAIN)),
+    ]:
+        deleted = 0
+        while True:
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            queryset.model.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+        log(f'  Deleted {deleted} bench {label}')
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at / updated_at values set on the objects"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class _Seeder:
+    def __init__(self, volumes, batch_size, seed, log):
+        self.v = volumes
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.log = log
+        self.now = timezone.now()
+        self.counts = {}
+
+    def past(self, days=None):
+        """Random moment in the last `days` days (skewed towards recent)"""
+        days = self.v['days'] if days is None else days
+        return self.now - timedelta(seconds=int(days * 86400 * self.rng.random() ** 2))
+
+    def stage(self, label, count):
+        self.counts[label] = self.counts.get(label, 0) + count
+
+    def run(self):
+        started = time.perf_counter()
+        for step in (self.users, self.projects, self.units, self.channel_partners, self.leads,
+                     self.bookings, self.finish):
+            step_started = time.perf_counter()
+            step()
+            self.log(f'  {step.__name__}: {time.perf_counter() - step_started:.1f}s')
+        self.counts['seconds'] = round(time.perf_counter() - started, 1)
+        return self.counts
+
+    # Users and projects
+
+    def users(self):
+        from accounts.models import User
+
+        password = make_password(BENCH_PASSWORD)
+        projects, per_project = self.v['projects'], self.v['employees_per_project']
+        specs = [('admin', 'super_admin'), ('owner', 'mandate_owner')]
+        specs += [(f'sitehead_{i}', 'site_head') for i in range(projects)]
+        for role, short in [('closing_manager', 'closer'), ('telecaller', 'telecaller'), ('sourcing_manager', 'sourcing')]:
+            specs += [(f'{short}_{i}', role) for i in range(max(1, projects * per_project // 2))]
+        User.objects.bulk_create([
+            User(username=f'{BENCH_USER_PREFIX}{name}', role=role, password=password, email=f'{name}{BENCH_USER_EMAIL_DOMAIN}')
+            for name, role in specs
+        ], batch_size=self.batch_size)
+        self.users_by_role = {}
+        for user in User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('pk'):
+            self.users_by_role.setdefault(user.role, []).append(user)
+        owner = self.users_by_role['mandate_owner'][0]
+        User.objects.filter(username__startswith=BENCH_USER_PREFIX).exclude(pk=owner.pk).update(mandate_owner=owner)
+        self.stage('users', len(specs))
+
+    def projects(self):
+        from projects.models import ConfigurationAreaType, Project, ProjectConfiguration, TowerFloorConfig
+
+        owner = self.users_by_role['mandate_owner'][0]
+        site_heads = self.users_by_role['site_head']
+        Project.objects.bulk_create([
+            Project(
+                name=f'{BENCH_PROJECT_PREFIX}{i + 1:03d}',
+                builder_name='Bench Builders',
+                location=self.rng.choice(LOCALITIES),
+                starting_price=Decimal(self.rng.randrange(50, 300) * 100000),
+                number_of_towers=self.v['towers'],
+                floors_per_tower=self.v['floors'],
+                units_per_floor=self.v['units_per_floor'],
+                default_commission_percent=Decimal('2.00'),
+                mandate_owner=owner,
+                site_head=site_heads[i],
+            )
+            for i in range(self.v['projects'])
+        ], batch_size=self.batch_size)
+        self.project_list = list(Project.objects.filter(name__startswith=BENCH_PROJECT_PREFIX).order_by('name'))
+
+        TowerFloorConfig.objects.bulk_create([
+            TowerFloorConfig(project=project, tower_number=tower, floors_count=self.v['floors'],
+                             units_per_floor=self.v['units_per_floor'])
+            for project in self.project_list for tower in range(1, self.v['towers'] + 1)
+        ], batch_size=self.batch_size)
+        ProjectConfiguration.objects.bulk_create([
+            ProjectConfiguration(project=project, name=name, price_per_sqft=Decimal(self.rng.randrange(12, 30) * 1000))
+            for project in self.project_list for name in ('2BHK', '3BHK')
+        ], batch_size=self.batch_size)
+        configurations = ProjectConfiguration.objects.filter(project__in=self.project_list)
+        ConfigurationAreaType.objects.bulk_create([
+            ConfigurationAreaType(configuration=configuration, carpet_area=Decimal(area), buildup_area=Decimal(area * 13 // 10))
+            for configuration in configurations
+            for area in ((650, 720) if configuration.name == '2BHK' else (950, 1050))
+        ], batch_size=self.batch_size)
+        self.area_types = {}
+        for area_type in ConfigurationAreaType.objects.filter(configuration__project__in=self.project_list):
+            self.area_types.setdefault(area_type.configuration.project_id, []).append(area_type)
+
+        # Employees: every project gets its share of each role, some overlap
+        Assignment = self.users_by_role['closing_manager'][0].assigned_projects.through
+        assignments = set()
+        for role in ('closing_manager', 'telecaller', 'sourcing_manager'):
+            for index, user in enumerate(self.users_by_role[role]):
+                home = self.project_list[index % len(self.project_list)]
+                assignments.add((user.pk, home.pk))
+                if self.rng.random() < 0.3:
+                    assignments.add((user.pk, self.rng.choice(self.project_list).pk))
+        Assignment.objects.bulk_create(
+            [Assignment(user_id=user_id, project_id=project_id) for user_id, project_id in assignments],
+            batch_size=self.batch_size,
+        )
+        self.project_staff = {project.pk: {} for project in self.project_list}
+        roles = {user.pk: user.role for users in self.users_by_role.values() for user in users}
+        for user_id, project_id in assignments:
+            self.project_staff[project_id].setdefault(roles[user_id], []).append(user_id)
+        self.stage('projects', len(self.project_list))
+
+    def units(self):
+        from projects.models import UnitConfiguration
+
+        units = []
+        for project in self.project_list:
+            area_types = self.area_types[project.pk]
+            for tower in range(1, self.v['towers'] + 1):
+                for floor in range(1, self.v['floors'] + 1):
+                    for unit in range(1, self.v['units_per_floor'] + 1):
+                        units.append(UnitConfiguration(
+                            project=project, tower_number=tower, floor_number=floor,
+                            unit_number=floor * 100 + unit, area_type=area_types[unit % len(area_types)],
+                        ))
+        UnitConfiguration.objects.bulk_create(units, batch_size=self.batch_size)
+        self.stage('units', len(units))
+
+    def channel_partners(self):
+        from channel_partners.models import ChannelPartner, CPIdPool, cp_id_prefix
+
+        pool = CPIdPool.load()
+        cps = []
+        for i in range(self.v['cps']):
+            name = f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+            prefix = cp_id_prefix(name)
+            cps.append(ChannelPartner(
+                firm_name=f'{name.split()[1]} Realty {i}',
+                cp_name=name,
+                cp_unique_id=pool.allocate(prefix),
+                phone=f'{BENCH_CP_PHONE_PREFIX}{i:08d}',
+                locality=self.rng.choice(LOCALITIES),
+                status='active' if self.rng.random() < 0.9 else 'inactive',
+            ))
+        ChannelPartner.objects.bulk_create(cps, batch_size=self.batch_size)
+        self.cp_ids = list(
+            ChannelPartner.objects.filter(phone__startswith=BENCH_CP_PHONE_PREFIX).values_list('pk', flat=True)
+        )
+        Link = ChannelPartner.linked_projects.through
+        Link.objects.bulk_create([
+            Link(channelpartner_id=cp_id, project_id=project.pk)
+            for cp_id in self.cp_ids
+            for project in self.rng.sample(self.project_list, min(2, len(self.project_list)))
+        ], batch_size=self.batch_size)
+        self.stage('channel_partners', len(cps))
+
+    # Leads and everything hanging off them
+
+    def leads(self):
+        from leads.models import CallLog, FollowUpReminder, GlobalConfiguration, Lead, LeadProjectAssociation
+
+        config_ids = list(GlobalConfiguration.objects.values_list('pk', flat=True))
+        Configurations = Lead.configurations.through
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        booking_rate = min(1.0, 2.0 * self.v['bookings'] / max(1, self.v['leads']))
+        self.booking_candidates = []
+
+        with explicit_timestamps(Lead, LeadProjectAssociation, CallLog, FollowUpReminder):
+            for start in range(0, self.v['leads'], self.batch_size):
+                stop = min(start + self.batch_size, self.v['leads'])
+                leads = []
+                for n in range(start, stop):
+                    created = self.past()
+                    phone = f'{BENCH_LEAD_PHONE_PREFIX}{n:08d}'
+                    from_cp = self.rng.random() < 0.3
+                    leads.append(Lead(
+                        name=f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}',
+                        phone=phone,
+                        phone_canonical=phone,
+                        locality=self.rng.choice(LOCALITIES),
+                        budget=Decimal(self.rng.randrange(40, 400) * 100000),
+                        channel_partner_id=self.rng.choice(self.cp_ids) if from_cp and self.cp_ids else None,
+                        visit_source='cp' if from_cp else self.rng.choice(['call', 'walkin']),
+                        created_at=created,
+                        updated_at=created,
+                    ))
+                with transaction.atomic():
+                    Lead.objects.bulk_create(leads, batch_size=self.batch_size)
+                    self._lead_children(leads, statuses, weights, booking_rate, config_ids, Configurations)
+                self.stage('leads', len(leads))
+                if stop % (self.batch_size * 20) == 0 or stop == self.v['leads']:
+                    self.log(f'    {stop}/{self.v["leads"]} leads')
+
+    def _lead_children(self, leads, statuses, weights, booking_rate, config_ids, Configurations):
+        from leads.models import CallLog, FollowUpReminder, LeadProjectAssociation
+
+        associations, calls, reminders, configurations = [], [], [], []
+        for lead in leads:
+            projects = [self.rng.choice(self.project_list)]
+            if len(self.project_list) > 1 and self.rng.random() < self.v['extra_association_rate']:
+                projects.append(self.rng.choice([p for p in self.project_list if p.pk != projects[0].pk]))
+            for project in projects:
+                staff = self.project_staff[project.pk]
+                status = 'booked' if self.rng.random() < booking_rate else self.rng.choices(statuses, weights)[0]
+                assignees = staff.get('closing_manager', []) + staff.get('telecaller', [])
+                assigned_to = self.rng.choice(assignees) if assignees and self.rng.random() < 0.7 else None
+                pretagged = self.rng.random() < 0.1
+                created = lead.created_at + timedelta(minutes=self.rng.randrange(0, 600))
+                associations.append(LeadProjectAssociation(
+                    lead_id=lead.pk,
+                    project_id=project.pk,
+                    status=status,
+                    is_pretagged=pretagged,
+                    pretag_status=self.rng.choice(['pending_verification', 'verified']) if pretagged else '',
+                    assigned_to_id=assigned_to,
+                    assigned_at=created if assigned_to else None,
+                    visit_scheduled_date=(
+                        self.now + timedelta(hours=self.rng.randrange(1, 24 * 14))
+                        if status == 'visit_scheduled' else None
+                    ),
+                    created_by_id=self.rng.choice(staff.get('sourcing_manager', [None])),
+                    visited_at=created if status == 'visit_completed' else None,
+                    created_at=created,
+                    updated_at=created,
+                ))
+                if status == 'booked':
+                    self.booking_candidates.append((lead.pk, project.pk, lead.channel_partner_id, assigned_to))
+            for _ in range(self._count(self.v['call_logs_per_lead'])):
+                call_date = lead.created_at + timedelta(hours=self.rng.randrange(1, 24 * 30))
+                calls.append(CallLog(
+                    lead_id=lead.pk, user_id=assigned_to, call_date=min(call_date, self.now),
+                    duration_minutes=self.rng.randrange(1, 20),
+                    outcome=self.rng.choice(['connected', 'no_answer', 'busy', 'callback']),
+                    created_at=min(call_date, self.now),
+                ))
+            for _ in range(self._count(self.v['reminders_per_lead'])):
+                reminder_date = self.now + timedelta(hours=self.rng.randrange(-24 * 7, 24 * 14))
+                reminders.append(FollowUpReminder(
+                    lead_id=lead.pk, reminder_date=reminder_date,
+                    is_completed=reminder_date < self.now and self.rng.random() < 0.6,
+                    created_by_id=assigned_to, created_at=lead.created_at,
+                ))
+            if config_ids:
+                configurations.append(Configurations(lead_id=lead.pk, globalconfiguration_id=self.rng.choice(config_ids)))
+        LeadProjectAssociation.objects.bulk_create(associations, batch_size=self.batch_size)
+        CallLog.objects.bulk_create(calls, batch_size=self.batch_size)
+        FollowUpReminder.objects.bulk_create(reminders, batch_size=self.batch_size)
+        Configurations.objects.bulk_create(configurations, batch_size=self.batch_size, ignore_conflicts=True)
+        self.stage('associations', len(associations))
+        self.stage('call_logs', len(calls))
+        self.stage('reminders', len(reminders))
+
+    def _count(self, mean):
+        """Row count with the given mean (whole part plus a coin flip for the fraction)"""
+        whole = int(mean)
+        return whole + (1 if self.rng.random() < mean - whole else 0) if mean else 0
+
+    # Bookings, payments, commissions
+
+    def bookings(self):
+        from bookings.commission_engine import build_commissions
+        from bookings.models import Booking, Commission, Payment
+        from projects.models import UnitConfiguration
+
+        free_units = {}
+        for unit in UnitConfiguration.objects.filter(project__in=self.project_list).select_related('area_type'):
+            free_units.setdefault(unit.project_id, []).append(unit)
+        for units in free_units.values():
+            self.rng.shuffle(units)
+        projects = {project.pk: project for project in self.project_list}
+        self.rng.shuffle(self.booking_candidates)
+
+        bookings, booked_units, payments_per_booking = [], [], []
+        for lead_id, project_id, cp_id, assigned_to in self.booking_candidates:
+            if len(bookings) >= self.v['bookings']:
+                break
+            if not free_units.get(project_id):
+                continue
+            unit = free_units[project_id].pop()
+            price = Decimal(self.rng.randrange(60, 350) * 100000)
+            created = self.past()
+            amounts = [
+                (price * Decimal(self.rng.randrange(5, 15)) / 100).quantize(Decimal('1'))
+                for _ in range(self._count(self.v['payments_per_booking']))
+            ]
+            staff = self.project_staff[project_id]
+            bookings.append(Booking(
+                lead_id=lead_id,
+                project=projects[project_id],
+                tower_wing=f'T{unit.tower_number}',
+                unit_number=str(unit.unit_number),
+                floor=unit.floor_number,
+                carpet_area=unit.area_type.carpet_area if unit.area_type else None,
+                final_negotiated_price=price,
+                token_amount=amounts[0] if amounts else Decimal('0'),
+                channel_partner_id=cp_id,
+                cp_commission_percent=Decimal('2.00') if cp_id else Decimal('0'),
+                credited_to_closing_manager_id=self.rng.choice(staff.get('closing_manager', [None])),
+                credited_to_sourcing_manager_id=self.rng.choice(staff.get('sourcing_manager', [None])),
+                credited_to_telecaller_id=assigned_to,
+                amount_paid=sum(amounts, Decimal('0')),
+                payments_count=len(amounts),
+                created_at=created,
+                updated_at=created,
+            ))
+            booked_units.append(unit)
+            payments_per_booking.append(amounts)
+
+        with explicit_timestamps(Booking, Payment, Commission):
+            Booking.objects.bulk_create(bookings, batch_size=self.batch_size)
+            for unit, booking in zip(booked_units, bookings):
+                unit.status = 'booked'
+                unit.booking_id = booking.pk
+            UnitConfiguration.objects.bulk_update(booked_units, ['status', 'booking'], batch_size=self.batch_size)
+
+            payments = []
+            for booking, amounts in zip(bookings, payments_per_booking):
+                for index, amount in enumerate(amounts):
+                    paid = min(booking.created_at + timedelta(days=30 * index), self.now)
+                    payments.append(Payment(
+                        booking_id=booking.pk, amount=amount, payment_date=paid.date(),
+                        payment_mode=self.rng.choice(['upi', 'cheque', 'rtgs', 'neft']),
+                        created_at=paid, updated_at=paid,
+                    ))
+            Payment.objects.bulk_create(payments, batch_size=self.batch_size)
+
+            commissions = build_commissions(bookings)
+            for commission in commissions:
+                commission.status = self.rng.choices(['pending', 'approved', 'paid'], [5, 3, 2])[0]
+                commission.created_at = commission.updated_at = commission.booking.created_at
+            Commission.objects.bulk_create(commissions, batch_size=self.batch_size)
+
+        self.stage('bookings', len(bookings))
+        self.stage('payments', len(payments))
+        self.stage('commissions', len(commissions))
+
+    def finish(self):
+        """Derived tables and caches that bulk_create bypassed"""
+        from bridgio.cache import DOMAINS, invalidate
+        from channel_partners.models import ChannelPartnerStats
+        from reports.models import DailyMetricsRollup
+
+        ChannelPartnerStats.refresh(self.cp_ids)
+        DailyMetricsRollup.rollup((self.now - timedelta(days=self.v['days'])).date())
+        invalidate(*DOMAINS)
+
+
+def seed_dataset(volumes, batch_size=5000, seed=0, log=print):
+    """Create the bench dataset described by `volumes` (see volumes_for); returns row counts"""
+    if connection.vendor == 'sqlite' and batch_size > 5000:
+        batch_size = 5000  # keep each INSERT under SQLite's variable limit for wide tables
+    return _Seeder(volumes, batch_size, seed, log).run()
+
+
+# Benchmark
+
+# (URL name, roles, needs a project pk)
+HOT_VIEWS = [
+    ('dashboard', ['super_admin', 'site_head', 'closing_manager', 'telecaller'], False),
+    ('leads:list', ['super_admin', 'site_head', 'closing_manager', 'telecaller'], False),
+    ('leads:upcoming_visits', ['super_admin', 'site_head', 'closing_manager'], False),
+    ('projects:unit_selection', ['super_admin', 'closing_manager'], True),
+    ('channel_partners:list', ['super_admin', 'site_head'], False),
+    ('bookings:list', ['super_admin', 'site_head'], False),
+    ('bookings:commission_list', ['super_admin'], False),
+    ('bookings:commission_dashboard', ['super_admin'], False),
+    ('reports:mandate_owner_reports', ['super_admin', 'mandate_owner'], False),
+    ('reports:employee_performance', ['super_admin', 'site_head'], False),
+    ('reports:cp_performance', ['super_admin', 'site_head'], False),
+]
+
+
+def bench_users():
+    """One bench user per role - the site head and closer of the first bench project"""
+    from accounts.models import User
+    from projects.models import Project
+
+    project = Project.objects.filter(name__startswith=BENCH_PROJECT_PREFIX).order_by('name').first()
+    if project is None:
+        return {}, None
+    users = User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('pk')
+    by_role = {
+        'super_admin': users.filter(role='super_admin').first(),
+        'mandate_owner': users.filter(role='mandate_owner').first(),
+        'site_head': project.site_head,
+    }
+    for role in ('closing_manager', 'telecaller', 'sourcing_manager'):
+        by_role[role] = users.filter(role=role, assigned_projects=project).first() or users.filter(role=role).first()
+    return {role: user for role, user in by_role.items() if user is not None}, project
+
+
+def measure(client, url, cold=False):
+    """(status, seconds, query count) of one GET"""
+    from django.core.cache import cache
+    from django.test.utils import CaptureQueriesContext
+
+    if cold:
+        cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+    return response.status_code, elapsed, len(queries)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def run_bench(views=None, roles=None, iterations=10, warmup=2, cold=False, log=print):
+    """Latency / query count per (URL name, role) as a list of dicts"""
+    from django.test.utils import override_settings
+
+    users, project = bench_users()
+    if not users:
+        raise RuntimeError('No bench dataset - run `python manage.py seed_benchmark` first.')
+    # The profiling middleware would add its own overhead and store a RequestProfile per slow request
+    with override_settings(REQUEST_PROFILING=False):
+        return _run_bench(users, project, views, roles, iterations, warmup, cold, log)
+
+
+def _run_bench(users, project, views, roles, iterations, warmup, cold, log):
+    from django.test import Client
+
+    results = []
+    for name, view_roles, needs_project in HOT_VIEWS:
+        if views and name not in views:
+            continue
+        url = reverse(name, kwargs={'pk': project.pk} if needs_project else None)
+        for role in view_roles:
+            if (roles and role not in roles) or role not in users:
+                continue
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(users[role])
+            for _ in range(warmup):
+                measure(client, url, cold)
+            samples = [measure(client, url, cold) for _ in range(iterations)]
+            result = _summarize(name, role, url, samples)
+            log(f"  {name} [{role}]: p50 {result['p50_ms']} ms, {result['queries']} queries (HTTP {result['status']})")
+            results.append(result)
+    return results
+
+
+def _summarize(name, role, url, samples):
+    """Result row for [(status, seconds, query count or None)]"""
+    timings = sorted(elapsed for _, elapsed, _ in samples)
+    query_counts = [count for _, _, count in samples if count is not None]
+    return {
+        'view': name,
+        'role': role,
+        'url': url,
+        'status': samples[-1][0],
+        'p50_ms': _ms(statistics.median(timings)),
+        'p95_ms': _ms(timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]),
+        'max_ms': _ms(timings[-1]),
+        'mean_ms': _ms(statistics.mean(timings)),
+        'queries': int(statistics.median(query_counts)) if query_counts else None,
+        'queries_max': max(query_counts) if query_counts else None,
+    }
+
+
+_SERVER_TIMING_QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+class HttpSession:
+    """A logged-in bench user against a running server (cookies + CSRF), safe to share between threads"""
+
+    def __init__(self, base_url, username, password=BENCH_PASSWORD):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+        login_url = self.base_url + reverse('accounts:login')
+        self.opener.open(login_url).read()
+        csrf_token = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+        data = urllib.parse.urlencode({'username': username, 'password': password, 'csrfmiddlewaretoken': csrf_token})
+        request = urllib.request.Request(login_url, data=data.encode(), headers={'Referer': login_url})
+        response = self.opener.open(request)
+        response.read()
+        if urllib.parse.urlparse(response.geturl()).path == reverse('accounts:login'):
+            raise RuntimeError(f'Could not log in to {self.base_url} as {username}')
+
+    def get(self, url):
+        """(status, seconds, query count from Server-Timing or None) of one GET"""
+        started = time.perf_counter()
+        try:
+            response = self.opener.open(self.base_url + url)
+            response.read()
+            status, headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            status, headers = e.code, e.headers
+        elapsed = time.perf_counter() - started
+        match = _SERVER_TIMING_QUERIES_RE.search(headers.get('Server-Timing', ''))
+        return status, elapsed, int(match.group(1)) if match else None
+
+
+def run_http_bench(base_url, views=None, roles=None, iterations=10, warmup=2, concurrency=1,
+                   slow_view=None, slow_clients=0, log=print):
+    """Like run_bench, but over HTTP against a running server (gunicorn) with concurrent clients
+
+    Each (view, role) gets `iterations` requests from `concurrency` threads at
+    once. With slow_view, `slow_clients` more threads keep requesting that view
+    for the whole run - a long report or export occupying workers - so the
+    numbers show how much the hot views wait behind it for a given worker
+    model (sync vs gthread, WEB_CONCURRENCY, GUNICORN_THREADS).
+    """
+    users, project = bench_users()
+    if not users:
+        raise RuntimeError('No bench dataset - run `python manage.py seed_benchmark` first.')
+    sessions = {}
+
+    def session(role):
+        if role not in sessions:
+            sessions[role] = HttpSession(base_url, users[role].username)
+        return sessions[role]
+
+    stop = threading.Event()
+    slow_results = []
+
+    def slow_loop(slow_session, url):
+        while not stop.is_set():
+            slow_results.append(slow_session.get(url))
+
+    slow_threads = []
+    if slow_view and slow_clients:
+        slow_name, slow_roles, slow_needs_project = next(row for row in HOT_VIEWS if row[0] == slow_view)
+        slow_url = reverse(slow_name, kwargs={'pk': project.pk} if slow_needs_project else None)
+        slow_session = session(slow_roles[0])
+        slow_threads = [threading.Thread(target=slow_loop, args=(slow_session, slow_url), daemon=True)
+                        for _ in range(slow_clients)]
+        for thread in slow_threads:
+            thread.start()
+
+    results = []
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for name, view_roles, needs_project in HOT_VIEWS:
+                if (views and name not in views) or (slow_threads and name == slow_view):
+                    continue
+                url = reverse(name, kwargs={'pk': project.pk} if needs_project else None)
+                for role in view_roles:
+                    if (roles and role not in roles) or role not in users:
+                        continue
+                    role_session = session(role)
+                    list(executor.map(role_session.get, [url] * warmup))
+                    started = time.perf_counter()
+                    samples = list(executor.map(role_session.get, [url] * iterations))
+                    result = _summarize(name, role, url, samples)
+                    result['requests_per_second'] = round(iterations / (time.perf_counter() - started), 1)
+                    log(f"  {name} [{role}]: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, "
+                        f"{result['requests_per_second']} req/s (HTTP {result['status']})")
+                    results.append(result)
+    finally:
+        stop.set()
+        for thread in slow_threads:
+            thread.join()
+    if slow_results:
+        results.append(_summarize(slow_view, 'background', slow_url, slow_results))
+    return results
+
+
+def compare(results, baseline):
+    """Add baseline p50 / query numbers and the change to each result (matched on view + role)"""
+    previous = {(row['view'], row['role']): row for row in baseline}
+    for row in results:
+        before = previous.get((row['view'], row['role']))
+        if before is None:
+            continue
+        row['baseline_p50_ms'] = before['p50_ms']
+        row['baseline_queries'] = before['queries']
+        row['p50_change'] = round(row['p50_ms'] / before['p50_ms'], 2) if before['p50_ms'] else None
+        if row['queries'] is not None and before['queries'] is not None:
+            row['queries_change'] = row['queries'] - before['queries']
+    return results
@@ -0,0 +1,170 @@
+"""
+Versioned cache namespaces per domain, invalidated by model signals.
+
+Dropdown lists (active projects, configurations, channel partners, assignees)
+and dashboard stats used to be re-queried on every request. Values cached
+here live in one or more domains:
+
+    projects     Project, GlobalConfiguration
+    leads        Lead, LeadProjectAssociation, Booking
+    cps          ChannelPartner, Booking
+    commissions  Commission, Payment
+    users        User
+
+Every domain has a version number in the cache and every key embeds the
+versions of the domains it was computed from, so invalidate('leads') drops
+all lead-derived values at once without knowing their keys. The post_save /
+post_delete receivers in each app's signals.py call invalidate_on_commit(); bulk
+.update() / bulk_create() paths skip signals and call it themselves.
+
+    projects = get_or_set(['projects'], 'active_projects', lambda: list(...))
+
+    @cache_fragment('leads', 'projects')
+    def site_head_stats(request, today): ...
+
+With the default locmem backend (CACHE_BACKEND) every process has its own
+versions, so other workers only see a change once their entries expire
+(CACHE_TIMEOUT); use the file or db backend to share them.
+"""
+import functools
+import hashlib
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+DOMAINS = ('projects', 'leads', 'cps', 'commissions', 'users')
+
+_MISSING = object()
+
+
+def _version_key(domain):
+    if domain not in DOMAINS:
+        raise ValueError(f'Unknown cache domain {domain!r} (expected one of {", ".join(DOMAINS)})')
+    return f'cache_version:{domain}'
+
+
+def domain_versions(domains):
+    """Current version of each domain, as a dict - one cache round trip"""
+    keys = {domain: _version_key(domain) for domain in domains}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for domain, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = 1
+            cache.add(key, version, None)
+        versions[domain] = version
+    return versions
+
+
+def invalidate(*domains):
+    """Drop every cached value computed from any of `domains`"""
+    for domain in domains:
+        key = _version_key(domain)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+
+
+def invalidate_on_commit(*domains):
+    """invalidate() once the current transaction commits (right away outside one)
+
+    Bumping earlier would let a concurrent request cache the old rows under
+    the new version.
+    """
+    transaction.on_commit(lambda: invalidate(*domains))
+
+
+def make_key(domains, *parts):
+    """Cache key for `parts` under the current versions of `domains`"""
+    versions = domain_versions(domains)
+    namespace = '.'.join(f'{domain}{version}' for domain, version in sorted(versions.items()))
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'bridgio:{namespace}:{digest}'
+
+
+def get_or_set(domains, name, compute, timeout=DEFAULT_TIMEOUT, *parts):
+    """Return the cached value of compute() for (name, *parts), computing it on a miss
+
+    `compute` should return plain data (lists of model instances are fine,
+    lazy querysets are not - evaluate them with list()).
+    """
+    key = make_key(domains, name, *parts)
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
+
+
+def scope_signature(request):
+    """What a request is allowed to see: role plus visible project ids ('all' if unrestricted)"""
+    scope = getattr(request, 'scope', None)
+    if scope is None:
+        from accounts.scope import UserScope
+        scope = request.scope = UserScope(request)
+    visible = scope.visible_project_ids
+    return (scope.role, 'all' if visible is None else tuple(sorted(visible)))
+
+
+def cache_fragment(*domains, timeout=DEFAULT_TIMEOUT, per_user=False):
+    """Cache fn(request, *args, **kwargs) per user scope, under `domains`
+
+    Users with the same role and visible projects share an entry; set
+    per_user when the function also filters on request.user itself (e.g.
+    "bookings I created"). The remaining arguments are part of the key, so
+    pass anything else the result depends on - like today's date.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(request, *args, **kwargs):
+            parts = [scope_signature(request), args, sorted(kwargs.items())]
+            if per_user:
+                parts.append(request.user.pk)
+            return get_or_set(domains, name, lambda: func(request, *args, **kwargs), timeout, *parts)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+# Shared dropdown lists
+
+def active_projects(*ordering):
+    """Active projects - newest first unless an ordering is given"""
+    from projects.models import Project
+    projects = Project.objects.filter(is_active=True)
+    if ordering:
+        projects = projects.order_by(*ordering)
+    return get_or_set(['projects'], 'active_projects', lambda: list(projects), DEFAULT_TIMEOUT, ordering)
+
+
+def active_configurations():
+    from leads.models import GlobalConfiguration
+    return get_or_set(
+        ['projects'], 'active_configurations',
+        lambda: list(GlobalConfiguration.objects.filter(is_active=True).order_by('order', 'name')),
+    )
+
+
+def active_channel_partners():
+    from channel_partners.models import ChannelPartner
+    return get_or_set(
+        ['cps'], 'active_channel_partners',
+        lambda: list(ChannelPartner.objects.filter(status='active').order_by('cp_name')),
+    )
+
+
+def assignable_users():
+    """Closing managers, telecallers and sourcing managers, by username"""
+    from accounts.models import User
+    return get_or_set(
+        ['users'], 'assignable_users',
+        lambda: list(User.objects.filter(
+            role__in=['closing_manager', 'telecaller', 'sourcing_manager']
+        ).order_by('username')),
+    )
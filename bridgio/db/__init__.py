@@ -0,0 +1,63 @@
+"""
+Database helpers shared by the apps.
+
+write_atomic() is transaction.atomic() for write-heavy paths. On the tuned
+SQLite backend (bridgio.db.sqlite3) the outermost block starts with
+BEGIN IMMEDIATE, which takes the write lock up front and waits up to
+busy_timeout for it. A plain (deferred) BEGIN that reads first and then
+writes fails straight away with "database is locked" when another process
+holds the write lock, because SQLite can't wait for a lock upgrade. On other
+backends it is exactly transaction.atomic().
+
+    with write_atomic():
+        ...
+
+    @write_atomic()
+    def save(self, ...):
+        ...
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def write_atomic(using=None, savepoint=True):
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if not hasattr(connection, 'begin_immediate') or connection.in_atomic_block:
+        # Not SQLite, or already inside a transaction (BEGIN was issued by the outer block)
+        with transaction.atomic(using=using, savepoint=savepoint):
+            yield
+        return
+
+    previous = connection.begin_immediate
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            connection.begin_immediate = previous
+            yield
+    finally:
+        connection.begin_immediate = previous
+
+
+def fields_without_counters(instance, counters, update_fields=None):
+    """update_fields that save `instance` without writing the given counter columns
+
+    Counters that only ever move through `UPDATE ... SET n = n + x` must not be
+    written back from an instance loaded before the increment. New rows insert
+    every column, so update_fields is returned unchanged for them. Deferred
+    fields are left out, as Django's own save() does.
+
+        def save(self, *args, **kwargs):
+            kwargs['update_fields'] = fields_without_counters(self, ['hits'], kwargs.get('update_fields'))
+            super().save(*args, **kwargs)
+    """
+    if instance._state.adding or instance.pk is None:
+        return update_fields
+    if update_fields is None:
+        deferred = instance.get_deferred_fields()
+        update_fields = [
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.attname not in deferred
+        ]
+    return [name for name in update_fields if name not in counters]
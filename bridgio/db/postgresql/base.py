@@ -0,0 +1,162 @@
+"""
+PostgreSQL backend with an optional in-process connection pool.
+
+With CONN_MAX_AGE > 0 Django keeps one connection per thread, which is
+enough for sync workers. With threaded workers (gunicorn gthread) every
+thread holds its own idle connection and the total grows to
+workers x threads. This backend instead hands out connections from a pool per
+process. Django "closes" the connection at the end of each request (use
+CONN_MAX_AGE = 0), which returns it to the pool. OPTIONS:
+
+    'OPTIONS': {
+        'pool': {'min_size': 1, 'max_size': 10, 'timeout': 10},
+    }
+
+min_size connections are opened when the pool is created; after that every
+returned connection is kept for reuse, up to max_size. (psycopg2's own
+ThreadedConnectionPool closes anything returned beyond minconn, so with a
+small min_size concurrent requests would still open a fresh connection each.)
+A pooled connection is checked with SELECT 1 before it is handed out, and a
+dead one is replaced. When all max_size connections are checked out, a
+thread waits up to `timeout` seconds for one to come back and then raises
+PoolError.
+"""
+import os
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class BlockingConnectionPool:
+    """Up to max_size psycopg2 connections; waits for a free one instead of failing at once"""
+
+    def __init__(self, min_size, max_size, timeout, **conn_params):
+        self.timeout = timeout
+        self.conn_params = conn_params
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = []
+        self._lock = threading.Lock()
+        for _ in range(min(min_size, max_size)):
+            self._idle.append(self._connect())
+
+    def _connect(self):
+        import psycopg2
+
+        return psycopg2.connect(**self.conn_params)
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def getconn(self):
+        from psycopg2.pool import PoolError
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolError(f'No database connection free after {self.timeout}s')
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return self._connect()
+                if self._is_alive(connection):
+                    return connection
+                self._discard(connection)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, close=False):
+        from psycopg2 import extensions
+
+        try:
+            if not close and not connection.closed:
+                status = connection.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    # Never hand out a connection with a transaction left open
+                    try:
+                        connection.rollback()
+                    except Exception:
+                        close = True
+            if close or connection.closed:
+                self._discard(connection)
+            else:
+                with self._lock:
+                    self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+
+class _PooledDatabase:
+    """The psycopg2 module, except that connect() checks out of the pool"""
+
+    def __init__(self, module, pool):
+        self._module = module
+        self._pool = pool
+
+    def connect(self, **conn_params):
+        return self._pool.getconn()
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_options = dict(self.settings_dict.get('OPTIONS', {}).get('pool') or {})
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_pool(self, conn_params):
+        # Keyed by pid so a pool created before gunicorn forks is never shared
+        key = (self.alias, os.getpid())
+        with _pools_lock:
+            if key not in _pools:
+                if base.is_psycopg3:
+                    raise ImproperlyConfigured('The pooled PostgreSQL backend needs psycopg2.')
+                _pools[key] = BlockingConnectionPool(
+                    int(self.pool_options.get('min_size', 1)),
+                    int(self.pool_options.get('max_size', 10)),
+                    float(self.pool_options.get('timeout', 10)),
+                    **conn_params,
+                )
+            return _pools[key]
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        self.Database = _PooledDatabase(base.Database, self.pool)
+        return super().get_new_connection(conn_params)
+
+    def _close(self):
+        if self.connection is None:
+            return
+        broken = self.errors_occurred and not self.is_usable()
+        with self.wrap_database_errors:
+            self.pool.putconn(self.connection, close=broken)
@@ -0,0 +1,43 @@
+"""
+SQLite backend tuned for running under several gunicorn workers.
+
+Django 4.2's SQLite backend opens connections with SQLite's defaults
+(rollback journal, synchronous=FULL, no busy timeout), so concurrent
+writers fail fast with "database is locked" and readers block on writers.
+This backend applies PRAGMAs on every new connection and can start
+transactions with BEGIN IMMEDIATE. Extra OPTIONS (everything else is passed
+to sqlite3.connect as usual):
+
+    'OPTIONS': {
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', ...},
+        'transaction_mode': 'DEFERRED' | 'IMMEDIATE',  # for every atomic() block
+    }
+
+With transaction_mode DEFERRED (the default) only bridgio.db.write_atomic()
+blocks use BEGIN IMMEDIATE.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict.get('OPTIONS', {})
+        self.pragmas = dict(options.get('pragmas') or {})
+        self.begin_immediate = str(options.get('transaction_mode', 'DEFERRED')).upper() == 'IMMEDIATE'
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
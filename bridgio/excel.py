@@ -0,0 +1,15 @@
+"""
+Lazy openpyxl import for the Excel uploads and exports (leads, channel partners).
+
+openpyxl adds ~75 ms to every worker's boot, so it is imported on the first
+request that reads or writes a workbook instead of with the views.
+"""
+
+
+def load_openpyxl():
+    """openpyxl, imported on first use, or None if not installed"""
+    try:
+        import openpyxl
+    except ImportError:
+        return None
+    return openpyxl
@@ -0,0 +1,129 @@
+"""
+Upload pipeline for photos - downsize, strip metadata, re-encode, thumbnail.
+
+Phones upload 3-8 MB JPEGs with EXIF (GPS included) that list pages used to
+show at full size. After an upload the view calls schedule_processing(),
+which runs process_image() on the background job pool (accounts.jobs) once
+the transaction commits:
+
+- the EXIF orientation is applied to the pixels, then all metadata except
+  the colour profile is dropped,
+- the original is replaced by a copy no larger than max_size px on its long
+  side, re-encoded as IMAGE_FORMAT (WebP by default, JPEG otherwise),
+- a thumb_size px copy is written to the thumbnail field; templates show it
+  and fall back to the original until it exists.
+
+The row is only updated if it still points at the file that was processed,
+so a newer upload finishing first is never overwritten. Existing uploads:
+`python manage.py process_images`.
+"""
+import io
+import logging
+import posixpath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from bridgio.cache import invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+# 'app_label.Model.field' -> sizes, thumbnail field and cache domains the row lives in
+IMAGE_SPECS = {
+    'projects.Project.image': {
+        'max_size': 1920, 'thumb_size': 480, 'thumbnail_field': 'image_thumbnail', 'cache_domains': ('projects',),
+    },
+    'attendance.Attendance.selfie_photo': {
+        'max_size': 1024, 'thumb_size': 160, 'thumbnail_field': 'selfie_thumbnail', 'cache_domains': (),
+    },
+}
+
+
+def output_format():
+    """('WEBP', 'webp') or ('JPEG', 'jpg') - JPEG if Pillow was built without WebP"""
+    if settings.IMAGE_FORMAT == 'webp' and features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def encode(image, max_size):
+    """Bytes of `image` scaled down to fit max_size x max_size, without EXIF"""
+    icc_profile = image.info.get('icc_profile')
+    image = image.copy()
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    image_format, _ = output_format()
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha and image_format == 'WEBP' else 'RGB')
+    buffer = io.BytesIO()
+    options = {'quality': settings.IMAGE_QUALITY, 'icc_profile': icc_profile}
+    if image_format == 'WEBP':
+        options['method'] = 4
+    else:
+        options.update(optimize=True, progressive=True)
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def process_image(instance, field_name):
+    """Re-encode instance.<field_name> and write its thumbnail; returns False if there was nothing to do"""
+    key = f'{instance._meta.label}.{field_name}'
+    spec = IMAGE_SPECS[key]
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return False
+    name = field_file.name
+    storage = field_file.storage
+    try:
+        with storage.open(name, 'rb') as f:
+            image = Image.open(f)
+            image.load()
+    except (FileNotFoundError, UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning(f'Skipping {key} #{instance.pk} ({name}): {e}')
+        return False
+    image = ImageOps.exif_transpose(image)
+
+    _, extension = output_format()
+    stem = posixpath.splitext(posixpath.basename(name))[0]
+    new_name = storage.save(posixpath.join(posixpath.dirname(name), f'{stem}.{extension}'),
+                            ContentFile(encode(image, spec['max_size'])))
+    thumbnail_field = instance._meta.get_field(spec['thumbnail_field'])
+    thumbnail_name = storage.save(thumbnail_field.generate_filename(instance, f'{stem}.{extension}'),
+                                  ContentFile(encode(image, spec['thumb_size'])))
+
+    model = type(instance)
+    old_thumbnail = model.objects.filter(pk=instance.pk).values_list(spec['thumbnail_field'], flat=True).first()
+    updated = model.objects.filter(pk=instance.pk, **{field_name: name}).update(
+        **{field_name: new_name, spec['thumbnail_field']: thumbnail_name}
+    )
+    if not updated:  # deleted or re-uploaded meanwhile
+        storage.delete(new_name)
+        storage.delete(thumbnail_name)
+        return False
+    storage.delete(name)
+    if old_thumbnail:
+        storage.delete(old_thumbnail)
+    if spec['cache_domains']:
+        invalidate_on_commit(*spec['cache_domains'])
+    setattr(instance, field_name, new_name)
+    setattr(instance, spec['thumbnail_field'], thumbnail_name)
+    return True
+
+
+def _process_job(job, model_label, pk, field_name):
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    processed = instance is not None and process_image(instance, field_name)
+    return {'processed': processed}
+
+
+def schedule_processing(instance, field_name, user=None):
+    """Process instance.<field_name> on the background job pool after the current transaction commits"""
+    from accounts.jobs import start_job
+
+    if not getattr(instance, field_name):
+        return None
+    return start_job(
+        'process_image', _process_job, instance._meta.label, instance.pk, field_name,
+        user=user, description=f'Resize {instance._meta.label}.{field_name} #{instance.pk}', total=1,
+    )
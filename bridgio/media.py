@@ -0,0 +1,218 @@
+"""
+Protected media - permission checks in Django, file transfer by the front server.
+
+Every /media/ URL goes through protected_media(): the file's owner row
+decides who may see it (MEDIA_RULES, by upload_to prefix), with the same
+rules as the pages that link to it:
+
+    projects/             project cover images and thumbnails - any signed-in user
+    attendance/selfies/   selfies and thumbnails - the employee, site heads of the project, admins
+    bookings/receipts/    whoever may open the booking (booking_detail)
+    payments/receipts/    whoever may open the payment's booking
+
+Files outside those prefixes are for super admins / mandate owners only.
+Anything not visible is a 404, so file names can't be probed.
+
+The transfer itself depends on MEDIA_SERVER:
+
+- 'nginx': an empty response with X-Accel-Redirect; nginx serves the file
+  from its internal MEDIA_ACCEL_PREFIX location (ranges, sendfile(2), no
+  Python worker held for the download),
+- 'sendfile': X-Sendfile with the absolute path (Apache mod_xsendfile),
+- '' (default): streamed from Django with single-range support.
+
+Conditional GETs are answered here in every mode: the ETag uses nginx's
+format (hex mtime - hex size), so validators stay the same whichever side
+served the previous response.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def can_view_booking(request, booking):
+    """Same rules as bookings.views.booking_detail"""
+    scope = request.scope
+    if scope.sees_all_projects or (request.user.is_superuser and request.user.is_staff):
+        return True
+    if scope.is_site_head:
+        return booking.project.site_head_id == request.user.pk
+    if scope.is_closing_manager:
+        return booking.created_by_id == request.user.pk
+    return False
+
+
+def _project_image(request, name):
+    return True
+
+
+def _attendance_selfie(request, name):
+    from attendance.models import Attendance
+    attendance = Attendance.objects.filter(
+        Q(selfie_photo=name) | Q(selfie_thumbnail=name)
+    ).select_related('project').first()
+    if attendance is None:
+        return False
+    scope = request.scope
+    return (
+        attendance.user_id == request.user.pk
+        or scope.sees_all_projects
+        or (scope.is_site_head and attendance.project is not None and attendance.project.site_head_id == request.user.pk)
+    )
+
+
+def _booking_receipt(request, name):
+    from bookings.models import Booking
+    booking = Booking.objects.filter(token_receipt_proof=name, is_archived=False).select_related('project').first()
+    return booking is not None and can_view_booking(request, booking)
+
+
+def _payment_receipt(request, name):
+    from bookings.models import Payment
+    payment = Payment.objects.filter(
+        receipt_proof=name, booking__is_archived=False
+    ).select_related('booking__project').first()
+    return payment is not None and can_view_booking(request, payment.booking)
+
+
+# (upload_to prefix, check(request, name) -> bool)
+MEDIA_RULES = [
+    ('projects/', _project_image),
+    ('attendance/selfies/', _attendance_selfie),
+    ('bookings/receipts/', _booking_receipt),
+    ('payments/receipts/', _payment_receipt),
+]
+
+
+def can_view_media(request, name):
+    for prefix, check in MEDIA_RULES:
+        if name.startswith(prefix):
+            return check(request, name)
+    return request.scope.sees_all_projects
+
+
+def file_etag(stat):
+    """nginx-compatible strong ETag: "<mtime hex>-<size hex>\""""
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single 'bytes=' range, None to send the whole file
+
+    Raises ValueError for a range that can't be satisfied. Multiple ranges
+    aren't supported and get the whole file, which RFC 9110 allows.
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    """A Range is only honoured if If-Range (when sent) still matches the file"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _stream(request, path, stat, content_type, etag, last_modified):
+    """FileResponse, or a 206 / 416 for Range requests"""
+    size = stat.st_size
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None or not _if_range_matches(request, etag, last_modified):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_file(request, name, path):
+    """Response for the media file `name` at `path` - conditional, offloaded or streamed"""
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if settings.MEDIA_SERVER == 'nginx':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(name)
+        elif settings.MEDIA_SERVER == 'sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = path
+        else:
+            response = _stream(request, path, stat, content_type, etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, max_age=settings.MEDIA_CACHE_SECONDS)
+    return response
+
+
+@require_safe
+@login_required
+def protected_media(request, path):
+    """/media/<path> - the file if the user may see it, 404 otherwise"""
+    name = os.path.normpath(path).replace(os.sep, '/')
+    if name.startswith(('../', '/')) or name in ('.', '..'):
+        raise Http404('File not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    if not can_view_media(request, name):
+        raise Http404('File not found')
+    return serve_file(request, name, full_path)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -50,6 +51,41 @@ TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER', '')
 MSG91_API_KEY = os.environ.get('MSG91_API_KEY', '')
 MSG91_SENDER_ID = os.environ.get('MSG91_SENDER_ID', 'BRIDIO')
 MSG91_TEMPLATE_ID = os.environ.get('MSG91_TEMPLATE_ID', '')
+# Seconds an SMS gateway call may take before falling back to the WhatsApp link
+SMS_TIMEOUT_SECONDS = float(os.environ.get('SMS_TIMEOUT_SECONDS', '10'))
+
+# Background Jobs
+# Heavy operations (e.g. duplicating 100k+ leads) run on an in-process thread pool
+BACKGROUND_JOB_WORKERS = int(os.environ.get('BACKGROUND_JOB_WORKERS', '2'))
+# Lead duplications up to this many leads run inline; larger ones become background jobs
+LEAD_DUPLICATION_SYNC_LIMIT = int(os.environ.get('LEAD_DUPLICATION_SYNC_LIMIT', '5000'))
+# Lead uploads up to this many rows are imported inline; larger files become background jobs
+LEAD_UPLOAD_SYNC_LIMIT = int(os.environ.get('LEAD_UPLOAD_SYNC_LIMIT', '500'))
+
+# Commission analytics summaries are cached per filter set and invalidated on every change;
+# the timeout only bounds staleness across processes when a non-shared cache backend is used
+COMMISSION_STATS_CACHE_TIMEOUT = int(os.environ.get('COMMISSION_STATS_CACHE_TIMEOUT', '300'))
+
+# request.scope project ids are computed once per request; set this (seconds) to also cache
+# them across requests. Invalidated on assignment changes - keep it short with a per-process cache
+USER_SCOPE_CACHE_TIMEOUT = int(os.environ.get('USER_SCOPE_CACHE_TIMEOUT', '0'))
+
+# Request profiling (accounts.middleware.RequestProfilingMiddleware)
+# Every request logs a JSON line to 'bridgio.requests'; requests slower than REQUEST_PROFILE_SLOW_MS
+# or with more than REQUEST_PROFILE_MAX_QUERIES queries are stored (at REQUEST_PROFILE_SAMPLE_RATE)
+# as RequestProfile rows - see "Request profiles" in the admin for endpoints ranked by DB time.
+# Rows older than REQUEST_PROFILE_RETENTION_DAYS are pruned by the middleware (hourly) and by
+# `python manage.py prune_request_profiles`
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING', 'True').lower() == 'true'
+REQUEST_PROFILE_SLOW_MS = float(os.environ.get('REQUEST_PROFILE_SLOW_MS', '1000'))
+REQUEST_PROFILE_MAX_QUERIES = int(os.environ.get('REQUEST_PROFILE_MAX_QUERIES', '100'))
+REQUEST_PROFILE_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILE_SAMPLE_RATE', '1.0'))
+REQUEST_PROFILE_RETENTION_DAYS = int(os.environ.get('REQUEST_PROFILE_RETENTION_DAYS', '14'))
+
+# Unit Selection
+# Legacy fallback that regex-matches bookings not linked via UnitConfiguration.booking on every
+# unit selection request. Run `python manage.py backfill_unit_bookings` once, then keep this off.
+LEGACY_BOOKING_UNIT_MATCHING = os.environ.get('LEGACY_BOOKING_UNIT_MATCHING', 'False').lower() == 'true'
 
 
 # Application definition
@@ -72,12 +108,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bridgio.health.HealthCheckMiddleware',  # /healthz readiness probe, answered before everything else
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'accounts.middleware.RequestProfilingMiddleware',  # SQL / template timings, Server-Timing, RequestProfile
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.RequestScopeMiddleware',  # request.scope - role flags / visible projects
+    'channel_partners.middleware.ChannelPartnerStatsMiddleware',  # one CP counter refresh per request
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
@@ -112,21 +152,55 @@ WSGI_APPLICATION = 'bridgio.wsgi.application'
 # 2. SQLite on persistent disk (Render, Fly.io) - via PERSISTENT_DISK_PATH or /data
 # 3. SQLite local (development)
 
+def sqlite_database(path):
+    """SQLite settings - tuned for several concurrent workers unless SQLITE_TUNING=0"""
+    if os.environ.get('SQLITE_TUNING', '1') == '0':
+        return {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}
+    return {
+        'ENGINE': 'bridgio.db.sqlite3',
+        'NAME': path,
+        'OPTIONS': {
+            # Applied to every new connection (see bridgio/db/sqlite3/base.py)
+            'pragmas': {
+                'journal_mode': 'WAL',  # readers don't block the writer and vice versa
+                'synchronous': 'NORMAL',  # safe with WAL; fsync at checkpoints instead of every commit
+                'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),  # wait for locks instead of failing
+                'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024))),
+                'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', str(32 * 1024))),  # negative = KiB
+                'temp_store': 'MEMORY',
+            },
+            # DEFERRED: only bridgio.db.write_atomic() blocks use BEGIN IMMEDIATE; IMMEDIATE: every atomic()
+            'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', 'DEFERRED'),
+        },
+    }
+
+
 # Check for PostgreSQL first (Railway, Heroku, etc.)
 DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
     try:
         import dj_database_url
+        # Connection reuse: persistent per-thread connections (DB_CONN_MAX_AGE seconds, health
+        # checked before reuse), or DB_POOL=1 for a per-process pool shared by threaded workers
+        DB_POOL = os.environ.get('DB_POOL', '0') == '1'
         DATABASES = {
-            'default': dj_database_url.parse(DATABASE_URL)
+            'default': dj_database_url.parse(
+                DATABASE_URL,
+                conn_max_age=0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+                conn_health_checks=os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+            )
         }
+        if DB_POOL and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+            DATABASES['default']['ENGINE'] = 'bridgio.db.postgresql'
+            DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+                'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '1')),
+                'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+                'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+            }
     except ImportError:
         # Fallback to SQLite if dj_database_url not installed
         DATABASES = {
-            'default': {
-                'ENGINE': 'django.db.backends.sqlite3',
-                'NAME': BASE_DIR / 'db.sqlite3',
-            }
+            'default': sqlite_database(BASE_DIR / 'db.sqlite3')
         }
 else:
     # Use SQLite with persistent disk support
@@ -159,13 +233,43 @@ else:
             os.makedirs(db_dir, exist_ok=True)
     
     DATABASES = {
-        'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': db_path,
-        }
+        'default': sqlite_database(db_path)
     }
 
 
+# Test databases are built straight from the models: the historical migrations
+# (leads 0008/0009 both add call_logs.user_id) don't apply to an empty database.
+# SQLite tests use a file instead of the in-memory default, so the threaded concurrency
+# tests get separate connections with real locking (WAL, busy_timeout).
+if sys.argv[1:2] == ['test']:
+    MIGRATION_MODULES = {app.rsplit('.', 1)[-1]: None for app in INSTALLED_APPS}
+    if 'sqlite3' in DATABASES['default']['ENGINE']:
+        import tempfile
+        DATABASES['default']['TEST'] = {'NAME': os.path.join(tempfile.gettempdir(), 'bridgio_test.sqlite3')}
+
+# Cache (see bridgio/cache.py for the per-domain key namespaces and invalidation)
+# CACHE_BACKEND: locmem (per process, default), file (shared by the processes of one
+# machine) or db (shared by every machine - run `python manage.py createcachetable`).
+# gunicorn.conf.py switches the default to file when it runs more than one worker.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem').lower()
+CACHE_TIMEOUT = int(os.environ.get('CACHE_TIMEOUT', '300'))
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'bridgio'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'django_cache'),
+}
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ValueError(f"CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}, not {CACHE_BACKEND!r}")
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.environ.get('CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '5000'))},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -204,9 +308,23 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-# Media files
+# Media files - served by bridgio.media.protected_media after a permission check
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# MEDIA_SERVER: '' streams from Django; 'nginx' hands the transfer to nginx with
+# X-Accel-Redirect (internal location MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT);
+# 'sendfile' sets X-Sendfile for Apache mod_xsendfile / lighttpd
+MEDIA_SERVER = os.environ.get('MEDIA_SERVER', '').lower()
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_CACHE_SECONDS = int(os.environ.get('MEDIA_CACHE_SECONDS', '3600'))
+if MEDIA_SERVER not in ('', 'nginx', 'sendfile'):
+    raise ValueError(f"MEDIA_SERVER must be '', 'nginx' or 'sendfile', not {MEDIA_SERVER!r}")
+# Uploaded photos are re-encoded (bridgio.images): webp or jpeg, quality 1-100
+IMAGE_FORMAT = os.environ.get('IMAGE_FORMAT', 'webp').lower()
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', '80'))
+
+# Readiness probe answered by bridgio.health.HealthCheckMiddleware (database + migrations)
+HEALTH_CHECK_PATH = os.environ.get('HEALTH_CHECK_PATH', '/healthz')
 
 # WhiteNoise for static files serving in production
 if not DEBUG:
@@ -245,6 +363,11 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': False,
         },
+        'bridgio.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
 
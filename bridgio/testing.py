@@ -0,0 +1,108 @@
+"""
+Query budgets for the hot views, checked by the app test modules.
+
+QUERY_BUDGETS caps the number of SQL queries each view may run per role.
+QueryBudgetTestCase seeds the bench dataset (bridgio.benchmark) at two sizes,
+requests every view it covers as a bench user of each role with a cold cache,
+and fails when
+
+- a view runs more queries than its budget, or
+- a view runs more queries on the larger dataset than on the smaller one -
+  the signature of an N+1 (one query per row, per project, per CP ...).
+
+    class LeadQueryBudgetTests(QueryBudgetTestCase):
+        url_names = ['leads:list', 'leads:upcoming_visits']
+
+When a change legitimately needs more queries, raise the budget here in the
+same commit, so the reviewer sees it.
+"""
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from bridgio.benchmark import HOT_VIEWS, bench_users, seed_dataset, volumes_for
+
+# URL name -> {role: max queries per request (cold cache)}
+QUERY_BUDGETS = {
+    'dashboard': {'super_admin': 15, 'site_head': 11, 'closing_manager': 8, 'telecaller': 8},
+    'leads:list': {'super_admin': 14, 'site_head': 14, 'closing_manager': 15, 'telecaller': 14},
+    'leads:upcoming_visits': {'super_admin': 7, 'site_head': 7, 'closing_manager': 7},
+    'projects:unit_selection': {'super_admin': 7, 'closing_manager': 8},
+    'channel_partners:list': {'super_admin': 5, 'site_head': 5},
+    'bookings:list': {'super_admin': 6, 'site_head': 6},
+    'bookings:commission_list': {'super_admin': 9},
+    'bookings:commission_dashboard': {'super_admin': 7},
+    'reports:mandate_owner_reports': {'super_admin': 18, 'mandate_owner': 18},
+    'reports:employee_performance': {'super_admin': 15, 'site_head': 16},
+    'reports:cp_performance': {'super_admin': 14, 'site_head': 14},
+}
+
+# The larger dataset has more of everything a view may loop over - projects, staff per
+# project, leads, CPs and bookings - so a query per project or per employee shows up too
+DATASET_SIZES = {
+    'smaller': volumes_for('tiny'),
+    'larger': volumes_for('tiny', projects=4, employees_per_project=4, leads=600, cps=60, bookings=30),
+}
+
+_NEEDS_PROJECT = {name for name, _, needs_project in HOT_VIEWS if needs_project}
+
+
+def count_queries(url_names, budgets=QUERY_BUDGETS):
+    """{(url name, role): queries} for one cold-cache GET per view and role on the seeded dataset"""
+    users, project = bench_users()
+    counts = {}
+    # The profiling middleware's RequestProfile inserts would count against the view
+    with override_settings(REQUEST_PROFILING=False):
+        for name in url_names:
+            counts.update(_count_view(name, budgets[name], users, project))
+    return counts
+
+
+def _count_view(name, roles, users, project):
+    counts = {}
+    url = reverse(name, kwargs={'pk': project.pk} if name in _NEEDS_PROJECT else None)
+    for role in roles:
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(users[role])
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        if response.status_code != 200:
+            raise AssertionError(f'{name} [{role}] returned HTTP {response.status_code}')
+        counts[(name, role)] = len(queries)
+    return counts
+
+
+class QueryBudgetTestCase(TestCase):
+    """Checks QUERY_BUDGETS for `url_names` at both DATASET_SIZES"""
+
+    url_names = []
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.query_counts = {label: {} for label in DATASET_SIZES}
+        if not cls.url_names:
+            return
+        for label, volumes in DATASET_SIZES.items():
+            savepoint = transaction.savepoint()
+            seed_dataset(volumes, log=lambda message: None)
+            cls.query_counts[label] = count_queries(cls.url_names)
+            transaction.savepoint_rollback(savepoint)
+        cache.clear()
+
+    def test_query_budgets(self):
+        for key, larger in self.query_counts['larger'].items():
+            name, role = key
+            smaller = self.query_counts['smaller'][key]
+            with self.subTest(view=name, role=role):
+                self.assertLessEqual(
+                    max(smaller, larger), QUERY_BUDGETS[name][role],
+                    f'{name} [{role}] runs {max(smaller, larger)} queries, budget {QUERY_BUDGETS[name][role]}',
+                )
+                self.assertLessEqual(
+                    larger, smaller,
+                    f'{name} [{role}] runs {smaller} queries on the smaller dataset and {larger} on the '
+                    f'larger one - the query count grows with the data (N+1?)',
+                )
@@ -0,0 +1,175 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from accounts.models import User
+from attendance.models import Attendance
+from bookings.models import Booking
+from bridgio.db.postgresql.base import BlockingConnectionPool
+from bridgio.media import parse_range
+from leads.models import Lead
+from projects.models import Project
+
+
+class ParseRangeTests(SimpleTestCase):
+    """Single byte ranges of a 1000-byte file"""
+
+    def test_ranges(self):
+        for header, expected in [
+            ('bytes=0-99', (0, 99)),
+            ('bytes=500-', (500, 999)),
+            ('bytes=900-5000', (900, 999)),  # end clamped to the file
+            ('bytes=-100', (900, 999)),  # suffix: the last 100 bytes
+            ('bytes=-5000', (0, 999)),
+            (' bytes=10-10 ', (10, 10)),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 1000), expected)
+
+    def test_whole_file(self):
+        for header in [None, '', 'bytes=-', 'bytes=0-9,20-29', 'items=0-9', 'bytes=abc']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+    def test_unsatisfiable(self):
+        for header in ['bytes=1000-', 'bytes=50-10', 'bytes=-0']:
+            with self.subTest(header=header):
+                with self.assertRaises(ValueError):
+                    parse_range(header, 1000)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = True
+        self.alive = True
+        self.info = mock.Mock(transaction_status=0)  # TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        if not self.alive:
+            raise ConnectionError('server closed the connection')
+        return mock.MagicMock()
+
+    def rollback(self):
+        self.info.transaction_status = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class BlockingConnectionPoolTests(SimpleTestCase):
+    """Returned connections are reused up to max_size and checked before reuse"""
+
+    def make_pool(self, min_size, max_size):
+        self.opened = []
+
+        def connect(**params):
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        patcher = mock.patch('psycopg2.connect', side_effect=connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return BlockingConnectionPool(min_size, max_size, timeout=0.01)
+
+    def test_keeps_returned_connections_beyond_min_size(self):
+        pool = self.make_pool(1, 3)
+        connections = [pool.getconn() for _ in range(3)]
+        for connection in connections:
+            pool.putconn(connection)
+        again = {pool.getconn() for _ in range(3)}
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(again, set(connections))
+
+    def test_waits_then_fails_when_exhausted(self):
+        from psycopg2.pool import PoolError
+
+        pool = self.make_pool(0, 1)
+        pool.getconn()
+        with self.assertRaises(PoolError):
+            pool.getconn()
+
+    def test_dead_or_mid_transaction_connections(self):
+        pool = self.make_pool(0, 2)
+        first, second = pool.getconn(), pool.getconn()
+        second.info.transaction_status = 2  # TRANSACTION_STATUS_INTRANS
+        pool.putconn(first)
+        pool.putconn(second)
+        self.assertEqual(second.info.transaction_status, 0)  # rolled back before reuse
+
+        second.alive = False
+        self.assertIs(pool.getconn(), first)  # the dead one was replaced
+        self.assertEqual(second.closed, 1)
+        self.assertEqual(len(self.opened), 2)
+
+
+class ProtectedMediaTests(TestCase):
+    """/media/ files are only served to the users who may see their owner row"""
+
+    files = [
+        'bookings/receipts/token.pdf',
+        'attendance/selfies/selfie.jpg',
+        'attendance/selfies/thumbs/selfie.webp',
+        'exports/leads.csv',
+    ]
+
+    def setUp(self):
+        media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, media_root)
+        for name in self.files:
+            (media_root / name).parent.mkdir(parents=True, exist_ok=True)
+            (media_root / name).write_bytes(b'data')
+        settings = override_settings(MEDIA_ROOT=str(media_root), MEDIA_SERVER='')
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.admin = User.objects.create_user(username='media_admin', role='super_admin')
+        self.site_head = User.objects.create_user(username='media_site_head', role='site_head')
+        self.other_site_head = User.objects.create_user(username='media_other_head', role='site_head')
+        self.closer = User.objects.create_user(username='media_closer', role='closing_manager')
+        self.other_closer = User.objects.create_user(username='media_other_closer', role='closing_manager')
+        self.project = Project.objects.create(
+            name='Media', builder_name='Media', location='-', mandate_owner=self.admin, site_head=self.site_head,
+        )
+        Booking.objects.create(
+            lead=Lead.objects.create(name='Buyer', phone='9876500009'), project=self.project, unit_number='101',
+            final_negotiated_price=Decimal('1000000'), created_by=self.closer,
+            token_receipt_proof='bookings/receipts/token.pdf',
+        )
+        Attendance.objects.create(
+            user=self.closer, project=self.project, latitude=0, longitude=0, accuracy_radius=5,
+            selfie_photo='attendance/selfies/selfie.jpg', selfie_thumbnail='attendance/selfies/thumbs/selfie.webp',
+        )
+
+    def status(self, user, name):
+        self.client.force_login(user)
+        response = self.client.get(f'/media/{name}')
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        return response.status_code
+
+    def test_booking_receipt_follows_booking_access(self):
+        self.assertEqual(self.status(self.closer, 'bookings/receipts/token.pdf'), 200)
+        self.assertEqual(self.status(self.other_closer, 'bookings/receipts/token.pdf'), 404)
+
+    def test_selfie_and_thumbnail(self):
+        for name in ['attendance/selfies/selfie.jpg', 'attendance/selfies/thumbs/selfie.webp']:
+            with self.subTest(name=name):
+                self.assertEqual(self.status(self.closer, name), 200)
+                self.assertEqual(self.status(self.site_head, name), 200)
+                self.assertEqual(self.status(self.other_site_head, name), 404)
+                self.assertEqual(self.status(self.other_closer, name), 404)
+
+    def test_path_traversal(self):
+        for name in ['../settings.py', 'attendance/../../settings.py', 'projects/../../bridgio/settings.py']:
+            with self.subTest(name=name):
+                self.assertEqual(self.status(self.admin, name), 404)
+
+    def test_unknown_prefix_needs_all_projects(self):
+        self.assertEqual(self.status(self.admin, 'exports/leads.csv'), 200)
+        self.assertEqual(self.status(self.site_head, 'exports/leads.csv'), 404)
+        self.assertEqual(self.status(self.closer, 'exports/leads.csv'), 404)
@@ -8,7 +8,160 @@ from leads.models import Lead, LeadProjectAssociation
 from bookings.models import Booking, Payment
 from projects.models import Project
 from accounts.models import User
-from channel_partners.models import ChannelPartner
+from channel_partners.models import ChannelPartnerStats
+from bridgio.cache import cache_fragment
+
+
+@cache_fragment('leads', 'cps', 'projects', 'commissions', 'users')
+def system_stats(request, today):
+    """System-wide numbers for the super admin / mandate owner dashboard (cached)"""
+    # All leads - handle if table doesn't exist
+    try:
+        all_leads = Lead.objects.filter(is_archived=False)
+    except Exception:
+        all_leads = Lead.objects.none()
+    
+    try:
+        all_bookings = Booking.objects.filter(is_archived=False)
+    except Exception:
+        all_bookings = Booking.objects.none()
+    
+    # Total Worth Sold and Revenue calculations - handle None values
+    try:
+        # Total Worth Sold = sum of all agreement values (final negotiated prices)
+        total_worth_sold = all_bookings.aggregate(total=Sum('final_negotiated_price'))['total'] or 0
+    
+        # Revenue = sum of all commissions (only for commissions page)
+        total_revenue = Payment.objects.aggregate(total=Sum('amount'))['total'] or 0
+    except Exception:
+        total_worth_sold = 0
+        total_revenue = 0
+    
+    bookings_count = all_bookings.count() if all_bookings else 0
+    
+    try:
+        avg_booking_value = all_bookings.aggregate(avg=Avg('final_negotiated_price'))['avg'] or 0
+    except Exception:
+        avg_booking_value = 0
+    
+    # CP Leaderboard - handle empty queryset
+    try:
+        # Maintained counters (ChannelPartnerStats) instead of two queries per CP
+        cp_leaderboard = [
+            {
+                'cp_name': stats.channel_partner.cp_name,
+                'firm_name': stats.channel_partner.firm_name,
+                'booking_count': stats.booking_count,
+                'total_revenue': stats.total_revenue,
+            }
+            for stats in ChannelPartnerStats.objects.filter(
+                channel_partner__is_active=True, booking_count__gt=0
+            ).select_related('channel_partner').order_by('-total_revenue', '-booking_count')[:10]
+        ]
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        cp_leaderboard = []
+    
+    # Project stats - handle empty queryset
+    try:
+        project_stats = list(Project.objects.filter(is_active=True).annotate(
+            lead_count=Count('lead_associations', filter=Q(lead_associations__is_archived=False)),
+            booking_count=Count('bookings', filter=Q(bookings__is_archived=False)),
+            revenue=Coalesce(Sum('bookings__final_negotiated_price'), Value(Decimal('0')), output_field=DecimalField())
+        ).order_by('-revenue')[:10])
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        project_stats = []
+    
+    # User stats
+    try:
+        user_stats = list(User.objects.values('role').annotate(
+            count=Count('id')
+        ).order_by('role'))
+    except Exception:
+        user_stats = []
+    
+    # Count projects and mandate owners safely
+    try:
+        total_projects = Project.objects.filter(is_active=True).count()
+    except Exception:
+        total_projects = 0
+    
+    try:
+        total_mandate_owners = User.objects.filter(role='mandate_owner', is_active=True).count()
+    except Exception:
+        total_mandate_owners = 0
+    
+    # Pending OTP - use LeadProjectAssociation
+    try:
+        pending_otp = LeadProjectAssociation.objects.filter(
+            is_pretagged=True,
+            pretag_status='pending_verification',
+            is_archived=False
+        ).count()
+    except Exception:
+        pending_otp = 0
+    
+    return {
+        'total_leads': all_leads.count(),
+        'new_visits_today': all_leads.filter(created_at__date=today).count(),
+        'total_bookings': bookings_count,
+        'pending_otp': pending_otp,
+        'total_worth_sold': total_worth_sold,
+        'total_revenue': total_revenue,
+        'avg_booking_value': avg_booking_value,
+        'total_projects': total_projects,
+        'total_mandate_owners': total_mandate_owners,
+        'cp_leaderboard': cp_leaderboard,
+        'project_stats': project_stats,
+        'user_stats': user_stats,
+    }
+
+
+@cache_fragment('leads', 'projects', 'users')
+def site_head_stats(request, today):
+    """Numbers for the site head dashboard - projects the user heads (cached per scope)"""
+    user = request.user
+    # Use LeadProjectAssociation for project-specific data
+    site_head_projects = Project.objects.filter(site_head=user, is_active=True)
+    associations = LeadProjectAssociation.objects.filter(
+        project__site_head=user,
+        is_archived=False
+    )
+    
+    # Get unique leads from associations
+    lead_ids = associations.values_list('lead_id', flat=True).distinct()
+    leads_qs = Lead.objects.filter(id__in=lead_ids, is_archived=False)
+    
+    bookings_qs = Booking.objects.filter(project__site_head=user, is_archived=False)
+    projects = Project.objects.filter(site_head=user, is_active=True)
+    
+    # Unassigned leads (associations without assigned_to)
+    unassigned_leads = associations.filter(assigned_to__isnull=True).count()
+    
+    # Employee stats - Only show employees assigned to this site head's projects
+    employees = User.objects.filter(
+        Q(role='closing_manager') | Q(role='telecaller') | Q(role='sourcing_manager'),
+        assigned_projects__in=site_head_projects
+    ).distinct()
+    
+    # Pending OTP - use LeadProjectAssociation
+    pending_otp = associations.filter(
+        is_pretagged=True,
+        pretag_status='pending_verification'
+    ).count()
+    
+    return {
+        'total_leads': leads_qs.count(),
+        'new_visits_today': leads_qs.filter(created_at__date=today).count(),
+        'total_bookings': bookings_qs.count(),
+        'pending_otp': pending_otp,
+        'unassigned_leads': unassigned_leads,
+        'projects': list(projects),
+        'employees': list(employees),
+    }
 
 
 @login_required
@@ -27,265 +180,17 @@ def dashboard(request):
         is_staff_flag = getattr(user, 'is_staff', False)
         
         if is_super_admin or (is_superuser_flag and is_staff_flag):
-            # All leads - handle if table doesn't exist
-            try:
-                all_leads = Lead.objects.filter(is_archived=False)
-            except Exception:
-                all_leads = Lead.objects.none()
-            
-            try:
-                all_bookings = Booking.objects.filter(is_archived=False)
-            except Exception:
-                all_bookings = Booking.objects.none()
-            
-            # Total Worth Sold and Revenue calculations - handle None values
-            try:
-                # Total Worth Sold = sum of all agreement values (final negotiated prices)
-                total_worth_sold = all_bookings.aggregate(total=Sum('final_negotiated_price'))['total'] or 0
-                
-                # Revenue = sum of all commissions (only for commissions page)
-                total_revenue = Payment.objects.aggregate(total=Sum('amount'))['total'] or 0
-            except Exception:
-                total_worth_sold = 0
-                total_revenue = 0
-            
-            bookings_count = all_bookings.count() if all_bookings else 0
-            
-            try:
-                avg_booking_value = all_bookings.aggregate(avg=Avg('final_negotiated_price'))['avg'] or 0
-            except Exception:
-                avg_booking_value = 0
-            
-            # CP Leaderboard - handle empty queryset
-            try:
-                cp_leaderboard = []
-                for cp in ChannelPartner.objects.filter(is_active=True):
-                    booking_count = cp.bookings.filter(is_archived=False).count()
-                    if booking_count > 0:
-                        # Total Worth Sold = sum of agreement values for this CP
-                        total_worth = cp.bookings.filter(is_archived=False).aggregate(total=Sum('final_negotiated_price'))['total'] or 0
-                        cp_leaderboard.append({
-                            'cp_name': cp.cp_name,
-                            'firm_name': cp.firm_name,
-                            'booking_count': booking_count,
-                            'total_revenue': total_worth
-                        })
-                cp_leaderboard.sort(key=lambda x: x['total_revenue'], reverse=True)
-                cp_leaderboard = cp_leaderboard[:10]
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                cp_leaderboard = []
-            
-            # Project stats - handle empty queryset
-            try:
-                project_stats = list(Project.objects.filter(is_active=True).annotate(
-                    lead_count=Count('lead_associations', filter=Q(lead_associations__is_archived=False)),
-                    booking_count=Count('bookings', filter=Q(bookings__is_archived=False)),
-                    revenue=Coalesce(Sum('bookings__final_negotiated_price'), Value(Decimal('0')), output_field=DecimalField())
-                ).order_by('-revenue')[:10])
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                project_stats = []
-            
-            # User stats
-            try:
-                user_stats = list(User.objects.values('role').annotate(
-                    count=Count('id')
-                ).order_by('role'))
-            except Exception:
-                user_stats = []
-            
-            # Count projects and mandate owners safely
-            try:
-                total_projects = Project.objects.filter(is_active=True).count()
-            except Exception:
-                total_projects = 0
-            
-            try:
-                total_mandate_owners = User.objects.filter(role='mandate_owner', is_active=True).count()
-            except Exception:
-                total_mandate_owners = 0
-            
-            # Pending OTP - use LeadProjectAssociation
-            try:
-                pending_otp = LeadProjectAssociation.objects.filter(
-                    is_pretagged=True,
-                    pretag_status='pending_verification',
-                    is_archived=False
-                ).count()
-            except Exception:
-                pending_otp = 0
-            
-            context = {
-                'is_super_admin': True,
-                'total_leads': all_leads.count(),
-                'new_visits_today': all_leads.filter(created_at__date=today).count(),
-                'total_bookings': bookings_count,
-                'pending_otp': pending_otp,
-                'total_worth_sold': total_worth_sold,
-                'total_revenue': total_revenue,
-                'avg_booking_value': avg_booking_value,
-                'total_projects': total_projects,
-                'total_mandate_owners': total_mandate_owners,
-                'cp_leaderboard': cp_leaderboard,
-                'project_stats': project_stats,
-                'user_stats': user_stats,
-            }
+            context = {'is_super_admin': True, **system_stats(request, today)}
             return render(request, 'dashboard_super_admin.html', context)
         
         # Mandate Owner Dashboard - Same as Super Admin (they see all data)
         elif user_role == 'mandate_owner':
-            # All leads - handle if table doesn't exist
-            try:
-                all_leads = Lead.objects.filter(is_archived=False)
-            except Exception:
-                all_leads = Lead.objects.none()
-            
-            try:
-                all_bookings = Booking.objects.filter(is_archived=False)
-            except Exception:
-                all_bookings = Booking.objects.none()
-            
-            # Total Worth Sold and Revenue calculations - handle None values
-            try:
-                # Total Worth Sold = sum of all agreement values (final negotiated prices)
-                total_worth_sold = all_bookings.aggregate(total=Sum('final_negotiated_price'))['total'] or 0
-                
-                # Revenue = sum of all commissions (only for commissions page)
-                total_revenue = Payment.objects.aggregate(total=Sum('amount'))['total'] or 0
-            except Exception:
-                total_worth_sold = 0
-                total_revenue = 0
-            
-            bookings_count = all_bookings.count() if all_bookings else 0
-            
-            try:
-                avg_booking_value = all_bookings.aggregate(avg=Avg('final_negotiated_price'))['avg'] or 0
-            except Exception:
-                avg_booking_value = 0
-            
-            # CP Leaderboard - handle empty queryset
-            try:
-                cp_leaderboard = []
-                for cp in ChannelPartner.objects.filter(is_active=True):
-                    booking_count = cp.bookings.filter(is_archived=False).count()
-                    if booking_count > 0:
-                        # Total Worth Sold = sum of agreement values for this CP
-                        total_worth = cp.bookings.filter(is_archived=False).aggregate(total=Sum('final_negotiated_price'))['total'] or 0
-                        cp_leaderboard.append({
-                            'cp_name': cp.cp_name,
-                            'firm_name': cp.firm_name,
-                            'booking_count': booking_count,
-                            'total_revenue': total_worth
-                        })
-                cp_leaderboard.sort(key=lambda x: x['total_revenue'], reverse=True)
-                cp_leaderboard = cp_leaderboard[:10]
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                cp_leaderboard = []
-            
-            # Project stats - handle empty queryset
-            try:
-                project_stats = list(Project.objects.filter(is_active=True).annotate(
-                    lead_count=Count('lead_associations', filter=Q(lead_associations__is_archived=False)),
-                    booking_count=Count('bookings', filter=Q(bookings__is_archived=False)),
-                    revenue=Coalesce(Sum('bookings__final_negotiated_price'), Value(Decimal('0')), output_field=DecimalField())
-                ).order_by('-revenue')[:10])
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                project_stats = []
-            
-            # User stats
-            try:
-                user_stats = list(User.objects.values('role').annotate(
-                    count=Count('id')
-                ).order_by('role'))
-            except Exception:
-                user_stats = []
-            
-            # Count projects and mandate owners safely
-            try:
-                total_projects = Project.objects.filter(is_active=True).count()
-            except Exception:
-                total_projects = 0
-            
-            try:
-                total_mandate_owners = User.objects.filter(role='mandate_owner', is_active=True).count()
-            except Exception:
-                total_mandate_owners = 0
-            
-            # Pending OTP - use LeadProjectAssociation
-            try:
-                pending_otp = LeadProjectAssociation.objects.filter(
-                    is_pretagged=True,
-                    pretag_status='pending_verification',
-                    is_archived=False
-                ).count()
-            except Exception:
-                pending_otp = 0
-            
-            context = {
-                'is_mandate_owner': True,
-                'total_leads': all_leads.count(),
-                'new_visits_today': all_leads.filter(created_at__date=today).count(),
-                'total_bookings': bookings_count,
-                'pending_otp': pending_otp,
-                'total_worth_sold': total_worth_sold,
-                'total_revenue': total_revenue,
-                'avg_booking_value': avg_booking_value,
-                'total_projects': total_projects,
-                'total_mandate_owners': total_mandate_owners,
-                'cp_leaderboard': cp_leaderboard,
-                'project_stats': project_stats,
-                'user_stats': user_stats,
-            }
+            context = {'is_mandate_owner': True, **system_stats(request, today)}
             return render(request, 'dashboard_super_admin.html', context)
         
         # Site Head Dashboard
         elif user_role == 'site_head':
-            # Use LeadProjectAssociation for project-specific data
-            site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-            associations = LeadProjectAssociation.objects.filter(
-                project__site_head=user,
-                is_archived=False
-            )
-            
-            # Get unique leads from associations
-            lead_ids = associations.values_list('lead_id', flat=True).distinct()
-            leads_qs = Lead.objects.filter(id__in=lead_ids, is_archived=False)
-            
-            bookings_qs = Booking.objects.filter(project__site_head=user, is_archived=False)
-            projects = Project.objects.filter(site_head=user, is_active=True)
-            
-            # Unassigned leads (associations without assigned_to)
-            unassigned_leads = associations.filter(assigned_to__isnull=True).count()
-            
-            # Employee stats - Only show employees assigned to this site head's projects
-            employees = User.objects.filter(
-                Q(role='closing_manager') | Q(role='telecaller') | Q(role='sourcing_manager'),
-                assigned_projects__in=site_head_projects
-            ).distinct()
-            
-            # Pending OTP - use LeadProjectAssociation
-            pending_otp = associations.filter(
-                is_pretagged=True,
-                pretag_status='pending_verification'
-            ).count()
-            
-            context = {
-                'is_site_head': True,
-                'total_leads': leads_qs.count(),
-                'new_visits_today': leads_qs.filter(created_at__date=today).count(),
-                'total_bookings': bookings_qs.count(),
-                'pending_otp': pending_otp,
-                'unassigned_leads': unassigned_leads,
-                'projects': projects,
-                'employees': employees,
-            }
+            context = {'is_site_head': True, **site_head_stats(request, today)}
             return render(request, 'dashboard_site_head.html', context)
         
         # Closing Manager Dashboard
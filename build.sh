@@ -8,11 +8,9 @@ pip install -r requirements.txt
 # Create database directory if it doesn't exist
 mkdir -p $(dirname db.sqlite3) || true
 
-# Run migrations (create database if needed)
-python manage.py migrate --noinput
-
-# Load initial data from fixtures (if available)
-python manage.py load_initial_data --skip-if-exists || true
+# Release phase: migrations, cache table (CACHE_BACKEND=db), initial fixtures and the
+# idempotent catch-ups (unit links, daily rollups, CP counters) in one process
+python manage.py release --catch-up
 
 # Collect static files
 python manage.py collectstatic --noinput
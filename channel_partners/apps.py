@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ChannelPartnersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'channel_partners'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,112 @@
+"""
+Bulk Channel Partner import.
+
+cp_upload used to run get_or_create + save() per row, and every new CP's
+save() looped over random CP IDs with an EXISTS query per attempt (only 1,000
+ids per letter pair, so the loop got slower as a prefix filled up).
+import_channel_partners() instead:
+
+- normalizes all phones up front (the same way ChannelPartner.save() does),
+- loads the existing CPs for those phones in one query per chunk,
+- allocates CP IDs from one in-memory pool (CPIdPool), loaded in the write
+  transaction under the CP ID allocation lock,
+- writes with bulk_create / bulk_update in chunks, falling back to per-row
+  saves when a bulk write hits an IntegrityError so the offending rows are
+  reported one by one,
+- reports rows whose prefix has no free CP ID left instead of looping forever.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from bridgio.cache import invalidate
+from bridgio.db import write_atomic
+from leads.utils import normalize_phone
+
+from .models import ChannelPartner, CPIdExhausted, CPIdPool, cp_id_prefix
+
+IMPORT_FIELDS = [
+    'cp_name', 'firm_name', 'phone2', 'locality', 'team_size',
+    'owner_name', 'owner_number', 'rera_id', 'status',
+]
+UPDATE_FIELDS = IMPORT_FIELDS + ['cp_unique_id', 'updated_at']
+
+
+def import_channel_partners(records, batch_size=500):
+    """Create or update CPs (matched on phone) from parsed upload rows
+
+    `records` is a list of dicts with 'row' (sheet row number), 'data' (raw
+    row, echoed back in errors), 'phone' and the IMPORT_FIELDS values. When a
+    phone appears more than once the last row wins, like the old per-row
+    get_or_create + update did.
+
+    Returns {'created': n, 'updated': n, 'errors': [{'row', 'error', 'data'}, ...]}.
+    """
+    by_phone = {}
+    for record in records:
+        record = dict(record)
+        record['phone'] = normalize_phone(record['phone'])
+        record['phone2'] = normalize_phone(record.get('phone2')) if record.get('phone2') else ''
+        record['owner_number'] = normalize_phone(record.get('owner_number')) if record.get('owner_number') else ''
+        by_phone[record['phone']] = record
+
+    to_create, to_update, errors = [], [], []
+    now = timezone.now()
+    with write_atomic():
+        # Existing CPs and used ids are read in the transaction that writes the new ones
+        phones = list(by_phone)
+        existing = {}
+        for start in range(0, len(phones), batch_size):
+            for cp in ChannelPartner.objects.filter(phone__in=phones[start:start + batch_size]):
+                existing[cp.phone] = cp
+
+        needs_id = any(phone not in existing or not existing[phone].cp_unique_id for phone in by_phone)
+        pool = CPIdPool.load() if needs_id else None
+        for phone, record in by_phone.items():
+            cp = existing.get(phone)
+            try:
+                if cp is None:
+                    cp = ChannelPartner(phone=phone)
+                if not cp.cp_unique_id:
+                    cp.cp_unique_id = pool.allocate(cp_id_prefix(record['cp_name']))
+            except CPIdExhausted as e:
+                errors.append({'row': record['row'], 'error': f"Row {record['row']}: {e}", 'data': record['data']})
+                continue
+            for field in IMPORT_FIELDS:
+                setattr(cp, field, record.get(field, ''))
+            if cp.pk:
+                cp.updated_at = now
+                to_update.append((cp, record))
+            else:
+                to_create.append((cp, record))
+
+        try:
+            with transaction.atomic():
+                ChannelPartner.objects.bulk_create([cp for cp, _ in to_create], batch_size=batch_size)
+                ChannelPartner.objects.bulk_update(
+                    [cp for cp, _ in to_update], UPDATE_FIELDS, batch_size=batch_size
+                )
+        except IntegrityError:
+            to_create, to_update = _save_per_row(to_create, to_update, errors)
+    # bulk writes skip the signals that invalidate cached CP lists
+    invalidate('cps')
+
+    return {'created': len(to_create), 'updated': len(to_update), 'errors': errors}
+
+
+def _save_per_row(to_create, to_update, errors):
+    """Save rows one by one after a failed bulk write, reporting the rows that fail"""
+    created, updated = [], []
+    for rows, saved, update_fields in [(to_create, created, None), (to_update, updated, UPDATE_FIELDS)]:
+        for cp, record in rows:
+            if update_fields is None:
+                # bulk_create was rolled back
+                cp.pk = None
+                cp._state.adding = True
+            try:
+                with transaction.atomic():
+                    cp.save(update_fields=update_fields)
+            except IntegrityError as e:
+                errors.append({'row': record['row'], 'error': f"Row {record['row']}: {e}", 'data': record['data']})
+                continue
+            saved.append((cp, record))
+    return created, updated
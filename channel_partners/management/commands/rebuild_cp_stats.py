@@ -0,0 +1,34 @@
+"""
+Rebuild the CP counter tables (ChannelPartnerStats / ChannelPartnerProjectStats).
+
+The counters are kept current by signals on lead associations, bookings and
+leads, and by the bulk archive / duplicate paths. Run this once after
+deploying them (backfill) and after anything that bypasses those paths
+(raw SQL, shell .update() calls, restores from backup).
+
+Usage:
+    python manage.py rebuild_cp_stats
+    python manage.py rebuild_cp_stats --cp 12 --cp 40
+"""
+from django.core.management.base import BaseCommand
+
+from channel_partners.models import ChannelPartner, ChannelPartnerStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute lead / booking / revenue counters for channel partners'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cp', type=int, action='append', help='Only rebuild this CP id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500, help='CPs per chunk')
+
+    def handle(self, *args, **options):
+        cp_ids = options['cp'] or list(ChannelPartner.objects.order_by('id').values_list('id', flat=True))
+        batch_size = options['batch_size']
+
+        written = 0
+        for start in range(0, len(cp_ids), batch_size):
+            written += ChannelPartnerStats.refresh(cp_ids[start:start + batch_size])
+
+        self.stdout.write(f'CPs checked: {len(cp_ids)}')
+        self.stdout.write(self.style.SUCCESS(f'Counters written for {written} CP(s) with activity.'))
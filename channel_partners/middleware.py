@@ -0,0 +1,12 @@
+from .signals import batched_refresh
+
+
+class ChannelPartnerStatsMiddleware:
+    """Refresh the CP counters a request touched once, after the view (channel_partners.signals)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with batched_refresh():
+            return self.get_response(request)
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0016_unitstatusevent'),
+        ('channel_partners', '0004_channelpartner_sourcing_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelPartnerStats',
+            fields=[
+                ('channel_partner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='channel_partners.channelpartner')),
+                ('lead_count', models.PositiveIntegerField(default=0)),
+                ('booking_count', models.PositiveIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'channel_partner_stats',
+                'indexes': [models.Index(fields=['-total_revenue', '-booking_count'], name='channel_par_total_r_5f642d_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChannelPartnerProjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lead_count', models.PositiveIntegerField(default=0)),
+                ('booking_count', models.PositiveIntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('channel_partner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='project_stats', to='channel_partners.channelpartner')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='channel_partner_stats', to='projects.project')),
+            ],
+            options={
+                'db_table': 'channel_partner_project_stats',
+                'indexes': [models.Index(fields=['project', '-total_revenue', '-booking_count'], name='channel_par_project_a02161_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='channelpartnerprojectstats',
+            constraint=models.UniqueConstraint(fields=('channel_partner', 'project'), name='unique_cp_project_stats'),
+        ),
+    ]
@@ -1,12 +1,28 @@
-from django.db import models
+from django.db import connection, models
 from projects.models import Project
 import random
 import string
 
 
-def generate_cp_id(cp_name):
-    """Generate unique 5-character CP ID: 2 letters (first letter of first name + first letter of last name) + 3 random numbers"""
-    name_parts = cp_name.strip().split()
+CP_ID_DIGITS = 3
+
+# pg_advisory_xact_lock key that serializes CP ID allocation on PostgreSQL
+CP_ID_LOCK_KEY = 0x43504944  # 'CPID'
+
+
+class CPIdExhausted(Exception):
+    """Every CP ID for a two-letter prefix is already taken"""
+    
+    def __init__(self, prefix):
+        self.prefix = prefix
+        super().__init__(
+            f"All {10 ** CP_ID_DIGITS} CP IDs for prefix '{prefix}' are in use - set a CP ID manually"
+        )
+
+
+def cp_id_prefix(cp_name):
+    """2 letters: first letter of first name + first letter of last name (or first two letters of a single name)"""
+    name_parts = (cp_name or '').strip().split()
     if len(name_parts) >= 2:
         first_letter = name_parts[0][0].upper() if name_parts[0] else 'X'
         last_letter = name_parts[-1][0].upper() if name_parts[-1] else 'X'
@@ -16,18 +32,65 @@ def generate_cp_id(cp_name):
     else:
         first_letter = 'X'
         last_letter = 'X'
+    return f"{first_letter}{last_letter}"
+
+
+class CPIdPool:
+    """Free CP IDs per prefix, handed out in random order
     
-    # Generate 3 random numbers
-    numbers = ''.join([str(random.randint(0, 9)) for _ in range(3)])
+    Built from the ids already in use; the free list of a prefix is computed
+    the first time the prefix is asked for and then shared by every later
+    allocation, so a bulk import pays for it once per prefix, not once per
+    row. Load it inside the write_atomic() block that saves the new ids:
+    load() first takes the CP ID allocation lock, held until that transaction
+    ends, so concurrent imports and ChannelPartner.save() calls allocate one
+    after another. On SQLite the BEGIN IMMEDIATE of write_atomic() already
+    serializes writers; on PostgreSQL (READ COMMITTED) it is a transaction
+    level advisory lock.
+    """
     
-    cp_id = f"{first_letter}{last_letter}{numbers}"
+    def __init__(self, used_ids=()):
+        self.used = {}
+        self.free = {}
+        for cp_id in used_ids:
+            self.used.setdefault(cp_id[:2], set()).add(cp_id)
     
-    # Ensure uniqueness
-    while ChannelPartner.objects.filter(cp_unique_id=cp_id).exists():
-        numbers = ''.join([str(random.randint(0, 9)) for _ in range(3)])
-        cp_id = f"{first_letter}{last_letter}{numbers}"
+    @classmethod
+    def load(cls, prefix=None):
+        """Pool of the ids in use - for one prefix, or for all of them"""
+        lock_cp_ids()
+        used_ids = ChannelPartner.objects.exclude(cp_unique_id__isnull=True).exclude(cp_unique_id='')
+        if prefix is not None:
+            used_ids = used_ids.filter(cp_unique_id__startswith=prefix)
+        return cls(used_ids.values_list('cp_unique_id', flat=True))
     
-    return cp_id
+    def allocate(self, prefix):
+        """A random free CP ID for prefix; raises CPIdExhausted when the prefix is full"""
+        free = self.free.get(prefix)
+        if free is None:
+            used = self.used.get(prefix, set())
+            free = [f"{prefix}{number:0{CP_ID_DIGITS}d}" for number in range(10 ** CP_ID_DIGITS)]
+            free = [cp_id for cp_id in free if cp_id not in used]
+            random.shuffle(free)
+            self.free[prefix] = free
+        if not free:
+            raise CPIdExhausted(prefix)
+        cp_id = free.pop()
+        self.used.setdefault(prefix, set()).add(cp_id)
+        return cp_id
+
+
+def lock_cp_ids():
+    """Block other CP ID allocations until the current transaction ends (PostgreSQL)"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CP_ID_LOCK_KEY])
+
+
+def generate_cp_id(cp_name):
+    """Generate unique 5-character CP ID: 2 letters (first letter of first name + first letter of last name) + 3 random numbers"""
+    prefix = cp_id_prefix(cp_name)
+    return CPIdPool.load(prefix).allocate(prefix)
 
 
 class ChannelPartner(models.Model):
@@ -79,9 +142,6 @@ class ChannelPartner(models.Model):
         ordering = ['-created_at']
     
     def save(self, *args, **kwargs):
-        if not self.cp_unique_id:
-            self.cp_unique_id = generate_cp_id(self.cp_name)
-        
         # Normalize phone numbers to +91 format
         from leads.utils import normalize_phone
         if self.phone:
@@ -91,7 +151,14 @@ class ChannelPartner(models.Model):
         if self.owner_number:
             self.owner_number = normalize_phone(self.owner_number)
         
-        super().save(*args, **kwargs)
+        if self.cp_unique_id:
+            super().save(*args, **kwargs)
+            return
+        # Read the used ids and write the new one in the same transaction
+        from bridgio.db import write_atomic
+        with write_atomic():
+            self.cp_unique_id = generate_cp_id(self.cp_name)
+            super().save(*args, **kwargs)
     
     def get_formatted_phone(self):
         """Return phone number without decimal point if it's a float string"""
@@ -105,3 +172,143 @@ class ChannelPartner(models.Model):
     
     def __str__(self):
         return f"{self.firm_name} - {self.cp_name} ({self.cp_unique_id})"
+
+
+class ChannelPartnerProjectStats(models.Model):
+    """Per-CP per-project counters for the CP list (see ChannelPartnerStats.refresh)"""
+    channel_partner = models.ForeignKey(ChannelPartner, on_delete=models.CASCADE, related_name='project_stats')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='channel_partner_stats')
+    lead_count = models.PositiveIntegerField(default=0)
+    booking_count = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'channel_partner_project_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['channel_partner', 'project'], name='unique_cp_project_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['project', '-total_revenue', '-booking_count']),
+        ]
+    
+    def __str__(self):
+        return f"{self.channel_partner_id} @ {self.project_id}: {self.booking_count} bookings"
+
+
+class ChannelPartnerStats(models.Model):
+    """Per-CP counters - non-archived lead associations, bookings and booking value
+    
+    Maintained from association / booking / lead save and delete events
+    (channel_partners.signals) and bulk archive paths. `python manage.py
+    rebuild_cp_stats` recomputes everything for backfills.
+    """
+    channel_partner = models.OneToOneField(ChannelPartner, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    lead_count = models.PositiveIntegerField(default=0)
+    booking_count = models.PositiveIntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'channel_partner_stats'
+        indexes = [
+            models.Index(fields=['-total_revenue', '-booking_count']),
+        ]
+    
+    def __str__(self):
+        return f"{self.channel_partner_id}: {self.booking_count} bookings"
+    
+    @classmethod
+    def refresh(cls, cp_ids=None, project_ids=None):
+        """Recompute the counters for the given CPs (all CPs when None)
+        
+        With project_ids only those project rows are recomputed, and only the
+        CPs that have (or had) a row in them get their totals re-summed from
+        the project rows. One GROUP BY for leads, one for bookings, then bulk
+        upserts.
+        """
+        from decimal import Decimal
+        from django.db import transaction
+        from django.db.models import Count, Sum
+        from leads.models import LeadProjectAssociation
+        from bookings.models import Booking
+        
+        associations = LeadProjectAssociation.objects.filter(is_archived=False, lead__channel_partner__isnull=False)
+        bookings = Booking.objects.filter(is_archived=False, channel_partner__isnull=False)
+        project_rows = ChannelPartnerProjectStats.objects.all()
+        if cp_ids is not None:
+            cp_ids = {cp_id for cp_id in cp_ids if cp_id}
+            if not cp_ids:
+                return 0
+            associations = associations.filter(lead__channel_partner_id__in=cp_ids)
+            bookings = bookings.filter(channel_partner_id__in=cp_ids)
+            project_rows = project_rows.filter(channel_partner_id__in=cp_ids)
+        if project_ids is not None:
+            associations = associations.filter(project_id__in=project_ids)
+            bookings = bookings.filter(project_id__in=project_ids)
+            project_rows = project_rows.filter(project_id__in=project_ids)
+        
+        counters = {}
+        for row in associations.order_by().values('lead__channel_partner_id', 'project_id').annotate(count=Count('id')):
+            key = (row['lead__channel_partner_id'], row['project_id'])
+            counters[key] = ChannelPartnerProjectStats(channel_partner_id=key[0], project_id=key[1], lead_count=row['count'])
+        for row in bookings.order_by().values('channel_partner_id', 'project_id').annotate(
+            count=Count('id'), revenue=Sum('final_negotiated_price')
+        ):
+            key = (row['channel_partner_id'], row['project_id'])
+            if key not in counters:
+                counters[key] = ChannelPartnerProjectStats(channel_partner_id=key[0], project_id=key[1])
+            stats = counters[key]
+            stats.booking_count = row['count']
+            stats.total_revenue = row['revenue'] or Decimal('0')
+        
+        total_ids = cp_ids
+        if total_ids is None and project_ids is not None:
+            total_ids = set(project_rows.values_list('channel_partner_id', flat=True))
+            total_ids.update(cp_id for cp_id, _ in counters)
+            if not total_ids:
+                return 0
+        
+        # Upsert the rows and delete only the keys that disappeared: a
+        # delete-then-insert lets two concurrent refreshes of one CP collide
+        # on the unique keys under READ COMMITTED
+        with transaction.atomic():
+            stale = [
+                pk for pk, cp_id, project_id in project_rows.values_list('pk', 'channel_partner_id', 'project_id')
+                if (cp_id, project_id) not in counters
+            ]
+            for start in range(0, len(stale), 1000):
+                ChannelPartnerProjectStats.objects.filter(pk__in=stale[start:start + 1000]).delete()
+            ChannelPartnerProjectStats.objects.bulk_create(
+                counters.values(),
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['channel_partner', 'project'],
+                update_fields=['lead_count', 'booking_count', 'total_revenue', 'updated_at'],
+            )
+            
+            totals = ChannelPartnerProjectStats.objects.all()
+            if total_ids is not None:
+                totals = totals.filter(channel_partner_id__in=total_ids)
+            rows = [
+                cls(
+                    channel_partner_id=row['channel_partner_id'],
+                    lead_count=row['leads'],
+                    booking_count=row['bookings'],
+                    total_revenue=row['revenue'] or Decimal('0'),
+                )
+                for row in totals.order_by().values('channel_partner_id').annotate(
+                    leads=Sum('lead_count'), bookings=Sum('booking_count'), revenue=Sum('total_revenue')
+                )
+            ]
+            (cls.objects.all() if total_ids is None else cls.objects.filter(channel_partner_id__in=total_ids)).exclude(
+                channel_partner_id__in=totals.values('channel_partner_id')
+            ).delete()
+            cls.objects.bulk_create(
+                rows,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['channel_partner'],
+                update_fields=['lead_count', 'booking_count', 'total_revenue', 'updated_at'],
+            )
+        return len(rows)
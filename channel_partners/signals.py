@@ -0,0 +1,126 @@
+"""
+Keep ChannelPartnerStats / ChannelPartnerProjectStats in step with the rows they count.
+
+A snapshot of the counted fields is taken when an instance is loaded; on save
+the counters of the affected CP(s) are recomputed after commit only if one of
+those fields changed (status updates etc. cost nothing). Bulk .update() /
+bulk_create paths call ChannelPartnerStats.refresh() themselves, and
+`python manage.py rebuild_cp_stats` repairs anything else.
+
+Inside batched_refresh() (every request, via ChannelPartnerStatsMiddleware,
+and every lead import) the touched CPs are only collected, and refreshed with
+one refresh() call when the block ends - an import of thousands of rows costs
+one refresh, not one per saved lead.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from bookings.models import Booking
+from bridgio.cache import invalidate_on_commit
+from leads.models import Lead, LeadProjectAssociation
+
+from .models import ChannelPartner, ChannelPartnerStats
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_refresh():
+    """Collect the CPs touched inside the block and refresh them once at the end (nests)"""
+    if getattr(_batch, 'cp_ids', None) is not None:
+        yield
+        return
+    _batch.cp_ids = set()
+    try:
+        yield
+    finally:
+        cp_ids, _batch.cp_ids = _batch.cp_ids, None
+        if cp_ids:
+            transaction.on_commit(lambda: ChannelPartnerStats.refresh(cp_ids))
+
+
+def schedule_refresh(cp_ids):
+    cp_ids = {cp_id for cp_id in cp_ids if cp_id}
+    if not cp_ids:
+        return
+    pending = getattr(_batch, 'cp_ids', None)
+    if pending is not None:
+        pending.update(cp_ids)
+    else:
+        transaction.on_commit(lambda: ChannelPartnerStats.refresh(cp_ids))
+
+
+def _snapshot(instance, fields):
+    return tuple(instance.__dict__.get(field) for field in fields)
+
+
+ASSOCIATION_FIELDS = ('lead_id', 'project_id', 'is_archived')
+BOOKING_FIELDS = ('channel_partner_id', 'project_id', 'is_archived', 'final_negotiated_price')
+
+
+@receiver(post_init, sender=LeadProjectAssociation)
+def remember_association_state(sender, instance, **kwargs):
+    instance._cp_stats_state = _snapshot(instance, ASSOCIATION_FIELDS)
+
+
+@receiver(post_save, sender=LeadProjectAssociation)
+def association_saved(sender, instance, created, **kwargs):
+    previous = instance._cp_stats_state
+    instance._cp_stats_state = _snapshot(instance, ASSOCIATION_FIELDS)
+    if created or previous != instance._cp_stats_state:
+        lead_ids = {instance.lead_id, previous[0]} - {None}
+        schedule_refresh(Lead.objects.filter(pk__in=lead_ids).values_list('channel_partner_id', flat=True))
+
+
+@receiver(post_delete, sender=LeadProjectAssociation)
+def association_deleted(sender, instance, **kwargs):
+    schedule_refresh(Lead.objects.filter(pk=instance.lead_id).values_list('channel_partner_id', flat=True))
+
+
+@receiver(post_init, sender=Booking)
+def remember_booking_state(sender, instance, **kwargs):
+    instance._cp_stats_state = _snapshot(instance, BOOKING_FIELDS)
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created, **kwargs):
+    previous = instance._cp_stats_state
+    instance._cp_stats_state = _snapshot(instance, BOOKING_FIELDS)
+    if created or previous != instance._cp_stats_state:
+        schedule_refresh({instance.channel_partner_id, previous[0]})
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    schedule_refresh({instance.channel_partner_id})
+
+
+@receiver(post_init, sender=Lead)
+def remember_lead_state(sender, instance, **kwargs):
+    instance._cp_stats_state = instance.__dict__.get('channel_partner_id')
+
+
+@receiver(post_save, sender=Lead)
+def lead_saved(sender, instance, created, **kwargs):
+    # A lead moving to another CP carries its project associations along
+    previous = instance._cp_stats_state
+    instance._cp_stats_state = instance.channel_partner_id
+    if not created and previous != instance.channel_partner_id:
+        schedule_refresh({previous, instance.channel_partner_id})
+
+
+@receiver(post_delete, sender=Lead)
+def lead_deleted(sender, instance, **kwargs):
+    schedule_refresh({instance.channel_partner_id})
+
+
+@receiver(post_save, sender=ChannelPartner)
+@receiver(post_delete, sender=ChannelPartner)
+def channel_partner_changed(sender, **kwargs):
+    # Cached CP dropdowns / leaderboard (bridgio.cache)
+    invalidate_on_commit('cps')
@@ -1,3 +1,118 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import User
+from bridgio.testing import QueryBudgetTestCase
+from channel_partners.models import (
+    ChannelPartner, ChannelPartnerProjectStats, ChannelPartnerStats, CPIdExhausted, CPIdPool, cp_id_prefix,
+)
+from channel_partners.importer import import_channel_partners
+from channel_partners.signals import batched_refresh
+from leads.models import Lead, LeadProjectAssociation
+from projects.models import Project
+
+
+class ChannelPartnerQueryBudgetTests(QueryBudgetTestCase):
+    url_names = ['channel_partners:list']
+
+
+class CPIdPoolTests(TestCase):
+    """CP IDs are unique per import and never collide with ids already in use"""
+
+    def test_prefix(self):
+        self.assertEqual(cp_id_prefix('Ravi Kumar Shah'), 'RS')
+        self.assertEqual(cp_id_prefix('  '), 'XX')
+
+    def test_allocates_every_free_id_once(self):
+        pool = CPIdPool(['RK000', 'RK999', 'AB123'])
+        ids = [pool.allocate('RK') for _ in range(998)]
+        self.assertEqual(len(set(ids)), 998)
+        self.assertNotIn('RK000', ids)
+        self.assertNotIn('RK999', ids)
+        self.assertTrue(all(cp_id.startswith('RK') and len(cp_id) == 5 for cp_id in ids))
+        with self.assertRaises(CPIdExhausted):
+            pool.allocate('RK')
+        # Other prefixes are unaffected
+        self.assertNotEqual(pool.allocate('AB'), 'AB123')
+
+    def test_load_reads_ids_in_use(self):
+        cp = ChannelPartner.objects.create(firm_name='Firm', cp_name='Ravi Kumar', phone='9876512345')
+        self.assertTrue(cp.cp_unique_id.startswith('RK'))
+        pool = CPIdPool.load('RK')
+        self.assertEqual(pool.used['RK'], {cp.cp_unique_id})
+
+    def test_import_reports_integrity_errors_per_row(self):
+        ChannelPartner.objects.create(firm_name='Firm', cp_name='Ravi Kumar', phone='9876512345', cp_unique_id='RK001')
+        records = [
+            {'row': row, 'data': {}, 'phone': phone, 'cp_name': 'Ravi Kumar', 'firm_name': 'Firm', 'team_size': None,
+             'status': 'active'}
+            for row, phone in [(2, '9876500001'), (3, '9876500002')]
+        ]
+        with mock.patch.object(CPIdPool, 'allocate', side_effect=['RK001', 'RK002']):
+            result = import_channel_partners(records)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([error['row'] for error in result['errors']], [2])
+        self.assertEqual(ChannelPartner.objects.get(phone='+919876500002').cp_unique_id, 'RK002')
+        self.assertFalse(ChannelPartner.objects.filter(phone='+919876500001').exists())
+
+
+class ChannelPartnerStatsRefreshTests(TestCase):
+    """Counter refreshes are batched, and a project refresh leaves other CPs alone"""
+
+    def setUp(self):
+        owner = User.objects.create_user(username='cp_owner', role='mandate_owner')
+        self.projects = [
+            Project.objects.create(name=f'CP {i}', builder_name='CP', location='-', mandate_owner=owner)
+            for i in range(2)
+        ]
+        self.cps = [
+            ChannelPartner.objects.create(firm_name=f'Firm {i}', cp_name=f'CP {i}', phone=f'98765000{i:02d}')
+            for i in range(3)
+        ]
+
+    def add_leads(self, cp, project, count):
+        for i in range(count):
+            lead = Lead.objects.create(name='Lead', phone=f'9{cp.pk:03d}{project.pk:03d}{i:03d}', channel_partner=cp)
+            LeadProjectAssociation.objects.create(lead=lead, project=project)
+
+    def test_batched_refresh_runs_once(self):
+        with mock.patch.object(ChannelPartnerStats, 'refresh', wraps=ChannelPartnerStats.refresh) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                with batched_refresh():
+                    self.add_leads(self.cps[0], self.projects[0], 5)
+                    self.add_leads(self.cps[1], self.projects[0], 3)
+        refresh.assert_called_once()
+        self.assertEqual(refresh.call_args.args[0], {self.cps[0].pk, self.cps[1].pk})
+        self.assertEqual(ChannelPartnerStats.objects.get(pk=self.cps[0].pk).lead_count, 5)
+        self.assertEqual(ChannelPartnerStats.objects.get(pk=self.cps[1].pk).lead_count, 3)
+
+    def test_project_refresh_only_rebuilds_its_cps(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_leads(self.cps[0], self.projects[0], 2)
+            self.add_leads(self.cps[1], self.projects[0], 1)
+            self.add_leads(self.cps[1], self.projects[1], 4)
+            self.add_leads(self.cps[2], self.projects[1], 1)
+        untouched = ChannelPartnerStats.objects.get(pk=self.cps[2].pk).updated_at
+
+        ChannelPartnerStats.refresh(project_ids=[self.projects[0].pk])
+        stats = dict(ChannelPartnerStats.objects.values_list('channel_partner_id', 'lead_count'))
+        self.assertEqual(stats, {self.cps[0].pk: 2, self.cps[1].pk: 5, self.cps[2].pk: 1})
+        self.assertEqual(ChannelPartnerStats.objects.get(pk=self.cps[2].pk).updated_at, untouched)
+
+    def test_refresh_updates_rows_in_place_and_drops_vanished_keys(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_leads(self.cps[0], self.projects[0], 2)
+            self.add_leads(self.cps[0], self.projects[1], 1)
+        kept = ChannelPartnerProjectStats.objects.get(channel_partner=self.cps[0], project=self.projects[0])
+
+        LeadProjectAssociation.objects.filter(project=self.projects[1]).update(is_archived=True)
+        ChannelPartnerStats.refresh([self.cps[0].pk])
+        ChannelPartnerStats.refresh([self.cps[0].pk])
+        rows = ChannelPartnerProjectStats.objects.filter(channel_partner=self.cps[0])
+        self.assertEqual(list(rows.values_list('pk', 'lead_count')), [(kept.pk, 2)])
+        self.assertEqual(ChannelPartnerStats.objects.get(pk=self.cps[0].pk).lead_count, 2)
+
+        LeadProjectAssociation.objects.update(is_archived=True)
+        ChannelPartnerStats.refresh([self.cps[0].pk])
+        self.assertFalse(ChannelPartnerStats.objects.filter(pk=self.cps[0].pk).exists())
@@ -1,15 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Sum, F, OuterRef, Subquery, Value, IntegerField, DecimalField
+from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator
 from django.http import JsonResponse, HttpResponse
 from django.utils import timezone
 from django.conf import settings
-try:
-    import openpyxl
-except ImportError:
-    openpyxl = None
 import csv
 import io
 import json
@@ -17,11 +14,13 @@ import uuid
 import tempfile
 import os
 import base64
-from .models import ChannelPartner
+from .models import ChannelPartner, ChannelPartnerProjectStats
+from .importer import import_channel_partners
 from leads.models import Lead, LeadProjectAssociation
 from .utils import _create_cp_column_mapper
 from projects.models import Project
 from bookings.models import Booking
+from bridgio.excel import load_openpyxl
 from leads.models import Lead
 
 
@@ -83,27 +82,34 @@ def cp_list(request):
     if cp_type:
         cps = cps.filter(cp_type=cp_type)
     
-    # Annotate with stats - use LeadProjectAssociation instead of leads
-    from leads.models import LeadProjectAssociation
-    if request.user.is_mandate_owner():
-        cps = cps.annotate(
-            lead_count=Count('leads__project_associations', filter=Q(leads__project_associations__project__mandate_owner=request.user, leads__project_associations__is_archived=False), distinct=True),
-            booking_count=Count('bookings', filter=Q(bookings__project__mandate_owner=request.user, bookings__is_archived=False)),
-            total_revenue=Sum('bookings__final_negotiated_price', filter=Q(bookings__project__mandate_owner=request.user))
-        ).order_by('-total_revenue', '-booking_count')
-    elif request.user.is_site_head():
-        site_head_projects = Project.objects.filter(site_head=request.user, is_active=True)
+    # Stats come from the counter tables (ChannelPartnerStats / ChannelPartnerProjectStats),
+    # so sorting by revenue is an index scan instead of a join over leads and bookings
+    if request.user.is_mandate_owner() or request.user.is_site_head():
+        if request.user.is_mandate_owner():
+            scope_projects = Project.objects.filter(mandate_owner=request.user)
+        else:
+            scope_projects = Project.objects.filter(site_head=request.user, is_active=True)
+        scoped_stats = ChannelPartnerProjectStats.objects.filter(
+            channel_partner=OuterRef('pk'), project__in=scope_projects
+        ).order_by().values('channel_partner')
+        
+        def scoped_sum(field, output_field):
+            return Coalesce(
+                Subquery(scoped_stats.annotate(total=Sum(field)).values('total')[:1], output_field=output_field),
+                Value(0), output_field=output_field,
+            )
+        
         cps = cps.annotate(
-            lead_count=Count('leads__project_associations', filter=Q(leads__project_associations__project__in=site_head_projects, leads__project_associations__is_archived=False), distinct=True),
-            booking_count=Count('bookings', filter=Q(bookings__project__in=site_head_projects, bookings__is_archived=False)),
-            total_revenue=Sum('bookings__final_negotiated_price', filter=Q(bookings__project__in=site_head_projects))
+            lead_count=scoped_sum('lead_count', IntegerField()),
+            booking_count=scoped_sum('booking_count', IntegerField()),
+            total_revenue=scoped_sum('total_revenue', DecimalField(max_digits=15, decimal_places=2)),
         ).order_by('-total_revenue', '-booking_count')
     else:
         cps = cps.annotate(
-            lead_count=Count('leads__project_associations', filter=Q(leads__project_associations__is_archived=False), distinct=True),
-            booking_count=Count('bookings', filter=Q(bookings__is_archived=False)),
-            total_revenue=Sum('bookings__final_negotiated_price')
-        ).order_by('-total_revenue', '-booking_count')
+            lead_count=Coalesce(F('stats__lead_count'), 0),
+            booking_count=Coalesce(F('stats__booking_count'), 0),
+            total_revenue=F('stats__total_revenue'),
+        ).order_by(F('stats__total_revenue').desc(nulls_last=True), F('stats__booking_count').desc(nulls_last=True))
     
     # Pagination
     paginator = Paginator(cps, 25)
@@ -302,6 +308,7 @@ def cp_upload_analyze(request):
                 'type': 'csv'
             }
         else:
+            openpyxl = load_openpyxl()
             if openpyxl is None:
                 return JsonResponse({'success': False, 'error': 'openpyxl not installed'}, status=500)
             try:
@@ -433,6 +440,7 @@ def cp_upload_preview(request):
             
             workbook = None
             try:
+                openpyxl = load_openpyxl()
                 workbook = openpyxl.load_workbook(tmp_path, read_only=True)
                 worksheet = workbook.active
                 headers = [str(cell.value).strip() if cell.value else '' for cell in worksheet[1]]
@@ -561,6 +569,7 @@ def cp_upload(request):
             cps_updated = 0
             errors = []
             error_rows = []  # Store failed rows for CSV download
+            records = []  # Parsed rows, imported in bulk below
             
             if file_data['type'] == 'csv':
                 decoded_file = file_data['content']
@@ -640,45 +649,21 @@ def cp_upload(request):
                         else:
                             status = 'active'  # Default to active if not specified
                         
-                        # Normalize phone numbers
-                        from leads.utils import normalize_phone
-                        phone = normalize_phone(phone)
-                        if phone2:
-                            phone2 = normalize_phone(phone2)
-                        if owner_number:
-                            owner_number = normalize_phone(owner_number)
-                        
-                        # Check if CP already exists by phone
-                        cp, created = ChannelPartner.objects.get_or_create(
-                            phone=phone,
-                            defaults={
-                                'cp_name': name,
-                                'firm_name': firm_name,
-                                'phone2': phone2,
-                                'locality': locality,
-                                'team_size': team_size,
-                                'owner_name': owner_name,
-                                'owner_number': owner_number,
-                                'rera_id': rera_id,
-                                'status': status,
-                            }
-                        )
-                        
-                        if not created:
-                            # Update existing CP
-                            cp.cp_name = name
-                            cp.firm_name = firm_name
-                            cp.phone2 = phone2
-                            cp.locality = locality
-                            cp.team_size = team_size
-                            cp.owner_name = owner_name
-                            cp.owner_number = owner_number
-                            cp.rera_id = rera_id
-                            cp.status = status
-                            cp.save()
-                            cps_updated += 1
-                        else:
-                            cps_created += 1
+                        # Saved in bulk after the loop (phones normalized there)
+                        records.append({
+                            'row': row_num,
+                            'data': dict(row),
+                            'phone': phone,
+                            'cp_name': name,
+                            'firm_name': firm_name,
+                            'phone2': phone2,
+                            'locality': locality,
+                            'team_size': team_size,
+                            'owner_name': owner_name,
+                            'owner_number': owner_number,
+                            'rera_id': rera_id,
+                            'status': status,
+                        })
                     except Exception as e:
                         error_msg = f"Row {row_num}: {str(e)}"
                         errors.append(error_msg)
@@ -689,6 +674,7 @@ def cp_upload(request):
                         })
             else:
                 # Process Excel - decode base64 content
+                openpyxl = load_openpyxl()
                 if openpyxl is None:
                     messages.error(request, 'openpyxl is not installed. Please install it: pip install openpyxl')
                     return redirect('channel_partners:upload')
@@ -783,45 +769,21 @@ def cp_upload(request):
                             else:
                                 status = 'active'  # Default to active if not specified
                             
-                            # Normalize phone numbers
-                            from leads.utils import normalize_phone
-                            phone = normalize_phone(phone)
-                            if phone2:
-                                phone2 = normalize_phone(phone2)
-                            if owner_number:
-                                owner_number = normalize_phone(owner_number)
-                            
-                            # Check if CP already exists by phone
-                            cp, created = ChannelPartner.objects.get_or_create(
-                                phone=phone,
-                                defaults={
-                                    'cp_name': name,
-                                    'firm_name': firm_name,
-                                    'phone2': phone2,
-                                    'locality': locality,
-                                    'team_size': team_size,
-                                    'owner_name': owner_name,
-                                    'owner_number': owner_number,
-                                    'rera_id': rera_id,
-                                    'status': status,
-                                }
-                            )
-                            
-                            if not created:
-                                # Update existing CP
-                                cp.cp_name = name
-                                cp.firm_name = firm_name
-                                cp.phone2 = phone2
-                                cp.locality = locality
-                                cp.team_size = team_size
-                                cp.owner_name = owner_name
-                                cp.owner_number = owner_number
-                                cp.rera_id = rera_id
-                                cp.status = status
-                                cp.save()
-                                cps_updated += 1
-                            else:
-                                cps_created += 1
+                            # Saved in bulk after the loop (phones normalized there)
+                            records.append({
+                                'row': row_num,
+                                'data': {headers[i]: str(row[i].value) if i < len(row) and row[i].value else '' for i in range(len(headers))},
+                                'phone': phone,
+                                'cp_name': name,
+                                'firm_name': firm_name,
+                                'phone2': phone2,
+                                'locality': locality,
+                                'team_size': team_size,
+                                'owner_name': owner_name,
+                                'owner_number': owner_number,
+                                'rera_id': rera_id,
+                                'status': status,
+                            })
                         except Exception as e:
                             error_msg = f"Row {row_num}: {str(e)}"
                             errors.append(error_msg)
@@ -850,6 +812,13 @@ def cp_upload(request):
                     except Exception:
                         pass  # Ignore deletion errors
             
+            result = import_channel_partners(records)
+            cps_created = result['created']
+            cps_updated = result['updated']
+            for error in result['errors']:
+                errors.append(error['error'])
+                error_rows.append(error)
+            
             # Clean up session
             del request.session[f'cp_upload_file_{session_id}']
             
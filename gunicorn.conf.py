@@ -0,0 +1,84 @@
+"""
+Gunicorn settings - picked up from the working directory by every
+`gunicorn bridgio.wsgi:application` (Procfile, Dockerfile, render.yaml).
+
+The app mixes fast HTMX fragments with file uploads and outbound SMS calls,
+so workers are threaded (gthread): a request waiting on the network or the
+database holds one thread, not the whole process. Large lead imports and
+lead duplications don't run in a request at all - they go to the background
+job runner (accounts.jobs), which shares the worker process. That is why
+workers are not recycled by default: a worker restarted by max_requests
+stops heartbeating while it waits for its job threads, and after
+graceful_timeout the master SIGKILLs it - leaving a half-done import and a
+BackgroundJob stuck in 'running'.
+
+Everything is overridable from the environment (see ENVIRONMENT_VARIABLES.md):
+
+    WEB_CONCURRENCY          worker processes (default 2 x CPUs + 1, at most 4)
+    GUNICORN_THREADS         threads per worker (default 4; 1 = sync workers)
+    GUNICORN_TIMEOUT         seconds without a heartbeat before a worker is killed (default 30)
+    GUNICORN_GRACEFUL_TIMEOUT
+    GUNICORN_KEEPALIVE
+    GUNICORN_MAX_REQUESTS    recycle a worker after this many requests (default 0 = never)
+    GUNICORN_MAX_REQUESTS_JITTER
+    GUNICORN_PRELOAD         1 = import the app once in the master before forking (default 1)
+
+Set the worker count with WEB_CONCURRENCY rather than --workers: with more
+than one worker the cache has to be shared between them, so CACHE_BACKEND
+defaults to `file` here and an explicit `locmem` refuses to start.
+
+`python manage.py bench --url http://localhost:8000 --concurrency 8
+--slow-view reports:employee_performance` compares settings under load.
+"""
+import multiprocessing
+import os
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+workers = _int('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4))
+threads = _int('GUNICORN_THREADS', 4)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# A per-process locmem cache would let each worker serve its own stale copy after a change.
+# Runs before the app is imported, so the default reaches bridgio.settings.
+if workers > 1:
+    if os.environ.setdefault('CACHE_BACKEND', 'file').lower() == 'locmem':
+        raise RuntimeError(
+            f'CACHE_BACKEND=locmem is per process, but WEB_CONCURRENCY runs {workers} workers - '
+            'use CACHE_BACKEND=file or db (or WEB_CONCURRENCY=1)'
+        )
+
+# With gthread the timeout is the worker heartbeat, not a per-request limit
+timeout = _int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _int('GUNICORN_KEEPALIVE', 5)
+
+# Recycling caps slow memory growth, but a recycled worker gets killed while its in-process
+# background jobs are still running (see the module docstring) - so it is opt-in. Only turn
+# it on together with a generous GUNICORN_GRACEFUL_TIMEOUT; the jitter keeps workers from
+# restarting together.
+max_requests = _int('GUNICORN_MAX_REQUESTS', 0)
+max_requests_jitter = _int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Import Django once in the master: faster worker (re)starts and shared memory pages
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Heartbeat files on tmpfs - an overlay filesystem can stall them in containers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# Requests are logged by accounts.middleware.RequestProfilingMiddleware
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # A database connection opened in the master while preloading must not be shared by the workers
+    from django.db import connections
+
+    connections.close_all()
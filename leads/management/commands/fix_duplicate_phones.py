@@ -1,57 +1,181 @@
+"""
+Merge leads whose phone numbers are the same number in different formats.
+
+Duplicates are found on Lead.phone_canonical (E.164, see
+leads.utils.canonical_phone) with one GROUP BY. In every group the oldest
+lead is kept; the others are merged into it in chunks of groups, with one
+set-based UPDATE per related table:
+
+- project associations move to the kept lead; where several leads of a group
+  are in the same project, the non-archived (then the kept lead's, then the
+  oldest) association wins and the others are removed
+- call logs, follow-up reminders, OTP logs and bookings move to the kept lead
+- configurations are copied over, blank name / email / CP are filled in and
+  notes are appended
+- the duplicate leads are deleted
+
+Finally every lead's phone is rewritten to its canonical form, so the unique
+index on Lead.phone catches future duplicates.
+
+Usage:
+    python manage.py fix_duplicate_phones --dry-run
+    python manage.py fix_duplicate_phones --batch-size 200
+"""
 from django.core.management.base import BaseCommand
-from leads.models import Lead
-from django.db.models import Count
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Min, Value, When
+
+from bookings.models import Booking
+from bridgio.cache import invalidate
+from leads.models import CallLog, FollowUpReminder, Lead, LeadProjectAssociation, OtpLog
+
+MOVED_MODELS = [
+    ('call logs', CallLog),
+    ('reminders', FollowUpReminder),
+    ('OTP logs', OtpLog),
+    ('bookings', Booking),
+]
 
 
 class Command(BaseCommand):
-    help = 'Fix duplicate phone numbers by merging them'
+    help = 'Merge leads with the same canonical phone number (set-based, chunked)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report duplicate groups without changing anything')
+        parser.add_argument('--batch-size', type=int, default=500, help='Duplicate groups per chunk')
 
     def handle(self, *args, **options):
-        # Find all duplicate phone numbers
-        duplicates = Lead.objects.values('phone').annotate(
-            count=Count('phone')
-        ).filter(count__gt=1, phone__isnull=False).exclude(phone='')
-        
-        total_duplicates = 0
-        merged_count = 0
-        
-        for dup in duplicates:
-            phone = dup['phone']
-            if not phone:
+        groups = list(
+            Lead.objects.exclude(phone_canonical='')
+            .order_by()
+            .values('phone_canonical')
+            .annotate(lead_count=Count('id'), keep_id=Min('id'))
+            .filter(lead_count__gt=1)
+            .order_by('phone_canonical')
+            .values_list('phone_canonical', 'lead_count', 'keep_id')
+        )
+        duplicates = sum(count - 1 for _, count, _ in groups)
+        self.stdout.write(f'Duplicate groups: {len(groups)}')
+        self.stdout.write(f'  Leads to merge away: {duplicates}')
+
+        if options['dry_run']:
+            for canonical, count, keep_id in groups[:50]:
+                self.stdout.write(f'  {canonical}: {count} leads, keeping #{keep_id}')
+            if len(groups) > 50:
+                self.stdout.write(f'  ... and {len(groups) - 50} more group(s)')
+            self.stdout.write(self.style.WARNING('Dry run - no changes saved.'))
+            return
+
+        totals = {'leads': 0, 'associations moved': 0, 'associations removed': 0}
+        totals.update({label: 0 for label, _ in MOVED_MODELS})
+        batch_size = options['batch_size']
+        for start in range(0, len(groups), batch_size):
+            chunk = [canonical for canonical, _, _ in groups[start:start + batch_size]]
+            with transaction.atomic():
+                for key, value in self.merge_groups(chunk).items():
+                    totals[key] += value
+            self.stdout.write(f'  Merged {min(start + batch_size, len(groups))}/{len(groups)} group(s)')
+
+        rewritten = self.canonicalize_phones()
+        invalidate('leads', 'cps')
+
+        for key, value in totals.items():
+            self.stdout.write(f'  {key[0].upper()}{key[1:]}: {value}')
+        self.stdout.write(f'  Phones rewritten to canonical form: {rewritten}')
+        self.stdout.write(self.style.SUCCESS(f"Merged {totals['leads']} duplicate lead(s)."))
+
+    def merge_groups(self, canonical_phones):
+        """Merge every duplicate group in canonical_phones into its oldest lead"""
+        leads = list(
+            Lead.objects.filter(phone_canonical__in=canonical_phones)
+            .order_by('phone_canonical', 'id')
+            .only('id', 'phone_canonical', 'name', 'email', 'notes', 'channel_partner_id')
+        )
+        keepers = {}
+        merge_into = {}
+        for lead in leads:
+            keeper = keepers.setdefault(lead.phone_canonical, lead)
+            if keeper.pk != lead.pk:
+                merge_into[lead.pk] = keeper
+        if not merge_into:
+            return {}
+        duplicate_ids = list(merge_into)
+        keep_id = Case(
+            *[When(lead_id=dup_id, then=Value(keeper.pk)) for dup_id, keeper in merge_into.items()],
+            output_field=IntegerField(),
+        )
+        result = {'leads': len(duplicate_ids)}
+
+        # Associations: one winner per (kept lead, project)
+        winners = {}
+        losers = []
+        associations = LeadProjectAssociation.objects.filter(
+            lead_id__in=[lead.pk for lead in leads]
+        ).values_list('id', 'lead_id', 'project_id', 'is_archived')
+        for association_id, lead_id, project_id, is_archived in associations:
+            owner = merge_into[lead_id].pk if lead_id in merge_into else lead_id
+            rank = (is_archived, lead_id != owner, association_id)
+            key = (owner, project_id)
+            current = winners.get(key)
+            if current is None or rank < current[0]:
+                if current is not None:
+                    losers.append(current[1])
+                winners[key] = (rank, association_id)
+            else:
+                losers.append(association_id)
+        LeadProjectAssociation.objects.filter(id__in=losers).delete()
+        result['associations removed'] = len(losers)
+        result['associations moved'] = LeadProjectAssociation.objects.filter(
+            lead_id__in=duplicate_ids
+        ).update(lead_id=keep_id)
+
+        for label, model in MOVED_MODELS:
+            result[label] = model.objects.filter(lead_id__in=duplicate_ids).update(lead_id=keep_id)
+
+        Configurations = Lead.configurations.through
+        Configurations.objects.bulk_create(
+            [
+                Configurations(lead_id=merge_into[lead_id].pk, globalconfiguration_id=config_id)
+                for lead_id, config_id in Configurations.objects.filter(lead_id__in=duplicate_ids)
+                .values_list('lead_id', 'globalconfiguration_id')
+            ],
+            ignore_conflicts=True,
+        )
+
+        # Fill in what the kept lead is missing, append notes
+        changed = {}
+        for lead in leads:
+            keeper = merge_into.get(lead.pk)
+            if keeper is None:
                 continue
-                
-            # Get all leads with this phone number
-            leads_with_phone = Lead.objects.filter(phone=phone).order_by('id')
-            total_duplicates += leads_with_phone.count() - 1
-            
-            # Keep the first one (oldest), merge data from others
-            primary_lead = leads_with_phone.first()
-            duplicate_leads = list(leads_with_phone[1:])
-            
-            self.stdout.write(f"Found {len(duplicate_leads)} duplicate(s) for phone: {phone}")
-            
-            for dup_lead in duplicate_leads:
-                # Merge notes if both have notes
-                if dup_lead.notes and primary_lead.notes:
-                    primary_lead.notes = f"{primary_lead.notes}\n\n[Merged from duplicate lead #{dup_lead.id}]: {dup_lead.notes}"
-                elif dup_lead.notes:
-                    primary_lead.notes = dup_lead.notes
-                
-                # Update other fields if primary is missing them
-                if not primary_lead.email and dup_lead.email:
-                    primary_lead.email = dup_lead.email
-                if not primary_lead.name and dup_lead.name:
-                    primary_lead.name = dup_lead.name
-                
-                # Save primary lead
-                primary_lead.save()
-                
-                # Delete the duplicate lead
-                dup_lead.delete()
-                merged_count += 1
-                self.stdout.write(self.style.SUCCESS(f"  Merged and deleted duplicate lead #{dup_lead.id}"))
-        
-        self.stdout.write(self.style.SUCCESS(f"\nTotal duplicates found: {total_duplicates}"))
-        self.stdout.write(self.style.SUCCESS(f"Total merged: {merged_count}"))
-        self.stdout.write(self.style.SUCCESS("Duplicate phone numbers have been fixed!"))
+            if not keeper.name and lead.name:
+                keeper.name = lead.name
+            if not keeper.email and lead.email:
+                keeper.email = lead.email
+            if not keeper.channel_partner_id and lead.channel_partner_id:
+                keeper.channel_partner_id = lead.channel_partner_id
+            if lead.notes:
+                keeper.notes = (
+                    f"{keeper.notes}\n\n[Merged from duplicate lead #{lead.pk}]: {lead.notes}"
+                    if keeper.notes else lead.notes
+                )
+            changed[keeper.pk] = keeper
+        Lead.objects.bulk_update(changed.values(), ['name', 'email', 'notes', 'channel_partner'], batch_size=500)
+
+        Lead.objects.filter(id__in=duplicate_ids).delete()
+
+        # Moved associations / bookings change the CP counters
+        from channel_partners.models import ChannelPartnerStats
+        ChannelPartnerStats.refresh({lead.channel_partner_id for lead in leads} | {
+            keeper.channel_partner_id for keeper in keepers.values()
+        })
+        return result
 
+    def canonicalize_phones(self):
+        """Rewrite Lead.phone to the canonical form (safe once no two leads share one)"""
+        return (
+            Lead.objects.exclude(phone_canonical='')
+            .exclude(phone=F('phone_canonical'))
+            .filter(phone_canonical__regex=r'^\+\d{1,14}$')  # Lead.phone holds at most 15 characters
+            .update(phone=F('phone_canonical'))
+        )
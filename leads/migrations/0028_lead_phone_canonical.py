@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:04
+
+from django.db import migrations, models
+
+
+def canonical_phone(phone):
+    """Frozen copy of leads.utils.canonical_phone as of this migration - later rule changes need their own migration"""
+    if phone is None:
+        return ''
+    if isinstance(phone, float):
+        phone = int(phone)
+    raw = str(phone).split(',')[0].strip()
+    if raw.endswith('.0'):
+        raw = raw[:-2]
+
+    has_plus = raw.startswith('+')
+    digits = ''.join(ch for ch in raw if ch.isdigit())
+    if not digits:
+        return ''
+    if not has_plus and digits.startswith('00'):
+        has_plus = True
+        digits = digits[2:]
+
+    if has_plus:
+        return f'+{digits}' if 11 <= len(digits) <= 15 else ''
+
+    if len(digits) == 10:
+        return f'+91{digits}'
+    if len(digits) == 11 and digits.startswith('0'):
+        return f'+91{digits[1:]}'
+    if len(digits) == 13 and digits.startswith('091'):
+        return f'+{digits[1:]}'
+    if len(digits) == 12 and digits.startswith(('91', '44')):
+        return f'+{digits}'
+    if len(digits) == 11 and digits.startswith('1'):
+        return f'+{digits}'
+    return ''
+
+
+def populate_phone_canonical(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    last_id = 0
+    while True:
+        chunk = list(Lead.objects.filter(id__gt=last_id).order_by('id').only('id', 'phone')[:2000])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        for lead in chunk:
+            lead.phone_canonical = canonical_phone(lead.phone)
+        Lead.objects.bulk_update(chunk, ['phone_canonical'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0027_alter_leadprojectassociation_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='phone_canonical',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='E.164 form of phone (leads.utils.canonical_phone) - catches duplicates stored in other formats', max_length=16),
+        ),
+        migrations.RunPython(populate_phone_canonical, migrations.RunPython.noop),
+    ]
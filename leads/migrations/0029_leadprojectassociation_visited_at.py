@@ -0,0 +1,26 @@
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def backfill_visited_at(apps, schema_editor):
+    # The original visit time was never stored - the last update is the closest stand-in
+    LeadProjectAssociation = apps.get_model('leads', 'LeadProjectAssociation')
+    LeadProjectAssociation.objects.filter(
+        Q(status='visit_completed') | Q(phone_verified=True), visited_at__isnull=True,
+    ).update(visited_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0028_lead_phone_canonical'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leadprojectassociation',
+            name='visited_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='When the lead first counted as a visit (completed or phone verified) - set once, on save', null=True),
+        ),
+        migrations.RunPython(backfill_visited_at, migrations.RunPython.noop),
+    ]
@@ -83,6 +83,10 @@ class Lead(models.Model):
     # Client Information (Master Data)
     name = models.CharField(max_length=200)
     phone = models.CharField(max_length=15, db_index=True, unique=True, help_text="Unique phone number - used for deduplication")
+    phone_canonical = models.CharField(
+        max_length=16, blank=True, db_index=True, editable=False,
+        help_text="E.164 form of phone (leads.utils.canonical_phone) - catches duplicates stored in other formats"
+    )
     email = models.EmailField(blank=True)
     age = models.IntegerField(null=True, blank=True, validators=[MinValueValidator(18), MaxValueValidator(100)])
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES, blank=True)
@@ -162,6 +166,14 @@ class Lead(models.Model):
     def __str__(self):
         return f"{self.name} - {self.phone}"
     
+    def save(self, *args, **kwargs):
+        from .utils import canonical_phone
+        self.phone_canonical = canonical_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'phone_canonical'}
+        super().save(*args, **kwargs)
+    
     @property
     def primary_project(self):
         """Get the primary project (first active association)"""
@@ -319,6 +331,12 @@ class LeadProjectAssociation(models.Model):
         related_name='queued_visits',
         help_text="Telecaller who queued the visit"
     )
+    visited_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="When the lead first counted as a visit (completed or phone verified) - set once, on save"
+    )
     
     # System Metadata
     created_by = models.ForeignKey(
@@ -344,6 +362,101 @@ class LeadProjectAssociation(models.Model):
     def __str__(self):
         return f"{self.lead.name} - {self.project.name} ({self.status})"
 
+    @property
+    def is_visit(self):
+        """Same definition of a visit as the reports: completed, or phone verified at the site"""
+        return self.status == 'visit_completed' or self.phone_verified
+
+    def save(self, *args, **kwargs):
+        # Reports date a visit by visited_at - updated_at moves with every later edit
+        if self.visited_at is None and self.is_visit:
+            from django.utils import timezone
+            self.visited_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'visited_at' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'visited_at']
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def duplicate_to_project(cls, source_project, target_project, user=None, lead_ids=None,
+                             batch_size=2000, progress=None):
+        """Add the source project's leads to the target project (set-based)
+
+        Leads are shared rows, so duplicating only means creating the missing
+        (lead, target_project) associations. Missing pairs are found with one
+        anti-join per chunk (keyset-paginated on the source association id) and
+        inserted with bulk_create(ignore_conflicts=True), so re-running after an
+        interruption just picks up where it stopped. progress(done, total) is
+        called after every chunk.
+
+        ignore_conflicts drops pairs another request created in the meantime
+        without saying so, so each chunk is counted in the target project
+        before and after its insert (same transaction) instead of assuming
+        every row went in.
+
+        Returns a dict with the number of source leads, created and skipped associations.
+        """
+        from django.db.models import Exists, OuterRef
+        from bridgio.db import write_atomic
+
+        source = cls.objects.filter(project=source_project, is_archived=False)
+        if lead_ids is not None:
+            source = source.filter(lead_id__in=lead_ids)
+
+        missing = source.filter(
+            ~Exists(cls.objects.filter(project=target_project, lead_id=OuterRef('lead_id')))
+        ).order_by('id')
+        source_count = source.count()
+        total = missing.count()
+        if progress:
+            progress(0, total)
+
+        prefix = f"[Duplicated from {source_project.name}]"
+        created = 0
+        processed = 0
+        last_id = 0
+        while True:
+            chunk = list(missing.filter(id__gt=last_id).values_list('id', 'lead_id', 'notes')[:batch_size])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            in_target = cls.objects.filter(project=target_project, lead_id__in=[lead_id for _, lead_id, _ in chunk])
+            with write_atomic():
+                before = in_target.count()
+                cls.objects.bulk_create(
+                    [
+                        cls(
+                            lead_id=lead_id,
+                            project=target_project,
+                            status='new',  # Reset to new for the duplicate
+                            is_pretagged=False,  # Reset pretagging
+                            pretag_status='',
+                            phone_verified=False,
+                            notes=f"{prefix} {notes}" if notes else prefix,
+                            created_by=user,
+                        )
+                        for _, lead_id, notes in chunk
+                    ],
+                    ignore_conflicts=True,
+                )
+                created += in_target.count() - before
+            processed += len(chunk)
+            if progress:
+                progress(min(processed, total), total)
+
+        if created:
+            # bulk_create skips the signals that maintain the CP counters and invalidate cached stats
+            from channel_partners.models import ChannelPartnerStats
+            from bridgio.cache import invalidate
+            ChannelPartnerStats.refresh(project_ids=[target_project.pk])
+            invalidate('leads')
+
+        return {
+            'source': source_count,
+            'created': created,
+            'skipped': source_count - created,
+        }
+
 
 class OtpLog(models.Model):
     """OTP Verification Logs"""
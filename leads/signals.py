@@ -0,0 +1,22 @@
+"""Invalidate the cache domains (bridgio.cache) that lead and configuration rows feed"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bridgio.cache import invalidate_on_commit
+
+from .models import GlobalConfiguration, Lead, LeadProjectAssociation
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_delete, sender=Lead)
+@receiver(post_save, sender=LeadProjectAssociation)
+@receiver(post_delete, sender=LeadProjectAssociation)
+def lead_changed(sender, **kwargs):
+    invalidate_on_commit('leads')
+
+
+@receiver(post_save, sender=GlobalConfiguration)
+@receiver(post_delete, sender=GlobalConfiguration)
+def configuration_changed(sender, **kwargs):
+    # Configurations are set up alongside projects and cached with them
+    invalidate_on_commit('projects')
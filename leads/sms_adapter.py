@@ -77,9 +77,12 @@ class TwilioSMSAdapter(BaseSMSAdapter):
     def send(self, phone, message):
         """Send SMS via Twilio"""
         try:
+            from twilio.http.http_client import TwilioHttpClient
             from twilio.rest import Client
             
-            client = Client(self.account_sid, self.auth_token)
+            # Bounded, so a slow gateway can't hold the request's worker thread
+            client = Client(self.account_sid, self.auth_token,
+                            http_client=TwilioHttpClient(timeout=settings.SMS_TIMEOUT_SECONDS))
             
             # Use normalize_phone to format the number properly
             from .utils import normalize_phone
@@ -121,14 +124,9 @@ class MSG91SMSAdapter(BaseSMSAdapter):
         try:
             import requests
             
-            # Format phone number
-            clean_phone = phone.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-            if clean_phone.startswith('+91'):
-                clean_phone = clean_phone[3:]
-            elif clean_phone.startswith('91'):
-                clean_phone = clean_phone[2:]
-            elif clean_phone.startswith('0'):
-                clean_phone = clean_phone[1:]
+            # MSG91 expects the number with country code and without +
+            from .utils import whatsapp_number
+            clean_phone = whatsapp_number(phone)
             
             url = "https://control.msg91.com/api/v5/flow/"
             headers = {
@@ -149,7 +147,7 @@ class MSG91SMSAdapter(BaseSMSAdapter):
                 ]
             }
             
-            response = requests.post(url, json=payload, headers=headers)
+            response = requests.post(url, json=payload, headers=headers, timeout=settings.SMS_TIMEOUT_SECONDS)
             response.raise_for_status()
             
             return {
@@ -1,3 +1,36 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from bridgio.testing import QueryBudgetTestCase
+from leads.utils import canonical_phone, normalize_phone
+
+
+class LeadQueryBudgetTests(QueryBudgetTestCase):
+    url_names = ['leads:list', 'leads:upcoming_visits']
+
+
+class CanonicalPhoneTests(SimpleTestCase):
+    """One canonical form per number, whatever the entry point typed"""
+
+    def test_indian_numbers(self):
+        for raw in ['9876543210', '09876543210', '919876543210', '0919876543210', '+91 98765-43210',
+                    '(98765) 43.210', '0091 9876543210', 9876543210.0, '9876543210.0']:
+            with self.subTest(raw=raw):
+                self.assertEqual(canonical_phone(raw), '+919876543210')
+
+    def test_other_countries(self):
+        self.assertEqual(canonical_phone('14155552671'), '+14155552671')
+        self.assertEqual(canonical_phone('447911123456'), '+447911123456')
+        self.assertEqual(canonical_phone('+971 50 123 4567'), '+971501234567')
+
+    def test_first_of_several_numbers(self):
+        self.assertEqual(canonical_phone('9876543210, 9123456789'), '+919876543210')
+
+    def test_undeterminable(self):
+        for raw in [None, '', 'n/a', '12345', '+1234', '+1234567890123456', '5876543210123']:
+            with self.subTest(raw=raw):
+                self.assertEqual(canonical_phone(raw), '')
+
+    def test_normalize_phone_keeps_unknown_input(self):
+        self.assertEqual(normalize_phone('98765 43210'), '+919876543210')
+        self.assertEqual(normalize_phone('ext 42'), 'ext 42')
+        self.assertEqual(normalize_phone(None), '')
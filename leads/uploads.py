@@ -0,0 +1,377 @@
+"""
+Lead import from Excel / CSV files, shared by lead_upload and its background job.
+
+lead_upload imports files of up to LEAD_UPLOAD_SYNC_LIMIT rows inline. Larger
+files become a BackgroundJob (accounts.jobs) that runs import_leads_job(), so
+the request - and the gunicorn thread serving it - returns straight away and
+the user follows the progress on the job page. Both paths run the same
+LeadImporter, one row at a time (get_or_create by phone, so re-running an
+interrupted import doesn't duplicate leads).
+"""
+import csv
+import io
+
+from django.urls import reverse
+
+from bridgio.excel import load_openpyxl
+
+from .models import GlobalConfiguration, Lead, LeadProjectAssociation
+from .utils import normalize_phone, parse_budget
+
+# Failed rows kept in a job result for the error CSV download
+MAX_ERROR_ROWS = 1000
+
+PROGRESS_EVERY = 200
+
+
+def _create_column_mapper(headers):
+    """
+    Create an intelligent column mapper that auto-detects column names.
+    Returns a function that can extract values by field name.
+    """
+    # Normalize headers: strip, lowercase, remove special chars
+    normalized_headers = {}
+    for idx, header in enumerate(headers):
+        if header:
+            normalized = str(header).strip().lower().replace('_', ' ').replace('-', ' ')
+            normalized_headers[normalized] = idx
+
+    # Define field mappings with common variations
+    # Note: This is for LEADS upload only. Visits are created separately when leads actually visit.
+    field_mappings = {
+        'name': ['name', 'full name', 'client name', 'customer name', 'person name', 'contact name', 'lead name'],
+        'phone': ['phone', 'mobile', 'contact', 'contact number', 'phone number', 'mobile number', 'cell', 'cell phone', 'whatsapp', 'whatsapp number'],
+        'email': ['email', 'e mail', 'email address', 'mail', 'email id'],
+        'age': ['age'],
+        'gender': ['gender', 'sex'],
+        'locality': ['locality', 'area', 'location', 'city', 'address'],
+        'current_residence': ['current residence', 'residence', 'residence type', 'living in', 'own rent'],
+        'occupation': ['occupation', 'profession', 'job', 'work'],
+        'company_name': ['company name', 'company', 'organization', 'org', 'firm name'],
+        'designation': ['designation', 'position', 'title', 'role', 'job title'],
+        'budget': ['budget', 'price range', 'budget range', 'expected budget', 'investment amount'],
+        'purpose': ['purpose', 'requirement', 'need', 'buying purpose'],
+        'visit_type': ['visit type', 'visit', 'accompanied by', 'family alone'],
+        'is_first_visit': ['first visit', 'is first visit', 'new visit', 'revisit'],
+        'how_did_you_hear': ['how did you hear', 'source', 'referral source', 'lead source', 'marketing source'],
+        'status': ['status', 'lead status', 'stage', 'current status', 'lead stage'],  # IMPORTANT: Lead Status
+        'cp_firm_name': ['cp firm name', 'channel partner firm', 'cp firm', 'partner firm', 'broker firm'],
+        'cp_name': ['cp name', 'channel partner name', 'cp', 'partner name', 'broker name'],
+        'cp_phone': ['cp phone', 'channel partner phone', 'cp mobile', 'partner phone', 'broker phone'],
+        'cp_rera_number': ['cp rera number', 'rera number', 'cp rera', 'rera id', 'rera'],
+        'is_pretagged': ['is pretagged', 'pretagged', 'pretag', 'is pretag', 'pretagged lead'],
+    }
+
+    # Create reverse mapping: field -> column index
+    field_to_index = {}
+    for field, variations in field_mappings.items():
+        for variation in variations:
+            if variation in normalized_headers:
+                field_to_index[field] = normalized_headers[variation]
+                break
+
+    def get_value(field_name):
+        """Get value for a field by trying all variations"""
+        if field_name in field_to_index:
+            idx = field_to_index[field_name]
+            if idx < len(headers):
+                return headers[idx]
+        return None
+
+    return get_value, field_to_index
+
+
+def count_rows(file_name, content):
+    """Data rows in the file (header excluded) without importing it - decides inline vs background"""
+    if file_name.endswith('.csv'):
+        lines = content.count('\n') + (0 if not content or content.endswith('\n') else 1)
+        return max(lines - 1, 0)
+    workbook = load_openpyxl().load_workbook(io.BytesIO(content), read_only=True)
+    try:
+        return max((workbook.active.max_row or 1) - 1, 0)
+    finally:
+        workbook.close()
+
+
+def read_rows(file_name, content):
+    """(headers, iterator of row value lists) for CSV text or Excel bytes"""
+    if file_name.endswith('.csv'):
+        reader = csv.reader(io.StringIO(content))
+        headers = next(reader, [])
+        return headers, reader
+    workbook = load_openpyxl().load_workbook(io.BytesIO(content), read_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    headers = [str(value).strip() if value else '' for value in next(rows, ())]
+    return headers, rows
+
+
+def field_columns(headers, manual_mapping):
+    """({field: column index}, auto-detected field_map) from the user's header -> field mapping or auto-detection"""
+    if manual_mapping:
+        columns = {}
+        for header, field in manual_mapping.items():
+            if field not in columns and header in headers:
+                columns[field] = headers.index(header)
+        return columns, {}
+    _, field_map = _create_column_mapper(headers)
+    return {field: idx for field, idx in field_map.items() if idx < len(headers)}, field_map
+
+
+def cell_value(value, field_name):
+    if value is None or value == '':
+        return ''
+    # Handle Excel numeric phone numbers (convert float to int, then to string)
+    if isinstance(value, (int, float)) and field_name == 'phone':
+        return str(int(value))
+    return str(value).strip()
+
+
+def feedback_status(feedback):
+    """Lead status implied by a telecaller's feedback text"""
+    feedback_lower = feedback.lower()
+    if 'interested' in feedback_lower or 'intrested' in feedback_lower:
+        return 'hot'
+    if 'not interested' in feedback_lower or 'not intrested' in feedback_lower:
+        return 'lost'
+    if 'call back' in feedback_lower or 'callback' in feedback_lower:
+        return 'contacted'
+    if 'busy' in feedback_lower or 'not answering' in feedback_lower:
+        return 'contacted'
+    if 'already booked' in feedback_lower:
+        return 'lost'
+    return 'contacted'
+
+
+def match_status(status_str):
+    """A LEAD_STATUS_CHOICES value for the file's status text, 'new' if nothing matches"""
+    if not status_str:
+        return 'new'
+    status_str = status_str.lower().strip()
+    for valid_status, _ in LeadProjectAssociation.LEAD_STATUS_CHOICES:
+        if status_str == valid_status or status_str.replace('_', ' ') == valid_status.replace('_', ' '):
+            return valid_status
+    for valid_status, display_name in LeadProjectAssociation.LEAD_STATUS_CHOICES:
+        display_lower = display_name.lower()
+        if status_str == display_lower or status_str in display_lower or display_lower in status_str:
+            return valid_status
+    return 'new'
+
+
+class LeadImporter:
+    """Creates / updates the leads of one upload and their association with `project`
+
+    Lookups that used to run per row (global configurations, the form's
+    channel partner, CPs by unique id) are loaded once per import.
+    """
+
+    def __init__(self, project, user, is_cp_data=False, channel_partner_id=None):
+        from channel_partners.models import ChannelPartner
+
+        self.project = project
+        self.user = user
+        self.is_cp_data = is_cp_data
+        self.form_channel_partner = None
+        if is_cp_data and channel_partner_id:
+            self.form_channel_partner = ChannelPartner.objects.filter(pk=channel_partner_id).first()
+        self.configurations = list(GlobalConfiguration.objects.filter(is_active=True))
+        self._cps_by_unique_id = {}
+
+    def match_configuration(self, configuration_str):
+        normalized_config = configuration_str.replace(' ', '').replace('-', '').upper()
+        for gc in self.configurations:
+            if gc.name == normalized_config:
+                return gc
+        # Try partial match
+        for gc in self.configurations:
+            if gc.name.upper() in normalized_config or normalized_config in gc.name.upper():
+                return gc
+        return None
+
+    def channel_partner_by_unique_id(self, cp_id):
+        from channel_partners.models import ChannelPartner
+
+        if cp_id not in self._cps_by_unique_id:
+            self._cps_by_unique_id[cp_id] = ChannelPartner.objects.filter(cp_unique_id=cp_id).first()
+        return self._cps_by_unique_id[cp_id]
+
+    def import_row(self, get_row_value):
+        """Import one row; False if it was skipped (no phone number)"""
+        phone = get_row_value('phone')
+        name = get_row_value('name')
+        if phone:
+            phone = phone.split(',')[0].strip()  # Take first phone if multiple
+            phone = normalize_phone(phone)
+        # Skip row if phone is not available (don't show as error)
+        if not phone:
+            return False
+        if not name:
+            name = f"Lead-{phone[-4:]}"  # Use last 4 digits of phone as name
+
+        # Get or create lead by phone (deduplication)
+        age = get_row_value('age')
+        lead, lead_created = Lead.objects.get_or_create(
+            phone=phone,
+            defaults={
+                'name': name,
+                'email': get_row_value('email') or '',
+                'age': int(age) if age and age.isdigit() else None,
+                'gender': get_row_value('gender') or '',
+                'locality': get_row_value('locality') or '',
+                'current_residence': get_row_value('current_residence') or '',
+                'occupation': get_row_value('occupation') or '',
+                'company_name': get_row_value('company_name') or '',
+                'designation': get_row_value('designation') or '',
+                'created_by': self.user,
+            }
+        )
+
+        configuration_str = get_row_value('configuration')
+        budget_str = get_row_value('budget')
+        feedback = get_row_value('feedback')
+        cp_id = get_row_value('cp_id')
+
+        global_config = self.match_configuration(configuration_str) if configuration_str else None
+
+        budget = None
+        if budget_str:
+            try:
+                budget = parse_budget(budget_str)
+            except Exception:
+                budget = None
+
+        if self.is_cp_data:
+            channel_partner = self.form_channel_partner
+        else:
+            channel_partner = self.channel_partner_by_unique_id(cp_id) if cp_id else None
+
+        status_str = get_row_value('status')
+        if not status_str and feedback:
+            status_str = feedback_status(feedback)
+        status = match_status(status_str)
+
+        is_pretagged = self.is_cp_data and channel_partner is not None
+
+        # Store feedback in notes
+        notes = ''
+        if feedback:
+            notes = f"Feedback: {feedback}"
+        if budget_str and budget is None:
+            # Budget is "Open Budget" or "Low Budget"
+            notes = f"{notes}\nBudget: {budget_str}" if notes else f"Budget: {budget_str}"
+
+        # One save for the name / budget / CP changes
+        if not lead_created and name and lead.name != name:
+            lead.name = name
+        if budget:
+            lead.budget = budget
+        if channel_partner:
+            lead.channel_partner = channel_partner
+        if not lead_created or budget or channel_partner:
+            lead.save()
+        if global_config:
+            lead.configurations.set([global_config])
+
+        association, assoc_created = LeadProjectAssociation.objects.get_or_create(
+            lead=lead,
+            project=self.project,
+            defaults={
+                'status': status,
+                'is_pretagged': is_pretagged,
+                'pretag_status': 'pending_verification' if is_pretagged else '',
+                'phone_verified': False,
+                'notes': notes,
+                'created_by': self.user,
+            }
+        )
+        if not assoc_created:
+            association.status = status
+            if is_pretagged:
+                association.is_pretagged = True
+                association.pretag_status = 'pending_verification'
+            if notes:
+                association.notes = notes
+            association.save()
+        return True
+
+
+def import_leads(file_name, content, manual_mapping, project, user, is_cp_data=False, channel_partner_id=None,
+                 progress=None):
+    """Import every row of the file; returns a dict with counts, errors and the failed rows
+
+    content is the decoded text for .csv files, the raw bytes otherwise.
+    progress(done), if given, is called every PROGRESS_EVERY rows.
+    """
+    from channel_partners.signals import batched_refresh
+
+    headers, rows = read_rows(file_name, content)
+    columns, field_map = field_columns(headers, manual_mapping)
+    importer = LeadImporter(project, user, is_cp_data, channel_partner_id)
+
+    mapping_info = []
+    if field_map:
+        mapping_info.append(f"Detected columns: {', '.join([f'{k} → {headers[field_map[k]]}' for k in ['name', 'phone'] if k in field_map])}")
+
+    created = 0
+    errors = []
+    error_rows = []
+    # Every saved lead / association touches CP counters - refresh them once, after the last row
+    with batched_refresh():
+        for row_num, values in enumerate(rows, start=2):
+            def get_row_value(field_name, values=values):
+                idx = columns.get(field_name)
+                return cell_value(values[idx], field_name) if idx is not None and idx < len(values) else ''
+
+            try:
+                if importer.import_row(get_row_value):
+                    created += 1
+            except Exception as e:
+                error_msg = f"Row {row_num}: {str(e)}"
+                errors.append(error_msg)
+                error_rows.append({
+                    'row': row_num,
+                    'error': error_msg,
+                    'data': {header: cell_value(values[i], '') for i, header in enumerate(headers) if i < len(values)},
+                })
+            if progress is not None and (row_num - 1) % PROGRESS_EVERY == 0:
+                progress(row_num - 1)
+
+    return {
+        'created': created,
+        'errors': errors,
+        'error_rows': error_rows,
+        'headers': headers,
+        'field_map': field_map,
+        'mapping_info': mapping_info,
+    }
+
+
+def upload_message(result):
+    message = f"Successfully uploaded {result['created']} lead(s)!"
+    if result['mapping_info']:
+        message += f" {' '.join(result['mapping_info'])}"
+    return message
+
+
+def import_leads_job(job, file_name, content, manual_mapping, project_id, is_cp_data, channel_partner_id):
+    """Background job body for lead_upload (large files)"""
+    from projects.models import Project
+
+    project = Project.objects.get(pk=project_id)
+    result = import_leads(
+        file_name, content, manual_mapping, project, job.created_by, is_cp_data, channel_partner_id,
+        progress=lambda done: job.set_progress(done),
+    )
+    job.set_progress(job.total)
+    message = upload_message(result)
+    if result['errors']:
+        message += f" {len(result['errors'])} row(s) failed: {'; '.join(result['errors'][:10])}"
+        if len(result['errors']) > 10:
+            message += f" and {len(result['errors']) - 10} more..."
+    return {
+        'message': message,
+        'created': result['created'],
+        'failed': len(result['errors']),
+        'error_rows': result['error_rows'][:MAX_ERROR_ROWS],
+        'headers': result['headers'],
+        'errors_url': reverse('leads:upload_errors_csv', args=[f'job-{job.pk}']) if result['error_rows'] else '',
+    }
@@ -52,16 +52,7 @@ def get_sms_deep_link(phone, otp, project_name=None):
     """
     from urllib.parse import quote
     
-    # Clean phone number (remove spaces, dashes, etc.)
-    clean_phone = phone.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-    
-    # Remove + or 91 prefix for WhatsApp (WhatsApp needs number without + or country code prefix)
-    if clean_phone.startswith('+91'):
-        clean_phone = clean_phone[3:]
-    elif clean_phone.startswith('91'):
-        clean_phone = clean_phone[2:]
-    elif clean_phone.startswith('0'):
-        clean_phone = clean_phone[1:]
+    clean_phone = whatsapp_number(phone)
     
     # Create WhatsApp message with project name if provided
     # Format: "Here's the OTP to confirm your visit for {project_name}. Thank you. Please provide this OTP to the executive."
@@ -79,48 +70,63 @@ def get_sms_deep_link(phone, otp, project_name=None):
     return whatsapp_link
 
 
+DEFAULT_COUNTRY_CODE = '91'
+
+
+def canonical_phone(phone):
+    """
+    Canonical E.164 form of a phone number (+CountryCodeNumber), or '' if it
+    can't be determined. This is the single set of rules for every entry point
+    (forms, uploads, links, SMS) and for Lead.phone_canonical:
+    - separators (spaces, dashes, dots, slashes, parentheses) are dropped
+    - Excel float artefacts (9876543210.0) are undone
+    - only the first of several comma-separated numbers is used
+    - +CC... / 00CC... keep their country code
+    - 91XXXXXXXXXX, 091XXXXXXXXXX, 0XXXXXXXXXX and XXXXXXXXXX are India
+    - 1XXXXXXXXXX (US) and 44XXXXXXXXXX (UK) are recognised without +
+    """
+    if phone is None:
+        return ''
+    if isinstance(phone, float):
+        phone = int(phone)
+    raw = str(phone).split(',')[0].strip()
+    if raw.endswith('.0'):
+        raw = raw[:-2]
+    
+    has_plus = raw.startswith('+')
+    digits = ''.join(ch for ch in raw if ch.isdigit())
+    if not digits:
+        return ''
+    if not has_plus and digits.startswith('00'):
+        has_plus = True
+        digits = digits[2:]
+    
+    if has_plus:
+        # E.164 allows up to 15 digits including the country code
+        return f'+{digits}' if 11 <= len(digits) <= 15 else ''
+    
+    if len(digits) == 10:
+        return f'+{DEFAULT_COUNTRY_CODE}{digits}'
+    if len(digits) == 11 and digits.startswith('0'):
+        return f'+{DEFAULT_COUNTRY_CODE}{digits[1:]}'
+    if len(digits) == 13 and digits.startswith('091'):
+        return f'+{digits[1:]}'
+    if len(digits) == 12 and digits.startswith(('91', '44')):
+        return f'+{digits}'
+    if len(digits) == 11 and digits.startswith('1'):
+        return f'+{digits}'
+    return ''
+
+
 def normalize_phone(phone):
     """
-    Normalize phone number to international format.
-    Handles various input formats:
-    - +91XXXXXXXXXX (already international)
-    - +1XXXXXXXXXX (US numbers)
-    - +44XXXXXXXXXX (UK numbers)
-    - 91XXXXXXXXXX (India without +)
-    - 0XXXXXXXXXX (India with 0 prefix)
-    - XXXXXXXXXX (10 digits - assume India)
-    Returns: International format (+CountryCodeXXXXXXXXXX)
+    Normalize phone number to international format (see canonical_phone).
+    Returns: International format (+CountryCodeXXXXXXXXXX), or the input
+    unchanged if its format can't be determined.
     """
     if not phone:
         return ''
-    
-    # Convert to string and remove all spaces, dashes, parentheses
-    clean_phone = str(phone).strip().replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-    
-    # If already in international format (+CountryCode), return as-is
-    if clean_phone.startswith('+') and len(clean_phone) >= 12:
-        # Validate international format (should have + followed by country code and number)
-        country_part = clean_phone[1:]  # Remove +
-        if country_part.isdigit() and len(country_part) >= 11:
-            return clean_phone
-    
-    # Check for common country codes without + (91, 1, 44, etc.)
-    if clean_phone.startswith('91') and len(clean_phone) == 12:  # India
-        return f'+{clean_phone}'
-    elif clean_phone.startswith('1') and len(clean_phone) == 11:  # US
-        return f'+{clean_phone}'
-    elif clean_phone.startswith('44') and len(clean_phone) == 12:  # UK
-        return f'+{clean_phone}'
-    
-    # Handle India-specific formats
-    if clean_phone.startswith('0') and len(clean_phone) == 11:  # India with 0 prefix
-        clean_phone = clean_phone[1:]
-        return f'+91{clean_phone}'
-    elif len(clean_phone) == 10 and clean_phone.isdigit():  # 10-digit number (assume India)
-        return f'+91{clean_phone}'
-    
-    # If we can't determine the format, return original
-    return phone
+    return canonical_phone(phone) or phone
 
 
 def get_phone_display(phone):
@@ -135,48 +141,24 @@ def get_tel_link(phone):
     if not phone:
         return 'tel:+910000000000'  # Return a placeholder number instead of empty
     
-    # Clean the phone number first
-    clean_phone = str(phone).strip().replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-    
-    # If already in international format, use as-is
-    if clean_phone.startswith('+') and len(clean_phone) >= 12:
-        return f'tel:{clean_phone}'
-    
-    # Remove any existing 91 prefix if present
-    if clean_phone.startswith('91') and len(clean_phone) == 12:
-        clean_phone = clean_phone[2:]
-    elif clean_phone.startswith('091') and len(clean_phone) == 13:
-        clean_phone = clean_phone[3:]
-    
-    # Remove leading 0 for Indian numbers
-    if clean_phone.startswith('0') and len(clean_phone) == 11:
-        clean_phone = clean_phone[1:]
+    canonical = canonical_phone(phone)
+    if canonical:
+        return f'tel:{canonical}'
     
-    # If we have a 10-digit number, add +91
-    if len(clean_phone) == 10 and clean_phone.isdigit():
-        return f'tel:+91{clean_phone}'
-    
-    # If we have some other format, try to extract last 10 digits
-    if len(clean_phone) >= 10:
-        last_10 = clean_phone[-10:]
-        if last_10.isdigit():
-            return f'tel:+91{last_10}'
-    
-    # Fallback - return the original with +91 if possible
-    return f'tel:+91{clean_phone[-10:] if len(clean_phone) >= 10 else "0000000000"}'
+    # Unrecognised format - fall back to the last 10 digits as an Indian number
+    digits = ''.join(ch for ch in str(phone) if ch.isdigit())
+    return f'tel:+91{digits[-10:] if len(digits) >= 10 else "0000000000"}'
+
+
+def whatsapp_number(phone):
+    """Digits-only international number (91XXXXXXXXXX) as wa.me and SMS gateways expect it"""
+    canonical = canonical_phone(phone)
+    return canonical[1:] if canonical else ''.join(ch for ch in str(phone or '') if ch.isdigit())
 
 
 def get_whatsapp_link(phone, message=''):
     """Generate WhatsApp deep link"""
-    clean_phone = phone.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-    
-    # Remove + or 91 prefix for WhatsApp
-    if clean_phone.startswith('+91'):
-        clean_phone = clean_phone[3:]
-    elif clean_phone.startswith('91'):
-        clean_phone = clean_phone[2:]
-    elif clean_phone.startswith('0'):
-        clean_phone = clean_phone[1:]
+    clean_phone = whatsapp_number(phone)
     
     # URL encode message
     from urllib.parse import quote
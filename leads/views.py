@@ -1,26 +1,26 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count
+from django.conf import settings
+from django.db.models import Q, Count, Prefetch
 from django.core.paginator import Paginator
 from django.utils import timezone
 from django.http import JsonResponse, HttpResponse
 from django.urls import reverse
 from datetime import timedelta, datetime
 from django.template.loader import render_to_string
-try:
-    import openpyxl
-except ImportError:
-    openpyxl = None
 import csv
 import io
 from .models import Lead, OtpLog, CallLog, FollowUpReminder, DailyAssignmentQuota, GlobalConfiguration, LeadProjectAssociation
 from projects.models import Project
 from accounts.models import User
+from bridgio.cache import active_channel_partners, active_configurations, active_projects, assignable_users
+from bridgio.excel import load_openpyxl
 from .utils import (
     generate_otp, hash_otp, verify_otp as verify_otp_hash, get_sms_deep_link,
-    get_phone_display, get_tel_link, get_whatsapp_link, get_whatsapp_templates
+    get_phone_display, get_tel_link, get_whatsapp_link, get_whatsapp_templates, normalize_phone
 )
+from .uploads import _create_column_mapper, count_rows, import_leads, import_leads_job, upload_message
 
 
 def get_lead_association(lead, project=None):
@@ -45,7 +45,7 @@ def lead_list(request):
         associations = associations.filter(assigned_to=request.user)
     elif request.user.is_closing_manager():
         # Closing Managers see their assigned leads AND pretagged leads in their projects
-        user_projects = request.user.assigned_projects.all()
+        user_projects = request.scope.assigned_project_ids
         associations = associations.filter(
             Q(assigned_to=request.user) | 
             Q(is_pretagged=True, project__in=user_projects)
@@ -133,8 +133,20 @@ def lead_list(request):
     now = timezone.now()
     today = now.date()
     
-    # Prefetch reminders and call logs for each lead
-    leads = leads.prefetch_related('reminders', 'call_logs')
+    # Everything the rows show, in one query per relation for the whole page
+    leads = leads.select_related('channel_partner').prefetch_related(
+        'configurations',
+        Prefetch(
+            'reminders',
+            queryset=FollowUpReminder.objects.filter(is_completed=False).order_by('reminder_date'),
+            to_attr='open_reminders',
+        ),
+        Prefetch(
+            'project_associations',
+            queryset=LeadProjectAssociation.objects.filter(is_archived=False).select_related('project', 'assigned_to'),
+            to_attr='active_associations',
+        ),
+    )
     
     # Pagination
     paginator = Paginator(leads, 25)
@@ -144,45 +156,27 @@ def lead_list(request):
     # Get reminders and callbacks for each lead in the page
     lead_notifications = {}
     for lead in leads_page:
-        # Get upcoming reminders (today and future)
-        upcoming_reminders = lead.reminders.filter(
-            is_completed=False,
-            reminder_date__gte=now
-        ).order_by('reminder_date')[:3]
-        
-        # Get overdue reminders
-        overdue_reminders = lead.reminders.filter(
-            is_completed=False,
-            reminder_date__lt=now
-        ).count()
-        
-        # Get today's callbacks (reminder_type field was removed)
-        today_callbacks = lead.reminders.filter(
-            is_completed=False,
-            reminder_date__date=today
-        ).count()
+        # Upcoming reminders (today and future), overdue ones and today's callbacks
+        upcoming_reminders = [reminder for reminder in lead.open_reminders if reminder.reminder_date >= now]
+        overdue_reminders = len(lead.open_reminders) - len(upcoming_reminders)
+        today_callbacks = sum(
+            1 for reminder in lead.open_reminders if timezone.localtime(reminder.reminder_date).date() == today
+        )
         
         # Get tel link for phone button
         tel_link = get_tel_link(lead.phone)
         
         lead_notifications[lead.id] = {
-            'upcoming_reminders': list(upcoming_reminders),
+            'upcoming_reminders': upcoming_reminders[:3],
             'overdue_count': overdue_reminders,
             'today_callbacks': today_callbacks,
             'tel_link': tel_link,
         }
     
-    # Get global configurations for filter dropdown
-    configurations = GlobalConfiguration.objects.filter(is_active=True).order_by('order', 'name')
-    
-    # Get assignees for filter
-    assignees = User.objects.filter(
-        role__in=['closing_manager', 'telecaller', 'sourcing_manager']
-    ).order_by('username')
-    
-    # Get channel partners for filter
-    from channel_partners.models import ChannelPartner
-    channel_partners = ChannelPartner.objects.filter(status='active').order_by('cp_name')
+    # Filter dropdowns (cached, see bridgio.cache)
+    configurations = active_configurations()
+    assignees = assignable_users()
+    channel_partners = active_channel_partners()
     
     # Get call metrics for current user
     # Count calls based on: CallLog entries, Notes updates, Status updates
@@ -191,62 +185,24 @@ def lead_list(request):
     week_start = today_start - timedelta(days=today_start.weekday())
     month_start = today_start.replace(day=1)
     
-    # Count CallLog entries
-    call_logs_today = CallLog.objects.filter(user=request.user, call_date__gte=today_start).count()
-    call_logs_week = CallLog.objects.filter(user=request.user, call_date__gte=week_start).count()
-    call_logs_month = CallLog.objects.filter(user=request.user, call_date__gte=month_start).count()
-    call_logs_total = CallLog.objects.filter(user=request.user).count()
+    def period_counts(queryset, date_field):
+        """Today / this week / this month / total in one query"""
+        return queryset.aggregate(
+            today=Count('id', filter=Q(**{f'{date_field}__gte': today_start})),
+            this_week=Count('id', filter=Q(**{f'{date_field}__gte': week_start})),
+            this_month=Count('id', filter=Q(**{f'{date_field}__gte': month_start})),
+            total=Count('id'),
+        )
     
-    # Count notes updates (from AuditLog)
+    # Count CallLog entries, notes updates and status updates (from AuditLog)
     from accounts.models import AuditLog
-    notes_updates_today = AuditLog.objects.filter(
-        user=request.user, 
-        action='notes_updated',
-        created_at__gte=today_start
-    ).count()
-    notes_updates_week = AuditLog.objects.filter(
-        user=request.user, 
-        action='notes_updated',
-        created_at__gte=week_start
-    ).count()
-    notes_updates_month = AuditLog.objects.filter(
-        user=request.user, 
-        action='notes_updated',
-        created_at__gte=month_start
-    ).count()
-    notes_updates_total = AuditLog.objects.filter(
-        user=request.user, 
-        action='notes_updated'
-    ).count()
-    
-    # Count status updates (from AuditLog)
-    status_updates_today = AuditLog.objects.filter(
-        user=request.user, 
-        action='status_updated',
-        created_at__gte=today_start
-    ).count()
-    status_updates_week = AuditLog.objects.filter(
-        user=request.user, 
-        action='status_updated',
-        created_at__gte=week_start
-    ).count()
-    status_updates_month = AuditLog.objects.filter(
-        user=request.user, 
-        action='status_updated',
-        created_at__gte=month_start
-    ).count()
-    status_updates_total = AuditLog.objects.filter(
-        user=request.user, 
-        action='status_updated'
-    ).count()
+    call_logs = period_counts(CallLog.objects.filter(user=request.user), 'call_date')
+    updates = period_counts(
+        AuditLog.objects.filter(user=request.user, action__in=['notes_updated', 'status_updated']), 'created_at'
+    )
     
     # Combine all call activities
-    call_metrics = {
-        'today': call_logs_today + notes_updates_today + status_updates_today,
-        'this_week': call_logs_week + notes_updates_week + status_updates_week,
-        'this_month': call_logs_month + notes_updates_month + status_updates_month,
-        'total': call_logs_total + notes_updates_total + status_updates_total,
-    }
+    call_metrics = {period: call_logs[period] + updates[period] for period in call_logs}
     
     # Generate budget choices for dropdown (common budget ranges)
     budget_choices = [
@@ -278,23 +234,23 @@ def lead_list(request):
     lead_associations = {}
     lead_primary_associations = {}  # Primary association for each lead (for status, etc.)
     for lead in leads_page:
-        # Get all associations for this lead
-        associations = lead.project_associations.filter(is_archived=False).select_related('project', 'assigned_to')
+        # All associations for this lead (prefetched above)
+        associations = lead.active_associations
         lead_associations[lead.id] = associations
         
         # Determine primary association (first one, or filtered by project if available)
         primary_assoc = None
         if project_id:
-            primary_assoc = associations.filter(project_id=project_id).first()
-        if not primary_assoc:
-            primary_assoc = associations.first()
+            primary_assoc = next((a for a in associations if str(a.project_id) == project_id), None)
+        if not primary_assoc and associations:
+            primary_assoc = associations[0]
         lead_primary_associations[lead.id] = primary_assoc
     
     context = {
         'leads': leads_page,
         'lead_associations': lead_associations,
         'lead_primary_associations': lead_primary_associations,
-        'projects': Project.objects.filter(is_active=True),
+        'projects': active_projects(),
         'status_choices': LeadProjectAssociation.LEAD_STATUS_CHOICES,
         'pretag_status_choices': LeadProjectAssociation.PRETAG_STATUS_CHOICES,
         'configurations': configurations,
@@ -708,8 +664,8 @@ def lead_create(request):
     
     # GET request - show form
     context = {
-        'projects': Project.objects.filter(is_active=True),
-        'global_configurations': GlobalConfiguration.objects.filter(is_active=True).order_by('order', 'name'),
+        'projects': active_projects(),
+        'global_configurations': active_configurations(),
     }
     return render(request, 'leads/create.html', context)
 
@@ -941,8 +897,8 @@ def lead_pretag(request):
             messages.error(request, f'Error creating pretagged lead: {str(e)}')
     
     context = {
-        'projects': Project.objects.filter(is_active=True),
-        'global_configurations': GlobalConfiguration.objects.filter(is_active=True).order_by('order', 'name'),
+        'projects': active_projects(),
+        'global_configurations': active_configurations(),
     }
     return render(request, 'leads/pretag.html', context)
 
@@ -1069,7 +1025,7 @@ def send_otp(request, pk):
     # 5. For Telecallers: Any lead in their assigned projects (for queue visit feature)
     if request.user.is_closing_manager() or request.user.is_telecaller():
         # Check associations in user's projects
-        user_projects = request.user.assigned_projects.all()
+        user_projects = request.scope.assigned_project_ids
         associations = lead.project_associations.filter(
             project__in=user_projects,
             is_archived=False
@@ -1095,9 +1051,9 @@ def send_otp(request, pk):
         # Get primary project for SMS link
         if associations.exists():
             primary_project = associations.first().project
-        elif user_projects.exists():
+        elif user_projects:
             # For telecallers with new leads, use their first assigned project
-            primary_project = user_projects.first()
+            primary_project = request.user.assigned_projects.first()
         else:
             primary_project = lead.primary_project
     else:
@@ -1114,7 +1070,7 @@ def send_otp(request, pk):
     # BUT: For booking conversions, always generate new OTP even if previously verified
     is_pretagged = False
     if request.user.is_closing_manager():
-        user_projects = request.user.assigned_projects.all()
+        user_projects = request.scope.assigned_project_ids
         associations = lead.project_associations.filter(project__in=user_projects, is_archived=False)
         is_pretagged = associations.filter(is_pretagged=True).exists()
     elif request.user.is_site_head() or request.user.is_super_admin() or request.user.is_mandate_owner():
@@ -1303,7 +1259,7 @@ def verify_otp(request, pk):
     # For Mandate Owners and Site Heads, allow OTP verification for all leads in their projects
     elif request.user.is_closing_manager() or request.user.is_telecaller():
         # Check associations in user's projects
-        user_projects = request.user.assigned_projects.all()
+        user_projects = request.scope.assigned_project_ids
         associations = lead.project_associations.filter(
             project__in=user_projects,
             is_archived=False
@@ -1393,7 +1349,7 @@ def verify_otp(request, pk):
             associations = lead.project_associations.filter(project_id=project_id, is_archived=False)
         else:
             if request.user.is_closing_manager():
-                user_projects = request.user.assigned_projects.all()
+                user_projects = request.scope.assigned_project_ids
                 associations = lead.project_associations.filter(project__in=user_projects, is_archived=False)
             else:
                 associations = lead.project_associations.filter(is_archived=False)
@@ -1484,7 +1440,7 @@ def verify_otp(request, pk):
             primary_association = lead.project_associations.filter(is_archived=False).first()
             if not primary_association and request.user.is_closing_manager():
                 # Try to get association from user's projects
-                user_projects = request.user.assigned_projects.all()
+                user_projects = request.scope.assigned_project_ids
                 primary_association = lead.project_associations.filter(
                     project__in=user_projects,
                     is_archived=False
@@ -1558,7 +1514,7 @@ def visits_list(request):
     
     # Get projects for filter dropdown
     if request.user.is_super_admin() or request.user.is_mandate_owner():
-        projects = Project.objects.filter(is_active=True).order_by('name')
+        projects = active_projects('name')
     else:  # Site Head
         projects = Project.objects.filter(site_head=request.user, is_active=True).order_by('name')
     
@@ -1683,7 +1639,9 @@ def upcoming_visits(request):
         leads_page = Paginator(leads, 25).get_page(1)
         lead_associations_dict = {}
     else:
-        leads = Lead.objects.filter(id__in=lead_ids, is_archived=False).order_by('-created_at')
+        leads = Lead.objects.filter(id__in=lead_ids, is_archived=False).select_related(
+            'channel_partner'
+        ).order_by('-created_at')
         
         # Pagination
         paginator = Paginator(leads, 25)
@@ -1700,21 +1658,6 @@ def upcoming_visits(request):
             if lead.id in all_lead_associations_dict:
                 lead_associations_dict[lead.id] = all_lead_associations_dict[lead.id]
     
-    # Debug output (can be removed later)
-    if not lead_associations_dict and associations_list:
-        # This shouldn't happen, but if it does, log it
-        print(f"DEBUG: Found {len(associations_list)} associations but lead_associations_dict is empty. Lead IDs: {lead_ids[:10]}")
-        # Check if leads are archived
-        archived_count = Lead.objects.filter(id__in=lead_ids, is_archived=True).count()
-        print(f"DEBUG: {archived_count} out of {len(lead_ids)} leads are archived")
-    
-    # Debug: Print what we're sending to template
-    leads_count = len(leads_page.object_list) if hasattr(leads_page, 'object_list') else 0
-    print(f"DEBUG upcoming_visits: associations_list={len(associations_list)}, lead_ids={len(lead_ids)}, leads_page.objects={leads_count}, lead_associations_dict={len(lead_associations_dict)}")
-    if leads_page and hasattr(leads_page, 'object_list') and leads_page.object_list:
-        print(f"DEBUG: First lead ID: {leads_page.object_list[0].id}, in dict: {leads_page.object_list[0].id in lead_associations_dict}")
-        print(f"DEBUG: First lead associations count: {len(lead_associations_dict.get(leads_page.object_list[0].id, []))}")
-    
     # Ensure we always have a valid leads_page object, even if empty
     if not leads_page:
         leads = Lead.objects.none()
@@ -1733,11 +1676,6 @@ def upcoming_visits(request):
         'is_mandate_owner': request.user.is_mandate_owner(),
         'is_site_head': request.user.is_site_head(),
     }
-    print(f"DEBUG FINAL: Context keys: {list(context.keys())}")
-    print(f"DEBUG FINAL: leads_page exists: {'leads_page' in context}")
-    print(f"DEBUG FINAL: leads_page type: {type(context.get('leads_page')).__name__ if context.get('leads_page') else 'None'}")
-    print(f"DEBUG FINAL: leads_page.object_list length: {len(context['leads_page'].object_list) if context.get('leads_page') and hasattr(context['leads_page'], 'object_list') else 'N/A'}")
-    print(f"DEBUG FINAL: lead_associations dict size: {len(context.get('lead_associations', {}))}")
     return render(request, 'leads/upcoming_visits.html', context)
 
 
@@ -1999,7 +1937,7 @@ def schedule_visit(request):
     
     context = {
         'projects': projects,
-        'global_configurations': GlobalConfiguration.objects.filter(is_active=True).order_by('order', 'name'),
+        'global_configurations': active_configurations(),
     }
     return render(request, 'leads/schedule_visit.html', context)
 
@@ -2406,10 +2344,10 @@ def update_status(request, pk):
                 has_permission = True
     elif request.user.is_mandate_owner():
         # Mandate owners can update status for leads in their projects
-        has_permission = project in request.user.assigned_projects.all()
+        has_permission = request.scope.is_assigned_to(project)
     elif request.user.is_site_head():
         # Site heads can update status for leads in their projects
-        has_permission = project in request.user.assigned_projects.all()
+        has_permission = request.scope.is_assigned_to(project)
     elif request.user.is_super_admin() or request.user.is_sourcing_manager():
         # Super admins and sourcing managers can update any lead
         has_permission = True
@@ -2560,7 +2498,7 @@ def update_notes(request, pk):
         ).exists()
     elif request.user.is_mandate_owner() or request.user.is_site_head():
         # Mandate owners and site heads can update notes for leads in their projects
-        user_projects = request.user.assigned_projects.all()
+        user_projects = request.scope.assigned_project_ids
         has_permission = lead.project_associations.filter(
             project__in=user_projects,
             is_archived=False
@@ -2955,8 +2893,8 @@ def lead_assign(request):
                 )
             
             # Use atomic transaction with row locking to prevent race conditions
-            from django.db import transaction
-            with transaction.atomic():
+            from bridgio.db import write_atomic
+            with write_atomic():
                 assigned_count = 0
                 
                 for assignment in assignments:
@@ -3033,63 +2971,6 @@ def lead_assign(request):
     return render(request, 'leads/assign.html', context)
 
 
-def _create_column_mapper(headers):
-    """
-    Create an intelligent column mapper that auto-detects column names.
-    Returns a function that can extract values by field name.
-    """
-    # Normalize headers: strip, lowercase, remove special chars
-    normalized_headers = {}
-    for idx, header in enumerate(headers):
-        if header:
-            normalized = str(header).strip().lower().replace('_', ' ').replace('-', ' ')
-            normalized_headers[normalized] = idx
-    
-    # Define field mappings with common variations
-    # Note: This is for LEADS upload only. Visits are created separately when leads actually visit.
-    field_mappings = {
-        'name': ['name', 'full name', 'client name', 'customer name', 'person name', 'contact name', 'lead name'],
-        'phone': ['phone', 'mobile', 'contact', 'contact number', 'phone number', 'mobile number', 'cell', 'cell phone', 'whatsapp', 'whatsapp number'],
-        'email': ['email', 'e mail', 'email address', 'mail', 'email id'],
-        'age': ['age'],
-        'gender': ['gender', 'sex'],
-        'locality': ['locality', 'area', 'location', 'city', 'address'],
-        'current_residence': ['current residence', 'residence', 'residence type', 'living in', 'own rent'],
-        'occupation': ['occupation', 'profession', 'job', 'work'],
-        'company_name': ['company name', 'company', 'organization', 'org', 'firm name'],
-        'designation': ['designation', 'position', 'title', 'role', 'job title'],
-        'budget': ['budget', 'price range', 'budget range', 'expected budget', 'investment amount'],
-        'purpose': ['purpose', 'requirement', 'need', 'buying purpose'],
-        'visit_type': ['visit type', 'visit', 'accompanied by', 'family alone'],
-        'is_first_visit': ['first visit', 'is first visit', 'new visit', 'revisit'],
-        'how_did_you_hear': ['how did you hear', 'source', 'referral source', 'lead source', 'marketing source'],
-        'status': ['status', 'lead status', 'stage', 'current status', 'lead stage'],  # IMPORTANT: Lead Status
-        'cp_firm_name': ['cp firm name', 'channel partner firm', 'cp firm', 'partner firm', 'broker firm'],
-        'cp_name': ['cp name', 'channel partner name', 'cp', 'partner name', 'broker name'],
-        'cp_phone': ['cp phone', 'channel partner phone', 'cp mobile', 'partner phone', 'broker phone'],
-        'cp_rera_number': ['cp rera number', 'rera number', 'cp rera', 'rera id', 'rera'],
-        'is_pretagged': ['is pretagged', 'pretagged', 'pretag', 'is pretag', 'pretagged lead'],
-    }
-    
-    # Create reverse mapping: field -> column index
-    field_to_index = {}
-    for field, variations in field_mappings.items():
-        for variation in variations:
-            if variation in normalized_headers:
-                field_to_index[field] = normalized_headers[variation]
-                break
-    
-    def get_value(field_name):
-        """Get value for a field by trying all variations"""
-        if field_name in field_to_index:
-            idx = field_to_index[field_name]
-            if idx < len(headers):
-                return headers[idx]
-        return None
-    
-    return get_value, field_to_index
-
-
 @login_required
 def upload_analyze(request):
     """Analyze uploaded file and return headers with auto-mapping"""
@@ -3124,6 +3005,7 @@ def upload_analyze(request):
                 'type': 'csv'
             }
         else:
+            openpyxl = load_openpyxl()
             if openpyxl is None:
                 return JsonResponse({'success': False, 'error': 'openpyxl not installed'}, status=500)
             workbook = openpyxl.load_workbook(uploaded_file)
@@ -3205,15 +3087,9 @@ def upload_preview(request):
                 name = row.get(name_header, '').strip() if name_header else ''
                 phone = row.get(phone_header, '').strip() if phone_header else ''
                 
-                # Clean phone number (remove spaces, handle multiple contacts)
+                # Same canonical form the upload will store (first of multiple contacts)
                 if phone:
-                    phone = phone.split(',')[0].strip()  # Take first phone if multiple
-                    phone = phone.replace(' ', '').replace('-', '').replace('/', '')
-                    # Remove leading +91 or 91
-                    if phone.startswith('+91'):
-                        phone = phone[3:]
-                    elif phone.startswith('91') and len(phone) > 10:
-                        phone = phone[2:]
+                    phone = normalize_phone(phone.split(',')[0].strip())
                 
                 # Phone is required, name is optional
                 if phone:
@@ -3234,6 +3110,7 @@ def upload_preview(request):
                 tmp_path = tmp.name
             
             try:
+                openpyxl = load_openpyxl()
                 workbook = openpyxl.load_workbook(tmp_path)
                 worksheet = workbook.active
                 headers = [str(cell.value).strip() if cell.value else '' for cell in worksheet[1]]
@@ -3257,26 +3134,20 @@ def upload_preview(request):
                         phone_idx = headers.index(phone_header)
                         if phone_idx < len(row):
                             phone = str(row[phone_idx].value).strip() if row[phone_idx].value else ''
-                # Clean phone number (remove spaces, handle multiple contacts)
-                if phone:
-                    phone = phone.split(',')[0].strip()  # Take first phone if multiple
-                    phone = phone.replace(' ', '').replace('-', '').replace('/', '')
-                    # Remove leading +91 or 91
-                    if phone.startswith('+91'):
-                        phone = phone[3:]
-                    elif phone.startswith('91') and len(phone) > 10:
-                        phone = phone[2:]
-                
-                # Phone is required, name is optional
-                if phone:
-                    valid_rows += 1
-                else:
-                    errors += 1
-                    error_rows.append({
-                        'row': row_num,
-                        'error': 'Phone is required',
-                        'data': {headers[i]: str(row[i].value) if i < len(row) and row[i].value else '' for i in range(len(headers))}
-                    })
+                    # Same canonical form the upload will store (first of multiple contacts)
+                    if phone:
+                        phone = normalize_phone(phone.split(',')[0].strip())
+                    
+                    # Phone is required, name is optional
+                    if phone:
+                        valid_rows += 1
+                    else:
+                        errors += 1
+                        error_rows.append({
+                            'row': row_num,
+                            'error': 'Phone is required',
+                            'data': {headers[i]: str(row[i].value) if i < len(row) and row[i].value else '' for i in range(len(headers))}
+                        })
             finally:
                 os.unlink(tmp_path)
         
@@ -3337,546 +3208,47 @@ def lead_upload(request):
                 except:
                     pass
             
-            # Process file
-            leads_created = 0
-            errors = []
-            error_rows = []  # Store failed rows for CSV download
-            mapping_info = []
-            field_map = {}
-            headers = []
+            if not file_name.endswith('.csv') and load_openpyxl() is None:
+                messages.error(request, 'openpyxl is not installed. Please install it: pip install openpyxl')
+                return redirect('leads:upload')
             
-            if file_name.endswith('.csv'):
-                # Process CSV
-                if session_id and request.session.get(f'upload_file_{session_id}'):
-                    file_data = request.session.get(f'upload_file_{session_id}')
-                    decoded_file = file_data['content']
-                    # Clean up session
-                    del request.session[f'upload_file_{session_id}']
-                else:
-                    decoded_file = uploaded_file.read().decode('utf-8')
-                
-                io_string = io.StringIO(decoded_file)
-                reader = csv.DictReader(io_string)
-                
-                # Get headers from CSV
-                csv_headers = reader.fieldnames or []
-                headers = csv_headers
-                
-                # Use manual mapping if provided, otherwise auto-detect
-                if manual_mapping:
-                    # Manual mapping: header -> field
-                    header_to_field = manual_mapping
-                else:
-                    get_value, field_map = _create_column_mapper(csv_headers)
-                    # Convert to header->field format
-                    header_to_field = {}
-                    for field, col_idx in field_map.items():
-                        if col_idx < len(csv_headers):
-                            header_to_field[csv_headers[col_idx]] = field
-                
-                # Store mapping info for user feedback
-                if field_map:
-                    mapping_info.append(f"Detected columns: {', '.join([f'{k} → {csv_headers[field_map[k]]}' for k in ['name', 'phone'] if k in field_map])}")
-                
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        # Use manual or auto-mapping to get values
-                        def get_row_value(field_name):
-                            if manual_mapping:
-                                # Find header mapped to this field
-                                header = None
-                                for h, f in header_to_field.items():
-                                    if f == field_name:
-                                        header = h
-                                        break
-                                if header:
-                                    return str(row.get(header, '')).strip() if row.get(header) else ''
-                            else:
-                                col_idx = field_map.get(field_name)
-                                if col_idx is not None and col_idx < len(csv_headers):
-                                    col_name = csv_headers[col_idx]
-                                    return str(row.get(col_name, '')).strip() if row.get(col_name) else ''
-                            return ''
-                        
-                        # Get phone (required) and name (optional)
-                        phone = get_row_value('phone')
-                        name = get_row_value('name')
-                        
-                        # Normalize phone number
-                        from .utils import normalize_phone
-                        if phone:
-                            phone = phone.split(',')[0].strip()  # Take first phone if multiple
-                            phone = normalize_phone(phone)
-                        
-                        # Skip row if phone is not available (don't show as error)
-                        if not phone:
-                            continue
-                        
-                        # If name is not available but phone is, generate a default name
-                        if not name:
-                            name = f"Lead-{phone[-4:]}"  # Use last 4 digits of phone as name
-                        
-                        # Get or create lead by phone (deduplication)
-                        lead, lead_created = Lead.objects.get_or_create(
-                            phone=phone,
-                            defaults={
-                                'name': name,
-                                'email': get_row_value('email') or '',
-                                'age': int(get_row_value('age')) if get_row_value('age') and get_row_value('age').isdigit() else None,
-                                'gender': get_row_value('gender') or '',
-                                'locality': get_row_value('locality') or '',
-                                'current_residence': get_row_value('current_residence') or '',
-                                'occupation': get_row_value('occupation') or '',
-                                'company_name': get_row_value('company_name') or '',
-                                'designation': get_row_value('designation') or '',
-                                'created_by': request.user,
-                            }
-                        )
-                        
-                        # Update lead if it already existed
-                        if not lead_created:
-                            if name and lead.name != name:
-                                lead.name = name
-                            lead.save()
-                        
-                        # Get simplified fields (only what's needed for leads upload)
-                        configuration_str = get_row_value('configuration')
-                        budget_str = get_row_value('budget')
-                        feedback = get_row_value('feedback')
-                        cp_id = get_row_value('cp_id')
-                        
-                        # Parse configurations - match to global configurations
-                        configs_to_add = []
-                        if configuration_str:
-                            try:
-                                # Try to match to global configurations
-                                normalized_config = configuration_str.replace(' ', '').replace('-', '').upper()
-                                global_config = GlobalConfiguration.objects.filter(
-                                    name=normalized_config,
-                                    is_active=True
-                                ).first()
-                                
-                                if not global_config:
-                                    # Try partial match
-                                    for gc in GlobalConfiguration.objects.filter(is_active=True):
-                                        if gc.name.upper() in normalized_config or normalized_config in gc.name.upper():
-                                            global_config = gc
-                                            break
-                                
-                                if global_config:
-                                    configs_to_add.append(global_config)
-                            except Exception as e:
-                                pass
-                        
-                        # Parse budget - use flexible parsing utility
-                        budget = None
-                        if budget_str:
-                            try:
-                                from leads.utils import parse_budget
-                                budget = parse_budget(budget_str)
-                            except Exception as e:
-                                # Log error but don't fail the upload
-                                budget = None
-                        
-                        # Get CP data if provided
-                        channel_partner = None
-                        is_cp_data = request.POST.get('is_cp_data', 'no') == 'yes'
-                        if is_cp_data:
-                            cp_id_from_form = request.POST.get('channel_partner_id')
-                            if cp_id_from_form:
-                                try:
-                                    from channel_partners.models import ChannelPartner
-                                    channel_partner = ChannelPartner.objects.get(pk=cp_id_from_form)
-                                except:
-                                    pass
-                        elif cp_id:
-                            # Try to find CP by ID
-                            try:
-                                from channel_partners.models import ChannelPartner
-                                channel_partner = ChannelPartner.objects.filter(cp_unique_id=cp_id).first()
-                            except:
-                                pass
-                        
-                        # Get Lead Status
-                        status_str = get_row_value('status')
-                        # Map feedback to status if status not provided
-                        if not status_str and feedback:
-                            feedback_lower = feedback.lower()
-                            if 'interested' in feedback_lower or 'intrested' in feedback_lower:
-                                status_str = 'hot'
-                            elif 'not interested' in feedback_lower or 'not intrested' in feedback_lower:
-                                status_str = 'lost'
-                            elif 'call back' in feedback_lower or 'callback' in feedback_lower:
-                                status_str = 'contacted'
-                            elif 'busy' in feedback_lower or 'not answering' in feedback_lower:
-                                status_str = 'contacted'
-                            elif 'already booked' in feedback_lower:
-                                status_str = 'lost'
-                            else:
-                                status_str = 'contacted'
-                        
-                        # Validate status against choices
-                        valid_statuses = [choice[0] for choice in LeadProjectAssociation.LEAD_STATUS_CHOICES]
-                        if status_str:
-                            status_str = status_str.lower().strip()
-                            status_matched = None
-                            for valid_status in valid_statuses:
-                                if status_str == valid_status or status_str.replace('_', ' ') == valid_status.replace('_', ' '):
-                                    status_matched = valid_status
-                                    break
-                            if not status_matched:
-                                for valid_status, display_name in LeadProjectAssociation.LEAD_STATUS_CHOICES:
-                                    display_lower = display_name.lower()
-                                    if status_str == display_lower or status_str in display_lower or display_lower in status_str:
-                                        status_matched = valid_status
-                                        break
-                            status = status_matched if status_matched else 'new'
-                        else:
-                            status = 'new'
-                        
-                        # Handle pretagged leads (if CP data)
-                        is_pretagged = is_cp_data and channel_partner is not None
-                        
-                        # Store feedback in notes
-                        notes = ''
-                        if feedback:
-                            notes = f"Feedback: {feedback}"
-                        if budget_str and budget is None:
-                            # Budget is "Open Budget" or "Low Budget"
-                            if notes:
-                                notes += f"\nBudget: {budget_str}"
-                            else:
-                                notes = f"Budget: {budget_str}"
-                        
-                        # Add configurations to lead
-                        if configs_to_add:
-                            lead.configurations.set(configs_to_add)
-                        
-                        # Update budget if provided
-                        if budget:
-                            lead.budget = budget
-                            lead.save()
-                        
-                        # Update channel partner if provided
-                        if channel_partner:
-                            lead.channel_partner = channel_partner
-                            lead.save()
-                        
-                        # Create or get association for this project
-                        association, assoc_created = LeadProjectAssociation.objects.get_or_create(
-                            lead=lead,
-                            project=project,
-                            defaults={
-                                'status': status,
-                                'is_pretagged': is_pretagged,
-                                'pretag_status': 'pending_verification' if is_pretagged else '',
-                                'phone_verified': False,
-                                'notes': notes,
-                                'created_by': request.user,
-                            }
-                        )
-                        
-                        # Update association if it already existed
-                        if not assoc_created:
-                            association.status = status
-                            if is_pretagged:
-                                association.is_pretagged = True
-                                association.pretag_status = 'pending_verification'
-                            if notes:
-                                association.notes = notes
-                            association.save()
-                        
-                        leads_created += 1
-                    except Exception as e:
-                        error_msg = f"Row {row_num}: {str(e)}"
-                        errors.append(error_msg)
-                        error_rows.append({
-                            'row': row_num,
-                            'error': error_msg,
-                            'data': {headers[i]: str(row[i].value) if i < len(row) and row[i].value else '' for i in range(len(headers))}
-                        })
+            # File content: the copy upload_analyze kept in the session, else the upload itself
+            file_data = request.session.pop(f'upload_file_{session_id}', None) if session_id else None
+            if file_data:
+                content = file_data['content']
             else:
-                # Process Excel
-                if openpyxl is None:
-                    messages.error(request, 'openpyxl is not installed. Please install it: pip install openpyxl')
-                    return redirect('leads:upload')
-                
-                # Get file from session if available
-                if session_id and request.session.get(f'upload_file_{session_id}'):
-                    file_data = request.session.get(f'upload_file_{session_id}')
-                    import tempfile
-                    import os
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp:
-                        tmp.write(file_data['content'])
-                        tmp_path = tmp.name
-                    try:
-                        workbook = openpyxl.load_workbook(tmp_path)
-                    finally:
-                        os.unlink(tmp_path)
-                    # Clean up session
-                    del request.session[f'upload_file_{session_id}']
-                else:
-                    workbook = openpyxl.load_workbook(uploaded_file)
-                
-                worksheet = workbook.active
-                
-                # Get header row
-                headers = [str(cell.value).strip() if cell.value else '' for cell in worksheet[1]]
-                
-                # Use manual mapping if provided, otherwise auto-detect
-                if manual_mapping:
-                    header_to_field = manual_mapping
-                else:
-                    get_value, field_map = _create_column_mapper(headers)
-                    # Convert to header->field format
-                    header_to_field = {}
-                    for field, col_idx in field_map.items():
-                        if col_idx < len(headers):
-                            header_to_field[headers[col_idx]] = field
-                
-                # Store mapping info for user feedback
-                if field_map:
-                    mapping_info.append(f"Detected columns: {', '.join([f'{k} → {headers[field_map[k]]}' for k in ['name', 'phone'] if k in field_map])}")
-                
-                for row_num, row in enumerate(worksheet.iter_rows(min_row=2, values_only=False), start=2):
-                    try:
-                        # Use manual or auto-mapping to get values
-                        def get_row_value(field_name):
-                            if manual_mapping:
-                                # Find header mapped to this field
-                                header = None
-                                for h, f in header_to_field.items():
-                                    if f == field_name:
-                                        header = h
-                                        break
-                                if header and header in headers:
-                                    col_idx = headers.index(header)
-                                    if col_idx < len(row):
-                                        cell = row[col_idx]
-                                        value = cell.value
-                                        if value is not None:
-                                            # Handle Excel numeric phone numbers (convert float to int, then to string)
-                                            if isinstance(value, (int, float)) and field_name == 'phone':
-                                                return str(int(value))
-                                            return str(value).strip()
-                            else:
-                                col_idx = field_map.get(field_name)
-                                if col_idx is not None and col_idx < len(row):
-                                    cell = row[col_idx]
-                                    value = cell.value
-                                    if value is not None:
-                                        # Handle Excel numeric phone numbers (convert float to int, then to string)
-                                        if isinstance(value, (int, float)) and field_name == 'phone':
-                                            return str(int(value))
-                                        return str(value).strip()
-                            return ''
-                        
-                        # Get phone (required) and name (optional)
-                        phone = get_row_value('phone')
-                        name = get_row_value('name')
-                        
-                        # Clean phone number (handle multiple contacts, remove spaces)
-                        if phone:
-                            phone = phone.split(',')[0].strip()  # Take first phone if multiple
-                            phone = phone.replace(' ', '').replace('-', '').replace('/', '').replace('.', '')
-                            # Remove leading +91 or 91
-                            if phone.startswith('+91'):
-                                phone = phone[3:]
-                            elif phone.startswith('91') and len(phone) > 10:
-                                phone = phone[2:]
-                        
-                        # Skip row if phone is not available (don't show as error)
-                        if not phone:
-                            continue
-                        
-                        # If name is not available but phone is, generate a default name
-                        if not name:
-                            name = f"Lead-{phone[-4:]}"  # Use last 4 digits of phone as name
-                        
-                        # Normalize phone number
-                        from .utils import normalize_phone
-                        if phone:
-                            phone = normalize_phone(phone)
-                        
-                        # Get or create lead by phone (deduplication)
-                        lead, lead_created = Lead.objects.get_or_create(
-                            phone=phone,
-                            defaults={
-                                'name': name,
-                                'email': get_row_value('email') or '',
-                                'age': int(get_row_value('age')) if get_row_value('age') and get_row_value('age').isdigit() else None,
-                                'gender': get_row_value('gender') or '',
-                                'locality': get_row_value('locality') or '',
-                                'current_residence': get_row_value('current_residence') or '',
-                                'occupation': get_row_value('occupation') or '',
-                                'company_name': get_row_value('company_name') or '',
-                                'designation': get_row_value('designation') or '',
-                                'created_by': request.user,
-                            }
-                        )
-                        
-                        # Update lead if it already existed
-                        if not lead_created:
-                            if name and lead.name != name:
-                                lead.name = name
-                            lead.save()
-                        
-                        # Get simplified fields (only what's needed for leads upload)
-                        configuration_str = get_row_value('configuration')
-                        budget_str = get_row_value('budget')
-                        feedback = get_row_value('feedback')
-                        cp_id = get_row_value('cp_id')
-                        
-                        # Parse configurations - match to global configurations
-                        configs_to_add = []
-                        if configuration_str:
-                            try:
-                                # Try to match to global configurations
-                                normalized_config = configuration_str.replace(' ', '').replace('-', '').upper()
-                                global_config = GlobalConfiguration.objects.filter(
-                                    name=normalized_config,
-                                    is_active=True
-                                ).first()
-                                
-                                if not global_config:
-                                    # Try partial match
-                                    for gc in GlobalConfiguration.objects.filter(is_active=True):
-                                        if gc.name.upper() in normalized_config or normalized_config in gc.name.upper():
-                                            global_config = gc
-                                            break
-                                
-                                if global_config:
-                                    configs_to_add.append(global_config)
-                            except Exception as e:
-                                pass
-                        
-                        # Parse budget - use flexible parsing utility
-                        budget = None
-                        if budget_str:
-                            try:
-                                from leads.utils import parse_budget
-                                budget = parse_budget(budget_str)
-                            except Exception as e:
-                                # Log error but don't fail the upload
-                                budget = None
-                        
-                        # Get CP data if provided
-                        channel_partner = None
-                        is_cp_data = request.POST.get('is_cp_data', 'no') == 'yes'
-                        if is_cp_data:
-                            cp_id_from_form = request.POST.get('channel_partner_id')
-                            if cp_id_from_form:
-                                try:
-                                    from channel_partners.models import ChannelPartner
-                                    channel_partner = ChannelPartner.objects.get(pk=cp_id_from_form)
-                                except:
-                                    pass
-                        elif cp_id:
-                            # Try to find CP by ID
-                            try:
-                                from channel_partners.models import ChannelPartner
-                                channel_partner = ChannelPartner.objects.filter(cp_unique_id=cp_id).first()
-                            except:
-                                pass
-                        
-                        # Get Lead Status
-                        status_str = get_row_value('status')
-                        # Map feedback to status if status not provided
-                        if not status_str and feedback:
-                            feedback_lower = feedback.lower()
-                            if 'interested' in feedback_lower or 'intrested' in feedback_lower:
-                                status_str = 'hot'
-                            elif 'not interested' in feedback_lower or 'not intrested' in feedback_lower:
-                                status_str = 'lost'
-                            elif 'call back' in feedback_lower or 'callback' in feedback_lower:
-                                status_str = 'contacted'
-                            elif 'busy' in feedback_lower or 'not answering' in feedback_lower:
-                                status_str = 'contacted'
-                            elif 'already booked' in feedback_lower:
-                                status_str = 'lost'
-                            else:
-                                status_str = 'contacted'
-                        
-                        # Validate status against choices
-                        valid_statuses = [choice[0] for choice in LeadProjectAssociation.LEAD_STATUS_CHOICES]
-                        if status_str:
-                            status_str = status_str.lower().strip()
-                            status_matched = None
-                            for valid_status in valid_statuses:
-                                if status_str == valid_status or status_str.replace('_', ' ') == valid_status.replace('_', ' '):
-                                    status_matched = valid_status
-                                    break
-                            if not status_matched:
-                                for valid_status, display_name in LeadProjectAssociation.LEAD_STATUS_CHOICES:
-                                    display_lower = display_name.lower()
-                                    if status_str == display_lower or status_str in display_lower or display_lower in status_str:
-                                        status_matched = valid_status
-                                        break
-                            status = status_matched if status_matched else 'new'
-                        else:
-                            status = 'new'
-                        
-                        # Handle pretagged leads (if CP data)
-                        is_pretagged = is_cp_data and channel_partner is not None
-                        
-                        # Store feedback in notes
-                        notes = ''
-                        if feedback:
-                            notes = f"Feedback: {feedback}"
-                        if budget_str and budget is None:
-                            # Budget is "Open Budget" or "Low Budget"
-                            if notes:
-                                notes += f"\nBudget: {budget_str}"
-                            else:
-                                notes = f"Budget: {budget_str}"
-                        
-                        # Add configurations to lead
-                        if configs_to_add:
-                            lead.configurations.set(configs_to_add)
-                        
-                        # Update budget if provided
-                        if budget:
-                            lead.budget = budget
-                            lead.save()
-                        
-                        # Update channel partner if provided
-                        if channel_partner:
-                            lead.channel_partner = channel_partner
-                            lead.save()
-                        
-                        # Create or get association for this project
-                        association, assoc_created = LeadProjectAssociation.objects.get_or_create(
-                            lead=lead,
-                            project=project,
-                            defaults={
-                                'status': status,
-                                'is_pretagged': is_pretagged,
-                                'pretag_status': 'pending_verification' if is_pretagged else '',
-                                'phone_verified': False,
-                                'notes': notes,
-                                'created_by': request.user,
-                            }
-                        )
-                        
-                        # Update association if it already existed
-                        if not assoc_created:
-                            association.status = status
-                            if is_pretagged:
-                                association.is_pretagged = True
-                                association.pretag_status = 'pending_verification'
-                            if notes:
-                                association.notes = notes
-                            association.save()
-                        
-                        leads_created += 1
-                    except Exception as e:
-                        error_msg = f"Row {row_num}: {str(e)}"
-                        errors.append(error_msg)
-                        error_rows.append({
-                            'row': row_num,
-                            'error': error_msg,
-                            'data': dict(row) if 'row' in locals() else {}
-                        })
+                content = uploaded_file.read()
+                if file_name.endswith('.csv'):
+                    content = content.decode('utf-8')
+            
+            is_cp_data = request.POST.get('is_cp_data', 'no') == 'yes'
+            channel_partner_id = request.POST.get('channel_partner_id')
+            
+            # Large files are imported on the background job runner with a progress page
+            row_count = count_rows(file_name, content)
+            if row_count > settings.LEAD_UPLOAD_SYNC_LIMIT:
+                from accounts.jobs import start_job
+                job = start_job(
+                    'lead_upload',
+                    import_leads_job,
+                    file_name,
+                    content,
+                    manual_mapping,
+                    project.pk,
+                    is_cp_data,
+                    channel_partner_id,
+                    user=request.user,
+                    description=f'Upload {uploaded_file.name} to {project.name}',
+                    total=row_count,
+                )
+                messages.info(request, f'Importing {row_count} row(s) into {project.name} in the background.')
+                return redirect(f"{reverse('accounts:job_status', args=[job.pk])}?next={reverse('leads:list')}")
+            
+            result = import_leads(file_name, content, manual_mapping, project, request.user, is_cp_data, channel_partner_id)
+            errors = result['errors']
+            error_rows = result['error_rows']
+            headers = result['headers']
+            field_map = result['field_map']
             
             # Store error rows in session for CSV download
             error_session_id = None
@@ -3889,11 +3261,8 @@ def lead_upload(request):
                 }
                 request.session.modified = True
             
-            if leads_created > 0:
-                success_msg = f'Successfully uploaded {leads_created} lead(s)!'
-                if mapping_info:
-                    success_msg += f" {' '.join(mapping_info)}"
-                messages.success(request, success_msg)
+            if result['created'] > 0:
+                messages.success(request, upload_message(result))
             
             if errors:
                 # Check if errors are due to missing required columns
@@ -3919,13 +3288,12 @@ def lead_upload(request):
     
     # Get available projects
     if request.user.is_super_admin() or request.user.is_mandate_owner():
-        projects = Project.objects.filter(is_active=True)
+        projects = active_projects()
     else:  # Site Head
         projects = Project.objects.filter(site_head=request.user, is_active=True)
     
     # Get channel partners for CP selection dropdown
-    from channel_partners.models import ChannelPartner
-    channel_partners = ChannelPartner.objects.filter(status='active').order_by('cp_name')
+    channel_partners = active_channel_partners()
     
     context = {
         'projects': projects,
@@ -3980,9 +3348,9 @@ def lead_assign_admin(request):
             # Also do immediate assignment if requested
             immediate_assign = request.POST.get('immediate_assign', 'false') == 'true'
             if immediate_assign:
-                from django.db import transaction
+                from bridgio.db import write_atomic
                 # Use atomic transaction with row locking to prevent race conditions
-                with transaction.atomic():
+                with write_atomic():
                     # Get quotas
                     quotas = DailyAssignmentQuota.objects.filter(
                         project=project,
@@ -4089,7 +3457,16 @@ def lead_upload_errors_csv(request, session_id):
         messages.error(request, 'You do not have permission to download error files.')
         return redirect('dashboard')
     
-    error_data = request.session.get(f'lead_upload_errors_{session_id}')
+    if session_id.startswith('job-'):
+        # Failed rows of a background upload (leads.uploads.import_leads_job) live in the job result
+        from accounts.models import BackgroundJob
+        job = BackgroundJob.objects.filter(pk=session_id[4:] if session_id[4:].isdigit() else None, job_type='lead_upload').first()
+        if job is not None and (job.created_by_id == request.user.pk or request.user.is_super_admin()):
+            error_data = {'errors': job.result.get('error_rows', []), 'headers': job.result.get('headers', [])}
+        else:
+            error_data = None
+    else:
+        error_data = request.session.get(f'lead_upload_errors_{session_id}')
     if not error_data:
         messages.error(request, 'Error data not found.')
         return redirect('leads:list')
@@ -4111,7 +3488,7 @@ def lead_upload_errors_csv(request, session_id):
         writer.writerow(row_data)
     
     # Clean up session
-    del request.session[f'lead_upload_errors_{session_id}']
+    request.session.pop(f'lead_upload_errors_{session_id}', None)
     
     return response
 
@@ -4128,7 +3505,7 @@ def revisit_visit(request):
     
     # Get projects based on user role
     if request.user.is_super_admin() or request.user.is_mandate_owner():
-        projects = Project.objects.filter(is_active=True).order_by('name')
+        projects = active_projects('name')
     elif request.user.is_site_head():
         projects = Project.objects.filter(site_head=request.user, is_active=True).order_by('name')
     elif request.user.is_sourcing_manager():
@@ -4351,7 +3728,7 @@ def visit_detail(request, association_id):
             messages.error(request, 'You can only view your assigned visits.')
             return redirect('dashboard')
         elif request.user.is_sourcing_manager():
-            if not request.user.assigned_projects.filter(id=association.project.id).exists():
+            if not request.scope.is_assigned_to(association.project_id):
                 messages.error(request, 'You can only view visits in your assigned projects.')
                 return redirect('dashboard')
         elif request.user.is_site_head():
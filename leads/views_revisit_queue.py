@@ -12,6 +12,7 @@ import json
 
 from .models import Lead, LeadProjectAssociation, GlobalConfiguration
 from projects.models import Project
+from bridgio.cache import active_configurations
 
 
 @login_required
@@ -102,7 +103,7 @@ def queue_visit(request):
     assigned_projects = request.user.assigned_projects.filter(is_active=True)
     
     # Get global configurations
-    configurations = GlobalConfiguration.objects.filter(is_active=True).order_by('order', 'name')
+    configurations = active_configurations()
     
     if request.method == 'POST':
         # Handle queue visit submission
@@ -118,7 +119,7 @@ def queue_visit(request):
         project = get_object_or_404(Project, pk=project_id, is_active=True)
         
         # Check if project is assigned to telecaller
-        if project not in assigned_projects:
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You can only queue visits for your assigned projects.')
             return redirect('leads:queue_visit')
         
@@ -276,7 +277,7 @@ def mark_visit_done(request, association_id):
     
     # Check if user has permission for this project
     if request.user.is_closing_manager():
-        if association.project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(association.project_id):
             return JsonResponse({'success': False, 'error': 'You can only mark visits as done for your assigned projects.'}, status=403)
     elif request.user.is_site_head():
         if association.project.site_head != request.user:
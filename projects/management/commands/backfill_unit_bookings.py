@@ -0,0 +1,121 @@
+"""
+One-time backfill that links legacy bookings to their UnitConfiguration rows.
+
+Older bookings only stored tower_wing / floor / unit_number as text, so
+unit_selection used to regex-parse every booking of a project on each request
+to work out which units were booked. This command resolves those bookings to
+unit FKs in bulk (one query for the bookings, one per project for its units)
+so the LEGACY_BOOKING_UNIT_MATCHING fallback can stay switched off.
+
+Usage:
+    python manage.py backfill_unit_bookings --dry-run
+    python manage.py backfill_unit_bookings --project 3
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from bookings.models import Booking
+from projects.models import UnitConfiguration
+
+
+class Command(BaseCommand):
+    help = 'Link bookings that are not attached to a unit to the matching UnitConfiguration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, help='Only backfill this project id')
+        parser.add_argument('--dry-run', action='store_true', help='Report matches without saving')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk_update')
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.filter(
+            is_archived=False,
+            unit_configuration__isnull=True,
+        ).only('id', 'project_id', 'tower_wing', 'floor', 'unit_number').order_by('project_id', 'created_at')
+        if options['project']:
+            bookings = bookings.filter(project_id=options['project'])
+
+        bookings_by_project = {}
+        for booking in bookings:
+            bookings_by_project.setdefault(booking.project_id, []).append(booking)
+
+        if not bookings_by_project:
+            self.stdout.write(self.style.SUCCESS('No unlinked bookings found. Nothing to backfill.'))
+            return
+
+        now = timezone.now()
+        to_update = []
+        unparsed = 0
+        unmatched = 0
+        ambiguous = 0
+        conflicts = 0
+
+        for project_id, project_bookings in bookings_by_project.items():
+            # Every field bulk_update writes must be loaded, or each unit refetches it
+            units = UnitConfiguration.objects.filter(project_id=project_id).only(
+                'id', 'tower_number', 'floor_number', 'unit_number', 'status', 'booking_id', 'version',
+                'blocked_by', 'blocked_at', 'blocked_until', 'updated_at',
+            )
+            by_full_key = {}
+            by_floor_key = {}
+            for unit in units:
+                by_full_key[(unit.tower_number, unit.floor_number, unit.unit_number)] = unit
+                by_floor_key.setdefault((unit.floor_number, unit.unit_number), []).append(unit)
+
+            claimed = set()
+            for booking in project_bookings:
+                tower, floor, unit_number = booking.parse_unit_location()
+                if not unit_number or not floor:
+                    unparsed += 1
+                    continue
+
+                if tower:
+                    unit = by_full_key.get((tower, floor, unit_number))
+                else:
+                    # No tower info - only safe when the floor/unit pair is unique in the project
+                    candidates = by_floor_key.get((floor, unit_number), [])
+                    if len(candidates) > 1:
+                        ambiguous += 1
+                        continue
+                    unit = candidates[0] if candidates else None
+
+                if unit is None:
+                    unmatched += 1
+                    continue
+                if unit.booking_id or unit.pk in claimed:
+                    conflicts += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'  Booking #{booking.pk}: unit {unit.full_unit_number} is already linked to another booking'
+                    ))
+                    continue
+
+                claimed.add(unit.pk)
+                unit.booking_id = booking.pk
+                if unit.status in ('available', 'blocked'):
+                    unit.status = 'booked'
+                    unit.blocked_by = None
+                    unit.blocked_at = None
+                    unit.blocked_until = None
+                unit.version += 1
+                unit.updated_at = now
+                to_update.append(unit)
+
+        self.stdout.write(f'Unlinked bookings: {sum(len(b) for b in bookings_by_project.values())}')
+        self.stdout.write(f'  Matched to a unit: {len(to_update)}')
+        self.stdout.write(f'  Unparseable unit details: {unparsed}')
+        self.stdout.write(f'  No matching unit: {unmatched}')
+        self.stdout.write(f'  Ambiguous (no tower info): {ambiguous}')
+        self.stdout.write(f'  Unit already linked: {conflicts}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run - no changes saved.'))
+            return
+
+        with transaction.atomic():
+            UnitConfiguration.objects.bulk_update(
+                to_update,
+                ['booking', 'status', 'blocked_by', 'blocked_at', 'blocked_until', 'version', 'updated_at'],
+                batch_size=options['batch_size'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'Linked {len(to_update)} booking(s) to their units.'))
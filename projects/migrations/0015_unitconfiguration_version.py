@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0014_alter_unitconfiguration_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unitconfiguration',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Incremented on every status change'),
+        ),
+    ]
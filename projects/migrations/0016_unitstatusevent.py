@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('projects', '0015_unitconfiguration_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('available', 'Available'), ('reserved', 'Reserved'), ('booked', 'Booked'), ('blocked', 'Blocked'), ('maintenance', 'Under Maintenance'), ('sold', 'Sold')], max_length=20)),
+                ('blocked_until', models.DateTimeField(blank=True, help_text='Block expiry, so clients can expire holds locally', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='unit_status_events', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unit_status_events', to='projects.project')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='projects.unitconfiguration')),
+            ],
+            options={
+                'db_table': 'unit_status_events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['project', 'id'], name='unit_status_project_a45cf9_idx')],
+            },
+        ),
+    ]
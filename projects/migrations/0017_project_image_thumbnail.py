@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0016_unitstatusevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, help_text='Small copy of image for project cards (bridgio.images)', null=True, upload_to='projects/thumbs/'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def number_existing_events(apps, schema_editor):
+    """Existing events keep their id as seq, so pollers holding an old sequence carry on seamlessly"""
+    Project = apps.get_model('projects', 'Project')
+    UnitStatusEvent = apps.get_model('projects', 'UnitStatusEvent')
+    UnitStatusEvent.objects.update(seq=models.F('id'))
+    for row in UnitStatusEvent.objects.values('project_id').annotate(last=Max('id')):
+        Project.objects.filter(pk=row['project_id']).update(unit_event_seq=row['last'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0017_project_image_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='unit_event_seq',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='unitstatusevent',
+            name='seq',
+            field=models.BigIntegerField(null=True, help_text='Per-project sequence number, in commit order'),
+        ),
+        migrations.RunPython(number_existing_events, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='unitstatusevent',
+            name='seq',
+            field=models.BigIntegerField(help_text='Per-project sequence number, in commit order'),
+        ),
+        migrations.RemoveIndex(
+            model_name='unitstatusevent',
+            name='unit_status_project_a45cf9_idx',
+        ),
+        migrations.AlterModelOptions(
+            name='unitstatusevent',
+            options={'ordering': ['project', 'seq']},
+        ),
+        migrations.AlterUniqueTogether(
+            name='unitstatusevent',
+            unique_together={('project', 'seq')},
+        ),
+    ]
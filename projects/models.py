@@ -27,6 +27,10 @@ class Project(models.Model):
     
     # Project Image
     image = models.ImageField(upload_to='projects/', blank=True, null=True, help_text="Cover image for project cards and detail page")
+    image_thumbnail = models.ImageField(
+        upload_to='projects/thumbs/', blank=True, null=True, editable=False,
+        help_text="Small copy of image for project cards (bridgio.images)"
+    )
     
     # Tower and Unit Structure (for BookMyShow-style UI)
     number_of_towers = models.IntegerField(default=1, help_text="Total number of towers")
@@ -68,6 +72,9 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Last sequence number handed out to this project's UnitStatusEvents (see UnitStatusEvent.record)
+    unit_event_seq = models.BigIntegerField(default=0, editable=False)
+    
     class Meta:
         db_table = 'projects'
         ordering = ['-created_at']
@@ -75,6 +82,12 @@ class Project(models.Model):
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        # unit_event_seq only moves inside UnitStatusEvent.record - never write back a stale copy
+        from bridgio.db import fields_without_counters
+        kwargs['update_fields'] = fields_without_counters(self, ['unit_event_seq'], kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+    
     @property
     def total_residential_units(self):
         """Calculate total residential units - use TowerFloorConfig if available"""
@@ -261,6 +274,9 @@ class UnitConfiguration(models.Model):
     )
     notes = models.TextField(blank=True, help_text="Notes about this unit")
     
+    # Optimistic concurrency - bumped by every status change
+    version = models.PositiveIntegerField(default=0, help_text="Incremented on every status change")
+    
     # System fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -302,94 +318,256 @@ class UnitConfiguration(models.Model):
         """Get full unit identifier (e.g., T1-F2-U101)"""
         return f"T{self.tower_number}-F{self.floor_number}-U{self.unit_number}"
     
-    def block_unit(self, user, hours=24):
-        """Block this unit for a specified time period"""
-        from django.utils import timezone, timedelta
-        from django.db import transaction
-        
-        with transaction.atomic():
-            # Check if unit is still available
-            if not self.is_available:
-                return False, "Unit is not available for blocking"
-            
-            # Block the unit
-            self.status = 'blocked'
-            self.blocked_by = user
-            self.blocked_at = timezone.now()
-            self.blocked_until = timezone.now() + timedelta(hours=hours)
-            self.save()
+    def _conditional_update(self, values, *conditions, changed_by=None, **filters):
+        """Write values with one UPDATE guarded by the given conditions
+        
+        On success the values are copied onto this instance and the change is
+        appended to the UnitStatusEvent log in the same transaction. On failure
+        the instance is refreshed so callers see the current state. Returns
+        True when the row was changed.
+        """
+        from bridgio.db import write_atomic
+        from django.db.models import F
+        from django.utils import timezone
+        
+        now = values.pop('updated_at', None) or timezone.now()
+        with write_atomic():
+            updated = UnitConfiguration.objects.filter(*conditions, pk=self.pk, **filters).update(
+                version=F('version') + 1, updated_at=now, **values
+            )
+            if not updated:
+                self.refresh_from_db(fields=['status', 'blocked_by', 'blocked_at', 'blocked_until', 'booking', 'version'])
+                return False
             
-            return True, f"Unit blocked for {hours} hours"
+            for field, value in values.items():
+                setattr(self, field, value)
+            self.version += 1
+            self.updated_at = now
+            UnitStatusEvent.record(
+                self.project_id, [self.pk], self.status, changed_by, blocked_until=self.blocked_until,
+            )
+        return True
+    
+    @classmethod
+    def _blockable_q(cls, now):
+        """Units that can be blocked/booked: available, or blocked with an expired hold"""
+        from django.db.models import Q
+        return Q(status='available') | Q(status='blocked', blocked_until__lt=now)
+    
+    def block_unit(self, user, hours=24):
+        """Block this unit for a specified time period
+        
+        Uses a conditional UPDATE so two users racing for the same unit cannot
+        both succeed - only the statement that still sees the unit as available
+        changes the row.
+        """
+        from datetime import timedelta
+        from django.utils import timezone
+        
+        now = timezone.now()
+        values = {
+            'status': 'blocked',
+            'blocked_by': user,
+            'blocked_at': now,
+            'blocked_until': now + timedelta(hours=hours),
+            'updated_at': now,
+        }
+        if not self._conditional_update(values, UnitConfiguration._blockable_q(now), changed_by=user, is_excluded=False):
+            return False, "Unit is not available for blocking"
+        
+        return True, f"Unit blocked for {hours} hours"
     
     def unblock_unit(self, user=None):
-        """Unblock this unit"""
-        from django.db import transaction
+        """Unblock this unit
         
-        with transaction.atomic():
-            # Only allow unblocking by the same user who blocked it or admin
-            if user and self.blocked_by and self.blocked_by != user and not user.is_super_admin():
-                return False, "You can only unblock units you blocked"
-            
-            self.status = 'available'
-            self.blocked_by = None
-            self.blocked_at = None
-            self.blocked_until = None
-            self.save(update_fields=['status', 'blocked_by', 'blocked_at', 'blocked_until'])
-            
-            return True, "Unit unblocked successfully"
+        The UPDATE is guarded by the version this instance was loaded with, so a
+        unit that was re-blocked by someone else in the meantime is left alone.
+        """
+        # Only allow unblocking by the same user who blocked it or admin
+        if user and self.blocked_by_id and self.blocked_by_id != user.pk and not user.is_super_admin():
+            return False, "You can only unblock units you blocked"
+        
+        values = {
+            'status': 'available',
+            'blocked_by': None,
+            'blocked_at': None,
+            'blocked_until': None,
+        }
+        if not self._conditional_update(values, changed_by=user, status='blocked', version=self.version):
+            return False, "Unit is no longer blocked or was changed by someone else"
+        
+        return True, "Unit unblocked successfully"
     
-    def book_unit(self, booking):
-        """Mark this unit as booked"""
-        from django.db import transaction
+    def book_unit(self, booking, user=None):
+        """Mark this unit as booked (atomically - fails if someone else got it first)"""
+        from django.utils import timezone
         
-        with transaction.atomic():
-            if not self.is_available:
-                return False, "Unit is not available for booking"
-            
-            self.status = 'booked'
-            self.booking = booking
-            self.blocked_by = None
-            self.blocked_at = None
-            self.blocked_until = None
-            self.save()
-            
-            return True, "Unit booked successfully"
+        now = timezone.now()
+        values = {
+            'status': 'booked',
+            'booking': booking,
+            'blocked_by': None,
+            'blocked_at': None,
+            'blocked_until': None,
+            'updated_at': now,
+        }
+        if not self._conditional_update(values, UnitConfiguration._blockable_q(now), changed_by=user, is_excluded=False):
+            return False, "Unit is not available for booking"
+        
+        return True, "Unit booked successfully"
     
-    def release_unit(self):
+    def release_unit(self, user=None):
         """Release this unit back to available"""
-        from django.db import transaction
+        values = {
+            'status': 'available',
+            'booking': None,
+            'blocked_by': None,
+            'blocked_at': None,
+            'blocked_until': None,
+        }
+        self._conditional_update(values, changed_by=user)
         
-        with transaction.atomic():
-            self.status = 'available'
-            self.booking = None
-            self.blocked_by = None
-            self.blocked_at = None
-            self.blocked_until = None
-            self.save()
-            
-            return True, "Unit released successfully"
+        return True, "Unit released successfully"
     
     @classmethod
-    def get_available_units(cls, project):
-        """Get all available units for a project"""
+    def _bulk_outcomes(cls, project, unit_ids, stamp, success_status, failure_message):
+        """Build {unit_id: (success, message)} for a bulk action with one SELECT
+        
+        A unit counts as changed by the bulk UPDATE when it carries that
+        statement's updated_at stamp and the expected new status.
+        """
+        outcomes = {}
+        rows = cls.objects.filter(project=project, pk__in=unit_ids).values(
+            'pk', 'tower_number', 'floor_number', 'unit_number', 'status', 'updated_at',
+        )
+        for row in rows:
+            label = f"T{row['tower_number']}-F{row['floor_number']}-U{row['unit_number']}"
+            if row['updated_at'] == stamp and row['status'] == success_status:
+                outcomes[row['pk']] = (True, label)
+            else:
+                outcomes[row['pk']] = (False, f"{label}: {failure_message(row)}")
+        return outcomes
+    
+    @classmethod
+    def bulk_block(cls, project, unit_ids, user, hours=24):
+        """Block many units with a single conditional UPDATE
+        
+        Every unit that is still available is blocked by one statement; units
+        taken in the meantime are left untouched. Returns
+        {unit_id: (success, message)}.
+        """
+        from datetime import timedelta
+        from bridgio.db import write_atomic
+        from django.db.models import F
         from django.utils import timezone
+        
         now = timezone.now()
+        with write_atomic():
+            cls.objects.filter(
+                cls._blockable_q(now),
+                project=project,
+                pk__in=unit_ids,
+                is_excluded=False,
+            ).update(
+                status='blocked',
+                blocked_by=user,
+                blocked_at=now,
+                blocked_until=now + timedelta(hours=hours),
+                version=F('version') + 1,
+                updated_at=now,
+            )
+            outcomes = cls._bulk_outcomes(
+                project, unit_ids, now, 'blocked',
+                lambda row: f"not available ({row['status']})",
+            )
+            UnitStatusEvent.record(
+                project, [unit_id for unit_id, (ok, _) in outcomes.items() if ok],
+                'blocked', user, blocked_until=now + timedelta(hours=hours),
+            )
+            return outcomes
+    
+    @classmethod
+    def bulk_unblock(cls, project, unit_ids, user):
+        """Unblock many units with a single conditional UPDATE
         
-        # Clear expired blocks
-        cls.objects.filter(
-            project=project,
-            status='blocked',
-            blocked_until__lt=now
-        ).update(
-            status='available',
-            blocked_by=None,
-            blocked_at=None,
-            blocked_until=None
+        Non-admins can only release their own blocks. Returns
+        {unit_id: (success, message)}.
+        """
+        from bridgio.db import write_atomic
+        from django.db.models import F, Q
+        from django.utils import timezone
+        
+        now = timezone.now()
+        with write_atomic():
+            targets = cls.objects.filter(project=project, pk__in=unit_ids, status='blocked')
+            if not user.is_super_admin():
+                targets = targets.filter(Q(blocked_by=user) | Q(blocked_by__isnull=True))
+            targets.update(
+                status='available',
+                blocked_by=None,
+                blocked_at=None,
+                blocked_until=None,
+                version=F('version') + 1,
+                updated_at=now,
+            )
+            outcomes = cls._bulk_outcomes(
+                project, unit_ids, now, 'available',
+                lambda row: 'blocked by another user' if row['status'] == 'blocked' else f"not blocked ({row['status']})",
+            )
+            UnitStatusEvent.record(
+                project, [unit_id for unit_id, (ok, _) in outcomes.items() if ok], 'available', user,
+            )
+            return outcomes
+    
+    @classmethod
+    def inventory_state(cls, project, now=None, pricing_key=''):
+        """Return (etag, last_modified) describing the current inventory of a project
+        
+        Every status change bumps a unit's version and updated_at, so the sum of
+        versions plus the latest updated_at changes whenever the grid would. A
+        block that runs out changes no row, so the number of expired blocks (as of
+        `now`) is part of the tag too. Prices live on the configurations and area
+        types, which carry no timestamp - callers pass a digest of what they render
+        from them as `pricing_key`.
+        """
+        from django.db.models import Count, Max, Q, Sum
+        
+        now = now or timezone.now()
+        expired = Q(status='blocked', blocked_until__lt=now)
+        state = cls.objects.filter(project=project).aggregate(
+            unit_count=Count('id'),
+            version_total=Sum('version'),
+            last_change=Max('updated_at'),
+            expired_blocks=Count('id', filter=expired),
+            last_expiry=Max('blocked_until', filter=expired),
+        )
+        last_modified = max(
+            stamp for stamp in (project.updated_at, state['last_change'], state['last_expiry']) if stamp
+        )
+        
+        etag = '"inv-{}-{}-{}-{}-{}{}"'.format(
+            project.pk,
+            state['unit_count'],
+            state['version_total'] or 0,
+            state['expired_blocks'],
+            int(last_modified.timestamp() * 1000000),
+            f'-{pricing_key}' if pricing_key else '',
         )
+        return etag, last_modified
+    
+    @classmethod
+    def get_available_units(cls, project):
+        """Get all available units for a project
+        
+        Units whose block has expired count as available. This is a pure read -
+        the stale block is overwritten by whoever blocks or books the unit next.
+        """
+        from django.utils import timezone
+        now = timezone.now()
         
         return cls.objects.filter(
+            cls._blockable_q(now),
             project=project,
-            status='available',
             is_excluded=False
         ).order_by('tower_number', 'floor_number', 'unit_number')
     
@@ -416,6 +594,74 @@ class UnitConfiguration(models.Model):
         return None
 
 
+class UnitStatusEvent(models.Model):
+    """Append-only log of unit status changes - backs the live availability feed
+    
+    Clients poll for events with a seq greater than the last one they saw. seq
+    is a per-project counter (Project.unit_event_seq) bumped in the same
+    transaction that writes the events: the bump holds the project row lock
+    until commit, so sequence numbers become visible in the order they were
+    handed out. An auto-increment id gives no such guarantee - id N+1 can
+    commit before id N, and a poller that has moved past N+1 never sees N.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='unit_status_events')
+    seq = models.BigIntegerField(help_text="Per-project sequence number, in commit order")
+    unit = models.ForeignKey(UnitConfiguration, on_delete=models.CASCADE, related_name='status_events')
+    status = models.CharField(max_length=20, choices=UnitConfiguration.STATUS_CHOICES)
+    blocked_until = models.DateTimeField(null=True, blank=True, help_text="Block expiry, so clients can expire holds locally")
+    changed_by = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='unit_status_events'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'unit_status_events'
+        ordering = ['project', 'seq']
+        unique_together = ['project', 'seq']
+    
+    def __str__(self):
+        return f"#{self.seq} {self.project_id} - Unit {self.unit_id} -> {self.status}"
+    
+    @classmethod
+    def record(cls, project, unit_ids, status, changed_by=None, blocked_until=None):
+        """Log the same status change for many units with one INSERT
+        
+        Call it inside the transaction that changed the units, so the events
+        commit (and become visible to the feed) together with the change.
+        """
+        from bridgio.db import write_atomic
+        from django.db.models import F
+        
+        if not unit_ids:
+            return
+        project_id = getattr(project, 'pk', project)
+        with write_atomic():
+            # The UPDATE locks the project row until commit - concurrent writers queue here
+            Project.objects.filter(pk=project_id).update(unit_event_seq=F('unit_event_seq') + len(unit_ids))
+            last = Project.objects.filter(pk=project_id).values_list('unit_event_seq', flat=True).get()
+            first = last - len(unit_ids) + 1
+            cls.objects.bulk_create([
+                cls(
+                    project_id=project_id,
+                    seq=first + offset,
+                    unit_id=unit_id,
+                    status=status,
+                    blocked_until=blocked_until,
+                    changed_by=changed_by,
+                )
+                for offset, unit_id in enumerate(unit_ids)
+            ])
+    
+    @classmethod
+    def latest_sequence(cls, project):
+        """Highest committed sequence number for a project (0 when nothing has changed yet)"""
+        return Project.objects.filter(pk=getattr(project, 'pk', project)).values_list('unit_event_seq', flat=True).first() or 0
+
+
 class TowerFloorConfig(models.Model):
     """Flexible tower/floor configuration - allows different floors per tower and units per floor"""
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='tower_floor_configs')
@@ -0,0 +1,13 @@
+"""Invalidate the 'projects' cache domain (bridgio.cache) when a project changes"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bridgio.cache import invalidate_on_commit
+
+from .models import Project
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, **kwargs):
+    invalidate_on_commit('projects')
@@ -1,3 +1,136 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import OperationalError, connections
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from bridgio.testing import QueryBudgetTestCase
+from projects.models import ConfigurationAreaType, Project, ProjectConfiguration, UnitConfiguration
+
+
+class ProjectQueryBudgetTests(QueryBudgetTestCase):
+    url_names = ['projects:unit_selection']
+
+
+class SeatMapETagTests(TestCase):
+    """The seat map ETag must change whenever the payload would, not only when a unit row is written"""
+
+    def setUp(self):
+        owner = User.objects.create_user(username='seat_owner', role='mandate_owner')
+        self.project = Project.objects.create(name='Seats', builder_name='Seats', location='-', mandate_owner=owner)
+        self.configuration = ProjectConfiguration.objects.create(project=self.project, name='2BHK', price_per_sqft=5000)
+        area_type = ConfigurationAreaType.objects.create(configuration=self.configuration, carpet_area=600, buildup_area=750)
+        self.unit = UnitConfiguration.objects.create(
+            project=self.project, floor_number=1, unit_number=101, area_type=area_type,
+        )
+        self.client.force_login(owner)
+        self.url = reverse('projects:unit_seat_map_api', args=[self.project.pk])
+
+    def etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_unchanged_inventory_is_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag())
+        self.assertEqual(response.status_code, 304)
+
+    def test_expired_block_changes_etag(self):
+        UnitConfiguration.objects.filter(pk=self.unit.pk).update(
+            status='blocked', blocked_until=timezone.now() + timedelta(hours=1),
+        )
+        etag = self.etag()
+        # The block runs out (queryset update() leaves version and updated_at alone, like the clock does)
+        UnitConfiguration.objects.filter(pk=self.unit.pk).update(blocked_until=timezone.now() - timedelta(seconds=1))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['units']['status'][0], response.json()['status_codes'].index('available'))
+
+    def test_price_change_changes_etag(self):
+        etag = self.etag()
+        self.configuration.price_per_sqft = 5500
+        self.configuration.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class UnitBlockingConcurrencyTests(TransactionTestCase):
+    """Closing managers racing for the same units - every unit ends up blocked exactly once"""
+
+    threads = 6
+    units = 40
+
+    def setUp(self):
+        owner = User.objects.create_user(username='race_owner', role='mandate_owner')
+        self.closers = [
+            User.objects.create_user(username=f'race_closer_{i}', role='closing_manager')
+            for i in range(self.threads)
+        ]
+        self.project = Project.objects.create(name='Race', builder_name='Race', location='-', mandate_owner=owner)
+        UnitConfiguration.objects.bulk_create([
+            UnitConfiguration(project=self.project, tower_number=1, floor_number=1 + i // 10, unit_number=100 + i)
+            for i in range(self.units)
+        ])
+        self.unit_ids = list(UnitConfiguration.objects.filter(project=self.project).values_list('pk', flat=True))
+
+    def race(self, block):
+        """Run block(closer, unit_ids) -> units won in one thread per closer, all starting together"""
+        wins = {}
+        lock_errors = []
+        barrier = threading.Barrier(self.threads)
+
+        def worker(index, closer):
+            order = self.unit_ids[index:] + self.unit_ids[:index]
+            try:
+                barrier.wait()
+                wins[closer.pk] = block(closer, order, lock_errors)
+            except OperationalError as e:
+                lock_errors.append(str(e))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i, closer)) for i, closer in enumerate(self.closers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return wins, lock_errors
+
+    def assert_blocked_once(self, wins, lock_errors):
+        blocked = UnitConfiguration.objects.filter(project=self.project, status='blocked')
+        held = dict(blocked.values_list('blocked_by_id').annotate(count=Count('id')))
+        self.assertEqual(sum(wins.values()), blocked.count())
+        for closer_id, count in wins.items():
+            self.assertEqual(held.get(closer_id, 0), count, f'closer #{closer_id}')
+        # write_atomic (BEGIN IMMEDIATE) queues writers on the busy timeout instead of failing them
+        self.assertEqual(lock_errors, [])
+        self.assertEqual(blocked.count(), self.units)
+        # One 'blocked' event per unit, however many threads tried, numbered without gaps
+        seqs = list(self.project.unit_status_events.filter(status='blocked').values_list('seq', flat=True))
+        self.assertEqual(len(seqs), blocked.count())
+        self.assertEqual(seqs, list(range(1, len(seqs) + 1)))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.unit_event_seq, len(seqs))
+
+    def test_block_unit(self):
+        def block(closer, order, lock_errors):
+            won = 0
+            for unit in UnitConfiguration.objects.filter(pk__in=order):
+                try:
+                    won += unit.block_unit(closer)[0]
+                except OperationalError as e:
+                    lock_errors.append(str(e))
+            return won
+
+        self.assert_blocked_once(*self.race(block))
+
+    def test_bulk_block(self):
+        def block(closer, order, lock_errors):
+            outcomes = UnitConfiguration.bulk_block(self.project, order, closer)
+            return sum(1 for success, _ in outcomes.values() if success)
+
+        self.assert_blocked_once(*self.race(block))
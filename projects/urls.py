@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import project_list, project_create, project_detail, project_edit, project_delete, project_archive_data, migrate_leads, unit_selection, assign_employees, unit_calculation, search_visited_leads, multi_unit_calculation
-from .views_units import unit_inventory, block_unit, unblock_unit, update_unit_status, unit_availability_api, bulk_unit_actions, revoke_booked_unit
+from .views_units import unit_inventory, block_unit, unblock_unit, update_unit_status, unit_availability_api, unit_availability_changes_api, unit_seat_map_api, bulk_unit_actions, revoke_booked_unit
 
 app_name = 'projects'
 
@@ -24,6 +24,8 @@ urlpatterns = [
     path('<int:pk>/units/<int:unit_id>/update-status/', update_unit_status, name='update_unit_status'),
     path('<int:pk>/units/<int:unit_id>/revoke/', revoke_booked_unit, name='revoke_booked_unit'),
     path('<int:pk>/units/availability/', unit_availability_api, name='unit_availability_api'),
+    path('<int:pk>/units/availability/changes/', unit_availability_changes_api, name='unit_availability_changes_api'),
+    path('<int:pk>/units/seat-map/', unit_seat_map_api, name='unit_seat_map_api'),
     path('<int:pk>/units/bulk-actions/', bulk_unit_actions, name='bulk_unit_actions'),
 ]
 
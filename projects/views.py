@@ -4,13 +4,16 @@ from django.contrib import messages
 from django.db.models import Count, Sum, Q
 from django.http import JsonResponse, HttpResponse
 from django.urls import reverse
+from django.conf import settings
 from django.views.decorators.http import require_http_methods
+from django.utils import timezone
 from .models import Project, ProjectConfiguration, PaymentMilestone, UnitConfiguration, ConfigurationAreaType
 from accounts.models import User
 from leads.models import Lead
 from bookings.models import Booking, Payment
 from decimal import Decimal
 from leads.models import DailyAssignmentQuota
+from bridgio.images import schedule_processing
 
 
 def get_floor_display_name(floor_num):
@@ -290,6 +293,7 @@ def project_create(request):
             if 'image' in request.FILES:
                 project.image = request.FILES['image']
                 project.save()
+                schedule_processing(project, 'image', user=request.user)
             
             # Create/Update Highrise Pricing
             from projects.models import HighrisePricing
@@ -519,12 +523,12 @@ def project_detail(request, pk):
             return redirect('projects:list')
     elif request.user.is_closing_manager() or request.user.is_sourcing_manager():
         # Check if user is assigned to this project
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     elif request.user.is_telecaller():
         # Telecallers can view projects they're assigned to
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     else:
@@ -677,8 +681,13 @@ def project_edit(request, pk):
             
             if 'image' in request.FILES:
                 project.image = request.FILES['image']
+                # Lists would show the old image's thumbnail until the new one is processed
+                if project.image_thumbnail:
+                    project.image_thumbnail.delete(save=False)
             
             project.save()
+            if 'image' in request.FILES:
+                schedule_processing(project, 'image', user=request.user)
             return JsonResponse({'success': True, 'step': 2})
         
         elif step == '2':
@@ -1281,11 +1290,11 @@ def unit_selection(request, pk):
             return redirect('projects:list')
     elif request.user.is_closing_manager() or request.user.is_sourcing_manager():
         # Check if user is assigned to this project
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     elif request.user.is_telecaller():
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     else:
@@ -1307,27 +1316,17 @@ def unit_selection(request, pk):
     # Get all configurations with area types for filtering
     configurations = project.configurations.all().prefetch_related('area_types')
     
-    # Get bookings to show which units are booked
-    from bookings.models import Booking
+    # Legacy fallback: bookings that were never linked via UnitConfiguration.booking are
+    # matched by parsing tower_wing/floor/unit_number. Run `manage.py backfill_unit_bookings`
+    # once and leave LEGACY_BOOKING_UNIT_MATCHING off so status comes from the unit rows only.
     booked_units = {}
-    for booking in Booking.objects.filter(project=project, is_archived=False).select_related('lead', 'project', 'channel_partner'):
-        # Match booking to unit by tower, floor, and unit number
-        # Booking has: tower_wing, unit_number, floor
-        # UnitConfiguration has: tower_number, floor_number, unit_number
-        try:
-            # Try to parse unit_number from booking (could be "101", "201", etc.)
-            booking_unit_num = int(booking.unit_number) if booking.unit_number and booking.unit_number.isdigit() else None
-            booking_floor = booking.floor
-            
-            # Extract tower number from tower_wing (could be "Tower 1", "1", "Tower1", etc.)
-            booking_tower = None
-            if booking.tower_wing:
-                # Try to extract number from tower_wing string
-                import re
-                tower_match = re.search(r'\d+', str(booking.tower_wing))
-                if tower_match:
-                    booking_tower = int(tower_match.group())
-            
+    if settings.LEGACY_BOOKING_UNIT_MATCHING:
+        from bookings.models import Booking
+        legacy_bookings = Booking.objects.filter(
+            project=project, is_archived=False, unit_configuration__isnull=True
+        ).select_related('lead', 'project', 'channel_partner')
+        for booking in legacy_bookings:
+            booking_tower, booking_floor, booking_unit_num = booking.parse_unit_location()
             if booking_unit_num and booking_floor:
                 # Include tower in the key to avoid matching units from different towers
                 if booking_tower:
@@ -1336,9 +1335,8 @@ def unit_selection(request, pk):
                     # Fallback: if no tower info, use floor and unit (less accurate but better than nothing)
                     key = f"{booking_floor}_{booking_unit_num}"
                 booked_units[key] = booking
-        except (ValueError, AttributeError):
-            # If we can't parse, skip this booking
-            pass
+    
+    now = timezone.now()
     
     # Organize units by tower and floor
     units_by_tower = {}
@@ -1385,14 +1383,13 @@ def unit_selection(request, pk):
                 'area_display': area_type.get_display_name(),
             }
         
-        # Check unit status using our new unit status system
-        # The unit_config now has status, booking, and blocked_by fields
+        # Check unit status using our unit status system
+        # The unit_config has status, booking, and blocked_by fields; an expired block reads as available
         unit_status = unit_config.status
-        is_booked = unit_config.status == 'booked'
-        is_blocked = unit_config.status == 'blocked'
-        is_available = unit_config.is_available  # This checks for block expiration
+        if unit_status == 'blocked' and unit_config.blocked_until and unit_config.blocked_until < now:
+            unit_status = 'available'
         
-        # Also check legacy booking data for backward compatibility
+        # Also check legacy booking data for backward compatibility (only when the flag is on)
         booking_key = f"{unit_config.tower_number}_{unit_config.floor_number}_{unit_config.unit_number}"
         fallback_key = f"{unit_config.floor_number}_{unit_config.unit_number}"
         legacy_booked = booking_key in booked_units or fallback_key in booked_units
@@ -1424,6 +1421,26 @@ def unit_selection(request, pk):
     return render(request, 'projects/unit_selection.html', context)
 
 
+def _duplicate_leads_message(result, project, target_project):
+    message = f"Successfully duplicated {result['created']} lead(s) to {target_project.name}. Original leads remain in {project.name}."
+    if result['skipped']:
+        message += f" {result['skipped']} lead(s) were already in {target_project.name}."
+    return message
+
+
+def _duplicate_leads_job(job, source_project_id, target_project_id, lead_ids):
+    """Background job body for migrate_leads"""
+    from leads.models import LeadProjectAssociation
+    project = Project.objects.get(pk=source_project_id)
+    target_project = Project.objects.get(pk=target_project_id)
+    result = LeadProjectAssociation.duplicate_to_project(
+        project, target_project, job.created_by, lead_ids,
+        progress=lambda done, total: job.set_progress(done, total),
+    )
+    result['message'] = _duplicate_leads_message(result, project, target_project)
+    return result
+
+
 @login_required
 def migrate_leads(request, pk):
     """Duplicate leads from one project to another - Super Admin and Mandate Owners only"""
@@ -1443,89 +1460,36 @@ def migrate_leads(request, pk):
         # Get selected lead IDs or duplicate all if none selected
         from leads.models import LeadProjectAssociation
         selected_lead_ids = request.POST.getlist('lead_ids')
+        lead_ids = [int(lead_id) for lead_id in selected_lead_ids if lead_id.isdigit()] if selected_lead_ids else None
         
         # Get associations for the source project
-        if selected_lead_ids:
+        associations_to_migrate = LeadProjectAssociation.objects.filter(project=project, is_archived=False)
+        if lead_ids is not None:
             # Duplicate only selected leads
-            associations_to_migrate = LeadProjectAssociation.objects.filter(
-                project=project,
-                lead_id__in=selected_lead_ids,
-                is_archived=False
-            )
-        else:
-            # Duplicate all leads if none selected
-            associations_to_migrate = LeadProjectAssociation.objects.filter(
-                project=project,
-                is_archived=False
-            )
+            associations_to_migrate = associations_to_migrate.filter(lead_id__in=lead_ids)
         
         count = associations_to_migrate.count()
-        if count > 0:
-            # Duplicate leads instead of transferring them
-            duplicated_count = 0
-            for association in associations_to_migrate:
-                lead = association.lead
-                
-                # Get or create the lead (deduplicate by phone)
-                lead_defaults = {
-                    # Client Information
-                    'name': lead.name,
-                    'email': lead.email,
-                    'age': lead.age,
-                    'gender': lead.gender,
-                    'locality': lead.locality,
-                    'current_residence': lead.current_residence,
-                    'occupation': lead.occupation,
-                    'company_name': lead.company_name,
-                    'designation': lead.designation,
-                    # Requirement Details
-                    'budget': lead.budget,
-                    'purpose': lead.purpose,
-                    'visit_type': lead.visit_type,
-                    'is_first_visit': lead.is_first_visit,
-                    'how_did_you_hear': lead.how_did_you_hear,
-                    'visit_source': lead.visit_source,
-                    # CP Information
-                    'channel_partner': lead.channel_partner,
-                    'cp_firm_name': lead.cp_firm_name,
-                    'cp_name': lead.cp_name,
-                    'cp_phone': lead.cp_phone,
-                    'cp_rera_number': lead.cp_rera_number,
-                    # Notes
-                    'notes': f"[Duplicated from {project.name}] {lead.notes}" if lead.notes else f"[Duplicated from {project.name}]",
-                    # System Metadata
-                    'created_by': request.user,
-                }
-                new_lead, lead_created = Lead.objects.get_or_create(
-                    phone=lead.phone,
-                    defaults=lead_defaults
-                )
-                
-                # Copy configurations if they exist
-                if lead.configurations.exists():
-                    new_lead.configurations.set(lead.configurations.all())
-                
-                # Create new association for target project
-                LeadProjectAssociation.objects.get_or_create(
-                    lead=new_lead,
-                    project=target_project,
-                    defaults={
-                        'status': 'new',  # Reset to new for the duplicate
-                        'is_pretagged': False,  # Reset pretagging
-                        'pretag_status': '',
-                        'phone_verified': False,
-                        'assigned_to': None,
-                        'assigned_at': None,
-                        'assigned_by': None,
-                        'notes': f"[Duplicated from {project.name}] {association.notes}" if association.notes else f"[Duplicated from {project.name}]",
-                        'created_by': request.user,
-                    }
-                )
-                duplicated_count += 1
-            
-            messages.success(request, f'Successfully duplicated {duplicated_count} lead(s) to {target_project.name}. Original leads remain in {project.name}.')
-        else:
+        if count == 0:
             messages.warning(request, 'No leads selected for duplication.')
+            return redirect('projects:detail', pk=project.pk)
+        
+        # Large projects are duplicated on the background job runner with a progress page
+        if count > settings.LEAD_DUPLICATION_SYNC_LIMIT:
+            from accounts.jobs import start_job
+            job = start_job(
+                'duplicate_leads',
+                _duplicate_leads_job,
+                project.pk,
+                target_project.pk,
+                lead_ids,
+                user=request.user,
+                description=f'Duplicate leads from {project.name} to {target_project.name}',
+            )
+            messages.info(request, f'Duplicating leads to {target_project.name} in the background.')
+            return redirect(f"{reverse('accounts:job_status', args=[job.pk])}?next={reverse('projects:detail', args=[project.pk])}")
+        
+        result = LeadProjectAssociation.duplicate_to_project(project, target_project, request.user, lead_ids)
+        messages.success(request, _duplicate_leads_message(result, project, target_project))
         
         return redirect('projects:detail', pk=project.pk)
     
@@ -1635,11 +1599,11 @@ def unit_calculation(request, pk, unit_id):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     elif request.user.is_closing_manager() or request.user.is_sourcing_manager():
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     elif request.user.is_telecaller():
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     else:
@@ -1790,11 +1754,11 @@ def multi_unit_calculation(request, pk):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     elif request.user.is_closing_manager() or request.user.is_sourcing_manager():
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     elif request.user.is_telecaller():
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     else:
@@ -2055,11 +2019,23 @@ def project_archive_data(request, pk):
     from leads.models import LeadProjectAssociation
     from bookings.models import Booking
     
+    # Bulk .update() skips auto_now - bump updated_at so the incremental report rollup
+    # (DailyMetricsRollup.dirty_days) recomputes the days these rows count on
+    now = timezone.now()
+    
     # Archive all bookings
-    bookings_count = Booking.objects.filter(project=project, is_archived=False).update(is_archived=True)
+    bookings_count = Booking.objects.filter(project=project, is_archived=False).update(is_archived=True, updated_at=now)
     
     # Archive all lead associations
-    associations_count = LeadProjectAssociation.objects.filter(project=project, is_archived=False).update(is_archived=True)
+    associations_count = LeadProjectAssociation.objects.filter(project=project, is_archived=False).update(
+        is_archived=True, updated_at=now
+    )
+    
+    # Bulk .update() skips the signals that maintain the CP counters and invalidate cached stats
+    from channel_partners.models import ChannelPartnerStats
+    from bridgio.cache import invalidate
+    ChannelPartnerStats.refresh(project_ids=[project.pk])
+    invalidate('leads', 'cps')
     
     messages.success(request, f'Archived {bookings_count} booking(s) and {associations_count} lead association(s) for project "{project.name}". You can now delete the project.')
     return redirect('projects:detail', pk=project.pk)
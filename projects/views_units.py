@@ -1,13 +1,19 @@
+import hashlib
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count, Sum
+from django.db.models import Q, Count, Sum, F
 from django.utils import timezone
 from django.core.paginator import Paginator
 from django.http import JsonResponse
-from .models import Project, UnitConfiguration
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .models import Project, UnitConfiguration, ConfigurationAreaType, UnitStatusEvent
 from bookings.models import Booking
 from accounts.models import User
+from bridgio.db import write_atomic
 
 
 @login_required
@@ -23,7 +29,7 @@ def unit_inventory(request, pk):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     elif request.user.is_closing_manager() or request.user.is_sourcing_manager():
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             messages.error(request, 'You do not have permission to view this project.')
             return redirect('projects:list')
     else:
@@ -176,7 +182,11 @@ def update_unit_status(request, pk, unit_id):
                 unit.blocked_at = None
                 unit.blocked_until = None
             
-            unit.save()
+            unit.version = F('version') + 1
+            # The unit and its status event commit together, or the feed misses the change
+            with write_atomic():
+                unit.save()
+                UnitStatusEvent.record(project, [unit.pk], new_status, request.user, blocked_until=unit.blocked_until)
             messages.success(request, f'Unit status updated to {unit.get_status_display()}.')
         else:
             messages.error(request, 'Invalid status selected.')
@@ -191,14 +201,16 @@ def unit_availability_api(request, pk):
     
     # Permission check
     if request.user.is_telecaller():
-        if project not in request.user.assigned_projects.all():
+        if not request.scope.is_assigned_to(project):
             return JsonResponse({'error': 'Permission denied'}, status=403)
     elif not (request.user.is_closing_manager() or request.user.is_sourcing_manager() or 
               request.user.is_site_head() or request.user.is_super_admin() or request.user.is_mandate_owner()):
         return JsonResponse({'error': 'Permission denied'}, status=403)
     
     # Get available units
-    available_units = UnitConfiguration.get_available_units(project)
+    available_units = UnitConfiguration.get_available_units(project).select_related(
+        'area_type', 'area_type__configuration'
+    )
     
     # Format for API response
     units_data = []
@@ -211,16 +223,187 @@ def unit_availability_api(request, pk):
             'unit_number': unit.unit_number,
             'area_type': unit.area_type.configuration.name if unit.area_type else None,
             'carpet_area': unit.area_type.carpet_area if unit.area_type else None,
-            'price': unit.area_type.base_price if unit.area_type else None,
+            'price': unit.area_type.calculate_agreement_value() if unit.area_type else None,
         }
         units_data.append(unit_data)
     
     return JsonResponse({
         'available_units': units_data,
-        'total_available': len(units_data)
+        'total_available': len(units_data),
+        # Sequence to hand to the change feed for incremental updates from here on
+        'seq': UnitStatusEvent.latest_sequence(project),
     })
 
 
+@login_required
+def unit_availability_changes_api(request, pk):
+    """Incremental availability feed - unit status changes since a sequence number
+    
+    Sales screens poll `?since=<seq>` with the last sequence they saw and get back
+    only the units whose status changed (latest change per unit), plus the new
+    sequence to poll with next. Without `since` only the current sequence is returned.
+    """
+    project = get_object_or_404(Project, pk=pk)
+    
+    # Permission check - same audience as unit_availability_api
+    if request.user.is_telecaller():
+        if not request.scope.is_assigned_to(project):
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+    elif not (request.user.is_closing_manager() or request.user.is_sourcing_manager() or 
+              request.user.is_site_head() or request.user.is_super_admin() or request.user.is_mandate_owner()):
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    since = request.GET.get('since', '')
+    if not since.isdigit():
+        return JsonResponse({'seq': UnitStatusEvent.latest_sequence(project), 'changes': [], 'has_more': False})
+    
+    since = int(since)
+    limit = 500
+    events = list(
+        UnitStatusEvent.objects.filter(project=project, seq__gt=since).order_by('seq').values_list(
+            'seq', 'unit_id', 'status', 'blocked_until'
+        )[:limit + 1]
+    )
+    has_more = len(events) > limit
+    events = events[:limit]
+    
+    # Collapse to the latest change per unit
+    latest = {}
+    for seq, unit_id, status, blocked_until in events:
+        latest[unit_id] = {
+            'seq': seq,
+            'unit_id': unit_id,
+            'status': status,
+            'blocked_until': blocked_until.isoformat() if blocked_until else None,
+        }
+    
+    return JsonResponse({
+        'seq': events[-1][0] if events else since,
+        'changes': sorted(latest.values(), key=lambda change: change['seq']),
+        'has_more': has_more,
+    })
+
+
+# Status codes used by the seat map - index in this list is what the API sends per unit
+SEAT_MAP_STATUS_CODES = [code for code, _ in UnitConfiguration.STATUS_CHOICES] + ['excluded']
+
+
+@login_required
+def unit_seat_map_api(request, pk):
+    """Compact columnar JSON of the unit grid for the BookMyShow-style selection page
+    
+    Returns parallel arrays (one entry per unit) instead of nested objects, plus a
+    lookup table of price buckets (one per configuration area type). Responses carry
+    an ETag/Last-Modified derived from the project's inventory version, expired blocks and
+    prices, so polling clients get a 304 while nothing has changed.
+    """
+    project = get_object_or_404(Project, pk=pk)
+    
+    # Permission check - same audience as the unit selection page
+    if request.user.is_super_admin() or request.user.is_mandate_owner():
+        pass
+    elif request.user.is_site_head():
+        if project.site_head_id != request.user.pk:
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+    elif request.user.is_closing_manager() or request.user.is_sourcing_manager() or request.user.is_telecaller():
+        if not request.scope.is_assigned_to(project):
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+    else:
+        return JsonResponse({'error': 'Permission denied'}, status=403)
+    
+    # Price buckets - pricing only depends on the area type, so compute it once per area type.
+    # Built before the conditional check: price edits don't touch any unit row, so a digest
+    # of the buckets goes into the ETag.
+    price_buckets = []
+    bucket_index = {}
+    area_types = ConfigurationAreaType.objects.filter(
+        configuration__project=project
+    ).select_related('configuration').order_by('configuration__name', 'carpet_area')
+    for area_type in area_types:
+        cost_breakdown = area_type.calculate_total_cost()
+        agreement_value = cost_breakdown['agreement_value'] if cost_breakdown else None
+        bucket_index[area_type.pk] = len(price_buckets)
+        price_buckets.append({
+            'label': area_type.get_display_name(),
+            'configuration_id': area_type.configuration_id,
+            'carpet_area': float(area_type.carpet_area),
+            'agreement_value': float(agreement_value) if agreement_value else None,
+            'total_cost': float(cost_breakdown['total']) if cost_breakdown else None,
+        })
+    pricing_key = hashlib.md5(
+        json.dumps([bucket_index, price_buckets], sort_keys=True).encode()
+    ).hexdigest()[:12]
+    
+    # One `now` for the tag and the payload, so an expiring block can't slip between them
+    now = timezone.now()
+    etag, last_modified = UnitConfiguration.inventory_state(project, now=now, pricing_key=pricing_key)
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+    
+    # Units - one query, same grid as unit_selection (non-commercial ground floors hidden)
+    status_index = {code: i for i, code in enumerate(SEAT_MAP_STATUS_CODES)}
+    columns = {'id': [], 'tower': [], 'floor': [], 'unit': [], 'status': [], 'price': []}
+    rows = UnitConfiguration.objects.filter(project=project).exclude(
+        floor_number=0,
+        is_commercial=False
+    ).order_by('tower_number', 'floor_number', 'unit_number').values_list(
+        'id', 'tower_number', 'floor_number', 'unit_number',
+        'status', 'is_excluded', 'area_type_id', 'blocked_until',
+    )
+    for unit_id, tower, floor, unit_number, status, is_excluded, area_type_id, blocked_until in rows:
+        if is_excluded:
+            status = 'excluded'
+        elif status == 'blocked' and blocked_until and blocked_until < now:
+            status = 'available'  # Expired block
+        columns['id'].append(unit_id)
+        columns['tower'].append(tower)
+        columns['floor'].append(floor)
+        columns['unit'].append(unit_number)
+        columns['status'].append(status_index[status])
+        columns['price'].append(bucket_index.get(area_type_id, -1))
+    
+    response = JsonResponse({
+        'project': project.pk,
+        'version': etag.strip('"'),
+        'status_codes': SEAT_MAP_STATUS_CODES,
+        'price_buckets': price_buckets,
+        'units': columns,
+    })
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Always revalidate - the ETag makes that cheap
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _bulk_action_response(request, project, success, message, outcomes=None):
+    """Answer a bulk unit action as JSON for fetch() callers, otherwise via messages + redirect"""
+    skipped = [detail for ok, detail in (outcomes or {}).values() if not ok]
+    
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({
+            'success': success,
+            'message': message,
+            'results': [
+                {'unit_id': unit_id, 'success': ok, 'detail': detail}
+                for unit_id, (ok, detail) in (outcomes or {}).items()
+            ],
+            'skipped': skipped,
+        })
+    
+    if success:
+        messages.success(request, message)
+        if skipped:
+            messages.warning(request, f'{len(skipped)} units skipped: ' + ', '.join(skipped[:10]))
+    else:
+        messages.error(request, message)
+    return redirect('projects:unit_inventory', pk=project.pk)
+
+
 @login_required
 def bulk_unit_actions(request, pk):
     """Bulk actions on multiple units"""
@@ -228,53 +411,48 @@ def bulk_unit_actions(request, pk):
     
     # Permission check
     if not (request.user.is_site_head() or request.user.is_super_admin() or request.user.is_mandate_owner()):
-        messages.error(request, 'You do not have permission to perform bulk actions.')
-        return redirect('projects:unit_inventory', pk=project.pk)
+        return _bulk_action_response(request, project, False, 'You do not have permission to perform bulk actions.')
     
     if request.method == 'POST':
         action = request.POST.get('action')
         unit_ids = request.POST.getlist('unit_ids')
         
         if not unit_ids:
-            messages.error(request, 'No units selected.')
-            return redirect('projects:unit_inventory', pk=project.pk)
+            return _bulk_action_response(request, project, False, 'No units selected.')
         
         units = UnitConfiguration.objects.filter(
             pk__in=unit_ids,
             project=project
         )
         
+        # Block/unblock run as one conditional UPDATE each and report per-unit outcomes
+        outcomes = None
         if action == 'block':
             hours = int(request.POST.get('hours', 24))
-            blocked_count = 0
-            
-            for unit in units:
-                success, _ = unit.block_unit(request.user, hours)
-                if success:
-                    blocked_count += 1
-            
-            messages.success(request, f'{blocked_count} units blocked for {hours} hours.')
+            outcomes = UnitConfiguration.bulk_block(project, unit_ids, request.user, hours)
+            done_count = sum(1 for success, _ in outcomes.values() if success)
+            message = f'{done_count} units blocked for {hours} hours.'
         
         elif action == 'unblock':
-            unblocked_count = 0
-            
-            for unit in units:
-                success, _ = unit.unblock_unit(request.user)
-                if success:
-                    unblocked_count += 1
-            
-            messages.success(request, f'{unblocked_count} units unblocked.')
+            outcomes = UnitConfiguration.bulk_unblock(project, unit_ids, request.user)
+            done_count = sum(1 for success, _ in outcomes.values() if success)
+            message = f'{done_count} units unblocked.'
         
         elif action == 'update_status':
             new_status = request.POST.get('status')
             if new_status in dict(UnitConfiguration.STATUS_CHOICES):
-                updated_count = units.update(status=new_status)
-                messages.success(request, f'{updated_count} units updated to {new_status}.')
+                with write_atomic():
+                    changed_ids = list(units.values_list('pk', flat=True))
+                    updated_count = units.update(status=new_status, version=F('version') + 1, updated_at=timezone.now())
+                    UnitStatusEvent.record(project, changed_ids, new_status, request.user)
+                message = f'{updated_count} units updated to {new_status}.'
             else:
-                messages.error(request, 'Invalid status selected.')
+                return _bulk_action_response(request, project, False, 'Invalid status selected.')
         
         else:
-            messages.error(request, 'Invalid action selected.')
+            return _bulk_action_response(request, project, False, 'Invalid action selected.')
+        
+        return _bulk_action_response(request, project, True, message, outcomes)
     
     return redirect('projects:unit_inventory', pk=project.pk)
 
@@ -288,8 +466,8 @@ def revoke_booked_unit(request, pk, unit_id):
     # Permission check - super admins, mandate owners, site heads, closing managers, and sourcing managers can revoke
     if not (request.user.is_super_admin() or request.user.is_mandate_owner() or 
             (request.user.is_site_head() and project.site_head == request.user) or
-            (request.user.is_closing_manager() and project in request.user.assigned_projects.all()) or
-            (request.user.is_sourcing_manager() and project in request.user.assigned_projects.all())):
+            (request.user.is_closing_manager() and request.scope.is_assigned_to(project)) or
+            (request.user.is_sourcing_manager() and request.scope.is_assigned_to(project))):
         messages.error(request, 'You do not have permission to revoke booked units.')
         return redirect('projects:unit_inventory', pk=project.pk)
     
@@ -305,10 +483,8 @@ def revoke_booked_unit(request, pk, unit_id):
         unit.booking.save()
         messages.info(request, f'Booking for {unit.unit_number} has been archived.')
     
-    # Revoke the unit status
-    unit.status = 'available'
-    unit.booking = None  # Clear the booking reference
-    unit.save()
+    # Revoke the unit status and clear the booking reference
+    unit.release_unit(request.user)
     
     messages.success(request, f'Unit {unit.unit_number} has been revoked and is now available.')
     return redirect('projects:unit_inventory', pk=project.pk)
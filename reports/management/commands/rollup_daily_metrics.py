@@ -0,0 +1,39 @@
+"""
+Incrementally fill the DailyMetricsRollup table used by the report trends.
+
+Each run recomputes from the last rolled-up day up to today, so schedule it
+(e.g. hourly cron / scheduled job) to keep the current day fresh. Earlier days
+are recomputed when rows touched since the previous run fall on them
+(backdated payments, archived leads or bookings, late visits). Deleted
+payments leave no trace - recompute the affected range with --since.
+
+Usage:
+    python manage.py rollup_daily_metrics
+    python manage.py rollup_daily_metrics --since 2025-01-01
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reports.models import DailyMetricsRollup
+
+
+class Command(BaseCommand):
+    help = 'Roll up daily per-project leads, visits, bookings and revenue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Recompute from this date (YYYY-MM-DD) instead of the last rolled-up day')
+
+    def handle(self, *args, **options):
+        start_date = None
+        if options['since']:
+            try:
+                start_date = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format.')
+
+        start_date, end_date, written, dirty = DailyMetricsRollup.rollup(start_date)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {start_date} .. {end_date} and {dirty} earlier changed day(s): '
+            f'{written} project-day row(s) written.'
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('projects', '0016_unitstatusevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetricsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('leads_created', models.PositiveIntegerField(default=0, help_text='Leads added to the project that day')),
+                ('visits', models.PositiveIntegerField(default=0, help_text='Visits completed / verified that day')),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0.0, help_text='Payments received that day', max_digits=15)),
+                ('payments', models.PositiveIntegerField(default=0, help_text='Number of payments received that day')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='projects.project')),
+            ],
+            options={
+                'db_table': 'daily_metrics_rollups',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['project', 'date'], name='daily_metri_project_e8327d_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailymetricsrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'project'), name='unique_daily_metrics_per_project'),
+        ),
+    ]
@@ -0,0 +1,164 @@
+from datetime import datetime, time, timedelta
+
+from django.db import models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from projects.models import Project
+
+
+class DailyMetricsRollup(models.Model):
+    """Per-project daily totals backing the report trends
+
+    Filled incrementally by `python manage.py rollup_daily_metrics`. Each run
+    recomputes from the last rolled-up day (which may have been partial) up to
+    today, plus any earlier day that rows touched since the previous run fall
+    on: backdated payments, archived leads and bookings, late visits. Every
+    row of a run is stamped with the time the run started (updated_at), which
+    is where the next run looks for touched rows.
+    """
+    date = models.DateField()
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='daily_metrics')
+    leads_created = models.PositiveIntegerField(default=0, help_text="Leads added to the project that day")
+    visits = models.PositiveIntegerField(default=0, help_text="Visits completed / verified that day")
+    bookings = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, help_text="Payments received that day")
+    payments = models.PositiveIntegerField(default=0, help_text="Number of payments received that day")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'daily_metrics_rollups'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'project'], name='unique_daily_metrics_per_project'),
+        ]
+        indexes = [
+            models.Index(fields=['project', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} - {self.date}"
+
+    @classmethod
+    def compute(cls, start_date, end_date):
+        """Build (unsaved) rollup rows for start_date..end_date inclusive - one GROUP BY per metric"""
+        from leads.models import LeadProjectAssociation
+        from bookings.models import Booking, Payment
+
+        # Filter on the raw timestamps (index friendly), truncate only for grouping
+        range_start = timezone.make_aware(datetime.combine(start_date, time.min))
+        range_end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min))
+        rows = {}
+
+        def add(queryset, date_field, metrics):
+            for row in queryset.order_by().values(date_field, 'project_id').annotate(**metrics):
+                key = (row[date_field], row['project_id'])
+                rollup = rows.get(key)
+                if rollup is None:
+                    rollup = rows[key] = cls(date=key[0], project_id=key[1])
+                for name in metrics:
+                    setattr(rollup, name, row[name] or 0)
+
+        add(
+            LeadProjectAssociation.objects.filter(is_archived=False)
+            .filter(created_at__gte=range_start, created_at__lt=range_end)
+            .annotate(day=TruncDate('created_at')),
+            'day', {'leads_created': Count('id')},
+        )
+        # Same definition of a visit as the employee performance report, dated by
+        # visited_at so later edits of the association don't move it
+        add(
+            LeadProjectAssociation.objects.filter(is_archived=False)
+            .filter(Q(status='visit_completed') | Q(phone_verified=True))
+            .filter(visited_at__gte=range_start, visited_at__lt=range_end)
+            .annotate(day=TruncDate('visited_at')),
+            'day', {'visits': Count('id')},
+        )
+        add(
+            Booking.objects.filter(is_archived=False)
+            .filter(created_at__gte=range_start, created_at__lt=range_end)
+            .annotate(day=TruncDate('created_at')),
+            'day', {'bookings': Count('id')},
+        )
+        add(
+            Payment.objects.filter(payment_date__range=(start_date, end_date))
+            .annotate(day=models.F('payment_date'), project_id=models.F('booking__project_id')),
+            'day', {'revenue': Sum('amount'), 'payments': Count('id')},
+        )
+        return list(rows.values())
+
+    @classmethod
+    def dirty_days(cls, since):
+        """Days whose numbers may have changed because of rows touched at or after `since`
+
+        A touched association can move its lead-created and visit days, a touched
+        booking its created day, and a new or edited payment its payment day.
+        Deleted payments leave no trace - recompute with --since for those.
+        """
+        from leads.models import LeadProjectAssociation
+        from bookings.models import Booking, Payment
+
+        touched_associations = LeadProjectAssociation.objects.filter(updated_at__gte=since).order_by()
+        sources = [
+            (touched_associations, TruncDate('created_at')),
+            (touched_associations.filter(visited_at__isnull=False), TruncDate('visited_at')),
+            (Booking.objects.filter(updated_at__gte=since).order_by(), TruncDate('created_at')),
+            (Payment.objects.filter(Q(created_at__gte=since) | Q(updated_at__gte=since)).order_by(), models.F('payment_date')),
+        ]
+        days = set()
+        for queryset, day in sources:
+            days.update(queryset.annotate(day=day).values_list('day', flat=True).distinct())
+        days.discard(None)
+        return days
+
+    @classmethod
+    def rollup(cls, start_date=None, end_date=None, batch_size=1000):
+        """Recompute and store rollups; defaults to last rolled-up day .. today plus dirty days
+
+        Returns (start_date, end_date, rows written, earlier dirty days recomputed).
+        """
+        from django.db import transaction
+        from django.db.models import Max
+
+        started = timezone.now()
+        end_date = end_date or timezone.localdate()
+        earlier = []
+        if start_date is None:
+            last = cls.objects.aggregate(day=Max('date'), run=Max('updated_at'))
+            start_date = last['day']
+            if last['run'] is not None:
+                earlier = sorted(day for day in cls.dirty_days(last['run']) if day < start_date)
+        if start_date is None:
+            start_date = cls._first_activity_date() or end_date
+
+        # Recompute consecutive dirty days as one range, then the open range up to today
+        ranges = []
+        for day in earlier:
+            if ranges and ranges[-1][1] == day - timedelta(days=1):
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        ranges.append([start_date, end_date])
+
+        rollups = [rollup for first, last in ranges for rollup in cls.compute(first, last)]
+        with transaction.atomic():
+            # Replace the whole range so days that lost activity don't keep stale numbers
+            for first, last in ranges:
+                cls.objects.filter(date__range=(first, last)).delete()
+            cls.objects.bulk_create(rollups, batch_size=batch_size)
+            # auto_now stamped the insert time - the next run must also see rows touched during this one
+            cls.objects.filter(updated_at__gte=started).update(updated_at=started)
+        return start_date, end_date, len(rollups), len(earlier)
+
+    @classmethod
+    def _first_activity_date(cls):
+        from leads.models import LeadProjectAssociation
+        from bookings.models import Payment
+
+        first_lead = LeadProjectAssociation.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        first_payment = Payment.objects.order_by('payment_date').values_list('payment_date', flat=True).first()
+        candidates = [timezone.localtime(first_lead).date()] if first_lead else []
+        if first_payment:
+            candidates.append(first_payment)
+        return min(candidates) if candidates else None
@@ -1,4 +1,5 @@
-from django.db.models import Q, Sum, Count, Avg
+from django.db.models import Q, Sum, Count, Prefetch
+from django.db.models.functions import TruncMonth
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
@@ -9,6 +10,16 @@ from bookings.models import Booking, Payment
 from projects.models import Project
 from accounts.models import User
 from channel_partners.models import ChannelPartner
+from bridgio.cache import active_projects
+from .models import DailyMetricsRollup
+
+
+def _grouped(queryset, group_field, **aggregates):
+    """{group_field value: {aggregate: value}} from one GROUP BY query"""
+    return {
+        row[group_field]: row
+        for row in queryset.order_by().values(group_field).annotate(**aggregates)
+    }
 
 
 @login_required
@@ -105,72 +116,69 @@ def mandate_owner_reports(request):
     else:
         employees = User.objects.filter(mandate_owner=user, is_active=True)
     
+    # One GROUP BY per role's metric instead of a count per employee
+    from leads.models import LeadProjectAssociation
+    if user.is_super_admin() or user.is_mandate_owner() or (user.is_superuser and user.is_staff):
+        scoped_bookings = Booking.objects.all()
+        scoped_leads = Lead.objects.all()
+        scoped_associations = LeadProjectAssociation.objects.filter(is_archived=False)
+    else:
+        scoped_bookings = Booking.objects.filter(project__mandate_owner=user)
+        scoped_leads = Lead.objects.filter(project__mandate_owner=user)
+        scoped_associations = LeadProjectAssociation.objects.filter(project__mandate_owner=user, is_archived=False)
+    bookings_by_creator = _grouped(scoped_bookings.filter(created_by__role='closing_manager'), 'created_by', n=Count('id'))
+    leads_by_creator = _grouped(scoped_leads.filter(created_by__role='sourcing_manager'), 'created_by', n=Count('id'))
+    assigned_by_user = _grouped(scoped_associations.filter(assigned_to__role='telecaller'), 'assigned_to', n=Count('id'))
+    
     employee_performance = []
     for emp in employees:
         if emp.is_closing_manager():
-            if user.is_super_admin() or user.is_mandate_owner() or (user.is_superuser and user.is_staff):
-                bookings_count = Booking.objects.filter(created_by=emp).count()
-            else:
-                bookings_count = Booking.objects.filter(created_by=emp, project__mandate_owner=user).count()
             employee_performance.append({
                 'user': emp,
                 'role': emp.get_role_display(),
-                'bookings': bookings_count,
+                'bookings': bookings_by_creator.get(emp.id, {}).get('n', 0),
             })
         elif emp.is_sourcing_manager():
-            if user.is_super_admin() or user.is_mandate_owner() or (user.is_superuser and user.is_staff):
-                leads_count = Lead.objects.filter(created_by=emp).count()
-            else:
-                leads_count = Lead.objects.filter(created_by=emp, project__mandate_owner=user).count()
             employee_performance.append({
                 'user': emp,
                 'role': emp.get_role_display(),
-                'leads': leads_count,
+                'leads': leads_by_creator.get(emp.id, {}).get('n', 0),
             })
         elif emp.is_telecaller():
-            # Use LeadProjectAssociation instead of Lead for assigned_to
-            from leads.models import LeadProjectAssociation
-            if user.is_super_admin() or user.is_mandate_owner() or (user.is_superuser and user.is_staff):
-                calls_count = LeadProjectAssociation.objects.filter(assigned_to=emp, is_archived=False).count()
-            else:
-                calls_count = LeadProjectAssociation.objects.filter(
-                    assigned_to=emp,
-                    project__mandate_owner=user,
-                    is_archived=False
-                ).count()
             employee_performance.append({
                 'user': emp,
                 'role': emp.get_role_display(),
-                'assigned_leads': calls_count,
+                'assigned_leads': assigned_by_user.get(emp.id, {}).get('n', 0),
             })
     
-    # Monthly Trends (last 6 months)
+    # Monthly Trends (last 6 months) - one range scan + GROUP BY over the daily rollup
+    # (kept current by `python manage.py rollup_daily_metrics`)
+    trend_months = [this_month_start]
+    for _ in range(5):
+        trend_months.append((trend_months[-1] - timedelta(days=1)).replace(day=1))
+    trend_months.reverse()
+    
+    rollups = DailyMetricsRollup.objects.filter(date__gte=trend_months[0], date__lte=today)
+    if not (user.is_super_admin() or user.is_mandate_owner() or (user.is_superuser and user.is_staff)):
+        rollups = rollups.filter(project__mandate_owner=user)
+    totals_by_month = {
+        row['month']: row
+        for row in rollups.annotate(month=TruncMonth('date')).order_by().values('month').annotate(
+            leads=Sum('leads_created'),
+            bookings=Sum('bookings'),
+            revenue=Sum('revenue'),
+        )
+    }
+    
     monthly_trends = []
-    for i in range(6):
-        month_start = (this_month_start - timedelta(days=30*i)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        month_leads = all_leads.filter(created_at__date__gte=month_start, created_at__date__lte=month_end).count()
-        month_bookings = all_bookings.filter(created_at__date__gte=month_start, created_at__date__lte=month_end).count()
-        if user.is_super_admin() or user.is_mandate_owner() or (user.is_superuser and user.is_staff):
-            month_revenue = Payment.objects.filter(
-                payment_date__gte=month_start,
-                payment_date__lte=month_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-        else:
-            month_revenue = Payment.objects.filter(
-                booking__project__mandate_owner=user,
-                payment_date__gte=month_start,
-                payment_date__lte=month_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-        
+    for month_start in trend_months:
+        totals = totals_by_month.get(month_start, {})
         monthly_trends.append({
             'month': month_start.strftime('%b %Y'),
-            'leads': month_leads,
-            'bookings': month_bookings,
-            'revenue': month_revenue,
+            'leads': totals.get('leads') or 0,
+            'bookings': totals.get('bookings') or 0,
+            'revenue': totals.get('revenue') or 0,
         })
-    monthly_trends.reverse()
     
     context = {
         'total_leads': all_leads.count(),
@@ -211,7 +219,7 @@ def employee_performance(request):
         employees = User.objects.filter(is_active=True).exclude(role='super_admin')
     elif user.is_site_head():
         # Site Head sees employees assigned to their projects
-        site_head_projects = Project.objects.filter(site_head=user, is_active=True)
+        site_head_projects = request.scope.active_site_head_project_ids
         employees = User.objects.filter(
             Q(role='closing_manager') | Q(role='telecaller') | Q(role='sourcing_manager'),
             assigned_projects__in=site_head_projects
@@ -219,6 +227,117 @@ def employee_performance(request):
     else:
         employees = User.objects.none()
     
+    # Base filters based on user role - using LeadProjectAssociation
+    from leads.models import LeadProjectAssociation, CallLog, FollowUpReminder
+    if user.is_super_admin() or user.is_mandate_owner():
+        emp_associations = LeadProjectAssociation.objects.filter(is_archived=False)
+        emp_bookings = Booking.objects.filter(is_archived=False)
+        emp_payments = Payment.objects.all()
+        emp_calls = CallLog.objects.all()
+        active_cps = ChannelPartner.objects.filter(status='active', is_active=True)
+    else:  # Site Head
+        site_head_projects = request.scope.active_site_head_project_ids
+        emp_associations = LeadProjectAssociation.objects.filter(
+            project__in=site_head_projects,
+            is_archived=False
+        )
+        emp_bookings = Booking.objects.filter(project__in=site_head_projects, is_archived=False)
+        emp_payments = Payment.objects.filter(booking__project__in=site_head_projects)
+        lead_ids = LeadProjectAssociation.objects.filter(project__in=site_head_projects).values_list('lead_id', flat=True)
+        emp_calls = CallLog.objects.filter(lead_id__in=lead_ids)
+        active_cps = ChannelPartner.objects.filter(
+            linked_projects__in=site_head_projects,
+            status='active',
+            is_active=True
+        ).distinct()
+    
+    # Project assignments for all employees (for site heads display), in the same query batch
+    employees = list(employees.prefetch_related(
+        Prefetch('assigned_projects', queryset=Project.objects.filter(is_active=True), to_attr='active_projects')
+    ))
+    emp_ids = [emp.id for emp in employees]
+    
+    # Every per-employee count comes from one GROUP BY per source, so the
+    # number of queries doesn't grow with the staff
+    this_month = Q(created_at__date__gte=this_month_start)
+    this_week = Q(created_at__date__gte=this_week_start)
+    visit_q = Q(status='visit_completed') | Q(phone_verified=True)
+    yesterday = timezone.now() - timedelta(hours=24)
+    
+    calls_by_user = _grouped(
+        emp_calls.filter(user__in=emp_ids), 'user',
+        total=Count('id'),
+        this_month=Count('id', filter=this_month),
+    )
+    assigned_by_user = _grouped(
+        emp_associations.filter(assigned_to__in=emp_ids), 'assigned_to',
+        total=Count('id'),
+        this_month=Count('id', filter=this_month),
+        this_week=Count('id', filter=this_week),
+        visits=Count('id', filter=visit_q),
+        visits_this_month=Count('id', filter=visit_q & Q(visited_at__date__gte=this_month_start)),
+        pending_otp=Count('id', filter=Q(is_pretagged=True, pretag_status='pending_verification')),
+        scheduled=Count('id', filter=Q(status='visit_scheduled')),
+        scheduled_this_month=Count('id', filter=Q(status='visit_scheduled') & this_month),
+        verified_with_cp=Count('id', filter=Q(phone_verified=True, lead__channel_partner__isnull=False)),
+        verified_without_cp=Count('id', filter=Q(phone_verified=True, lead__channel_partner__isnull=True)),
+        untouched=Count('id', filter=Q(status='new', created_at__lt=yesterday)),
+    )
+    created_by_user = _grouped(
+        emp_associations.filter(created_by__in=emp_ids), 'created_by',
+        total=Count('id'),
+        this_month=Count('id', filter=this_month),
+        this_week=Count('id', filter=this_week),
+        pretagged=Count('id', filter=Q(is_pretagged=True)),
+        pretagged_this_month=Count('id', filter=Q(is_pretagged=True) & this_month),
+        verified_pretagged=Count('id', filter=Q(is_pretagged=True, phone_verified=True)),
+    )
+    closer_bookings = _grouped(
+        emp_bookings.filter(credited_to_closing_manager__in=emp_ids), 'credited_to_closing_manager',
+        total=Count('id'),
+        this_month=Count('id', filter=this_month),
+        this_week=Count('id', filter=this_week),
+    )
+    closer_revenue = _grouped(
+        emp_payments.filter(booking__credited_to_closing_manager__in=emp_ids), 'booking__credited_to_closing_manager',
+        total=Sum('amount'),
+        this_month=Sum('amount', filter=Q(payment_date__gte=this_month_start)),
+    )
+    sourcing_bookings = _grouped(
+        emp_bookings.filter(credited_to_sourcing_manager__in=emp_ids), 'credited_to_sourcing_manager',
+        total=Count('id'),
+    )
+    telecaller_bookings = _grouped(
+        emp_bookings.filter(credited_to_telecaller__in=emp_ids), 'credited_to_telecaller',
+        with_cp=Count('id', filter=Q(lead__channel_partner__isnull=False)),
+        without_cp=Count('id', filter=Q(lead__channel_partner__isnull=True)),
+    )
+    
+    # The same for every employee of a role
+    # CP bookings handled by telecallers count for every closing manager
+    cp_bookings = emp_bookings.filter(
+        lead__channel_partner__isnull=False,
+        credited_to_telecaller__isnull=False  # Telecaller handled this CP booking
+    ).aggregate(
+        total=Count('id'),
+        this_month=Count('id', filter=this_month),
+        this_week=Count('id', filter=this_week),
+    )
+    # Total visits done by CPs, including those handled by telecallers, split by who handled them
+    cp_visits = emp_associations.filter(
+        lead__channel_partner__isnull=False,
+        lead__is_archived=False
+    ).filter(visit_q).aggregate(
+        total=Count('id'),
+        by_telecallers=Count('id', filter=Q(assigned_to__role='telecaller')),
+        by_sourcing_managers=Count('id', filter=Q(assigned_to__role='sourcing_manager')),
+    )
+    total_cps_active = active_cps.count()
+    active_reminders = FollowUpReminder.objects.filter(
+        lead_id__in=emp_associations.values_list('lead_id', flat=True),
+        is_completed=False
+    ).count()
+    
     employee_metrics = []
     for emp in employees:
         metrics = {
@@ -226,73 +345,28 @@ def employee_performance(request):
             'role': emp.get_role_display(),
             'role_code': emp.role,
         }
-        
-        # Base filters based on user role - using LeadProjectAssociation
-        from leads.models import LeadProjectAssociation
-        if user.is_super_admin() or user.is_mandate_owner():
-            emp_associations = LeadProjectAssociation.objects.filter(is_archived=False)
-            emp_bookings = Booking.objects.filter(is_archived=False)
-            emp_payments = Payment.objects.all()
-        else:  # Site Head
-            site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-            emp_associations = LeadProjectAssociation.objects.filter(
-                project__in=site_head_projects,
-                is_archived=False
-            )
-            emp_bookings = Booking.objects.filter(project__in=site_head_projects, is_archived=False)
-            emp_payments = Payment.objects.filter(booking__project__in=site_head_projects)
+        calls = calls_by_user.get(emp.id, {})
+        assigned = assigned_by_user.get(emp.id, {})
+        created = created_by_user.get(emp.id, {})
         
         if emp.is_closing_manager():
             # Closing Manager Metrics
-            from leads.models import CallLog
-            # Total calls made
-            if user.is_super_admin() or user.is_mandate_owner():
-                metrics['total_calls'] = CallLog.objects.filter(user=emp).count()
-            else:
-                site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-                lead_ids = LeadProjectAssociation.objects.filter(project__in=site_head_projects).values_list('lead_id', flat=True)
-                metrics['total_calls'] = CallLog.objects.filter(lead_id__in=lead_ids, user=emp).count()
+            metrics['total_calls'] = calls.get('total', 0)
             
             # Total visits handled
-            metrics['total_visits_handled'] = emp_associations.filter(
-                assigned_to=emp
-            ).filter(
-                Q(status='visit_completed') | Q(phone_verified=True)
-            ).count()
-            metrics['visits_this_month'] = emp_associations.filter(
-                assigned_to=emp
-            ).filter(
-                Q(status='visit_completed') | Q(phone_verified=True)
-            ).filter(
-                updated_at__date__gte=this_month_start
-            ).count()
+            metrics['total_visits_handled'] = assigned.get('visits', 0)
+            metrics['visits_this_month'] = assigned.get('visits_this_month', 0)
             
             # Total bookings done (using credit fields)
             # Include both direct bookings and CP bookings when telecallers handle CP data
-            direct_bookings = emp_bookings.filter(credited_to_closing_manager=emp)
-            cp_bookings = emp_bookings.filter(
-                lead__channel_partner__isnull=False,
-                credited_to_telecaller__isnull=False  # Telecaller handled this CP booking
-            )
-            
-            # For closing managers, count both direct bookings and CP bookings from telecallers
-            if user.is_super_admin() or user.is_mandate_owner():
-                total_bookings = direct_bookings.count() + cp_bookings.count()
-            else:
-                site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-                direct_bookings_filtered = direct_bookings.filter(project__in=site_head_projects)
-                cp_bookings_filtered = cp_bookings.filter(project__in=site_head_projects)
-                total_bookings = direct_bookings_filtered.count() + cp_bookings_filtered.count()
-            
-            metrics['total_bookings'] = total_bookings
-            metrics['bookings_this_month'] = (direct_bookings.filter(created_at__date__gte=this_month_start).count() + 
-                                            cp_bookings.filter(created_at__date__gte=this_month_start).count())
-            metrics['bookings_this_week'] = (direct_bookings.filter(created_at__date__gte=this_week_start).count() + 
-                                           cp_bookings.filter(created_at__date__gte=this_week_start).count())
+            direct = closer_bookings.get(emp.id, {})
+            metrics['total_bookings'] = direct.get('total', 0) + cp_bookings['total']
+            metrics['bookings_this_month'] = direct.get('this_month', 0) + cp_bookings['this_month']
+            metrics['bookings_this_week'] = direct.get('this_week', 0) + cp_bookings['this_week']
             
             # Additional breakdown for reporting
-            metrics['direct_bookings'] = direct_bookings.count()
-            metrics['cp_bookings_from_telecallers'] = cp_bookings.count()
+            metrics['direct_bookings'] = direct.get('total', 0)
+            metrics['cp_bookings_from_telecallers'] = cp_bookings['total']
             
             # Total visit to conversion ratio
             if metrics['total_visits_handled'] > 0:
@@ -301,94 +375,29 @@ def employee_performance(request):
                 metrics['visit_to_conversion_ratio'] = 0
             
             # Additional metrics for backward compatibility
-            metrics['total_leads'] = emp_associations.filter(assigned_to=emp).count()
-            metrics['leads_this_month'] = emp_associations.filter(assigned_to=emp, created_at__date__gte=this_month_start).count()
-            metrics['leads_this_week'] = emp_associations.filter(assigned_to=emp, created_at__date__gte=this_week_start).count()
-            # Use Value expression to avoid string concatenation issues
-            total_revenue_raw = emp_payments.filter(booking__credited_to_closing_manager=emp).aggregate(
-                total=Sum('amount')
-            )['total']
-            metrics['total_revenue'] = float(total_revenue_raw) if total_revenue_raw is not None else 0
-            
-            revenue_this_month_raw = emp_payments.filter(
-                booking__credited_to_closing_manager=emp
-            ).filter(
-                payment_date__gte=this_month_start
-            ).aggregate(total=Sum('amount'))['total']
-            metrics['revenue_this_month'] = float(revenue_this_month_raw) if revenue_this_month_raw is not None else 0
-            assigned_leads = emp_associations.filter(assigned_to=emp).count()
-            if assigned_leads > 0:
-                metrics['conversion_rate'] = (metrics['total_bookings'] / assigned_leads) * 100
+            metrics['total_leads'] = assigned.get('total', 0)
+            metrics['leads_this_month'] = assigned.get('this_month', 0)
+            metrics['leads_this_week'] = assigned.get('this_week', 0)
+            revenue = closer_revenue.get(emp.id, {})
+            metrics['total_revenue'] = float(revenue.get('total') or 0)
+            metrics['revenue_this_month'] = float(revenue.get('this_month') or 0)
+            if metrics['total_leads'] > 0:
+                metrics['conversion_rate'] = (metrics['total_bookings'] / metrics['total_leads']) * 100
             else:
                 metrics['conversion_rate'] = 0
-            metrics['pending_otp'] = emp_associations.filter(
-                assigned_to=emp,
-                is_pretagged=True,
-                pretag_status='pending_verification'
-            ).count()
+            metrics['pending_otp'] = assigned.get('pending_otp', 0)
             metrics['visits_completed'] = metrics['total_visits_handled']
             
         elif emp.is_sourcing_manager():
             # Sourcing Manager Metrics
-            from channel_partners.models import ChannelPartner
-            # Total CPs active
-            if user.is_super_admin() or user.is_mandate_owner():
-                metrics['total_cps_active'] = ChannelPartner.objects.filter(
-                    status='active',
-                    is_active=True
-                ).count()
-            else:
-                site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-                metrics['total_cps_active'] = ChannelPartner.objects.filter(
-                    linked_projects__in=site_head_projects,
-                    status='active',
-                    is_active=True
-                ).distinct().count()
-            
-            # Total visits done by CPs (leads with CP that have visits)
-            # Include visits handled by telecallers for CP data
-            cp_lead_ids = Lead.objects.filter(
-                channel_partner__isnull=False,
-                is_archived=False
-            ).values_list('id', flat=True)
-            
-            # Get all CP visits (including those handled by telecallers)
-            all_cp_visits = LeadProjectAssociation.objects.filter(
-                lead_id__in=cp_lead_ids,
-                is_archived=False
-            ).filter(
-                Q(status='visit_completed') | Q(phone_verified=True)
-            )
-            
-            # Filter by user permissions
-            if user.is_super_admin() or user.is_mandate_owner():
-                cp_visits = all_cp_visits
-            else:
-                site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-                cp_visits = all_cp_visits.filter(project__in=site_head_projects)
-            
-            metrics['total_visits_by_cps'] = cp_visits.count()
-            
-            # Split CP visits by who handled them (for reporting)
-            cp_visits_by_telecallers = cp_visits.filter(
-                assigned_to__role='telecaller'
-            ).count()
-            cp_visits_by_sourcing_managers = cp_visits.filter(
-                assigned_to__role='sourcing_manager'
-            ).count()
-            cp_visits_by_others = cp_visits.count() - cp_visits_by_telecallers - cp_visits_by_sourcing_managers
-            
-            metrics['cp_visits_by_telecallers'] = cp_visits_by_telecallers
-            metrics['cp_visits_by_sourcing_managers'] = cp_visits_by_sourcing_managers
-            metrics['cp_visits_by_others'] = cp_visits_by_others
+            metrics['total_cps_active'] = total_cps_active
+            metrics['total_visits_by_cps'] = cp_visits['total']
+            metrics['cp_visits_by_telecallers'] = cp_visits['by_telecallers']
+            metrics['cp_visits_by_sourcing_managers'] = cp_visits['by_sourcing_managers']
+            metrics['cp_visits_by_others'] = cp_visits['total'] - cp_visits['by_telecallers'] - cp_visits['by_sourcing_managers']
             
             # Total conversion done (CP client handled by closer) - using credit fields
-            cp_bookings = emp_bookings.filter(credited_to_sourcing_manager=emp)
-            if user.is_super_admin() or user.is_mandate_owner():
-                metrics['total_conversion_done'] = cp_bookings.count()
-            else:
-                site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-                metrics['total_conversion_done'] = cp_bookings.filter(project__in=site_head_projects).count()
+            metrics['total_conversion_done'] = sourcing_bookings.get(emp.id, {}).get('total', 0)
             
             # Total conversion ratio of CP visits to conversion
             if metrics['total_visits_by_cps'] > 0:
@@ -397,20 +406,12 @@ def employee_performance(request):
                 metrics['cp_visits_to_conversion_ratio'] = 0
             
             # Additional metrics for backward compatibility
-            metrics['total_leads_created'] = emp_associations.filter(created_by=emp).count()
-            metrics['leads_this_month'] = emp_associations.filter(created_by=emp, created_at__date__gte=this_month_start).count()
-            metrics['leads_this_week'] = emp_associations.filter(created_by=emp, created_at__date__gte=this_week_start).count()
-            metrics['pretagged_leads'] = emp_associations.filter(created_by=emp, is_pretagged=True).count()
-            metrics['pretagged_this_month'] = emp_associations.filter(
-                created_by=emp,
-                is_pretagged=True,
-                created_at__date__gte=this_month_start
-            ).count()
-            metrics['verified_pretagged'] = emp_associations.filter(
-                created_by=emp,
-                is_pretagged=True,
-                phone_verified=True
-            ).count()
+            metrics['total_leads_created'] = created.get('total', 0)
+            metrics['leads_this_month'] = created.get('this_month', 0)
+            metrics['leads_this_week'] = created.get('this_week', 0)
+            metrics['pretagged_leads'] = created.get('pretagged', 0)
+            metrics['pretagged_this_month'] = created.get('pretagged_this_month', 0)
+            metrics['verified_pretagged'] = created.get('verified_pretagged', 0)
             if metrics['pretagged_leads'] > 0:
                 metrics['conversion_rate'] = (metrics['verified_pretagged'] / metrics['pretagged_leads']) * 100
             else:
@@ -418,92 +419,42 @@ def employee_performance(request):
             
         elif emp.is_telecaller():
             # Telecaller Metrics
-            from leads.models import CallLog, FollowUpReminder
-            
-            # Total calls made
-            if user.is_super_admin() or user.is_mandate_owner():
-                metrics['total_calls'] = CallLog.objects.filter(user=emp).count()
-                metrics['calls_this_month'] = CallLog.objects.filter(
-                    user=emp,
-                    created_at__date__gte=this_month_start
-                ).count()
-            else:
-                site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-                lead_ids = LeadProjectAssociation.objects.filter(project__in=site_head_projects).values_list('lead_id', flat=True)
-                metrics['total_calls'] = CallLog.objects.filter(lead_id__in=lead_ids, user=emp).count()
-                metrics['calls_this_month'] = CallLog.objects.filter(
-                    lead_id__in=lead_ids,
-                    user=emp,
-                    created_at__date__gte=this_month_start
-                ).count()
+            metrics['total_calls'] = calls.get('total', 0)
+            metrics['calls_this_month'] = calls.get('this_month', 0)
             
             # Total leads assigned
-            metrics['total_leads_assigned'] = emp_associations.filter(assigned_to=emp).count()
-            metrics['leads_this_month'] = emp_associations.filter(assigned_to=emp, created_at__date__gte=this_month_start).count()
-            metrics['leads_this_week'] = emp_associations.filter(assigned_to=emp, created_at__date__gte=this_week_start).count()
+            metrics['total_leads_assigned'] = assigned.get('total', 0)
+            metrics['leads_this_month'] = assigned.get('this_month', 0)
+            metrics['leads_this_week'] = assigned.get('this_week', 0)
             
             # Scheduled visits
-            metrics['scheduled_visits'] = emp_associations.filter(assigned_to=emp, status='visit_scheduled').count()
-            metrics['scheduled_this_month'] = emp_associations.filter(
-                assigned_to=emp,
-                status='visit_scheduled',
-                created_at__date__gte=this_month_start
-            ).count()
+            metrics['scheduled_visits'] = assigned.get('scheduled', 0)
+            metrics['scheduled_this_month'] = assigned.get('scheduled_this_month', 0)
             
             # Visits completed (OTP verified) - Split by CP vs Non-CP
-            visits_with_cp = emp_associations.filter(
-                assigned_to=emp,
-                phone_verified=True,
-                lead__channel_partner__isnull=False
-            ).count()
-            visits_without_cp = emp_associations.filter(
-                assigned_to=emp,
-                phone_verified=True,
-                lead__channel_partner__isnull=True
-            ).count()
-            metrics['visits_completed'] = visits_with_cp + visits_without_cp
-            metrics['visits_with_cp'] = visits_with_cp
-            metrics['visits_without_cp'] = visits_without_cp
+            metrics['visits_with_cp'] = assigned.get('verified_with_cp', 0)
+            metrics['visits_without_cp'] = assigned.get('verified_without_cp', 0)
+            metrics['visits_completed'] = metrics['visits_with_cp'] + metrics['visits_without_cp']
             
             # Bookings - Split by CP vs Non-CP
-            bookings_with_cp = emp_bookings.filter(
-                credited_to_telecaller=emp,
-                lead__channel_partner__isnull=False
-            ).count()
-            bookings_without_cp = emp_bookings.filter(
-                credited_to_telecaller=emp,
-                lead__channel_partner__isnull=True
-            ).count()
-            total_telecaller_bookings = bookings_with_cp + bookings_without_cp
+            bookings = telecaller_bookings.get(emp.id, {})
+            metrics['bookings_with_cp'] = bookings.get('with_cp', 0)
+            metrics['bookings_without_cp'] = bookings.get('without_cp', 0)
+            metrics['total_bookings'] = metrics['bookings_with_cp'] + metrics['bookings_without_cp']
             
             # Visit to conversion ratio (if applicable) - using credit fields
             if metrics['visits_completed'] > 0:
-                metrics['visit_to_conversion_ratio'] = (total_telecaller_bookings / metrics['visits_completed']) * 100
+                metrics['visit_to_conversion_ratio'] = (metrics['total_bookings'] / metrics['visits_completed']) * 100
             else:
                 metrics['visit_to_conversion_ratio'] = 0
             
-            # Additional CP-specific metrics
-            metrics['bookings_with_cp'] = bookings_with_cp
-            metrics['bookings_without_cp'] = bookings_without_cp
-            metrics['total_bookings'] = total_telecaller_bookings
-            
             # Follow-up reminders
-            lead_ids = emp_associations.values_list('lead_id', flat=True)
-            metrics['active_reminders'] = FollowUpReminder.objects.filter(
-                lead_id__in=lead_ids,
-                is_completed=False
-            ).count()
+            metrics['active_reminders'] = active_reminders
             
             # Untouched leads (>24 hours)
-            yesterday = timezone.now() - timedelta(hours=24)
-            metrics['untouched_leads'] = emp_associations.filter(
-                assigned_to=emp,
-                status='new',
-                created_at__lt=yesterday
-            ).count()
+            metrics['untouched_leads'] = assigned.get('untouched', 0)
         
-        # Add project assignments for all employees (for site heads display)
-        metrics['assigned_projects'] = list(emp.assigned_projects.filter(is_active=True).values_list('name', flat=True))
+        metrics['assigned_projects'] = [project.name for project in emp.active_projects]
         
         employee_metrics.append(metrics)
     
@@ -520,6 +471,96 @@ def employee_performance(request):
     return render(request, 'reports/employee_performance.html', context)
 
 
+def _cp_grouped_metrics(cp_ids, phone_to_cp, scope_projects, this_month_start, this_week_start,
+                        last_month_start, last_month_end):
+    """CP report metrics for many CPs at once, returned as {cp_id: {metric: value}}
+    
+    A record belongs to a CP through the booking's channel_partner, the lead's
+    channel_partner or the lead's cp_phone. Each path is one GROUP BY query; a
+    path excludes rows an earlier path already credited to the same CP, so
+    every record is counted once per CP - as with the per-CP OR filters.
+    """
+    from decimal import Decimal
+    from django.db.models import DecimalField, ExpressionWrapper, F
+    from leads.models import LeadProjectAssociation
+    
+    results = {}
+    
+    def collect(queryset, group_field, by_phone, aggregates, excludes=()):
+        if by_phone:
+            queryset = queryset.filter(**{f'{group_field}__in': list(phone_to_cp)})
+        else:
+            queryset = queryset.filter(**{f'{group_field}__in': cp_ids})
+        for exclude in excludes:
+            queryset = queryset.exclude(exclude)
+        for row in queryset.order_by().values(group_field).annotate(**aggregates):
+            cp_id = phone_to_cp.get(row[group_field]) if by_phone else row[group_field]
+            bucket = results.setdefault(cp_id, {})
+            for name in aggregates:
+                bucket[name] = bucket.get(name, 0) + (row[name] or 0)
+    
+    if not cp_ids:
+        return results
+    
+    # Leads and visits (project associations of CP leads)
+    visit_q = Q(status='visit_completed') | Q(is_pretagged=True, phone_verified=True)
+    associations = LeadProjectAssociation.objects.filter(is_archived=False, lead__is_archived=False)
+    if scope_projects is not None:
+        associations = associations.filter(project__in=scope_projects)
+    association_metrics = {
+        'total_leads': Count('id'),
+        'leads_this_month': Count('id', filter=Q(created_at__date__gte=this_month_start)),
+        'leads_this_week': Count('id', filter=Q(created_at__date__gte=this_week_start)),
+        'leads_last_month': Count('id', filter=Q(created_at__date__gte=last_month_start, created_at__date__lte=last_month_end)),
+        'cp_visits': Count('id', filter=visit_q),
+        'cp_visits_this_month': Count('id', filter=visit_q & Q(updated_at__date__gte=this_month_start)),
+    }
+    collect(associations, 'lead__channel_partner_id', False, association_metrics)
+    collect(associations, 'lead__cp_phone', True, association_metrics,
+            [Q(lead__channel_partner__phone=F('lead__cp_phone'))])
+    
+    # Bookings
+    bookings = Booking.objects.filter(is_archived=False)
+    if scope_projects is not None:
+        bookings = bookings.filter(project__in=scope_projects)
+    booking_metrics = {
+        'cp_bookings': Count('id'),
+        'cp_bookings_this_month': Count('id', filter=Q(created_at__date__gte=this_month_start)),
+        'bookings_this_week': Count('id', filter=Q(created_at__date__gte=this_week_start)),
+        'bookings_last_month': Count('id', filter=Q(created_at__date__gte=last_month_start, created_at__date__lte=last_month_end)),
+        'booking_value': Sum('final_negotiated_price'),
+        'total_commission': Sum(
+            ExpressionWrapper(
+                F('final_negotiated_price') * F('cp_commission_percent') / Decimal('100'),
+                output_field=DecimalField(max_digits=20, decimal_places=4),
+            ),
+            filter=Q(cp_commission_percent__gt=0, final_negotiated_price__gt=0),
+        ),
+    }
+    collect(bookings, 'channel_partner_id', False, booking_metrics)
+    collect(bookings, 'lead__channel_partner_id', False, booking_metrics,
+            [Q(channel_partner_id=F('lead__channel_partner_id'))])
+    collect(bookings, 'lead__cp_phone', True, booking_metrics,
+            [Q(channel_partner__phone=F('lead__cp_phone')), Q(lead__channel_partner__phone=F('lead__cp_phone'))])
+    
+    # Revenue (payments on CP bookings - archived bookings included, as before)
+    payments = Payment.objects.all()
+    if scope_projects is not None:
+        payments = payments.filter(booking__project__in=scope_projects)
+    payment_metrics = {
+        'total_revenue': Sum('amount'),
+        'revenue_this_month': Sum('amount', filter=Q(payment_date__gte=this_month_start)),
+    }
+    collect(payments, 'booking__channel_partner_id', False, payment_metrics)
+    collect(payments, 'booking__lead__channel_partner_id', False, payment_metrics,
+            [Q(booking__channel_partner_id=F('booking__lead__channel_partner_id'))])
+    collect(payments, 'booking__lead__cp_phone', True, payment_metrics,
+            [Q(booking__channel_partner__phone=F('booking__lead__cp_phone')),
+             Q(booking__lead__channel_partner__phone=F('booking__lead__cp_phone'))])
+    
+    return results
+
+
 @login_required
 def cp_performance(request):
     """Channel Partner Performance Dashboard - Super Admin, Mandate Owner, Site Head, Sourcing Manager"""
@@ -553,8 +594,43 @@ def cp_performance(request):
     else:
         cps = ChannelPartner.objects.none()
     
+    # Search and filter - applied in SQL before any metrics are computed
+    search = request.GET.get('search', '').strip()
+    selected_status = request.GET.get('status', '')
+    selected_project = request.GET.get('project', '')
+    
+    if search:
+        cps = cps.filter(
+            Q(cp_name__icontains=search) |
+            Q(firm_name__icontains=search) |
+            Q(phone__icontains=search) |
+            Q(cp_unique_id__icontains=search)
+        )
+    if selected_status:
+        cps = cps.filter(status=selected_status)
+    if selected_project and Project.objects.filter(pk=selected_project if selected_project.isdigit() else None).exists():
+        # Filter by project - CPs linked to the selected project
+        cps = cps.filter(linked_projects__pk=selected_project).distinct()
+    
+    cps = list(cps)
+    cp_ids = [cp.pk for cp in cps]
+    phone_to_cp = {cp.phone: cp.pk for cp in cps}
+    
+    # Linked (active) project ids per CP - one query on the M2M table
+    linked_project_ids = {cp_id: set() for cp_id in cp_ids}
+    for cp_id, project_id in ChannelPartner.linked_projects.through.objects.filter(
+        channelpartner_id__in=cp_ids, project__is_active=True
+    ).values_list('channelpartner_id', 'project_id'):
+        linked_project_ids[cp_id].add(project_id)
+    
+    # Grouped metrics keyed on channel_partner_id
+    scope_projects = Project.objects.filter(site_head=user, is_active=True) if user.is_site_head() else None
+    grouped = _cp_grouped_metrics(cp_ids, phone_to_cp, scope_projects, this_month_start, this_week_start,
+                                  last_month_start, last_month_end)
+    
     cp_metrics = []
     for cp in cps:
+        values = grouped.get(cp.pk, {})
         metrics = {
             'cp': cp,
             'cp_name': cp.cp_name,
@@ -564,109 +640,32 @@ def cp_performance(request):
             'status': cp.status,
         }
         
-        # Base filters based on user role - using LeadProjectAssociation
-        from leads.models import LeadProjectAssociation
-        if user.is_super_admin() or user.is_mandate_owner():
-            cp_lead_ids = Lead.objects.filter(
-                Q(channel_partner=cp) | Q(cp_phone=cp.phone),
-                is_archived=False
-            ).values_list('id', flat=True)
-            cp_associations = LeadProjectAssociation.objects.filter(
-                lead_id__in=cp_lead_ids,
-                is_archived=False
-            )
-            cp_bookings = Booking.objects.filter(
-                Q(channel_partner=cp) | Q(lead__channel_partner=cp) | Q(lead__cp_phone=cp.phone),
-                is_archived=False
-            )
-            cp_payments = Payment.objects.filter(
-                Q(booking__channel_partner=cp) | 
-                Q(booking__lead__channel_partner=cp) | 
-                Q(booking__lead__cp_phone=cp.phone)
-            )
-        elif user.is_site_head():
-            site_head_projects = Project.objects.filter(site_head=user, is_active=True)
-            cp_lead_ids = Lead.objects.filter(
-                Q(channel_partner=cp) | Q(cp_phone=cp.phone),
-                is_archived=False
-            ).values_list('id', flat=True)
-            cp_associations = LeadProjectAssociation.objects.filter(
-                lead_id__in=cp_lead_ids,
-                project__in=site_head_projects,
-                is_archived=False
-            )
-            cp_bookings = Booking.objects.filter(
-                Q(channel_partner=cp) | Q(lead__channel_partner=cp) | Q(lead__cp_phone=cp.phone),
-                project__in=site_head_projects,
-                is_archived=False
-            )
-            cp_payments = Payment.objects.filter(
-                Q(booking__channel_partner=cp) | 
-                Q(booking__lead__channel_partner=cp) | 
-                Q(booking__lead__cp_phone=cp.phone),
-                booking__project__in=site_head_projects
-            )
-        else:  # Sourcing Manager - sees all data like super admin
-            cp_lead_ids = Lead.objects.filter(
-                Q(channel_partner=cp) | Q(cp_phone=cp.phone),
-                is_archived=False
-            ).values_list('id', flat=True)
-            cp_associations = LeadProjectAssociation.objects.filter(
-                lead_id__in=cp_lead_ids,
-                is_archived=False
-            )
-            cp_bookings = Booking.objects.filter(
-                Q(channel_partner=cp) | Q(lead__channel_partner=cp) | Q(lead__cp_phone=cp.phone),
-                is_archived=False
-            )
-            cp_payments = Payment.objects.filter(
-                Q(booking__channel_partner=cp) | 
-                Q(booking__lead__channel_partner=cp) | 
-                Q(booking__lead__cp_phone=cp.phone)
-            )
-        
         # CPs active number (always 1 if CP is active, 0 if inactive)
         metrics['cps_active_number'] = 1 if cp.status == 'active' and cp.is_active else 0
         
         # Total leads brought by CP
-        metrics['total_leads'] = cp_associations.count()
-        metrics['leads_this_month'] = cp_associations.filter(created_at__date__gte=this_month_start).count()
-        metrics['leads_this_week'] = cp_associations.filter(created_at__date__gte=this_week_start).count()
-        metrics['leads_last_month'] = cp_associations.filter(
-            created_at__date__gte=last_month_start,
-            created_at__date__lte=last_month_end
-        ).count()
+        metrics['total_leads'] = values.get('total_leads', 0)
+        metrics['leads_this_month'] = values.get('leads_this_month', 0)
+        metrics['leads_this_week'] = values.get('leads_this_week', 0)
+        metrics['leads_last_month'] = values.get('leads_last_month', 0)
         
         # CP visits on projects (visit_completed or pretagged verified)
-        metrics['cp_visits'] = cp_associations.filter(
-            Q(status='visit_completed') | Q(is_pretagged=True, phone_verified=True)
-        ).count()
-        metrics['cp_visits_this_month'] = cp_associations.filter(
-            Q(status='visit_completed') | Q(is_pretagged=True, phone_verified=True),
-            updated_at__date__gte=this_month_start
-        ).count()
+        metrics['cp_visits'] = values.get('cp_visits', 0)
+        metrics['cp_visits_this_month'] = values.get('cp_visits_this_month', 0)
         metrics['visited_leads'] = metrics['cp_visits']  # Keep for backward compatibility
         metrics['visited_this_month'] = metrics['cp_visits_this_month']  # Keep for backward compatibility
         
         # CP bookings on projects
-        metrics['cp_bookings'] = cp_bookings.count()
-        metrics['cp_bookings_this_month'] = cp_bookings.filter(created_at__date__gte=this_month_start).count()
+        metrics['cp_bookings'] = values.get('cp_bookings', 0)
+        metrics['cp_bookings_this_month'] = values.get('cp_bookings_this_month', 0)
         metrics['total_bookings'] = metrics['cp_bookings']  # Keep for backward compatibility
         metrics['bookings_this_month'] = metrics['cp_bookings_this_month']
-        metrics['bookings_this_week'] = cp_bookings.filter(created_at__date__gte=this_week_start).count()
-        metrics['bookings_last_month'] = cp_bookings.filter(
-            created_at__date__gte=last_month_start,
-            created_at__date__lte=last_month_end
-        ).count()
+        metrics['bookings_this_week'] = values.get('bookings_this_week', 0)
+        metrics['bookings_last_month'] = values.get('bookings_last_month', 0)
         
         # Revenue generated
-        total_revenue_raw = cp_payments.aggregate(total=Sum('amount'))['total']
-        metrics['total_revenue'] = float(total_revenue_raw) if total_revenue_raw is not None else 0
-        
-        revenue_this_month_raw = cp_payments.filter(
-            payment_date__gte=this_month_start
-        ).aggregate(total=Sum('amount'))['total']
-        metrics['revenue_this_month'] = float(revenue_this_month_raw) if revenue_this_month_raw is not None else 0
+        metrics['total_revenue'] = float(values.get('total_revenue', 0))
+        metrics['revenue_this_month'] = float(values.get('revenue_this_month', 0))
         
         # Overall visit to conversion ratio of CPs
         if metrics['cp_visits'] > 0:
@@ -686,51 +685,21 @@ def cp_performance(request):
         
         # Average booking value
         if metrics['total_bookings'] > 0:
-            avg_booking = cp_bookings.aggregate(avg=Avg('final_negotiated_price'))['avg'] or 0
-            metrics['avg_booking_value'] = avg_booking
+            metrics['avg_booking_value'] = values.get('booking_value', 0) / metrics['total_bookings']
         else:
             metrics['avg_booking_value'] = 0
         
         # Commission (if available)
-        total_commission = 0
-        for booking in cp_bookings:
-            if booking.cp_commission_percent and booking.final_negotiated_price:
-                commission = (booking.final_negotiated_price * booking.cp_commission_percent) / 100
-                total_commission += commission
-        metrics['total_commission'] = total_commission
+        metrics['total_commission'] = values.get('total_commission', 0)
         
         # Projects linked
-        metrics['linked_projects_count'] = cp.linked_projects.filter(is_active=True).count()
+        metrics['linked_projects_count'] = len(linked_project_ids[cp.pk])
         
         cp_metrics.append(metrics)
     
-    # Search and filter
-    search = request.GET.get('search', '').strip()
-    selected_status = request.GET.get('status', '')
-    selected_project = request.GET.get('project', '')
-    
-    if search:
-        cp_metrics = [m for m in cp_metrics if (
-            search.lower() in m['cp_name'].lower() or
-            search.lower() in m['firm_name'].lower() or
-            search.lower() in m['phone'] or
-            (m['cp_id'] and search.lower() in m['cp_id'].lower())
-        )]
-    
-    if selected_status:
-        cp_metrics = [m for m in cp_metrics if m['status'] == selected_status]
-    
-    if selected_project:
-        # Filter by project - check if CP is linked to selected project
-        try:
-            project = Project.objects.get(pk=selected_project)
-            cp_metrics = [m for m in cp_metrics if project in m['cp'].linked_projects.all()]
-        except Project.DoesNotExist:
-            pass
-    
     # Get all projects for filter dropdown
     if user.is_super_admin() or user.is_mandate_owner():
-        projects = Project.objects.filter(is_active=True).order_by('name')
+        projects = active_projects('name')
     elif user.is_site_head():
         projects = Project.objects.filter(site_head=user, is_active=True).order_by('name')
     elif user.is_sourcing_manager():